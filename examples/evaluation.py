@@ -1,4 +1,5 @@
 from opperai import Opper
+from opperai.extra import SpanMetricsWriter
 from pydantic import BaseModel, Field
 from typing import Literal
 import asyncio
@@ -95,13 +96,14 @@ async def main():
     sentiment_metrics = await sentiment_evaluator(text=result, target="positive")
     metrics = linecount_metrics + sentiment_metrics
 
-    for metric in metrics:
-        opper.span_metrics.create_metric(
-            dimension=metric["dimension"],
-            value=metric["value"],
-            comment=metric["comment"],
-            span_id=result.span_id,
-        )
+    with SpanMetricsWriter(opper) as writer:
+        for metric in metrics:
+            writer.add(
+                dimension=metric["dimension"],
+                value=metric["value"],
+                comment=metric["comment"],
+                span_id=result.span_id,
+            )
 
     # Retrieve metrics from Opper and display
     print("\n--- Evaluation Results ---")
@@ -4,12 +4,33 @@ Script to apply schema conversion patches to the Opper SDK after Speakeasy gener
 This script adds Pydantic schema conversion handling to methods in:
 - sdk.py: call, call_async, stream, stream_async
 - functions.py: create, create_async, update, update_async
+
+It also adds the request-middleware hook to basesdk.py's do_request and
+do_request_async, which the helpers in opperai.extra build on, and restores
+the custom code regions (imports and sdk-class-body) of the sub-SDK files
+listed in CUSTOM_REGION_FILES if generation dropped them.
 """
 
 import os
 import re
+import subprocess
 import sys
 
+# Generated files with hand-written methods in custom code regions. Speakeasy
+# keeps these when enableCustomCodeRegions is on in gen.yaml; if a generation
+# drops one anyway it is restored from the last committed version of the file.
+CUSTOM_REGION_FILES = [
+    "src/opperai/analytics.py",
+    "src/opperai/datasets.py",
+    "src/opperai/embeddings.py",
+    "src/opperai/knowledge.py",
+    "src/opperai/ocr.py",
+    "src/opperai/openai.py",
+    "src/opperai/rerank.py",
+    "src/opperai/traces.py",
+]
+CUSTOM_REGIONS = ("imports", "sdk-class-body")
+
 
 def apply_sdk_schema_conversion_patch(file_path):
     """Apply schema conversion patches to the SDK file."""
@@ -136,17 +157,157 @@ def apply_functions_schema_conversion_patch(file_path):
     return True
 
 
+def apply_basesdk_middleware_patch(file_path):
+    """Add the request-middleware hook to do_request and do_request_async."""
+
+    if not os.path.exists(file_path):
+        print(f"❌ Error: {file_path} not found")
+        return False
+
+    with open(file_path, "r") as f:
+        content = f.read()
+
+    if "# region request-middleware" in content:
+        print("⚠️  basesdk middleware patches already exist, skipping...")
+        return True
+
+    def middleware_block(name, awaited):
+        handle = "handle_async" if awaited else "handle"
+        prefix = "await " if awaited else ""
+        return f"""        _skip_middleware: bool = False,
+    ) -> httpx.Response:
+        # region request-middleware
+        middleware = self.sdk_configuration.__dict__.get("_middleware")
+        if middleware and not _skip_middleware:
+            return {prefix}middleware.{handle}(
+                hook_ctx,
+                request,
+                stream,
+                lambda req=None: self.{name}(
+                    hook_ctx,
+                    request if req is None else req,
+                    error_status_codes,
+                    stream,
+                    retry_config,
+                    _skip_middleware=True,
+                ),
+            )
+        # endregion request-middleware
+
+"""
+
+    modified_content = content
+    for name, awaited in (("do_request", False), ("do_request_async", True)):
+        pattern = (
+            r"(    (?:async )?def "
+            + name
+            + r"\(\n(?:        .*\n)*?        retry_config: Optional\[Tuple\[RetryConfig, List\[str\]\]\] = None,\n)"
+            r"    \) -> httpx\.Response:\n"
+        )
+        block = middleware_block(name, awaited)
+        modified_content = re.sub(
+            pattern, lambda m: m.group(1) + block, modified_content, count=1
+        )
+
+    patch_count = len(re.findall(r"# region request-middleware", modified_content))
+    if patch_count != 2:
+        print(
+            "⚠️  No insertion points found in basesdk.py - the structure may have changed"
+        )
+        return False
+
+    with open(file_path, "w") as f:
+        f.write(modified_content)
+
+    print(f"✅ Applied middleware patches to {patch_count} basesdk methods")
+    return True
+
+
+def _find_region(content, name):
+    name = re.escape(name)
+    pattern = rf"^[ \t]*# region {name}\n.*?^[ \t]*# endregion {name}\n"
+    match = re.search(pattern, content, re.M | re.S)
+    return match.group(0) if match else None
+
+
+def _committed_content(file_path):
+    try:
+        result = subprocess.run(
+            ["git", "show", f"HEAD:{file_path}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout
+
+
+def apply_custom_region_patch(file_path):
+    """Restore the imports and sdk-class-body regions of a sub-SDK file."""
+
+    if not os.path.exists(file_path):
+        print(f"❌ Error: {file_path} not found")
+        return False
+
+    with open(file_path, "r") as f:
+        content = f.read()
+
+    missing = [name for name in CUSTOM_REGIONS if _find_region(content, name) is None]
+    if not missing:
+        print(f"⚠️  {file_path} custom code regions already exist, skipping...")
+        return True
+
+    committed = _committed_content(file_path)
+    modified_content = content
+    for name in missing:
+        block = _find_region(committed, name) if committed else None
+        if block is None:
+            print(f"❌ No committed '{name}' region to restore in {file_path}")
+            return False
+        if name == "imports":
+            # After the generated imports, before the first class.
+            match = re.search(r"^class ", modified_content, re.M)
+            if match is None:
+                print(
+                    f"⚠️  No insertion point found in {file_path} - the structure may have changed"
+                )
+                return False
+            head = modified_content[: match.start()].rstrip("\n")
+            modified_content = (
+                f"{head}\n\n{block}\n\n{modified_content[match.start():]}"
+            )
+        else:
+            # The sub-SDK class is the last definition in the file.
+            modified_content = modified_content.rstrip("\n") + "\n\n" + block
+
+    if any(_find_region(modified_content, name) is None for name in CUSTOM_REGIONS):
+        print(f"❌ Custom code regions were not restored in {file_path}")
+        return False
+
+    with open(file_path, "w") as f:
+        f.write(modified_content)
+
+    print(f"✅ Restored {', '.join(missing)} region(s) in {file_path}")
+    return True
+
+
 def main():
     """Main function."""
     sdk_file = "src/opperai/sdk.py"
     functions_file = "src/opperai/functions.py"
+    basesdk_file = "src/opperai/basesdk.py"
 
     print("🔧 Applying schema conversion patches...")
 
     sdk_success = apply_sdk_schema_conversion_patch(sdk_file)
     functions_success = apply_functions_schema_conversion_patch(functions_file)
+    basesdk_success = apply_basesdk_middleware_patch(basesdk_file)
+    regions_success = all(
+        [apply_custom_region_patch(path) for path in CUSTOM_REGION_FILES]
+    )
 
-    if sdk_success and functions_success:
+    if sdk_success and functions_success and basesdk_success and regions_success:
         print("✅ All schema conversion patches applied successfully!")
         sys.exit(0)
     else:
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare memory use and decode time of embedding responses against a local mock server.
+
+- model:   embeddings.create, which returns a CreateEmbeddingResponse whose
+           vectors are lists of Python floats
+- compact: embeddings.create_compact, which decodes the vectors into one
+           float32 array
+
+Each mode runs in its own process so the peak RSS numbers are independent.
+
+Usage: python scripts/bench_embeddings_compact.py [count] [dimensions]
+"""
+
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def result_size_mb(value):
+    # Approximate size of what the caller keeps: containers plus their items.
+    seen = set()
+
+    def size(obj):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+        total = sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            total += sum(size(k) + size(v) for k, v in obj.items())
+        elif isinstance(obj, (list, tuple)):
+            total += sum(size(v) for v in obj)
+        elif hasattr(obj, "__dict__"):
+            total += size(vars(obj))
+        return total
+
+    return size(value) / (1024 * 1024)
+
+
+def write_body(path, count, dimensions):
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"model":"bench","usage":{"total_tokens":%d},"data":[' % count)
+        for i in range(count):
+            vector = ",".join(repr(rng.uniform(-1, 1)) for _ in range(dimensions))
+            sep = "," if i else ""
+            f.write(f'{sep}{{"object":"embedding","index":{i},"embedding":[{vector}]}}')
+        f.write("]}")
+
+
+def run(mode, path):
+    import httpx
+    from opperai import Opper
+
+    with open(path, "rb") as f:
+        body = f.read()
+
+    def handler(request):
+        return httpx.Response(
+            200, content=body, headers={"content-type": "application/json"}
+        )
+
+    client = Opper(
+        http_bearer="bench",
+        client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "model":
+        result = client.embeddings.create(input="bench")
+        count = len(result.data)
+    else:
+        result = client.embeddings.create_compact(input="bench")
+        count = result.count
+    elapsed = time.perf_counter() - start
+    print(
+        f"{mode:<8} {count} vectors in {elapsed:6.2f}s, "
+        f"result size: {result_size_mb(result):8.1f} MB, "
+        f"peak RSS growth: {peak_rss_mb() - baseline:8.1f} MB"
+    )
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] in ("model", "compact"):
+        run(sys.argv[1], sys.argv[2])
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        path = f.name
+    try:
+        write_body(path, count, dimensions)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"decoding {count} x {dimensions} embeddings ({size_mb:.0f} MB of JSON)")
+        for mode in ("model", "compact"):
+            subprocess.run([sys.executable, __file__, mode, path], check=True)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
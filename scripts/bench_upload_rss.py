@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compare peak RSS of knowledge file uploads against a local mock server.
+
+- bytes:     knowledge.upload_file with the whole file read into memory
+- streaming: opperai.extra.upload_file, which streams large files through the
+             presigned upload flow
+
+Each mode runs in its own process so the peak RSS numbers are independent.
+
+Usage: python scripts/bench_upload_rss.py [size_mb]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run(mode, path):
+    import httpx
+    from opperai import Opper
+    from opperai.extra import upload_file
+
+    def handler(request):
+        received = sum(len(chunk) for chunk in request.stream)
+        path_ = request.url.path
+        if path_.endswith("/upload_url"):
+            return httpx.Response(
+                200,
+                json={"url": "https://upload.example/", "fields": {"key": "k"}, "id": "f1"},
+            )
+        if request.url.host == "upload.example":
+            assert received > 0
+            return httpx.Response(204)
+        return httpx.Response(
+            201,
+            json={"id": "f1", "key": "k", "original_filename": "bench.bin", "document_id": 1},
+        )
+
+    class DrainingTransport(httpx.BaseTransport):
+        # httpx.MockTransport reads the whole request body before calling the
+        # handler, which would hide the difference being measured.
+        def handle_request(self, request):
+            return handler(request)
+
+    client = Opper(
+        http_bearer="bench",
+        client=httpx.Client(transport=DrainingTransport()),
+    )
+    baseline = peak_rss_mb()
+    if mode == "bytes":
+        with open(path, "rb") as f:
+            client.knowledge.upload_file(
+                knowledge_base_id="kb",
+                file={"file_name": "bench.bin", "content": f.read()},
+            )
+    else:
+        upload_file(client, "kb", path)
+    print(f"{mode:<10} peak RSS growth: {peak_rss_mb() - baseline:8.1f} MB")
+
+
+def main():
+    if len(sys.argv) == 3:
+        run(sys.argv[1], sys.argv[2])
+        return
+
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.NamedTemporaryFile(suffix=".bin", delete=False) as f:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            f.write(chunk)
+        path = f.name
+
+    try:
+        print(f"uploading a {size_mb} MB file")
+        for mode in ("bytes", "streaming"):
+            subprocess.run([sys.executable, __file__, mode, path], check=True)
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
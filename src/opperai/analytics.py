@@ -9,6 +9,13 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, List, Mapping, Optional
 
+# region imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from opperai.extra.usage_table import UsageTable
+# endregion imports
+
 
 class Analytics(BaseSDK):
     def get_usage(
@@ -236,3 +243,108 @@ class Analytics(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def get_usage_table(
+        self,
+        *,
+        from_date: OptionalNullable[datetime] = UNSET,
+        to_date: OptionalNullable[datetime] = UNSET,
+        granularity: OptionalNullable[models.Granularity] = UNSET,
+        fields: OptionalNullable[List[str]] = UNSET,
+        group_by: OptionalNullable[List[str]] = UNSET,
+        use_numpy: Optional[bool] = None,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "UsageTable":
+        r"""Usage as a Columnar Table
+
+        Fetch usage like `get_usage` and convert it into a `UsageTable`, with one
+        array per summed field and dictionary-encoded group-by columns, for
+        group-by, rollup and top-N without per-row dict lookups.
+
+        :param from_date: Start date for the time range (inclusive). If not provided, defaults to the first day of the current month.
+        :param to_date: End date for the time range (exclusive). If not provided, defaults to the last day of the current month.
+        :param granularity: Time granularity for grouping (minute, hour, day, month, year)
+        :param fields: Fields from event_metadata to include and sum
+        :param group_by: Fields from tags to group by
+        :param use_numpy: Force or disable NumPy for aggregations; by default it is used when installed
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.usage_table import UsageTable
+
+        items = self.get_usage(
+            from_date=from_date,
+            to_date=to_date,
+            granularity=granularity,
+            fields=fields,
+            group_by=group_by,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+        return UsageTable.from_usage(
+            items,
+            group_by=group_by or None,
+            fields=fields or None,
+            use_numpy=use_numpy,
+        )
+
+    async def get_usage_table_async(
+        self,
+        *,
+        from_date: OptionalNullable[datetime] = UNSET,
+        to_date: OptionalNullable[datetime] = UNSET,
+        granularity: OptionalNullable[models.Granularity] = UNSET,
+        fields: OptionalNullable[List[str]] = UNSET,
+        group_by: OptionalNullable[List[str]] = UNSET,
+        use_numpy: Optional[bool] = None,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "UsageTable":
+        r"""Usage as a Columnar Table
+
+        Fetch usage like `get_usage` and convert it into a `UsageTable`, with one
+        array per summed field and dictionary-encoded group-by columns, for
+        group-by, rollup and top-N without per-row dict lookups.
+
+        :param from_date: Start date for the time range (inclusive). If not provided, defaults to the first day of the current month.
+        :param to_date: End date for the time range (exclusive). If not provided, defaults to the last day of the current month.
+        :param granularity: Time granularity for grouping (minute, hour, day, month, year)
+        :param fields: Fields from event_metadata to include and sum
+        :param group_by: Fields from tags to group by
+        :param use_numpy: Force or disable NumPy for aggregations; by default it is used when installed
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.usage_table import UsageTable
+
+        items = await self.get_usage_async(
+            from_date=from_date,
+            to_date=to_date,
+            granularity=granularity,
+            fields=fields,
+            group_by=group_by,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+        return UsageTable.from_usage(
+            items,
+            group_by=group_by or None,
+            fields=fields or None,
+            use_numpy=use_numpy,
+        )
+
+    # endregion sdk-class-body
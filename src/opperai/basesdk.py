@@ -226,7 +226,26 @@ class BaseSDK:
         error_status_codes,
         stream=False,
         retry_config: Optional[Tuple[RetryConfig, List[str]]] = None,
+        _skip_middleware: bool = False,
     ) -> httpx.Response:
+        # region request-middleware
+        middleware = self.sdk_configuration.__dict__.get("_middleware")
+        if middleware and not _skip_middleware:
+            return middleware.handle(
+                hook_ctx,
+                request,
+                stream,
+                lambda req=None: self.do_request(
+                    hook_ctx,
+                    request if req is None else req,
+                    error_status_codes,
+                    stream,
+                    retry_config,
+                    _skip_middleware=True,
+                ),
+            )
+        # endregion request-middleware
+
         client = self.sdk_configuration.client
         logger = self.sdk_configuration.debug_logger
 
@@ -298,7 +317,26 @@ class BaseSDK:
         error_status_codes,
         stream=False,
         retry_config: Optional[Tuple[RetryConfig, List[str]]] = None,
+        _skip_middleware: bool = False,
     ) -> httpx.Response:
+        # region request-middleware
+        middleware = self.sdk_configuration.__dict__.get("_middleware")
+        if middleware and not _skip_middleware:
+            return await middleware.handle_async(
+                hook_ctx,
+                request,
+                stream,
+                lambda req=None: self.do_request_async(
+                    hook_ctx,
+                    request if req is None else req,
+                    error_status_codes,
+                    stream,
+                    retry_config,
+                    _skip_middleware=True,
+                ),
+            )
+        # endregion request-middleware
+
         client = self.sdk_configuration.async_client
         logger = self.sdk_configuration.debug_logger
 
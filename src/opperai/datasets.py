@@ -10,6 +10,13 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, List, Mapping, Optional
 
+# region imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from opperai.extra.streamed_responses import AsyncStreamedItems, StreamedItems
+# endregion imports
+
 
 class Datasets(BaseSDK):
     entries: Entries
@@ -1119,3 +1126,82 @@ class Datasets(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def list_entries_streamed(
+        self,
+        *,
+        dataset_id: str,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "StreamedItems[models.GetDatasetEntriesResponse, models.PaginatedResponseGetDatasetEntriesResponse]":
+        r"""List Dataset Entries Streamed
+
+        List entries like `list_entries`, decoding the response as it arrives.
+        Iterate the result to receive entries one at a time; its
+        `envelope` then holds the pagination metadata.
+
+        :param dataset_id: The id of the dataset
+        :param offset: The offset of the entries to get
+        :param limit: The limit of the entries to get
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_responses import stream_dataset_entries
+
+        return stream_dataset_entries(
+            self,
+            dataset_id=dataset_id,
+            offset=offset,
+            limit=limit,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    async def list_entries_streamed_async(
+        self,
+        *,
+        dataset_id: str,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "AsyncStreamedItems[models.GetDatasetEntriesResponse, models.PaginatedResponseGetDatasetEntriesResponse]":
+        r"""List Dataset Entries Streamed
+
+        List entries like `list_entries`, decoding the response as it arrives.
+        Iterate the result with `async for` to receive entries one at a time; its
+        `envelope` then holds the pagination metadata.
+
+        :param dataset_id: The id of the dataset
+        :param offset: The offset of the entries to get
+        :param limit: The limit of the entries to get
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_responses import stream_dataset_entries_async
+
+        return await stream_dataset_entries_async(
+            self,
+            dataset_id=dataset_id,
+            offset=offset,
+            limit=limit,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    # endregion sdk-class-body
@@ -8,6 +8,13 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, Mapping, Optional, Union
 
+# region imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from opperai.extra.compact_embeddings import CompactEmbeddings
+# endregion imports
+
 
 class Embeddings(BaseSDK):
     def create(
@@ -229,3 +236,74 @@ class Embeddings(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def create_compact(
+        self,
+        *,
+        input: Union[models.Input, models.InputTypedDict],
+        model: OptionalNullable[Union[models.TModel, models.TModelTypedDict]] = UNSET,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "CompactEmbeddings":
+        r"""Create Embedding as a Float32 Matrix
+
+        Create embeddings like `create`, decoding the vectors straight into one
+        contiguous float32 buffer instead of a list of dicts
+
+        :param input: The input to embed, can be a single string or a list of strings
+        :param model: The model to use for the embedding, if not provided, the server's default embedding model will be used
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.compact_embeddings import create_compact
+
+        return create_compact(
+            self,
+            input=input,
+            model=model,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    async def create_compact_async(
+        self,
+        *,
+        input: Union[models.Input, models.InputTypedDict],
+        model: OptionalNullable[Union[models.TModel, models.TModelTypedDict]] = UNSET,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "CompactEmbeddings":
+        r"""Create Embedding as a Float32 Matrix
+
+        Create embeddings like `create`, decoding the vectors straight into one
+        contiguous float32 buffer instead of a list of dicts
+
+        :param input: The input to embed, can be a single string or a list of strings
+        :param model: The model to use for the embedding, if not provided, the server's default embedding model will be used
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.compact_embeddings import create_compact_async
+
+        return await create_compact_async(
+            self,
+            input=input,
+            model=model,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    # endregion sdk-class-body
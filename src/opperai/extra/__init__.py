@@ -0,0 +1,651 @@
+"""Hand-written helpers built on top of the generated SDK."""
+
+from typing import TYPE_CHECKING
+from importlib import import_module
+import builtins
+import sys
+
+if TYPE_CHECKING:
+    from .metrics_writer import (
+        DEFAULT_METRIC_RETRY_CONFIG,
+        MetricsFlushResult,
+        MetricWriteError,
+        SpanMetricsWriter,
+        SpanMetricsWriterAsync,
+    )
+    from .evaluation import (
+        DimensionStats,
+        EvaluationError,
+        EvaluationReport,
+        EvaluationRunner,
+        Evaluator,
+        EvaluatorMode,
+        StageStats,
+        evaluator,
+    )
+    from .offload import (
+        CPUExecutor,
+        chunk_size_for,
+        cpu_bound,
+        default_pool_size,
+        get_cpu_executor,
+        is_cpu_bound,
+        offload,
+        to_payload,
+    )
+    from .pipeline import (
+        aiter_items,
+        run_bounded,
+        run_bounded_async,
+    )
+    from .ingest import (
+        DEFAULT_INGEST_RETRY_CONFIG,
+        DocumentLike,
+        IngestFailure,
+        IngestProgress,
+        IngestReport,
+        KnowledgeIngestor,
+        document_key,
+    )
+    from .manifest import (
+        IngestManifest,
+        ManifestEntry,
+        fingerprint,
+        key_filter,
+    )
+    from .uploads import (
+        DEFAULT_CHUNK_SIZE,
+        DEFAULT_PRESIGNED_THRESHOLD,
+        FileSource,
+        StreamingMultipartBody,
+        UploadResult,
+        upload_file,
+        upload_file_async,
+    )
+    from .manifest import (
+        FileManifestEntry,
+        FileSyncManifest,
+    )
+    from .dirsync import (
+        DirectorySync,
+        DirectorySyncReport,
+        LocalFile,
+        PENDING_FILE_STATUSES,
+        SyncFailure,
+        scan_directory,
+    )
+    from .middleware import (
+        CallNext,
+        CallNextAsync,
+        MiddlewareChain,
+        RequestMiddleware,
+        add_middleware,
+        remove_middleware,
+    )
+    from .query_cache import (
+        INVALIDATING_OPERATIONS,
+        KnowledgeQueryCache,
+        QUERY_OPERATION,
+        QueryCacheStats,
+        enable_query_cache,
+        normalize_query,
+    )
+    from .multiquery import (
+        DEFAULT_RRF_K,
+        FusedDocument,
+        KnowledgeQuery,
+        KnowledgeQueryLike,
+        MultiQueryResult,
+        QueryOutcome,
+        fuse,
+        query_many,
+        query_many_async,
+    )
+    from .singleflight import (
+        AsyncSingleFlight,
+        SingleFlight,
+    )
+    from .coalesce import (
+        CoalescingStats,
+        RequestCoalescer,
+        enable_request_coalescing,
+        request_key,
+    )
+    from .embedding_batcher import (
+        EmbeddingBatchStats,
+        MicroBatchEmbedder,
+        Vector,
+        embedding_vectors,
+    )
+    from .compact_embeddings import (
+        CompactEmbeddings,
+        create_compact,
+        create_compact_async,
+        decode_embeddings,
+    )
+    from .embedding_cache import (
+        DEFAULT_CACHE_MAX_BYTES,
+        EMBEDDING_OPERATION,
+        EmbeddingCache,
+        EmbeddingCacheMiddleware,
+        EmbeddingCacheStats,
+        enable_embedding_cache,
+        model_key,
+        text_hash,
+    )
+    from .vector_index import (
+        VectorIndex,
+        SearchHit,
+        matches_filters,
+    )
+    from .sharded_rerank import (
+        rerank_sharded,
+        rerank_sharded_async,
+        ShardedRerankResponse,
+        bm25_scores,
+        shard_documents,
+    )
+    from .sharded_ocr import (
+        iter_ocr_pages,
+        iter_ocr_pages_async,
+        OCRPageStream,
+        AsyncOCRPageStream,
+        ShardedOCRResponse,
+        merge_ocr_responses,
+        page_shards,
+    )
+    from .streamed_ocr import (
+        process_streamed,
+        process_streamed_async,
+        StreamedOCRResponse,
+        AsyncStreamedOCRResponse,
+        StreamedOCRPage,
+        LazyOCRPageImage,
+        ImageSink,
+        TemporaryImageSink,
+    )
+    from .json_stream import (
+        JSONItemScanner,
+        StringSink,
+        iter_json_items,
+        aiter_json_items,
+    )
+    from .streamed_responses import (
+        StreamedItems,
+        AsyncStreamedItems,
+        stream_items,
+        stream_items_async,
+    )
+    from .chat_stream import (
+        ChatCompletionChunk,
+        ChunkChoice,
+        ChoiceDelta,
+        ChoiceDeltaToolCall,
+        ChoiceDeltaToolCallFunction,
+        ChoiceDeltaFunctionCall,
+        ChatCompletionAccumulator,
+        ChatCompletionStream,
+        AsyncChatCompletionStream,
+        streaming_payload,
+        create_chat_completion_stream,
+        create_chat_completion_stream_async,
+    )
+    from .chat_batch import (
+        BatchRequest,
+        batch_request,
+        read_batch_requests,
+        ModelUsage,
+        BatchProgress,
+        BatchFailure,
+        BatchReport,
+        AdaptiveConcurrency,
+        AsyncAdaptiveConcurrency,
+        BatchCheckpoint,
+        ChatBatchRunner,
+        retry_after,
+        RETRYABLE_STATUS_CODES,
+    )
+    from .usage_tracking import (
+        CALL_OPERATIONS,
+        STREAM_OPERATIONS,
+        UsageKey,
+        UsageTotals,
+        UsageSnapshot,
+        UsageAggregator,
+        UsageTrackingMiddleware,
+        usage_key,
+        track_usage,
+    )
+    from .usage_store import (
+        bucket_start,
+        bucket_end,
+        series_key,
+        UsageStoreStats,
+        UsageStore,
+    )
+    from .usage_table import (
+        TIME_BUCKET,
+        COST,
+        NULL_TIME,
+        DictionaryColumn,
+        UsageTable,
+    )
+    from .model_catalog import (
+        BUILTIN,
+        CUSTOM,
+        ALIAS,
+        MODEL_OPERATIONS,
+        ModelInfo,
+        UnknownModelError,
+        model_names,
+        ModelCatalog,
+        ModelValidationMiddleware,
+        validate_models,
+    )
+    from .pagination import (
+        paginate,
+        paginate_async,
+    )
+
+__all__ = [
+    "DEFAULT_METRIC_RETRY_CONFIG",
+    "MetricsFlushResult",
+    "MetricWriteError",
+    "SpanMetricsWriter",
+    "SpanMetricsWriterAsync",
+    "DimensionStats",
+    "EvaluationError",
+    "EvaluationReport",
+    "EvaluationRunner",
+    "Evaluator",
+    "EvaluatorMode",
+    "StageStats",
+    "evaluator",
+    "CPUExecutor",
+    "chunk_size_for",
+    "cpu_bound",
+    "default_pool_size",
+    "get_cpu_executor",
+    "is_cpu_bound",
+    "offload",
+    "to_payload",
+    "aiter_items",
+    "run_bounded",
+    "run_bounded_async",
+    "DEFAULT_INGEST_RETRY_CONFIG",
+    "DocumentLike",
+    "IngestFailure",
+    "IngestProgress",
+    "IngestReport",
+    "KnowledgeIngestor",
+    "document_key",
+    "IngestManifest",
+    "ManifestEntry",
+    "fingerprint",
+    "key_filter",
+    "DEFAULT_CHUNK_SIZE",
+    "DEFAULT_PRESIGNED_THRESHOLD",
+    "FileSource",
+    "StreamingMultipartBody",
+    "UploadResult",
+    "upload_file",
+    "upload_file_async",
+    "FileManifestEntry",
+    "FileSyncManifest",
+    "DirectorySync",
+    "DirectorySyncReport",
+    "LocalFile",
+    "PENDING_FILE_STATUSES",
+    "SyncFailure",
+    "scan_directory",
+    "CallNext",
+    "CallNextAsync",
+    "MiddlewareChain",
+    "RequestMiddleware",
+    "add_middleware",
+    "remove_middleware",
+    "INVALIDATING_OPERATIONS",
+    "KnowledgeQueryCache",
+    "QUERY_OPERATION",
+    "QueryCacheStats",
+    "enable_query_cache",
+    "normalize_query",
+    "DEFAULT_RRF_K",
+    "FusedDocument",
+    "KnowledgeQuery",
+    "KnowledgeQueryLike",
+    "MultiQueryResult",
+    "QueryOutcome",
+    "fuse",
+    "query_many",
+    "query_many_async",
+    "AsyncSingleFlight",
+    "SingleFlight",
+    "CoalescingStats",
+    "RequestCoalescer",
+    "enable_request_coalescing",
+    "request_key",
+    "EmbeddingBatchStats",
+    "MicroBatchEmbedder",
+    "Vector",
+    "embedding_vectors",
+    "CompactEmbeddings",
+    "create_compact",
+    "create_compact_async",
+    "decode_embeddings",
+    "DEFAULT_CACHE_MAX_BYTES",
+    "EMBEDDING_OPERATION",
+    "EmbeddingCache",
+    "EmbeddingCacheMiddleware",
+    "EmbeddingCacheStats",
+    "enable_embedding_cache",
+    "model_key",
+    "text_hash",
+    "VectorIndex",
+    "SearchHit",
+    "matches_filters",
+    "rerank_sharded",
+    "rerank_sharded_async",
+    "ShardedRerankResponse",
+    "bm25_scores",
+    "shard_documents",
+    "iter_ocr_pages",
+    "iter_ocr_pages_async",
+    "OCRPageStream",
+    "AsyncOCRPageStream",
+    "ShardedOCRResponse",
+    "merge_ocr_responses",
+    "page_shards",
+    "process_streamed",
+    "process_streamed_async",
+    "StreamedOCRResponse",
+    "AsyncStreamedOCRResponse",
+    "StreamedOCRPage",
+    "LazyOCRPageImage",
+    "ImageSink",
+    "TemporaryImageSink",
+    "JSONItemScanner",
+    "StringSink",
+    "iter_json_items",
+    "aiter_json_items",
+    "StreamedItems",
+    "AsyncStreamedItems",
+    "stream_items",
+    "stream_items_async",
+    "ChatCompletionChunk",
+    "ChunkChoice",
+    "ChoiceDelta",
+    "ChoiceDeltaToolCall",
+    "ChoiceDeltaToolCallFunction",
+    "ChoiceDeltaFunctionCall",
+    "ChatCompletionAccumulator",
+    "ChatCompletionStream",
+    "AsyncChatCompletionStream",
+    "streaming_payload",
+    "create_chat_completion_stream",
+    "create_chat_completion_stream_async",
+    "BatchRequest",
+    "batch_request",
+    "read_batch_requests",
+    "ModelUsage",
+    "BatchProgress",
+    "BatchFailure",
+    "BatchReport",
+    "AdaptiveConcurrency",
+    "AsyncAdaptiveConcurrency",
+    "BatchCheckpoint",
+    "ChatBatchRunner",
+    "retry_after",
+    "RETRYABLE_STATUS_CODES",
+    "CALL_OPERATIONS",
+    "STREAM_OPERATIONS",
+    "UsageKey",
+    "UsageTotals",
+    "UsageSnapshot",
+    "UsageAggregator",
+    "UsageTrackingMiddleware",
+    "usage_key",
+    "track_usage",
+    "bucket_start",
+    "bucket_end",
+    "series_key",
+    "UsageStoreStats",
+    "UsageStore",
+    "TIME_BUCKET",
+    "COST",
+    "NULL_TIME",
+    "DictionaryColumn",
+    "UsageTable",
+    "BUILTIN",
+    "CUSTOM",
+    "ALIAS",
+    "MODEL_OPERATIONS",
+    "ModelInfo",
+    "UnknownModelError",
+    "model_names",
+    "ModelCatalog",
+    "ModelValidationMiddleware",
+    "validate_models",
+    "paginate",
+    "paginate_async",
+]
+
+_dynamic_imports: dict[str, str] = {
+    "DEFAULT_METRIC_RETRY_CONFIG": ".metrics_writer",
+    "MetricsFlushResult": ".metrics_writer",
+    "MetricWriteError": ".metrics_writer",
+    "SpanMetricsWriter": ".metrics_writer",
+    "SpanMetricsWriterAsync": ".metrics_writer",
+    "DimensionStats": ".evaluation",
+    "EvaluationError": ".evaluation",
+    "EvaluationReport": ".evaluation",
+    "EvaluationRunner": ".evaluation",
+    "Evaluator": ".evaluation",
+    "EvaluatorMode": ".evaluation",
+    "StageStats": ".evaluation",
+    "evaluator": ".evaluation",
+    "CPUExecutor": ".offload",
+    "chunk_size_for": ".offload",
+    "cpu_bound": ".offload",
+    "default_pool_size": ".offload",
+    "get_cpu_executor": ".offload",
+    "is_cpu_bound": ".offload",
+    "offload": ".offload",
+    "to_payload": ".offload",
+    "aiter_items": ".pipeline",
+    "run_bounded": ".pipeline",
+    "run_bounded_async": ".pipeline",
+    "DEFAULT_INGEST_RETRY_CONFIG": ".ingest",
+    "DocumentLike": ".ingest",
+    "IngestFailure": ".ingest",
+    "IngestProgress": ".ingest",
+    "IngestReport": ".ingest",
+    "KnowledgeIngestor": ".ingest",
+    "document_key": ".ingest",
+    "IngestManifest": ".manifest",
+    "ManifestEntry": ".manifest",
+    "fingerprint": ".manifest",
+    "key_filter": ".manifest",
+    "DEFAULT_CHUNK_SIZE": ".uploads",
+    "DEFAULT_PRESIGNED_THRESHOLD": ".uploads",
+    "FileSource": ".uploads",
+    "StreamingMultipartBody": ".uploads",
+    "UploadResult": ".uploads",
+    "upload_file": ".uploads",
+    "upload_file_async": ".uploads",
+    "FileManifestEntry": ".manifest",
+    "FileSyncManifest": ".manifest",
+    "DirectorySync": ".dirsync",
+    "DirectorySyncReport": ".dirsync",
+    "LocalFile": ".dirsync",
+    "PENDING_FILE_STATUSES": ".dirsync",
+    "SyncFailure": ".dirsync",
+    "scan_directory": ".dirsync",
+    "CallNext": ".middleware",
+    "CallNextAsync": ".middleware",
+    "MiddlewareChain": ".middleware",
+    "RequestMiddleware": ".middleware",
+    "add_middleware": ".middleware",
+    "remove_middleware": ".middleware",
+    "INVALIDATING_OPERATIONS": ".query_cache",
+    "KnowledgeQueryCache": ".query_cache",
+    "QUERY_OPERATION": ".query_cache",
+    "QueryCacheStats": ".query_cache",
+    "enable_query_cache": ".query_cache",
+    "normalize_query": ".query_cache",
+    "DEFAULT_RRF_K": ".multiquery",
+    "FusedDocument": ".multiquery",
+    "KnowledgeQuery": ".multiquery",
+    "KnowledgeQueryLike": ".multiquery",
+    "MultiQueryResult": ".multiquery",
+    "QueryOutcome": ".multiquery",
+    "fuse": ".multiquery",
+    "query_many": ".multiquery",
+    "query_many_async": ".multiquery",
+    "AsyncSingleFlight": ".singleflight",
+    "SingleFlight": ".singleflight",
+    "CoalescingStats": ".coalesce",
+    "RequestCoalescer": ".coalesce",
+    "enable_request_coalescing": ".coalesce",
+    "request_key": ".coalesce",
+    "EmbeddingBatchStats": ".embedding_batcher",
+    "MicroBatchEmbedder": ".embedding_batcher",
+    "Vector": ".embedding_batcher",
+    "embedding_vectors": ".embedding_batcher",
+    "CompactEmbeddings": ".compact_embeddings",
+    "create_compact": ".compact_embeddings",
+    "create_compact_async": ".compact_embeddings",
+    "decode_embeddings": ".compact_embeddings",
+    "DEFAULT_CACHE_MAX_BYTES": ".embedding_cache",
+    "EMBEDDING_OPERATION": ".embedding_cache",
+    "EmbeddingCache": ".embedding_cache",
+    "EmbeddingCacheMiddleware": ".embedding_cache",
+    "EmbeddingCacheStats": ".embedding_cache",
+    "enable_embedding_cache": ".embedding_cache",
+    "model_key": ".embedding_cache",
+    "text_hash": ".embedding_cache",
+    "VectorIndex": ".vector_index",
+    "SearchHit": ".vector_index",
+    "matches_filters": ".vector_index",
+    "rerank_sharded": ".sharded_rerank",
+    "rerank_sharded_async": ".sharded_rerank",
+    "ShardedRerankResponse": ".sharded_rerank",
+    "bm25_scores": ".sharded_rerank",
+    "shard_documents": ".sharded_rerank",
+    "iter_ocr_pages": ".sharded_ocr",
+    "iter_ocr_pages_async": ".sharded_ocr",
+    "OCRPageStream": ".sharded_ocr",
+    "AsyncOCRPageStream": ".sharded_ocr",
+    "ShardedOCRResponse": ".sharded_ocr",
+    "merge_ocr_responses": ".sharded_ocr",
+    "page_shards": ".sharded_ocr",
+    "process_streamed": ".streamed_ocr",
+    "process_streamed_async": ".streamed_ocr",
+    "StreamedOCRResponse": ".streamed_ocr",
+    "AsyncStreamedOCRResponse": ".streamed_ocr",
+    "StreamedOCRPage": ".streamed_ocr",
+    "LazyOCRPageImage": ".streamed_ocr",
+    "ImageSink": ".streamed_ocr",
+    "TemporaryImageSink": ".streamed_ocr",
+    "JSONItemScanner": ".json_stream",
+    "StringSink": ".json_stream",
+    "iter_json_items": ".json_stream",
+    "aiter_json_items": ".json_stream",
+    "StreamedItems": ".streamed_responses",
+    "AsyncStreamedItems": ".streamed_responses",
+    "stream_items": ".streamed_responses",
+    "stream_items_async": ".streamed_responses",
+    "ChatCompletionChunk": ".chat_stream",
+    "ChunkChoice": ".chat_stream",
+    "ChoiceDelta": ".chat_stream",
+    "ChoiceDeltaToolCall": ".chat_stream",
+    "ChoiceDeltaToolCallFunction": ".chat_stream",
+    "ChoiceDeltaFunctionCall": ".chat_stream",
+    "ChatCompletionAccumulator": ".chat_stream",
+    "ChatCompletionStream": ".chat_stream",
+    "AsyncChatCompletionStream": ".chat_stream",
+    "streaming_payload": ".chat_stream",
+    "create_chat_completion_stream": ".chat_stream",
+    "create_chat_completion_stream_async": ".chat_stream",
+    "BatchRequest": ".chat_batch",
+    "batch_request": ".chat_batch",
+    "read_batch_requests": ".chat_batch",
+    "ModelUsage": ".chat_batch",
+    "BatchProgress": ".chat_batch",
+    "BatchFailure": ".chat_batch",
+    "BatchReport": ".chat_batch",
+    "AdaptiveConcurrency": ".chat_batch",
+    "AsyncAdaptiveConcurrency": ".chat_batch",
+    "BatchCheckpoint": ".chat_batch",
+    "ChatBatchRunner": ".chat_batch",
+    "retry_after": ".chat_batch",
+    "RETRYABLE_STATUS_CODES": ".chat_batch",
+    "CALL_OPERATIONS": ".usage_tracking",
+    "STREAM_OPERATIONS": ".usage_tracking",
+    "UsageKey": ".usage_tracking",
+    "UsageTotals": ".usage_tracking",
+    "UsageSnapshot": ".usage_tracking",
+    "UsageAggregator": ".usage_tracking",
+    "UsageTrackingMiddleware": ".usage_tracking",
+    "usage_key": ".usage_tracking",
+    "track_usage": ".usage_tracking",
+    "bucket_start": ".usage_store",
+    "bucket_end": ".usage_store",
+    "series_key": ".usage_store",
+    "UsageStoreStats": ".usage_store",
+    "UsageStore": ".usage_store",
+    "TIME_BUCKET": ".usage_table",
+    "COST": ".usage_table",
+    "NULL_TIME": ".usage_table",
+    "DictionaryColumn": ".usage_table",
+    "UsageTable": ".usage_table",
+    "BUILTIN": ".model_catalog",
+    "CUSTOM": ".model_catalog",
+    "ALIAS": ".model_catalog",
+    "MODEL_OPERATIONS": ".model_catalog",
+    "ModelInfo": ".model_catalog",
+    "UnknownModelError": ".model_catalog",
+    "model_names": ".model_catalog",
+    "ModelCatalog": ".model_catalog",
+    "ModelValidationMiddleware": ".model_catalog",
+    "validate_models": ".model_catalog",
+    "paginate": ".pagination",
+    "paginate_async": ".pagination",
+}
+
+
+def dynamic_import(modname, retries=3):
+    for attempt in range(retries):
+        try:
+            return import_module(modname, __package__)
+        except KeyError:
+            # Clear any half-initialized module and retry
+            sys.modules.pop(modname, None)
+            if attempt == retries - 1:
+                break
+    raise KeyError(f"Failed to import module '{modname}' after {retries} attempts")
+
+
+def __getattr__(attr_name: str) -> object:
+    module_name = _dynamic_imports.get(attr_name)
+    if module_name is None:
+        raise AttributeError(
+            f"no {attr_name} found in _dynamic_imports, module name -> {__name__} "
+        )
+
+    try:
+        module = dynamic_import(module_name)
+        return getattr(module, attr_name)
+    except ImportError as e:
+        raise ImportError(
+            f"Failed to import {attr_name} from {module_name}: {e}"
+        ) from e
+    except AttributeError as e:
+        raise AttributeError(
+            f"Failed to get {attr_name} from {module_name}: {e}"
+        ) from e
+
+
+def __dir__():
+    lazy_attrs = builtins.list(_dynamic_imports.keys())
+    return builtins.sorted(lazy_attrs)
@@ -0,0 +1,116 @@
+"""Request setup and error mapping shared by the helpers that stream a response body."""
+
+from typing import Any, Dict, Mapping, NoReturn, Optional, Type
+
+import httpx
+
+from opperai import errors, models, utils
+from opperai._hooks import HookContext
+from opperai.basesdk import BaseSDK
+from opperai.types import OptionalNullable, UNSET
+from opperai.utils import get_security_from_env
+from opperai.utils.unmarshal_json_response import unmarshal_json_response
+
+
+def raise_for_response(http_res: httpx.Response, text: str) -> NoReturn:
+    r"""Raise the error the generated methods raise for a non-success response."""
+    if utils.match_response(http_res, "400", "application/json"):
+        response_data = unmarshal_json_response(
+            errors.BadRequestErrorData, http_res, text
+        )
+        raise errors.BadRequestError(response_data, http_res, text)
+    if utils.match_response(http_res, "401", "application/json"):
+        response_data = unmarshal_json_response(
+            errors.UnauthorizedErrorData, http_res, text
+        )
+        raise errors.UnauthorizedError(response_data, http_res, text)
+    if utils.match_response(http_res, "404", "application/json"):
+        response_data = unmarshal_json_response(
+            errors.NotFoundErrorData, http_res, text
+        )
+        raise errors.NotFoundError(response_data, http_res, text)
+    if utils.match_response(http_res, "422", "application/json"):
+        response_data = unmarshal_json_response(
+            errors.RequestValidationErrorData, http_res, text
+        )
+        raise errors.RequestValidationError(response_data, http_res, text)
+    if utils.match_response(http_res, ["4XX", "5XX"], "*"):
+        raise errors.APIError("API error occurred", http_res, text)
+    raise errors.APIError("Unexpected response received", http_res, text)
+
+
+def prepare(
+    sdk: BaseSDK,
+    *,
+    method: str,
+    path: str,
+    request: Any,
+    operation_id: str,
+    accept: str,
+    retries: OptionalNullable[utils.RetryConfig],
+    server_url: Optional[str],
+    timeout_ms: Optional[int],
+    http_headers: Optional[Mapping[str, str]],
+    is_async: bool,
+    body_type: Optional[Type[Any]] = None,
+    has_path_params: bool = False,
+) -> Dict[str, Any]:
+    r"""Keyword arguments for ``sdk.do_request`` that send a request with ``stream`` on.
+
+    The request is built as the generated methods build it, so hooks,
+    retries and middleware apply.
+
+    :param body_type: Model ``request`` is serialized as for the JSON body; None to send no body
+    :param has_path_params: Whether ``request`` holds path parameters
+    """
+    if timeout_ms is None:
+        timeout_ms = sdk.sdk_configuration.timeout_ms
+    base_url = server_url if server_url is not None else sdk._get_url(None, None)
+
+    body: Dict[str, Any] = {}
+    if body_type is not None:
+        body["get_serialized_body"] = lambda: utils.serialize_request_body(
+            request, False, False, "json", body_type
+        )
+    build = sdk._build_request_async if is_async else sdk._build_request
+    req = build(
+        method=method,
+        path=path,
+        base_url=base_url,
+        url_variables=None,
+        request=request,
+        request_body_required=body_type is not None,
+        request_has_path_params=has_path_params,
+        request_has_query_params=True,
+        user_agent_header="user-agent",
+        accept_header_value=accept,
+        http_headers=http_headers,
+        security=sdk.sdk_configuration.security,
+        allow_empty_value=None,
+        timeout_ms=timeout_ms,
+        **body,
+    )
+
+    if retries == UNSET:
+        if sdk.sdk_configuration.retry_config is not UNSET:
+            retries = sdk.sdk_configuration.retry_config
+
+    retry_config = None
+    if isinstance(retries, utils.RetryConfig):
+        retry_config = (retries, ["429", "500", "502", "503", "504"])
+
+    return {
+        "hook_ctx": HookContext(
+            config=sdk.sdk_configuration,
+            base_url=base_url or "",
+            operation_id=operation_id,
+            oauth2_scopes=None,
+            security_source=get_security_from_env(
+                sdk.sdk_configuration.security, models.Security
+            ),
+        ),
+        "request": req,
+        "error_status_codes": ["400", "401", "404", "422", "4XX", "5XX"],
+        "stream": True,
+        "retry_config": retry_config,
+    }
@@ -0,0 +1,629 @@
+"""Offline batches of chat completion requests with adaptive concurrency."""
+
+import asyncio
+import contextlib
+import email.utils
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from pydantic import TypeAdapter
+
+from opperai import errors, models
+
+from .pipeline import run_bounded, run_bounded_async
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+"""Status codes after which a batch request is sent again."""
+
+_PAYLOAD = TypeAdapter(models.ChatCompletionNonStreaming)
+
+PathLike = Union[str, "os.PathLike[str]"]
+PayloadLike = Union[models.Payload, models.PayloadTypedDict, Mapping[str, Any]]
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    r"""Caller-chosen id that the result line and checkpoint are keyed by"""
+    body: models.ChatCompletionNonStreaming
+
+
+def batch_request(custom_id: str, body: PayloadLike) -> BatchRequest:
+    r"""Validate ``body`` as a non-streaming chat completion request.
+
+    ``stream`` and ``stream_options`` are dropped: batch results are whole completions.
+    """
+    if isinstance(body, models.ChatCompletionNonStreaming):
+        return BatchRequest(custom_id, body)
+    data = (
+        body.model_dump(by_alias=True, exclude_unset=True)
+        if isinstance(body, models.ChatCompletionStreaming)
+        else dict(body)
+    )
+    data.pop("stream", None)
+    data.pop("stream_options", None)
+    return BatchRequest(custom_id, _PAYLOAD.validate_python(data))
+
+
+def read_batch_requests(path: PathLike) -> Iterator[BatchRequest]:
+    r"""Read requests from a JSONL file, one per line.
+
+    A line is either ``{"custom_id": ..., "body": {...}}`` or a bare request
+    body, whose id is then its 1-based line number.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "body" in record and "messages" not in record:
+                yield batch_request(str(record["custom_id"]), record["body"])
+            else:
+                yield batch_request(str(lineno), record)
+
+
+def _requests(
+    source: Union[PathLike, Iterable[Any]],
+) -> Iterable[BatchRequest]:
+    if isinstance(source, (str, os.PathLike)):
+        return read_batch_requests(source)
+
+    def coerce() -> Iterator[BatchRequest]:
+        for index, item in enumerate(source, 1):  # type: ignore[arg-type]
+            yield (
+                item
+                if isinstance(item, BatchRequest)
+                else batch_request(str(index), item)
+            )
+
+    return coerce()
+
+
+@dataclass
+class ModelUsage:
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+
+    def add(self, usage: Optional[models.CompletionUsage]) -> None:
+        self.requests += 1
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+            self.total_tokens += usage.total_tokens
+
+
+@dataclass
+class BatchProgress:
+    submitted: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    throttled: int = 0
+    r"""Responses with status 429, including ones that later succeeded"""
+    concurrency: int = 0
+    r"""Current concurrency limit"""
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def requests_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.succeeded / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass
+class BatchFailure:
+    custom_id: str
+    error: Exception
+
+
+@dataclass
+class BatchReport:
+    progress: BatchProgress
+    usage: Dict[str, ModelUsage] = field(default_factory=dict)
+    r"""Token totals per model, including requests completed by earlier runs of the checkpoint"""
+    failures: List[BatchFailure] = field(default_factory=list)
+
+    @property
+    def failed_ids(self) -> List[str]:
+        return [f.custom_id for f in self.failures]
+
+
+class _AdaptiveState:
+    def __init__(self, maximum: int, minimum: int, initial: Optional[int]) -> None:
+        if not 1 <= minimum <= maximum:
+            raise ValueError("need 1 <= minimum <= maximum")
+        self.maximum = maximum
+        self.minimum = minimum
+        self._limit = float(initial if initial is not None else maximum)
+        self._in_flight = 0
+        self._epoch = 0
+        self._resume_at = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def _wait_time(self) -> Optional[float]:
+        # None: a slot is free now; 0.0: wait for a release; >0: paused after a 429.
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            return delay
+        if self._in_flight < int(self._limit):
+            self._in_flight += 1
+            return None
+        return 0.0
+
+    def _finish(self, epoch: int, throttled: bool, delay: float) -> None:
+        self._in_flight -= 1
+        if not throttled:
+            self._limit = min(float(self.maximum), self._limit + 1.0 / self._limit)
+            return
+        self._resume_at = max(self._resume_at, time.monotonic() + delay)
+        # Requests that started before the last cut report the same overload; cut once.
+        if epoch == self._epoch:
+            self._limit = max(float(self.minimum), self._limit / 2)
+            self._epoch += 1
+
+
+class AdaptiveConcurrency(_AdaptiveState):
+    r"""Concurrency limit that halves on throttling and grows back by one per window.
+
+    After a 429 no new request starts until the server's ``Retry-After`` (or the
+    caller's backoff) has passed. Each successful request adds ``1 / limit``, so
+    the limit grows by about one for every ``limit`` requests that succeed.
+
+    :param maximum: Upper bound on requests in flight
+    :param minimum: The limit is never cut below this
+    :param initial: Starting limit, ``maximum`` by default
+    """
+
+    def __init__(
+        self, maximum: int, minimum: int = 1, initial: Optional[int] = None
+    ) -> None:
+        super().__init__(maximum, minimum, initial)
+        self._cond = threading.Condition()
+
+    def acquire(self) -> int:
+        r"""Wait for a slot and return a token to pass to :meth:`release`."""
+        with self._cond:
+            while True:
+                wait = self._wait_time()
+                if wait is None:
+                    return self._epoch
+                self._cond.wait(wait or None)
+
+    def release(self, token: int, throttled: bool = False, delay: float = 0.0) -> None:
+        with self._cond:
+            self._finish(token, throttled, delay)
+            self._cond.notify_all()
+
+
+class AsyncAdaptiveConcurrency(_AdaptiveState):
+    r"""Async counterpart of :class:`AdaptiveConcurrency`, for use within one event loop."""
+
+    def __init__(
+        self, maximum: int, minimum: int = 1, initial: Optional[int] = None
+    ) -> None:
+        super().__init__(maximum, minimum, initial)
+        self._cond: Optional[asyncio.Condition] = None
+
+    async def acquire(self) -> int:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            while True:
+                wait = self._wait_time()
+                if wait is None:
+                    return self._epoch
+                try:
+                    await asyncio.wait_for(self._cond.wait(), wait or None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(
+        self, token: int, throttled: bool = False, delay: float = 0.0
+    ) -> None:
+        assert self._cond is not None
+        async with self._cond:
+            self._finish(token, throttled, delay)
+            self._cond.notify_all()
+
+
+def retry_after(error: errors.OpperError) -> Optional[float]:
+    r"""Seconds requested by the ``Retry-After`` header of an error response, if any."""
+    value = error.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class BatchCheckpoint:
+    r"""SQLite-backed record of the requests of a batch that have completed.
+
+    A request is recorded after its result line has been written, so a batch
+    resumed after a crash may repeat the lines of requests in flight at the
+    time, but never loses one. Failed requests are not recorded and are sent
+    again on resume.
+
+    :param path: Path of the SQLite database, created if it does not exist
+    :param batch_id: Batch the entries belong to; one file can hold several
+    :param commit_every: Number of writes between commits
+    """
+
+    def __init__(
+        self, path: PathLike, batch_id: str = "default", *, commit_every: int = 100
+    ) -> None:
+        self.batch_id = batch_id
+        self._commit_every = commit_every
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.fspath(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS batch_results (
+                batch_id TEXT NOT NULL,
+                custom_id TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                total_tokens INTEGER NOT NULL,
+                PRIMARY KEY (batch_id, custom_id)
+            )
+            """)
+        self._conn.commit()
+
+    def done(self, custom_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM batch_results WHERE batch_id = ? AND custom_id = ?",
+                (self.batch_id, custom_id),
+            ).fetchone()
+        return row is not None
+
+    def record(
+        self, custom_id: str, model: str, usage: Optional[models.CompletionUsage]
+    ) -> None:
+        tokens = (
+            (usage.prompt_tokens, usage.completion_tokens, usage.total_tokens)
+            if usage is not None
+            else (0, 0, 0)
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batch_results (batch_id, custom_id, model, "
+                "prompt_tokens, completion_tokens, total_tokens) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.batch_id, custom_id, model, *tokens),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self._commit_every:
+                self._conn.commit()
+                self._pending_writes = 0
+
+    def usage(self) -> Dict[str, ModelUsage]:
+        r"""Token totals per model over every recorded request."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT model, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), "
+                "SUM(total_tokens) FROM batch_results WHERE batch_id = ? GROUP BY model",
+                (self.batch_id,),
+            ).fetchall()
+        return {row[0]: ModelUsage(*map(int, row[1:])) for row in rows}
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM batch_results WHERE batch_id = ?",
+                (self.batch_id,),
+            ).fetchone()
+        return int(row[0])
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self) -> "BatchCheckpoint":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+@contextlib.contextmanager
+def _open_output(output: Union[PathLike, IO[str]]) -> Iterator[IO[str]]:
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, "a", encoding="utf-8") as f:
+            yield f
+    else:
+        yield output
+
+
+def _error_record(error: Exception) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"type": type(error).__name__, "message": str(error)}
+    if isinstance(error, errors.OpperError):
+        record["status_code"] = error.status_code
+    return record
+
+
+class ChatBatchRunner:
+    r"""Run a batch of chat completion requests and write the results as JSONL.
+
+    Requests are pulled from the source only as fast as they are sent. Each
+    result is written as soon as it completes, as one line of
+    ``{"custom_id", "response", "error"}``, so the output is not in input order.
+    Responses with status 429 cut the concurrency limit and pause new requests
+    (see :class:`AdaptiveConcurrency`); 429 and 5xx responses are retried up to
+    ``max_attempts`` times before the request is reported as failed.
+
+    With a ``checkpoint``, requests completed by an earlier run are skipped and
+    the usage totals carry over, so an interrupted batch can be run again with
+    the same input and output.
+
+    :param client: The Opper client
+    :param concurrency: Maximum number of requests in flight
+    :param min_concurrency: The adaptive limit is never cut below this
+    :param max_attempts: Attempts per request, including the first
+    :param backoff: Initial pause in seconds after a 429 without ``Retry-After``, doubled per attempt
+    :param max_backoff: Upper bound on the pause between attempts
+    :param checkpoint: Record of completed requests used to resume the batch
+    :param timeout_ms: Request timeout in milliseconds
+    :param on_progress: Called with the running :class:`BatchProgress`
+    :param progress_interval: Minimum number of seconds between ``on_progress`` calls
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        *,
+        concurrency: int = 32,
+        min_concurrency: int = 1,
+        max_attempts: int = 6,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        checkpoint: Optional[BatchCheckpoint] = None,
+        timeout_ms: Optional[int] = None,
+        on_progress: Optional[Callable[[BatchProgress], None]] = None,
+        progress_interval: float = 1.0,
+    ) -> None:
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self._client = client
+        self._concurrency = concurrency
+        self._min_concurrency = min_concurrency
+        self._max_attempts = max_attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self.checkpoint = checkpoint
+        self._timeout_ms = timeout_ms
+        self._on_progress = on_progress
+        self._progress_interval = progress_interval
+        self._lock = threading.Lock()
+
+    def _start(self, limit: _AdaptiveState) -> None:
+        self._limit = limit
+        self._progress = BatchProgress(concurrency=limit.limit)
+        usage = self.checkpoint.usage() if self.checkpoint is not None else {}
+        self._report = BatchReport(progress=self._progress, usage=usage)
+        self._last_report = time.monotonic()
+
+    def _begin(self, request: BatchRequest) -> bool:
+        if self.checkpoint is not None and self.checkpoint.done(request.custom_id):
+            with self._lock:
+                self._progress.skipped += 1
+            return False
+        with self._lock:
+            self._progress.submitted += 1
+        return True
+
+    def _delay(self, error: Exception, attempt: int) -> Optional[float]:
+        r"""Seconds to wait before sending again, or None if ``error`` is final."""
+        if not isinstance(error, errors.OpperError):
+            return None
+        if error.status_code not in RETRYABLE_STATUS_CODES:
+            return None
+        if error.status_code == 429:
+            with self._lock:
+                self._progress.throttled += 1
+        if attempt >= self._max_attempts:
+            return None
+        delay = retry_after(error)
+        if delay is None:
+            delay = self._backoff * 2 ** (attempt - 1) * (0.5 + random.random() / 2)
+        return min(delay, self._max_backoff)
+
+    def _finish(
+        self,
+        out: IO[str],
+        request: BatchRequest,
+        response: Optional[models.ChatCompletion],
+        error: Optional[Exception],
+    ) -> None:
+        record = {
+            "custom_id": request.custom_id,
+            "response": (
+                response.model_dump(mode="json", by_alias=True)
+                if response is not None
+                else None
+            ),
+            "error": _error_record(error) if error is not None else None,
+        }
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            out.write(line)
+            out.flush()
+            if response is not None:
+                model = response.model or request.body.model
+                self._report.usage.setdefault(model, ModelUsage()).add(response.usage)
+                self._progress.succeeded += 1
+            else:
+                assert error is not None
+                self._progress.failed += 1
+                self._report.failures.append(BatchFailure(request.custom_id, error))
+            self._progress.concurrency = self._limit.limit
+            now = time.monotonic()
+            notify = (
+                self._on_progress is not None
+                and now - self._last_report >= self._progress_interval
+            )
+            if notify:
+                self._last_report = now
+        if response is not None and self.checkpoint is not None:
+            self.checkpoint.record(
+                request.custom_id, response.model or request.body.model, response.usage
+            )
+        if notify and self._on_progress is not None:
+            self._on_progress(self._progress)
+
+    def _done(self) -> BatchReport:
+        if self.checkpoint is not None:
+            self.checkpoint.commit()
+        self._progress.concurrency = self._limit.limit
+        if self._on_progress is not None:
+            self._on_progress(self._progress)
+        return self._report
+
+    def run(
+        self,
+        requests: Union[PathLike, Iterable[Union[BatchRequest, PayloadLike]]],
+        output: Union[PathLike, IO[str]],
+    ) -> BatchReport:
+        r"""Run every request using a pool of ``concurrency`` threads.
+
+        :param requests: A JSONL file of requests (see :func:`read_batch_requests`), or an iterable of :class:`BatchRequest` or request bodies
+        :param output: File to append result lines to, or an open text stream
+        """
+        limit = AdaptiveConcurrency(self._concurrency, self._min_concurrency)
+        self._start(limit)
+
+        def send(request: BatchRequest) -> Tuple[Any, Optional[Exception]]:
+            attempt = 0
+            while True:
+                attempt += 1
+                token = limit.acquire()
+                error: Optional[Exception] = None
+                delay: Optional[float] = None
+                try:
+                    response = self._client.openai.create_chat_completion(
+                        request=request.body, retries=None, timeout_ms=self._timeout_ms
+                    )
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    error = e
+                    delay = self._delay(e, attempt)
+                finally:
+                    # Also on cancellation, or the slot is lost for the whole batch.
+                    throttled = getattr(error, "status_code", None) == 429
+                    limit.release(token, throttled, delay or 0.0)
+                if error is None:
+                    return response, None
+                if delay is None:
+                    return None, error
+                if not throttled:
+                    time.sleep(delay)
+
+        with _open_output(output) as out:
+
+            def work(request: BatchRequest) -> None:
+                if self._begin(request):
+                    self._finish(out, request, *send(request))
+
+            run_bounded(_requests(requests), work, self._concurrency)
+        return self._done()
+
+    async def run_async(
+        self,
+        requests: Union[
+            PathLike,
+            Iterable[Union[BatchRequest, PayloadLike]],
+            AsyncIterable[BatchRequest],
+        ],
+        output: Union[PathLike, IO[str]],
+    ) -> BatchReport:
+        r"""Run every request with at most ``concurrency`` requests in flight.
+
+        :param requests: A JSONL file of requests (see :func:`read_batch_requests`), an iterable of :class:`BatchRequest` or request bodies, or an async iterable of :class:`BatchRequest`
+        :param output: File to append result lines to, or an open text stream
+        """
+        limit = AsyncAdaptiveConcurrency(self._concurrency, self._min_concurrency)
+        self._start(limit)
+
+        async def send(request: BatchRequest) -> Tuple[Any, Optional[Exception]]:
+            attempt = 0
+            while True:
+                attempt += 1
+                token = await limit.acquire()
+                error: Optional[Exception] = None
+                delay: Optional[float] = None
+                try:
+                    response = await self._client.openai.create_chat_completion_async(
+                        request=request.body, retries=None, timeout_ms=self._timeout_ms
+                    )
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    error = e
+                    delay = self._delay(e, attempt)
+                finally:
+                    # Also on cancellation, or the slot is lost for the whole batch.
+                    throttled = getattr(error, "status_code", None) == 429
+                    await limit.release(token, throttled, delay or 0.0)
+                if error is None:
+                    return response, None
+                if delay is None:
+                    return None, error
+                if not throttled:
+                    await asyncio.sleep(delay)
+
+        source = (
+            requests
+            if hasattr(requests, "__aiter__")
+            else _requests(requests)  # type: ignore[arg-type]
+        )
+        with _open_output(output) as out:
+
+            async def work(request: BatchRequest) -> None:
+                if self._begin(request):
+                    self._finish(out, request, *(await send(request)))
+
+            await run_bounded_async(source, work, self._concurrency)  # type: ignore[arg-type]
+        return self._done()
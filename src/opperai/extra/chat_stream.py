@@ -0,0 +1,409 @@
+"""Server-sent event streaming of OpenAI-compatible chat completions."""
+
+import json
+import time
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+import httpx
+from pydantic import ConfigDict
+
+from opperai import models, utils
+from opperai.types import BaseModel, OptionalNullable, UNSET
+from opperai.utils import eventstreaming
+
+from ._streaming import prepare, raise_for_response
+
+if TYPE_CHECKING:
+    from opperai.openai import Openai
+
+
+class _ChunkModel(BaseModel):
+    model_config = ConfigDict(
+        populate_by_name=True, arbitrary_types_allowed=True, extra="allow"
+    )
+
+
+class ChoiceDeltaFunctionCall(_ChunkModel):
+    name: Optional[str] = None
+    arguments: Optional[str] = None
+
+
+class ChoiceDeltaToolCallFunction(_ChunkModel):
+    name: Optional[str] = None
+    arguments: Optional[str] = None
+    r"""A fragment of the JSON arguments, to be concatenated across chunks"""
+
+
+class ChoiceDeltaToolCall(_ChunkModel):
+    index: int
+    r"""Position of the tool call in the message, shared by all its fragments"""
+    id: Optional[str] = None
+    type: Optional[str] = None
+    function: Optional[ChoiceDeltaToolCallFunction] = None
+
+
+class ChoiceDelta(_ChunkModel):
+    role: Optional[str] = None
+    content: Optional[str] = None
+    refusal: Optional[str] = None
+    tool_calls: Optional[List[ChoiceDeltaToolCall]] = None
+    function_call: Optional[ChoiceDeltaFunctionCall] = None
+
+
+class ChunkChoice(_ChunkModel):
+    index: int
+    delta: ChoiceDelta
+    finish_reason: Optional[str] = None
+    logprobs: Optional[Dict[str, Any]] = None
+
+
+class ChatCompletionChunk(_ChunkModel):
+    r"""One streamed chunk of a chat completion."""
+
+    id: str
+    choices: List[ChunkChoice]
+    created: int
+    model: str
+    object: str = "chat.completion.chunk"
+    system_fingerprint: Optional[str] = None
+    service_tier: Optional[str] = None
+    usage: Optional[models.CompletionUsage] = None
+    r"""Token usage, sent on a final chunk without choices when ``stream_options.include_usage`` is set"""
+
+
+@dataclass
+class _ToolCallState:
+    id: Optional[str] = None
+    type: str = "function"
+    name: str = ""
+    arguments: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _ChoiceState:
+    role: str = "assistant"
+    content: List[str] = field(default_factory=list)
+    refusal: List[str] = field(default_factory=list)
+    tool_calls: Dict[int, _ToolCallState] = field(default_factory=dict)
+    function_name: str = ""
+    function_arguments: List[str] = field(default_factory=list)
+    finish_reason: Optional[str] = None
+    has_content: bool = False
+    has_refusal: bool = False
+    has_function_call: bool = False
+
+
+class ChatCompletionAccumulator:
+    r"""Rebuilds the complete chat completion from streamed chunks as they are added."""
+
+    def __init__(self) -> None:
+        self.id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.created: Optional[int] = None
+        self.system_fingerprint: Optional[str] = None
+        self.usage: Optional[models.CompletionUsage] = None
+        self._choices: Dict[int, _ChoiceState] = {}
+
+    def add(self, chunk: ChatCompletionChunk) -> None:
+        if self.id is None:
+            self.id, self.model, self.created = chunk.id, chunk.model, chunk.created
+        if chunk.system_fingerprint is not None:
+            self.system_fingerprint = chunk.system_fingerprint
+        if chunk.usage is not None:
+            self.usage = chunk.usage
+        for choice in chunk.choices:
+            state = self._choices.setdefault(choice.index, _ChoiceState())
+            delta = choice.delta
+            if delta.role:
+                state.role = delta.role
+            if delta.content is not None:
+                state.content.append(delta.content)
+                state.has_content = True
+            if delta.refusal is not None:
+                state.refusal.append(delta.refusal)
+                state.has_refusal = True
+            if delta.function_call is not None:
+                state.has_function_call = True
+                state.function_name += delta.function_call.name or ""
+                if delta.function_call.arguments:
+                    state.function_arguments.append(delta.function_call.arguments)
+            for call in delta.tool_calls or []:
+                tool = state.tool_calls.setdefault(call.index, _ToolCallState())
+                if call.id:
+                    tool.id = call.id
+                if call.type:
+                    tool.type = call.type
+                if call.function is not None:
+                    tool.name += call.function.name or ""
+                    if call.function.arguments:
+                        tool.arguments.append(call.function.arguments)
+            if choice.finish_reason is not None:
+                state.finish_reason = choice.finish_reason
+
+    def content(self, index: int = 0) -> str:
+        r"""The message text of choice ``index`` received so far."""
+        state = self._choices.get(index)
+        return "".join(state.content) if state else ""
+
+    def tool_calls(self, index: int = 0) -> List[Dict[str, Any]]:
+        r"""The tool calls of choice ``index`` received so far, with arguments joined."""
+        state = self._choices.get(index)
+        if state is None:
+            return []
+        return [
+            {
+                "id": tool.id,
+                "type": tool.type,
+                "function": {"name": tool.name, "arguments": "".join(tool.arguments)},
+            }
+            for _, tool in sorted(state.tool_calls.items())
+        ]
+
+    def completion(self) -> models.ChatCompletion:
+        r"""The accumulated response as a ``ChatCompletion``; every choice must have finished."""
+        choices = []
+        for index, state in sorted(self._choices.items()):
+            if state.finish_reason is None:
+                raise ValueError(f"choice {index} has not finished streaming")
+            message: Dict[str, Any] = {"role": state.role}
+            if state.has_content:
+                message["content"] = "".join(state.content)
+            if state.has_refusal:
+                message["refusal"] = "".join(state.refusal)
+            if state.tool_calls:
+                message["tool_calls"] = self.tool_calls(index)
+            if state.has_function_call:
+                message["function_call"] = {
+                    "name": state.function_name,
+                    "arguments": "".join(state.function_arguments),
+                }
+            choices.append(
+                {
+                    "index": index,
+                    "finish_reason": state.finish_reason,
+                    "message": message,
+                }
+            )
+        data: Dict[str, Any] = {
+            "id": self.id or "",
+            "choices": choices,
+            "created": self.created or 0,
+            "model": self.model or "",
+            "object": "chat.completion",
+        }
+        if self.system_fingerprint is not None:
+            data["system_fingerprint"] = self.system_fingerprint
+        if self.usage is not None:
+            data["usage"] = self.usage.model_dump(by_alias=True)
+        return models.ChatCompletion.model_validate(data)
+
+
+def _decode_chunk(raw: str) -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(json.loads(raw)["data"])
+
+
+def _has_token(chunk: ChatCompletionChunk) -> bool:
+    return any(
+        c.delta.content
+        or c.delta.refusal
+        or c.delta.tool_calls
+        or c.delta.function_call
+        for c in chunk.choices
+    )
+
+
+class _ChatStreamBase:
+    def __init__(self, started: float) -> None:
+        self.accumulator = ChatCompletionAccumulator()
+        self._started = started
+        self.time_to_first_chunk: Optional[float] = None
+        r"""Seconds from sending the request to the first chunk."""
+        self.time_to_first_token: Optional[float] = None
+        r"""Seconds from sending the request to the first chunk carrying content or a tool call."""
+
+    @property
+    def usage(self) -> Optional[models.CompletionUsage]:
+        r"""Usage reported by the final chunk, once it has been received."""
+        return self.accumulator.usage
+
+    def _observe(self, chunk: ChatCompletionChunk) -> ChatCompletionChunk:
+        if self.time_to_first_chunk is None:
+            self.time_to_first_chunk = time.monotonic() - self._started
+        if self.time_to_first_token is None and _has_token(chunk):
+            self.time_to_first_token = time.monotonic() - self._started
+        self.accumulator.add(chunk)
+        return chunk
+
+
+class ChatCompletionStream(_ChatStreamBase):
+    r"""Chunks of a streamed chat completion, accumulated as they are iterated."""
+
+    def __init__(
+        self, http_res: httpx.Response, started: float, client_ref: Any
+    ) -> None:
+        super().__init__(started)
+        self._events = eventstreaming.EventStream(
+            http_res, _decode_chunk, sentinel="[DONE]", client_ref=client_ref
+        )
+
+    def __iter__(self) -> Iterator[ChatCompletionChunk]:
+        with self._events:
+            for chunk in self._events:
+                yield self._observe(chunk)
+
+    def final_completion(self) -> models.ChatCompletion:
+        r"""Read the rest of the stream and return the complete ``ChatCompletion``."""
+        for _ in self:
+            pass
+        return self.accumulator.completion()
+
+    def close(self) -> None:
+        self._events.response.close()
+
+    def __enter__(self) -> "ChatCompletionStream":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class AsyncChatCompletionStream(_ChatStreamBase):
+    r"""Async counterpart of :class:`ChatCompletionStream`, iterated with ``async for``."""
+
+    def __init__(
+        self, http_res: httpx.Response, started: float, client_ref: Any
+    ) -> None:
+        super().__init__(started)
+        self._events = eventstreaming.EventStreamAsync(
+            http_res, _decode_chunk, sentinel="[DONE]", client_ref=client_ref
+        )
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        async with self._events:
+            async for chunk in self._events:
+                yield self._observe(chunk)
+
+    async def final_completion(self) -> models.ChatCompletion:
+        r"""Read the rest of the stream and return the complete ``ChatCompletion``."""
+        async for _ in self:
+            pass
+        return self.accumulator.completion()
+
+    async def close(self) -> None:
+        await self._events.response.aclose()
+
+    async def __aenter__(self) -> "AsyncChatCompletionStream":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+
+def streaming_payload(
+    request: Union[models.Payload, models.PayloadTypedDict, Mapping[str, Any]],
+) -> models.ChatCompletionStreaming:
+    r"""The request as a ``ChatCompletionStreaming`` that asks for usage on the final chunk.
+
+    ``stream_options.include_usage`` is turned on unless ``stream_options`` is given.
+    """
+    if isinstance(request, models.ChatCompletionStreaming):
+        payload = request
+    else:
+        data = (
+            request.model_dump(by_alias=True, exclude_unset=True)
+            if isinstance(request, BaseModel)
+            else dict(request)
+        )
+        data["stream"] = True
+        payload = models.ChatCompletionStreaming.model_validate(data)
+    if payload.stream_options == UNSET:
+        payload = payload.model_copy(
+            update={
+                "stream_options": models.ChatCompletionStreamOptionsParam(
+                    include_usage=True
+                )
+            }
+        )
+        payload.__pydantic_fields_set__.add("stream_options")
+    return payload
+
+
+def create_chat_completion_stream(
+    openai: "Openai",
+    *,
+    request: Union[models.Payload, models.PayloadTypedDict, Mapping[str, Any]],
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> ChatCompletionStream:
+    r"""Send a chat completion with ``stream`` on and return its chunks as they arrive.
+
+    :param openai: The client's OpenAI-compatible SDK, ``client.openai``
+    :param request: The chat completion request; ``stream`` is set to true
+    :param retries: Override the default retry configuration for this method
+    :param server_url: Override the default server URL for this method
+    :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+    :param http_headers: Additional headers to set or replace on requests.
+    """
+    kwargs = prepare(
+        openai,
+        method="POST",
+        path="/openai/chat/completions",
+        request=streaming_payload(request),
+        operation_id="chat_completions_openai_chat_completions_post",
+        accept="text/event-stream",
+        retries=retries,
+        server_url=server_url,
+        timeout_ms=timeout_ms,
+        http_headers=http_headers,
+        is_async=False,
+        body_type=models.ChatCompletionStreaming,
+    )
+    started = time.monotonic()
+    http_res = openai.do_request(**kwargs)
+    if utils.match_response(http_res, "200", "text/event-stream"):
+        return ChatCompletionStream(http_res, started, openai)
+    raise_for_response(http_res, utils.stream_to_text(http_res))
+
+
+async def create_chat_completion_stream_async(
+    openai: "Openai",
+    *,
+    request: Union[models.Payload, models.PayloadTypedDict, Mapping[str, Any]],
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> AsyncChatCompletionStream:
+    r"""Async counterpart of :func:`create_chat_completion_stream`."""
+    kwargs = prepare(
+        openai,
+        method="POST",
+        path="/openai/chat/completions",
+        request=streaming_payload(request),
+        operation_id="chat_completions_openai_chat_completions_post",
+        accept="text/event-stream",
+        retries=retries,
+        server_url=server_url,
+        timeout_ms=timeout_ms,
+        http_headers=http_headers,
+        is_async=True,
+        body_type=models.ChatCompletionStreaming,
+    )
+    started = time.monotonic()
+    http_res = await openai.do_request_async(**kwargs)
+    if utils.match_response(http_res, "200", "text/event-stream"):
+        return AsyncChatCompletionStream(http_res, started, openai)
+    raise_for_response(http_res, await utils.stream_to_text_async(http_res))
@@ -0,0 +1,119 @@
+"""Sharing of identical in-flight requests between callers."""
+
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Collection, Optional, Tuple
+
+import httpx
+
+from .middleware import CallNext, CallNextAsync, RequestMiddleware, add_middleware
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+@dataclass
+class CoalescingStats:
+    requests: int = 0
+    r"""Requests eligible for coalescing."""
+    coalesced: int = 0
+    r"""Requests answered by an identical request already in flight."""
+
+
+def request_key(operation_id: str, request: httpx.Request) -> Tuple[Any, ...]:
+    r"""Identify a request by its operation, method, URL, headers and body."""
+    return (
+        operation_id,
+        request.method,
+        str(request.url),
+        tuple(sorted(request.headers.multi_items())),
+        request.content,
+    )
+
+
+class RequestCoalescer(RequestMiddleware):
+    r"""Lets concurrent identical requests share one HTTP round trip.
+
+    While a request is in flight, any identical request, with the same
+    operation, URL, headers and body, waits for it and receives the same
+    response instead of being sent. This works across threads for the sync
+    client and across tasks for the async client. Nothing is cached once the
+    response arrives. Streaming responses are never shared.
+
+    Install it with :func:`enable_request_coalescing`.
+
+    :param methods: HTTP methods whose requests may be shared; only idempotent ones are safe
+    :param operations: If set, only these operation ids are coalesced
+    """
+
+    def __init__(
+        self,
+        *,
+        methods: Collection[str] = ("GET",),
+        operations: Optional[Collection[str]] = None,
+    ) -> None:
+        self.methods = frozenset(m.upper() for m in methods)
+        self.operations = frozenset(operations) if operations is not None else None
+        self._flights = SingleFlight()
+        self._async_flights = AsyncSingleFlight()
+        self._lock = threading.Lock()
+        self._stats = CoalescingStats()
+
+    def _eligible(self, hook_ctx: Any, request: httpx.Request, stream: bool) -> bool:
+        if stream or request.method.upper() not in self.methods:
+            return False
+        return self.operations is None or hook_ctx.operation_id in self.operations
+
+    def _count(self, shared: bool) -> None:
+        with self._lock:
+            self._stats.requests += 1
+            if shared:
+                self._stats.coalesced += 1
+
+    def stats(self) -> CoalescingStats:
+        with self._lock:
+            return CoalescingStats(self._stats.requests, self._stats.coalesced)
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        if not self._eligible(hook_ctx, request, stream):
+            return call_next()
+        response, shared = self._flights.do(
+            request_key(hook_ctx.operation_id, request), call_next
+        )
+        self._count(shared)
+        return response
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        if not self._eligible(hook_ctx, request, stream):
+            return await call_next()
+        response, shared = await self._async_flights.do(
+            request_key(hook_ctx.operation_id, request), call_next
+        )
+        self._count(shared)
+        return response
+
+
+def enable_request_coalescing(
+    client: "Opper",
+    *,
+    methods: Collection[str] = ("GET",),
+    operations: Optional[Collection[str]] = None,
+) -> RequestCoalescer:
+    r"""Share identical in-flight requests sent by ``client`` and return the coalescer.
+
+    :param client: The Opper client
+    :param methods: HTTP methods whose requests may be shared; only idempotent ones are safe
+    :param operations: If set, only these operation ids are coalesced
+    """
+    coalescer = RequestCoalescer(methods=methods, operations=operations)
+    add_middleware(client, coalescer)
+    return coalescer
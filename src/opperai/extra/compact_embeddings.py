@@ -0,0 +1,269 @@
+"""Embedding responses decoded into contiguous float32 buffers."""
+
+import contextvars
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import httpx
+
+from opperai import models, utils
+from opperai.types import OptionalNullable, UNSET
+
+from .embedding_cache import EMBEDDING_OPERATION
+from .json_stream import JSONItemScanner
+from .middleware import CallNext, CallNextAsync, MiddlewareChain, RequestMiddleware
+
+if TYPE_CHECKING:
+    from opperai.embeddings import Embeddings
+
+
+_DATA = ("data", "*")
+# The scanner buffers what it is fed, so feed it bounded slices of the body.
+_CHUNK = 64 * 1024
+
+
+@dataclass
+class CompactEmbeddings:
+    r"""Embedding vectors stored row-major in a single ``array('f')``.
+
+    A batch of ``count`` vectors of ``dimensions`` floats takes
+    ``4 * count * dimensions`` bytes, instead of a boxed Python float per
+    component. Rows and the whole matrix are exposed as zero-copy views.
+    """
+
+    model: str
+    usage: Dict[str, Any]
+    dimensions: int
+    vectors: array = field(repr=False)
+
+    @property
+    def count(self) -> int:
+        return len(self.vectors) // self.dimensions if self.dimensions else 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def row(self, index: int) -> memoryview:
+        r"""Zero-copy view of vector ``index``."""
+        if not -self.count <= index < self.count:
+            raise IndexError("embedding index out of range")
+        index %= self.count
+        start = index * self.dimensions
+        return memoryview(self.vectors)[start : start + self.dimensions]
+
+    def matrix(self) -> memoryview:
+        r"""Zero-copy ``memoryview`` of shape ``(count, dimensions)``.
+
+        A ``memoryview`` cannot have a zero in its shape, so for an empty
+        result this is an empty one-dimensional view.
+        """
+        if not self.count:
+            return memoryview(self.vectors)
+        return (
+            memoryview(self.vectors).cast("B").cast("f", (self.count, self.dimensions))
+        )
+
+    def to_numpy(self) -> Any:
+        r"""Zero-copy ``numpy.ndarray`` of shape ``(count, dimensions)`` and dtype float32.
+
+        Requires NumPy, which is not a dependency of this package.
+        """
+        try:
+            import numpy as np  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ImportError(
+                "CompactEmbeddings.to_numpy requires numpy; install it with `pip install numpy`"
+            ) from e
+        return np.frombuffer(self.vectors, dtype=np.float32).reshape(
+            self.count, self.dimensions
+        )
+
+    def tolist(self) -> List[List[float]]:
+        return [self.row(i).tolist() for i in range(self.count)]
+
+
+def _scan(scanner: JSONItemScanner, content: bytes) -> Iterator[Tuple[Any, Any]]:
+    view = memoryview(content)
+    for start in range(0, len(view), _CHUNK):
+        yield from scanner.feed(view[start : start + _CHUNK])
+    yield from scanner.close()
+
+
+def decode_embeddings(content: bytes) -> CompactEmbeddings:
+    r"""Decode a ``CreateEmbeddingResponse`` body without materializing the vectors as lists.
+
+    The items of the top-level ``data`` array are parsed one at a time and
+    their ``embedding`` copied into one shared ``array('f')``; the rest of the
+    body is small and parsed as ordinary JSON to read the model and usage.
+    """
+    scanner = JSONItemScanner([_DATA])
+    vectors = array("f")
+    dimensions = 0
+    order: List[int] = []
+    # One vector's floats exist as Python objects at a time, never the batch's.
+    for ordinal, (_, item) in enumerate(_scan(scanner, content)):
+        row = item["embedding"]
+        vectors.fromlist(row)
+        size = len(row)
+        if ordinal == 0:
+            dimensions = size
+        elif size != dimensions:
+            raise ValueError(
+                f"embedding {ordinal} has {size} dimensions, expected {dimensions}"
+            )
+        order.append(item.get("index", ordinal))
+    body = scanner.remainder or {}
+
+    # The API returns items in input order, but honour explicit indexes if they differ.
+    if order != list(range(len(order))):
+        reordered = array("f", bytes(4 * len(vectors)))
+        for source, target in enumerate(order):
+            reordered[target * dimensions : (target + 1) * dimensions] = vectors[
+                source * dimensions : (source + 1) * dimensions
+            ]
+        vectors = reordered
+    return CompactEmbeddings(
+        model=body.get("model", ""),
+        usage=body.get("usage") or {},
+        dimensions=dimensions,
+        vectors=vectors,
+    )
+
+
+_decoded: contextvars.ContextVar[Optional[List[CompactEmbeddings]]] = (
+    contextvars.ContextVar("opperai_compact_embeddings", default=None)
+)
+_install_lock = threading.Lock()
+
+
+class _CompactDecoder(RequestMiddleware):
+    r"""Decodes the response of an ``embeddings.create`` made by :func:`create_compact`.
+
+    It is the outermost middleware, so the rest of the chain sees the real
+    response. The decoded vectors are handed back through a context variable,
+    and ``create`` is given an empty body to parse in place of the vectors.
+    """
+
+    def _decode(
+        self, hook_ctx: Any, request: httpx.Request, response: httpx.Response
+    ) -> httpx.Response:
+        target = _decoded.get()
+        if (
+            target is None
+            or getattr(hook_ctx, "operation_id", "") != EMBEDDING_OPERATION
+            or not utils.match_response(response, "200", "application/json")
+        ):
+            return response
+        result = decode_embeddings(response.content)
+        target.append(result)
+        return httpx.Response(
+            200,
+            headers={"content-type": "application/json"},
+            json={"model": result.model, "data": [], "usage": result.usage},
+            request=request,
+        )
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        return self._decode(hook_ctx, request, call_next())
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        return self._decode(hook_ctx, request, await call_next())
+
+
+def _install(embeddings: "Embeddings") -> None:
+    config = embeddings.sdk_configuration.__dict__
+    with _install_lock:
+        middleware = config.get("_middleware")
+        if middleware is None:
+            middleware = config.setdefault("_middleware", MiddlewareChain())
+        if not any(isinstance(m, _CompactDecoder) for m in middleware):
+            middleware.add(_CompactDecoder(), outermost=True)
+
+
+def create_compact(
+    embeddings: "Embeddings",
+    *,
+    input: Union[models.Input, models.InputTypedDict],  # pylint: disable=redefined-builtin
+    model: OptionalNullable[Union[models.TModel, models.TModelTypedDict]] = UNSET,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> CompactEmbeddings:
+    r"""Create embeddings and return them as a :class:`CompactEmbeddings`.
+
+    Sends the request through ``embeddings.create`` itself, so request
+    building, retries and errors are the same, but decodes the vectors
+    directly into a float32 buffer instead of a ``CreateEmbeddingResponse``.
+
+    :param embeddings: The client's embeddings SDK, ``client.embeddings``
+    :param input: The input to embed, can be a single string or a list of strings
+    :param model: The model to use for the embedding
+    :param retries: Override the default retry configuration for this method
+    :param server_url: Override the default server URL for this method
+    :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+    :param http_headers: Additional headers to set or replace on requests.
+    """
+    _install(embeddings)
+    target: List[CompactEmbeddings] = []
+    token = _decoded.set(target)
+    try:
+        embeddings.create(
+            input=input,
+            model=model,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+    finally:
+        _decoded.reset(token)
+    return target[-1]
+
+
+async def create_compact_async(
+    embeddings: "Embeddings",
+    *,
+    input: Union[models.Input, models.InputTypedDict],  # pylint: disable=redefined-builtin
+    model: OptionalNullable[Union[models.TModel, models.TModelTypedDict]] = UNSET,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> CompactEmbeddings:
+    r"""Async counterpart of :func:`create_compact`."""
+    _install(embeddings)
+    target: List[CompactEmbeddings] = []
+    token = _decoded.set(target)
+    try:
+        await embeddings.create_async(
+            input=input,
+            model=model,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+    finally:
+        _decoded.reset(token)
+    return target[-1]
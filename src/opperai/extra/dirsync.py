@@ -0,0 +1,413 @@
+"""Mirror a local directory tree into a knowledge base."""
+
+import asyncio
+import fnmatch
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+
+from opperai import models
+
+from .manifest import FileManifestEntry, FileSyncManifest
+from .pagination import paginate, paginate_async
+from .pipeline import run_bounded, run_bounded_async
+from .uploads import DEFAULT_PRESIGNED_THRESHOLD, upload_file, upload_file_async
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+PENDING_FILE_STATUSES = ("pending", "queued", "uploading", "processing", "indexing")
+r"""``ListFilesResponse.status`` values that mean a file is still being processed."""
+
+
+@dataclass
+class LocalFile:
+    path: str
+    name: str
+    r"""Path relative to the synced root, with ``/`` separators; used as the remote filename."""
+    size: int
+    mtime_ns: int
+
+
+def _included(filename: str, patterns: Optional[Sequence[str]]) -> bool:
+    return not patterns or any(fnmatch.fnmatch(filename, p) for p in patterns)
+
+
+def scan_directory(
+    root: Union[str, "os.PathLike[str]"], patterns: Optional[Sequence[str]] = None
+) -> Iterator[LocalFile]:
+    r"""Yield the regular files under ``root`` matching any of ``patterns``."""
+    root = os.fspath(root)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not _included(filename, patterns):
+                continue
+            path = os.path.join(dirpath, filename)
+            st = os.stat(path)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            yield LocalFile(path, name, st.st_size, st.st_mtime_ns)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class _Upload:
+    file: LocalFile
+    replaces: Optional[str] = None
+    sha256: Optional[str] = None
+
+
+@dataclass
+class SyncFailure:
+    name: str
+    operation: str
+    error: Exception
+
+
+@dataclass
+class DirectorySyncReport:
+    uploaded: List[str] = field(default_factory=list)
+    replaced: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+    failures: List[SyncFailure] = field(default_factory=list)
+    statuses: Dict[str, str] = field(default_factory=dict)
+    r"""Last seen processing status of each uploaded file, by name."""
+
+
+class DirectorySync:
+    r"""Upload new and changed files from a directory and delete removed ones.
+
+    Local files are compared against the knowledge base's ``list_files``
+    (``original_filename`` and ``size``) and against a manifest of previous
+    uploads (size, mtime and content hash). Files that have not changed are
+    skipped, so a sync interrupted part way through resumes where it stopped.
+    Changed files are uploaded again and their previous version is deleted.
+
+    :param client: The Opper client
+    :param knowledge_base_id: The id of the knowledge base to mirror into
+    :param root: Directory to mirror
+    :param manifest_path: SQLite file recording completed uploads, defaults to ``.opper-sync.db`` in ``root``
+    :param patterns: Filename glob patterns to include, e.g. ``["*.pdf", "*.docx"]``
+    :param concurrency: Maximum number of uploads in flight
+    :param delete_removed: Delete remote files that were uploaded by a sync of this
+        directory, match ``patterns`` and no longer exist locally
+    :param configuration: Text processing configuration for uploaded files
+    :param presigned_threshold: Size in bytes above which uploads stream through a presigned URL
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        knowledge_base_id: str,
+        root: Union[str, "os.PathLike[str]"],
+        *,
+        manifest_path: Optional[Union[str, "os.PathLike[str]"]] = None,
+        patterns: Optional[Sequence[str]] = None,
+        concurrency: int = 8,
+        delete_removed: bool = True,
+        configuration: Optional[
+            Union[
+                models.TextProcessingConfiguration,
+                models.TextProcessingConfigurationTypedDict,
+            ]
+        ] = None,
+        presigned_threshold: int = DEFAULT_PRESIGNED_THRESHOLD,
+    ) -> None:
+        self._client = client
+        self.knowledge_base_id = knowledge_base_id
+        self.root = os.fspath(root)
+        if manifest_path is None:
+            manifest_path = os.path.join(self.root, ".opper-sync.db")
+        self._manifest_name = os.path.basename(os.fspath(manifest_path))
+        self.manifest = FileSyncManifest(manifest_path, knowledge_base_id)
+        self._patterns = patterns
+        self._concurrency = concurrency
+        self._delete_removed = delete_removed
+        self._configuration = configuration
+        self._presigned_threshold = presigned_threshold
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        self.manifest.close()
+
+    def __enter__(self) -> "DirectorySync":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _scan(self) -> Iterator[LocalFile]:
+        for file in scan_directory(self.root, self._patterns):
+            if file.name.startswith(self._manifest_name):
+                continue
+            yield file
+
+    def _plan(
+        self,
+        remote: Dict[str, models.ListFilesResponse],
+        report: DirectorySyncReport,
+    ) -> List[_Upload]:
+        uploads: List[_Upload] = []
+        for file in self._scan():
+            existing = remote.get(file.name)
+            entry = self.manifest.get(file.name)
+            if entry is not None and existing is not None and entry.file_id == existing.id:
+                if entry.size == file.size and entry.mtime_ns == file.mtime_ns:
+                    report.unchanged += 1
+                    continue
+                if entry.size == file.size:
+                    digest = _sha256(file.path)
+                    if digest == entry.sha256:
+                        self.manifest.record(entry._replace(mtime_ns=file.mtime_ns))
+                        report.unchanged += 1
+                        continue
+                    uploads.append(_Upload(file, existing.id, digest))
+                    continue
+            elif entry is None and existing is not None and existing.size == file.size:
+                # Uploaded before the manifest existed (or by another machine).
+                self.manifest.record(
+                    FileManifestEntry(
+                        file.name, file.size, file.mtime_ns, _sha256(file.path), existing.id
+                    )
+                )
+                report.unchanged += 1
+                continue
+            uploads.append(_Upload(file, existing.id if existing is not None else None))
+        return uploads
+
+    def _removed(
+        self, remote: Dict[str, models.ListFilesResponse], local: Collection[str]
+    ) -> List[models.ListFilesResponse]:
+        if not self._delete_removed:
+            return []
+        removed = []
+        for name, f in remote.items():
+            if name in local or not _included(name.rsplit("/", 1)[-1], self._patterns):
+                continue
+            # Files uploaded by anyone else are never deleted.
+            entry = self.manifest.get(name)
+            if entry is not None and entry.file_id == f.id:
+                removed.append(f)
+        return removed
+
+    def _uploaded(
+        self, report: DirectorySyncReport, upload: _Upload, file_id: str
+    ) -> None:
+        file = upload.file
+        digest = upload.sha256 or _sha256(file.path)
+        self.manifest.record(
+            FileManifestEntry(file.name, file.size, file.mtime_ns, digest, file_id)
+        )
+        with self._lock:
+            if upload.replaces is not None:
+                report.replaced.append(file.name)
+            else:
+                report.uploaded.append(file.name)
+
+    def _failed(
+        self, report: DirectorySyncReport, name: str, operation: str, error: Exception
+    ) -> None:
+        with self._lock:
+            report.failures.append(SyncFailure(name, operation, error))
+
+    def _upload_kwargs(self) -> Dict[str, Any]:
+        return {
+            "configuration": self._configuration,
+            "presigned_threshold": self._presigned_threshold,
+        }
+
+    def remote_files(self, page_size: int = 100) -> Dict[str, models.ListFilesResponse]:
+        r"""Every file in the knowledge base, keyed by ``original_filename``."""
+        return {
+            f.original_filename: f
+            for f in paginate(
+                self._client.knowledge.list_files,
+                page_size=page_size,
+                knowledge_base_id=self.knowledge_base_id,
+            )
+        }
+
+    async def remote_files_async(
+        self, page_size: int = 100
+    ) -> Dict[str, models.ListFilesResponse]:
+        r"""Async counterpart of :meth:`remote_files`."""
+        return {
+            f.original_filename: f
+            async for f in paginate_async(
+                self._client.knowledge.list_files_async,
+                page_size=page_size,
+                knowledge_base_id=self.knowledge_base_id,
+            )
+        }
+
+    def run(
+        self,
+        *,
+        wait: bool = False,
+        poll_interval: float = 5.0,
+        timeout: Optional[float] = None,
+        pending_statuses: Collection[str] = PENDING_FILE_STATUSES,
+    ) -> DirectorySyncReport:
+        r"""Synchronize the directory using a pool of ``concurrency`` threads.
+
+        :param wait: Poll ``list_files`` until the uploaded files finish processing
+        :param poll_interval: Seconds between polls when ``wait`` is set
+        :param timeout: Give up polling after this many seconds
+        :param pending_statuses: File statuses that mean processing is not done
+        """
+        report = DirectorySyncReport()
+        remote = self.remote_files()
+        uploads = self._plan(remote, report)
+        local = {f.name for f in self._scan()}
+
+        def do_upload(upload: _Upload) -> None:
+            try:
+                res = upload_file(
+                    self._client,
+                    self.knowledge_base_id,
+                    upload.file.path,
+                    filename=upload.file.name,
+                    **self._upload_kwargs(),
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._failed(report, upload.file.name, "upload", e)
+                return
+            self._uploaded(report, upload, res.id)
+            if upload.replaces is not None:
+                do_delete(upload.file.name, upload.replaces, forget=False)
+
+        def do_delete(name: str, file_id: str, forget: bool = True) -> None:
+            try:
+                self._client.knowledge.delete_file(
+                    knowledge_base_id=self.knowledge_base_id, file_id=file_id
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._failed(report, name, "delete", e)
+                return
+            if forget:
+                self.manifest.remove(name)
+                with self._lock:
+                    report.deleted.append(name)
+
+        run_bounded(uploads, do_upload, self._concurrency)
+        run_bounded(
+            self._removed(remote, local),
+            lambda f: do_delete(f.original_filename, f.id),
+            self._concurrency,
+        )
+
+        if wait:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            names = set(report.uploaded + report.replaced)
+            while names:
+                remote = self.remote_files()
+                if self._update_statuses(report, remote, names, pending_statuses):
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                time.sleep(poll_interval)
+        return report
+
+    async def run_async(
+        self,
+        *,
+        wait: bool = False,
+        poll_interval: float = 5.0,
+        timeout: Optional[float] = None,
+        pending_statuses: Collection[str] = PENDING_FILE_STATUSES,
+    ) -> DirectorySyncReport:
+        r"""Async counterpart of :meth:`run`."""
+        report = DirectorySyncReport()
+        remote = await self.remote_files_async()
+        loop = asyncio.get_running_loop()
+        # Scanning and hashing touch the disk, so keep them off the event loop.
+        uploads = await loop.run_in_executor(None, self._plan, remote, report)
+        local = await loop.run_in_executor(None, lambda: {f.name for f in self._scan()})
+
+        async def do_upload(upload: _Upload) -> None:
+            try:
+                res = await upload_file_async(
+                    self._client,
+                    self.knowledge_base_id,
+                    upload.file.path,
+                    filename=upload.file.name,
+                    **self._upload_kwargs(),
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._failed(report, upload.file.name, "upload", e)
+                return
+            self._uploaded(report, upload, res.id)
+            if upload.replaces is not None:
+                await do_delete(upload.file.name, upload.replaces, forget=False)
+
+        async def do_delete(name: str, file_id: str, forget: bool = True) -> None:
+            try:
+                await self._client.knowledge.delete_file_async(
+                    knowledge_base_id=self.knowledge_base_id, file_id=file_id
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._failed(report, name, "delete", e)
+                return
+            if forget:
+                self.manifest.remove(name)
+                report.deleted.append(name)
+
+        await run_bounded_async(uploads, do_upload, self._concurrency)
+
+        async def delete_removed(f: models.ListFilesResponse) -> None:
+            await do_delete(f.original_filename, f.id)
+
+        await run_bounded_async(
+            self._removed(remote, local), delete_removed, self._concurrency
+        )
+
+        if wait:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            names = set(report.uploaded + report.replaced)
+            while names:
+                remote = await self.remote_files_async()
+                if self._update_statuses(report, remote, names, pending_statuses):
+                    break
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(poll_interval)
+        return report
+
+    def _update_statuses(
+        self,
+        report: DirectorySyncReport,
+        remote: Dict[str, models.ListFilesResponse],
+        names: Collection[str],
+        pending_statuses: Collection[str],
+    ) -> bool:
+        done = True
+        for name in names:
+            f = remote.get(name)
+            if f is None:
+                continue
+            report.statuses[name] = f.status
+            if f.status.lower() in pending_statuses:
+                done = False
+        return done
@@ -0,0 +1,226 @@
+"""Micro-batching of single-text embedding requests."""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
+from opperai import models
+from opperai.types import OptionalNullable, UNSET
+from opperai.utils import RetryConfig
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+Vector = List[float]
+
+_STOP = object()
+
+
+def embedding_vectors(response: models.CreateEmbeddingResponse) -> List[Vector]:
+    r"""The vectors of an ``embeddings.create`` response, in input order."""
+    items = sorted(
+        enumerate(response.data), key=lambda pair: pair[1].get("index", pair[0])
+    )
+    return [item["embedding"] for _, item in items]
+
+
+@dataclass
+class EmbeddingBatchStats:
+    batches: int = 0
+    texts: int = 0
+    r"""Texts submitted, including duplicates sent once within a batch."""
+    max_batch_size: int = 0
+    queue_delay_total: float = 0.0
+    r"""Seconds texts spent waiting for their batch to be sent, summed."""
+    queue_delay_max: float = 0.0
+    failed_batches: int = 0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.texts / self.batches if self.batches else 0.0
+
+    @property
+    def mean_queue_delay(self) -> float:
+        return self.queue_delay_total / self.texts if self.texts else 0.0
+
+
+class _Pending:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.future: "Future[Vector]" = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatchEmbedder:
+    r"""Collect single texts from many callers into batched ``embeddings.create`` calls.
+
+    Texts submitted from any thread or coroutine are queued; a background
+    thread sends them as one request once ``max_batch_size`` texts are waiting
+    or ``max_delay`` seconds have passed since the oldest one arrived, and
+    hands each caller its own vector. Identical texts within a batch are sent
+    once. Up to ``max_in_flight`` batches are sent concurrently; while they are
+    all busy, new texts keep accumulating into the next batch.
+
+    A failed batch fails every text in it with the same exception.
+
+    :param client: The Opper client
+    :param model: The embedding model, the server default when unset
+    :param max_batch_size: Maximum number of texts per request
+    :param max_delay: Seconds the oldest queued text waits for a batch to fill
+    :param max_in_flight: Maximum number of batch requests in flight
+    :param retries: Retry configuration applied to each batch
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        *,
+        model: OptionalNullable[Union[models.TModel, models.TModelTypedDict]] = UNSET,
+        max_batch_size: int = 64,
+        max_delay: float = 0.005,
+        max_in_flight: int = 4,
+        retries: OptionalNullable[RetryConfig] = UNSET,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._client = client
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._retries = retries
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._slots = threading.Semaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_in_flight, thread_name_prefix="opper-embed"
+        )
+        self._lock = threading.Lock()
+        self._stats = EmbeddingBatchStats()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._collect, name="opper-embed-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, text: str) -> "Future[Vector]":
+        r"""Queue ``text`` and return a future for its vector."""
+        pending = _Pending(text)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("embedder is closed")
+            self._queue.put(pending)
+        return pending.future
+
+    def embed(self, text: str, timeout: Optional[float] = None) -> Vector:
+        r"""Embed ``text``, blocking until its batch has been sent."""
+        return self.submit(text).result(timeout)
+
+    async def embed_async(self, text: str) -> Vector:
+        r"""Embed ``text`` without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self) -> EmbeddingBatchStats:
+        with self._lock:
+            return EmbeddingBatchStats(**vars(self._stats))
+
+    def _collect(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch: List[_Pending] = [item]
+            deadline = item.enqueued_at + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = (
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+
+        # Send whatever was queued before close() was called.
+        rest: List[_Pending] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        for start in range(0, len(rest), self.max_batch_size):
+            self._dispatch(rest[start : start + self.max_batch_size])
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        self._slots.acquire()
+        sent_at = time.monotonic()
+        with self._lock:
+            self._stats.batches += 1
+            self._stats.texts += len(batch)
+            self._stats.max_batch_size = max(self._stats.max_batch_size, len(batch))
+            for pending in batch:
+                delay = sent_at - pending.enqueued_at
+                self._stats.queue_delay_total += delay
+                self._stats.queue_delay_max = max(self._stats.queue_delay_max, delay)
+        self._pool.submit(self._send, batch)
+
+    def _send(self, batch: List[_Pending]) -> None:
+        try:
+            # Claim each future so a caller cancelled from now on cannot make
+            # setting its result fail; texts already cancelled are not sent.
+            batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+            positions: Dict[str, int] = {}
+            for pending in batch:
+                positions.setdefault(pending.text, len(positions))
+            response = self._client.embeddings.create(
+                input=list(positions),
+                model=self.model,
+                retries=self._retries,
+            )
+            vectors = embedding_vectors(response)
+            if len(vectors) != len(positions):
+                raise ValueError(
+                    f"expected {len(positions)} embeddings, got {len(vectors)}"
+                )
+            for pending in batch:
+                pending.future.set_result(vectors[positions[pending.text]])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            with self._lock:
+                self._stats.failed_batches += 1
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        r"""Send any queued texts, wait for in-flight batches and stop."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "MicroBatchEmbedder":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
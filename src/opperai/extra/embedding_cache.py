@@ -0,0 +1,542 @@
+"""Persistent, memory-mapped cache of embedding vectors."""
+
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import httpx
+
+from .middleware import CallNext, CallNextAsync, RequestMiddleware, add_middleware
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+EMBEDDING_OPERATION = "create_embedding_embeddings_post"
+
+DEFAULT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+"""Size of the vector file above which the least recently used vectors are dropped."""
+
+_TOUCH_FLUSH_EVERY = 256
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def model_key(model: Any) -> str:
+    r"""Cache key of an ``embeddings.create`` ``model`` value; ``""`` for the server default."""
+    if model is None:
+        return ""
+    if isinstance(model, str):
+        return model
+    return json.dumps(model, sort_keys=True, separators=(",", ":"), default=str)
+
+
+@dataclass
+class EmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    compactions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class EmbeddingCache:
+    r"""Embedding vectors on disk, keyed by model and SHA-256 of the text.
+
+    Vectors are appended as float32 to a data file that is memory-mapped for
+    reads, so :meth:`get` returns a view into the page cache without copying,
+    and several processes using the same directory share both the file and
+    the pages. A SQLite index maps each key to the vector's offset.
+
+    When the data file grows past ``max_bytes`` it is compacted: the least
+    recently used vectors are dropped and the rest are written to a new file,
+    keeping about ``compact_ratio`` of the limit. Views returned before a
+    compaction stay valid, as they keep the old mapping alive.
+
+    :param path: Directory holding the cache, created if it does not exist
+    :param max_bytes: Size of the data file that triggers compaction
+    :param compact_ratio: Fraction of ``max_bytes`` kept by a compaction
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        *,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        compact_ratio: float = 0.75,
+    ) -> None:
+        self.path = os.fspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._lock_file = open(  # pylint: disable=consider-using-with
+            os.path.join(self.path, "lock"), "a+b"
+        )
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._touched: Dict[Tuple[str, bytes], float] = {}
+        self._stats = EmbeddingCacheStats()
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, "index.sqlite"),
+            check_same_thread=False,
+            timeout=30,
+        )
+        with self._exclusive():
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS vectors (
+                    model TEXT NOT NULL,
+                    text_hash BLOB NOT NULL,
+                    generation INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    dimensions INTEGER NOT NULL,
+                    response_model TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta (name, value) VALUES ('generation', 0)"
+            )
+            self._conn.commit()
+
+    def _data_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"vectors-{generation}.f32")
+
+    @contextlib.contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        # The thread lock serializes this process; flock serializes processes.
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _generation(self) -> int:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE name = 'generation'"
+        ).fetchone()
+        return int(row[0])
+
+    def _view(
+        self, generation: int, offset: int, dimensions: int
+    ) -> Optional[memoryview]:
+        end = offset + 4 * dimensions
+        mapped = self._maps.get(generation)
+        if mapped is None or len(mapped) < end:
+            try:
+                with open(self._data_path(generation), "rb") as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size < end:
+                        return None
+                    # Superseded mappings are closed once no view refers to them.
+                    mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                return None
+            self._maps = {generation: mapped}
+        return memoryview(mapped)[offset:end].cast("f")
+
+    def get(self, model: str, text: str) -> Optional[memoryview]:
+        r"""The cached vector of ``text`` as a float32 view, or ``None``."""
+        return self.get_many(model, [text])[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[memoryview]]:
+        r"""Look up several texts at once; missing ones are ``None``."""
+        hashes = [text_hash(t) for t in texts]
+        with self._lock:
+            rows: Dict[bytes, Tuple[int, int, int]] = {}
+            unique = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique), 500):
+                chunk = unique[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for h, generation, offset, dims in self._conn.execute(
+                    "SELECT text_hash, generation, offset, dimensions FROM vectors "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *chunk),
+                ):
+                    rows[h] = (generation, offset, dims)
+            now = time.time()
+            result: List[Optional[memoryview]] = []
+            for h in hashes:
+                row = rows.get(h)
+                view = self._view(*row) if row is not None else None
+                if view is None:
+                    self._stats.misses += 1
+                else:
+                    self._stats.hits += 1
+                    self._touched[(model, h)] = now
+                result.append(view)
+            if len(self._touched) >= _TOUCH_FLUSH_EVERY:
+                self._flush_touches()
+        return result
+
+    def response_model(self, model: str, text: str) -> Optional[str]:
+        r"""The ``model`` the API reported when ``text`` was embedded."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response_model FROM vectors WHERE model = ? AND text_hash = ?",
+                (model, text_hash(text)),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def locate(
+        self, model: str, texts: Optional[Sequence[str]] = None
+    ) -> Tuple[memoryview, List[Optional[Tuple[bytes, int, int]]]]:
+        r"""A float32 view of the whole data file and where ``model``'s vectors are in it.
+
+        Each location is ``(text_hash, start, dimensions)`` with ``start``
+        counted in floats from the beginning of the view. With ``texts`` the
+        locations follow their order and missing texts are ``None``; without,
+        every vector of ``model`` is returned in file order.
+        """
+        with self._exclusive():
+            generation = self._generation()
+            if texts is None:
+                rows = self._conn.execute(
+                    "SELECT text_hash, offset, dimensions FROM vectors "
+                    "WHERE model = ? ORDER BY offset",
+                    (model,),
+                ).fetchall()
+                locations: List[Optional[Tuple[bytes, int, int]]] = [
+                    (h, offset // 4, dims) for h, offset, dims in rows
+                ]
+            else:
+                found: Dict[bytes, Tuple[bytes, int, int]] = {}
+                hashes = [text_hash(t) for t in texts]
+                unique = list(dict.fromkeys(hashes))
+                for start in range(0, len(unique), 500):
+                    chunk = unique[start : start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for h, offset, dims in self._conn.execute(
+                        "SELECT text_hash, offset, dimensions FROM vectors "
+                        f"WHERE model = ? AND text_hash IN ({placeholders})",
+                        (model, *chunk),
+                    ):
+                        found[h] = (h, offset // 4, dims)
+                locations = [found.get(h) for h in hashes]
+            try:
+                size = os.path.getsize(self._data_path(generation))
+            except FileNotFoundError:
+                size = 0
+            view = self._view(generation, 0, size // 4) if size else None
+        return (view if view is not None else memoryview(array("f"))), locations
+
+    def _flush_touches(self) -> None:
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE vectors SET last_used = MAX(last_used, ?) WHERE model = ? AND text_hash = ?",
+            [(t, m, h) for (m, h), t in self._touched.items()],
+        )
+        self._conn.commit()
+        self._touched = {}
+
+    def put_many(
+        self,
+        model: str,
+        items: Sequence[Tuple[str, Sequence[float]]],
+        response_model: str = "",
+    ) -> None:
+        r"""Append ``(text, vector)`` pairs, compacting the file if it grew too large."""
+        if not items:
+            return
+        now = time.time()
+        with self._exclusive():
+            generation = self._generation()
+            rows = []
+            with open(self._data_path(generation), "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                for text, vector in items:
+                    data = array("f", vector)
+                    f.write(data.tobytes())
+                    rows.append(
+                        (
+                            model,
+                            text_hash(text),
+                            generation,
+                            offset,
+                            len(data),
+                            response_model,
+                            now,
+                        )
+                    )
+                    offset += 4 * len(data)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (model, text_hash, generation, offset, "
+                "dimensions, response_model, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._stats.stores += len(rows)
+            if offset > self.max_bytes:
+                self._compact(int(self.max_bytes * self.compact_ratio))
+
+    def put(
+        self, model: str, text: str, vector: Sequence[float], response_model: str = ""
+    ) -> None:
+        self.put_many(model, [(text, vector)], response_model)
+
+    def compact(self, target_bytes: Optional[int] = None) -> None:
+        r"""Rewrite the data file keeping the most recently used vectors.
+
+        :param target_bytes: Maximum size of the new file, defaults to all live vectors
+        """
+        with self._exclusive():
+            self._compact(target_bytes)
+
+    def _compact(self, target_bytes: Optional[int]) -> None:
+        self._flush_touches()
+        old = self._generation()
+        new = old + 1
+        kept: List[Tuple[int, str, bytes]] = []
+        dropped: List[Tuple[str, bytes]] = []
+        size = 0
+        rows = self._conn.execute(
+            "SELECT model, text_hash, generation, offset, dimensions FROM vectors "
+            "ORDER BY last_used DESC"
+        ).fetchall()
+        with open(self._data_path(new), "wb") as out:
+            for model, h, generation, offset, dims in rows:
+                nbytes = 4 * dims
+                view = self._view(generation, offset, dims)
+                if view is None or (
+                    target_bytes is not None and size + nbytes > target_bytes
+                ):
+                    dropped.append((model, h))
+                    continue
+                out.write(view)
+                kept.append((size, model, h))
+                size += nbytes
+        self._conn.executemany(
+            "UPDATE vectors SET generation = ?, offset = ? WHERE model = ? AND text_hash = ?",
+            [(new, offset, model, h) for offset, model, h in kept],
+        )
+        self._conn.executemany(
+            "DELETE FROM vectors WHERE model = ? AND text_hash = ?", dropped
+        )
+        self._conn.execute(
+            "UPDATE meta SET value = ? WHERE name = 'generation'", (new,)
+        )
+        self._conn.commit()
+        self._stats.evictions += len(dropped)
+        self._stats.compactions += 1
+        # Readers that still map an older file keep it alive until they let go.
+        for generation in range(old + 1):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._data_path(generation))
+
+    def stats(self) -> EmbeddingCacheStats:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+            try:
+                size = os.path.getsize(self._data_path(self._generation()))
+            except FileNotFoundError:
+                size = 0
+            return EmbeddingCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                stores=self._stats.stores,
+                evictions=self._stats.evictions,
+                compactions=self._stats.compactions,
+                entries=int(entries),
+                size_bytes=size,
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touches()
+            self._conn.close()
+            self._maps = {}
+            self._lock_file.close()
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class EmbeddingCacheMiddleware(RequestMiddleware):
+    r"""Answers ``embeddings.create`` from an :class:`EmbeddingCache`, sending only misses.
+
+    Cached vectors are returned as float32, so they can differ from the API's
+    float64 values in the last digits. Usage in a response only counts the
+    texts that were actually sent.
+
+    Install it with :func:`enable_embedding_cache`.
+    """
+
+    def __init__(self, cache: EmbeddingCache) -> None:
+        self.cache = cache
+
+    def _plan(
+        self, request: httpx.Request
+    ) -> Optional[Tuple[Dict[str, Any], List[str], str, List[Optional[memoryview]]]]:
+        try:
+            body = json.loads(request.content)
+        except ValueError:
+            return None
+        if not isinstance(body, dict):
+            return None
+        raw_input = body.get("input")
+        texts = [raw_input] if isinstance(raw_input, str) else raw_input
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return None
+        model = model_key(body.get("model"))
+        return body, texts, model, self.cache.get_many(model, texts)
+
+    def _miss_request(
+        self, request: httpx.Request, body: Dict[str, Any], misses: List[str]
+    ) -> httpx.Request:
+        headers = [
+            (k, v)
+            for k, v in request.headers.multi_items()
+            if k.lower() != "content-length"
+        ]
+        return httpx.Request(
+            request.method,
+            request.url,
+            headers=headers,
+            content=json.dumps({**body, "input": misses}).encode("utf-8"),
+            extensions=request.extensions,
+        )
+
+    def _respond(
+        self,
+        request: httpx.Request,
+        texts: List[str],
+        model: str,
+        cached: List[Optional[memoryview]],
+        misses: List[str],
+        response: Optional[httpx.Response],
+    ) -> httpx.Response:
+        fetched: Dict[str, List[float]] = {}
+        usage: Dict[str, Any] = {"prompt_tokens": 0, "total_tokens": 0}
+        response_model = ""
+        if response is not None:
+            data = response.json()
+            items = sorted(
+                enumerate(data["data"]), key=lambda pair: pair[1].get("index", pair[0])
+            )
+            vectors = [item["embedding"] for _, item in items]
+            if len(vectors) != len(misses):
+                raise ValueError(
+                    f"expected {len(misses)} embeddings, got {len(vectors)}"
+                )
+            fetched = dict(zip(misses, vectors))
+            usage = data.get("usage") or usage
+            response_model = data.get("model", "")
+            self.cache.put_many(model, list(fetched.items()), response_model)
+        elif texts:
+            response_model = self.cache.response_model(model, texts[0]) or ""
+
+        out = []
+        for index, (text, view) in enumerate(zip(texts, cached)):
+            vector = fetched[text] if view is None else view.tolist()
+            out.append({"object": "embedding", "index": index, "embedding": vector})
+        headers = {"content-type": "application/json"}
+        return httpx.Response(
+            200,
+            headers=headers,
+            json={"model": response_model, "data": out, "usage": usage},
+            request=request,
+        )
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        plan = (
+            self._plan(request)
+            if hook_ctx.operation_id == EMBEDDING_OPERATION and not stream
+            else None
+        )
+        if plan is None:
+            return call_next()
+        body, texts, model, cached = plan
+        misses = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        response = None
+        if misses:
+            response = call_next(self._miss_request(request, body, misses))
+            if response.status_code != 200:
+                return response
+        return self._respond(request, texts, model, cached, misses, response)
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        plan = (
+            self._plan(request)
+            if hook_ctx.operation_id == EMBEDDING_OPERATION and not stream
+            else None
+        )
+        if plan is None:
+            return await call_next()
+        body, texts, model, cached = plan
+        misses = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        response = None
+        if misses:
+            response = await call_next(self._miss_request(request, body, misses))
+            if response.status_code != 200:
+                return response
+        return self._respond(request, texts, model, cached, misses, response)
+
+
+def enable_embedding_cache(
+    client: "Opper",
+    path: Union[str, "os.PathLike[str]"],
+    *,
+    max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+) -> EmbeddingCache:
+    r"""Serve ``embeddings.create`` from a disk cache for ``client`` and return the cache.
+
+    :param client: The Opper client
+    :param path: Directory holding the cache, shared by every process using it
+    :param max_bytes: Size of the vector file that triggers compaction
+    """
+    cache = EmbeddingCache(path, max_bytes=max_bytes)
+    add_middleware(client, EmbeddingCacheMiddleware(cache))
+    return cache
@@ -0,0 +1,419 @@
+"""Concurrent evaluation of a target function over a dataset."""
+
+import asyncio
+import inspect
+import math
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from opperai import models
+
+from .metrics_writer import SpanMetricsWriterAsync
+from .offload import CPUExecutor, is_cpu_bound, to_payload
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+EvaluatorMode = Literal["async", "thread", "process"]
+
+MetricDict = Mapping[str, Any]
+r"""A metric returned by an evaluator: ``dimension``, ``value`` and optional ``comment``."""
+
+TargetFn = Callable[[models.GetDatasetEntriesResponse], Awaitable[Any]]
+
+_EVALUATOR_ATTR = "__opper_evaluator__"
+
+
+class Evaluator:
+    r"""An evaluator callable together with where it should run.
+
+    Coroutine functions always run on the event loop. Plain functions run in the
+    runner's thread pool by default, or in its process pool when ``mode`` is
+    ``"process"`` or the function is marked with :func:`~opperai.extra.cpu_bound`.
+    Process evaluators must be picklable module-level functions and receive the
+    entry and output converted to plain data with :func:`~opperai.extra.to_payload`.
+
+    ``mode`` and ``name`` default to those given to :func:`evaluator`.
+    """
+
+    fn: Callable[..., Any]
+    mode: EvaluatorMode
+    name: str
+
+    def __init__(
+        self,
+        fn: Callable[..., Any],
+        mode: Optional[EvaluatorMode] = None,
+        name: Optional[str] = None,
+    ) -> None:
+        marked_mode, marked_name = getattr(fn, _EVALUATOR_ATTR, (None, None))
+        mode = mode or marked_mode
+        name = name or marked_name
+        if mode is None:
+            if inspect.iscoroutinefunction(fn):
+                mode = "async"
+            elif is_cpu_bound(fn):
+                mode = "process"
+            else:
+                mode = "thread"
+        if mode == "async" and not inspect.iscoroutinefunction(fn):
+            raise ValueError(f"evaluator {fn!r} is not a coroutine function")
+        if mode != "async" and inspect.iscoroutinefunction(fn):
+            raise ValueError(f"coroutine evaluator {fn!r} cannot run in a {mode} pool")
+        self.fn = fn
+        self.mode = mode
+        self.name = name or getattr(fn, "__name__", repr(fn))
+
+
+def evaluator(
+    fn: Optional[Callable[..., Any]] = None,
+    *,
+    mode: Optional[EvaluatorMode] = None,
+    name: Optional[str] = None,
+):
+    r"""Mark a function as an evaluator, optionally choosing where it runs.
+
+    Can be used bare (``@evaluator``) or with arguments
+    (``@evaluator(mode="process")``). The function is returned unchanged, so
+    it stays picklable by reference for process evaluators; the runner reads
+    the mode and name from it.
+    """
+
+    def wrap(f: Callable[..., Any]) -> Callable[..., Any]:
+        # Validate now rather than when the runner first wraps it.
+        Evaluator(f, mode=mode, name=name)
+        setattr(f, _EVALUATOR_ATTR, (mode, name))
+        return f
+
+    if fn is not None:
+        return wrap(fn)
+    return wrap
+
+
+@dataclass
+class DimensionStats:
+    count: int = 0
+    total: float = 0.0
+    sq_total: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.sq_total += value * value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def stddev(self) -> float:
+        if self.count < 2:
+            return 0.0
+        variance = (self.sq_total - self.total * self.total / self.count) / (
+            self.count - 1
+        )
+        return math.sqrt(max(variance, 0.0))
+
+
+@dataclass
+class StageStats:
+    name: str
+    count: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+
+    def throughput(self, wall_seconds: float) -> float:
+        return self.count / wall_seconds if wall_seconds > 0 else 0.0
+
+
+@dataclass
+class EvaluationError:
+    entry_id: str
+    stage: str
+    error: Exception
+    span_id: Optional[str] = None
+    r"""The span the failed metric write was for, on ``"metrics"`` errors."""
+
+
+@dataclass
+class EvaluationReport:
+    dimensions: Dict[str, DimensionStats] = field(default_factory=dict)
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    errors: List[EvaluationError] = field(default_factory=list)
+    wall_seconds: float = 0.0
+
+    def summary(self) -> str:
+        r"""Render per-dimension statistics and per-stage throughput as a text table."""
+        lines = [
+            f"{'dimension':<32} {'count':>7} {'mean':>9} {'std':>9} {'min':>9} {'max':>9}"
+        ]
+        for name in sorted(self.dimensions):
+            d = self.dimensions[name]
+            lines.append(
+                f"{name:<32} {d.count:>7} {d.mean:>9.4f} {d.stddev:>9.4f} "
+                f"{d.min:>9.4f} {d.max:>9.4f}"
+            )
+        lines.append("")
+        lines.append(
+            f"{'stage':<32} {'count':>7} {'errors':>7} {'busy s':>9} {'items/s':>9}"
+        )
+        for name, s in self.stages.items():
+            lines.append(
+                f"{name:<32} {s.count:>7} {s.errors:>7} {s.busy_seconds:>9.2f} "
+                f"{s.throughput(self.wall_seconds):>9.2f}"
+            )
+        lines.append(f"\nwall time: {self.wall_seconds:.2f}s")
+        return "\n".join(lines)
+
+
+def _eval_stage(ev: Evaluator) -> str:
+    return f"eval:{ev.name}"
+
+
+def _check_metric(metric: Any) -> Tuple[str, float, Optional[str]]:
+    r"""The ``dimension``, ``value`` and ``comment`` of a metric, or ValueError if it is malformed."""
+    if not isinstance(metric, Mapping):
+        raise ValueError(f"metric must be a mapping, got {type(metric).__name__}")
+    dimension = metric.get("dimension")
+    if not isinstance(dimension, str):
+        raise ValueError(f"metric has no string 'dimension': {metric!r}")
+    try:
+        value = float(metric["value"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"metric has no numeric 'value': {metric!r}") from e
+    return dimension, value, metric.get("comment")
+
+
+def _result_span_id(result: Any) -> Optional[str]:
+    span_id = getattr(result, "span_id", None)
+    if span_id is None and isinstance(result, Mapping):
+        span_id = result.get("span_id")
+    return span_id
+
+
+class EvaluationRunner:
+    r"""Run a target function over a dataset and score it with evaluators.
+
+    Entries are streamed page by page from ``datasets.list_entries_async``, the
+    target runs with at most ``concurrency`` entries in flight, and evaluator
+    metrics are written in batches through :class:`SpanMetricsWriterAsync` to
+    the span returned by the target (any result with a ``span_id``).
+
+    Evaluators are called as ``evaluator(entry, output)`` and return a list of
+    metric dicts with ``dimension``, ``value`` and optional ``comment``.
+
+    :param client: The Opper client
+    :param concurrency: Maximum number of entries processed at once
+    :param page_size: Number of entries fetched per ``list_entries`` request
+    :param thread_workers: Size of the thread pool for ``"thread"`` evaluators
+    :param process_workers: Size of the process pool for ``"process"`` evaluators
+    :param metrics_in_flight: Maximum number of concurrent metric writes
+    :param write_metrics: Set to False to only compute the report
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        *,
+        concurrency: int = 8,
+        page_size: int = 100,
+        thread_workers: Optional[int] = None,
+        process_workers: Optional[int] = None,
+        metrics_in_flight: int = 16,
+        write_metrics: bool = True,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._client = client
+        self._concurrency = concurrency
+        self._page_size = page_size
+        self._thread_workers = thread_workers
+        self._process_workers = process_workers
+        self._metrics_in_flight = metrics_in_flight
+        self._write_metrics = write_metrics
+
+    async def iter_entries(
+        self, dataset_id: str
+    ) -> AsyncIterator[models.GetDatasetEntriesResponse]:
+        r"""Yield the entries of a dataset, fetching one page at a time."""
+        offset = 0
+        while True:
+            page = await self._client.datasets.list_entries_async(
+                dataset_id=dataset_id, offset=offset, limit=self._page_size
+            )
+            for entry in page.data:
+                yield entry
+            offset += len(page.data)
+            if not page.data or offset >= page.meta.total_count:
+                return
+
+    async def run(
+        self,
+        dataset_id: str,
+        target: TargetFn,
+        evaluators: Sequence[Union[Evaluator, Callable[..., Any]]],
+    ) -> EvaluationReport:
+        r"""Evaluate ``target`` over every entry of ``dataset_id``.
+
+        :param dataset_id: The id of the dataset to evaluate against
+        :param target: Coroutine function called with each dataset entry
+        :param evaluators: Evaluators, or plain callables wrapped with :class:`Evaluator`
+        """
+        evals = [e if isinstance(e, Evaluator) else Evaluator(e) for e in evaluators]
+        report = EvaluationReport()
+        for stage in ("fetch", "target", *(_eval_stage(e) for e in evals), "metrics"):
+            report.stages[stage] = StageStats(name=stage)
+
+        threads: Optional[Executor] = None
+        processes: Optional[CPUExecutor] = None
+        if any(e.mode == "thread" for e in evals):
+            threads = ThreadPoolExecutor(max_workers=self._thread_workers)
+        if any(e.mode == "process" for e in evals):
+            processes = CPUExecutor(max_workers=self._process_workers)
+
+        queue: "asyncio.Queue[Optional[models.GetDatasetEntriesResponse]]" = (
+            asyncio.Queue(maxsize=self._concurrency * 2)
+        )
+        writer = SpanMetricsWriterAsync(
+            self._client,
+            max_in_flight=self._metrics_in_flight,
+            max_pending=max(self._page_size, self._concurrency),
+        )
+        # The entry each span was produced for, to attribute failed metric writes.
+        span_entries: Dict[str, str] = {}
+        start = time.perf_counter()
+
+        async def produce() -> None:
+            fetch = report.stages["fetch"]
+            cancelled = False
+            try:
+                async for entry in self.iter_entries(dataset_id):
+                    fetch.count += 1
+                    await queue.put(entry)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                if not cancelled:
+                    for _ in range(self._concurrency):
+                        await queue.put(None)
+
+        async def run_evaluator(
+            ev: Evaluator, entry: models.GetDatasetEntriesResponse, output: Any
+        ) -> List[MetricDict]:
+            if ev.mode == "async":
+                return await ev.fn(entry, output)
+            if ev.mode == "process":
+                assert processes is not None
+                return await processes.run(ev.fn, to_payload(entry), to_payload(output))
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(threads, ev.fn, entry, output)
+
+        async def process(entry: models.GetDatasetEntriesResponse) -> None:
+            stage = report.stages["target"]
+            t0 = time.perf_counter()
+            try:
+                output = await target(entry)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                stage.errors += 1
+                report.errors.append(EvaluationError(entry.id, "target", e))
+                return
+            finally:
+                stage.busy_seconds += time.perf_counter() - t0
+            stage.count += 1
+
+            async def timed(ev: Evaluator) -> List[Tuple[str, float, Optional[str]]]:
+                ev_stage = report.stages[_eval_stage(ev)]
+                t1 = time.perf_counter()
+                try:
+                    metrics = await run_evaluator(ev, entry, output)
+                    checked = [_check_metric(m) for m in metrics or []]
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    ev_stage.errors += 1
+                    report.errors.append(EvaluationError(entry.id, ev_stage.name, e))
+                    return []
+                finally:
+                    ev_stage.busy_seconds += time.perf_counter() - t1
+                ev_stage.count += 1
+                return checked
+
+            results = await asyncio.gather(*(timed(ev) for ev in evals))
+            span_id = _result_span_id(output)
+            if span_id is not None:
+                span_entries[span_id] = entry.id
+            metrics_stage = report.stages["metrics"]
+            for metrics in results:
+                for dimension, value, comment in metrics:
+                    report.dimensions.setdefault(dimension, DimensionStats()).add(value)
+                    if self._write_metrics and span_id is not None:
+                        t2 = time.perf_counter()
+                        await writer.add(
+                            span_id=span_id,
+                            dimension=dimension,
+                            value=value,
+                            comment=comment,
+                        )
+                        metrics_stage.busy_seconds += time.perf_counter() - t2
+                        metrics_stage.count += 1
+
+        async def consume() -> None:
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    return
+                await process(entry)
+
+        producer = asyncio.ensure_future(produce())
+        consumers = [asyncio.ensure_future(consume()) for _ in range(self._concurrency)]
+        try:
+            await asyncio.gather(*consumers)
+            await producer
+            t0 = time.perf_counter()
+            await writer.flush()
+            report.stages["metrics"].busy_seconds += time.perf_counter() - t0
+        finally:
+            # After a failure the producer may be blocked on the full queue
+            # and the other consumers on the empty one.
+            unfinished = [t for t in (producer, *consumers) if not t.done()]
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            if threads is not None:
+                threads.shutdown(wait=False)
+            if processes is not None:
+                processes.shutdown(wait=False)
+
+        metrics_stage = report.stages["metrics"]
+        for failure in writer.failed:
+            metrics_stage.errors += 1
+            report.errors.append(
+                EvaluationError(
+                    span_entries.get(failure.span_id, ""),
+                    "metrics",
+                    failure.error,
+                    span_id=failure.span_id,
+                )
+            )
+        report.wall_seconds = time.perf_counter() - start
+        return report
@@ -0,0 +1,334 @@
+"""Bulk ingestion of documents into a knowledge base."""
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterable,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from opperai import models, utils
+from opperai.types import OptionalNullable, UNSET
+from opperai.utils import BackoffStrategy, RetryConfig
+
+from .manifest import IngestManifest, ManifestEntry, fingerprint, key_filter
+from .pipeline import run_bounded, run_bounded_async
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+DEFAULT_INGEST_RETRY_CONFIG = RetryConfig(
+    "backoff", BackoffStrategy(500, 10000, 2.0, 60000), True
+)
+"""Retry policy used for each ``knowledge.add`` when none is supplied."""
+
+DocumentLike = Union[models.AddRequest, models.AddRequestTypedDict]
+
+
+def document_key(content: str) -> str:
+    r"""Deterministic key for a document that was given without one."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class IngestProgress:
+    submitted: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    bytes_sent: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def docs_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.succeeded / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.bytes_sent / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass
+class IngestFailure:
+    key: str
+    error: Exception
+
+
+@dataclass
+class IngestReport:
+    progress: IngestProgress
+    failures: List[IngestFailure] = field(default_factory=list)
+
+    @property
+    def failed_keys(self) -> List[str]:
+        return [f.key for f in self.failures]
+
+
+class KnowledgeIngestor:
+    r"""Add a stream of documents to a knowledge base with bounded concurrency.
+
+    Documents are pulled from the source only as fast as they are sent, so memory
+    use does not depend on the size of the corpus. Every document is sent with a
+    ``key``: documents without one get the SHA-256 of their content, so retried
+    writes replace rather than duplicate. Failed documents are recorded in the
+    report and do not stop the ingest.
+
+    With a ``manifest``, documents whose content, metadata and configuration
+    are unchanged since they were last ingested are skipped, and
+    :meth:`sync`/:meth:`sync_async` also delete documents that are no longer in
+    the source.
+
+    :param client: The Opper client
+    :param knowledge_base_id: The id of the knowledge base to add the documents to
+    :param concurrency: Maximum number of ``knowledge.add`` requests in flight
+    :param configuration: Text processing configuration for documents that do not set one
+    :param retries: Retry configuration applied to each document
+    :param on_progress: Called with the running :class:`IngestProgress`
+    :param progress_interval: Minimum number of seconds between ``on_progress`` calls
+    :param manifest: Manifest of previously ingested documents for this knowledge base
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        knowledge_base_id: str,
+        *,
+        concurrency: int = 16,
+        configuration: OptionalNullable[
+            Union[
+                models.TextProcessingConfiguration,
+                models.TextProcessingConfigurationTypedDict,
+            ]
+        ] = UNSET,
+        retries: Optional[RetryConfig] = None,
+        on_progress: Optional[Callable[[IngestProgress], None]] = None,
+        progress_interval: float = 1.0,
+        manifest: Optional[IngestManifest] = None,
+    ) -> None:
+        if manifest is not None and manifest.knowledge_base_id != knowledge_base_id:
+            raise ValueError("manifest belongs to a different knowledge base")
+        self._client = client
+        self.knowledge_base_id = knowledge_base_id
+        self._concurrency = concurrency
+        self.configuration = utils.get_pydantic_model(
+            configuration, OptionalNullable[models.TextProcessingConfiguration]
+        )
+        self._retries = retries or DEFAULT_INGEST_RETRY_CONFIG
+        self._on_progress = on_progress
+        self._progress_interval = progress_interval
+        self.manifest = manifest
+        self._lock = threading.Lock()
+        self._start()
+
+    def prepare(self, document: DocumentLike) -> models.AddRequest:
+        r"""Validate a document and fill in its key and default configuration."""
+        doc = utils.get_pydantic_model(document, models.AddRequest)
+        update = {}
+        if not doc.key:
+            update["key"] = document_key(doc.content)
+        if doc.configuration == UNSET and self.configuration != UNSET:
+            update["configuration"] = self.configuration
+        return doc.model_copy(update=update) if update else doc
+
+    def _prepare_or_fail(self, document: DocumentLike) -> Optional[models.AddRequest]:
+        r"""The prepared document, or None with the failure recorded if it is invalid."""
+        try:
+            return self.prepare(document)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            key = (
+                document.get("key")
+                if isinstance(document, Mapping)
+                else getattr(document, "key", None)
+            )
+            with self._lock:
+                self._progress.failed += 1
+                self._report.failures.append(IngestFailure(str(key or ""), e))
+            return None
+
+    def _begin(self, doc: models.AddRequest) -> Tuple[bool, Optional[ManifestEntry]]:
+        entry: Optional[ManifestEntry] = None
+        if self.manifest is not None:
+            entry = fingerprint(doc)
+            if self.manifest.check(entry):
+                with self._lock:
+                    self._progress.skipped += 1
+                return False, entry
+        with self._lock:
+            self._progress.submitted += 1
+        return True, entry
+
+    def _finish(
+        self,
+        doc: models.AddRequest,
+        entry: Optional[ManifestEntry],
+        error: Optional[Exception],
+    ) -> None:
+        size = len(doc.content.encode("utf-8"))
+        if error is None and entry is not None and self.manifest is not None:
+            self.manifest.record(entry)
+        with self._lock:
+            if error is None:
+                self._progress.succeeded += 1
+                self._progress.bytes_sent += size
+            else:
+                self._progress.failed += 1
+                self._report.failures.append(IngestFailure(str(doc.key), error))
+            now = time.monotonic()
+            notify = (
+                self._on_progress is not None
+                and now - self._last_report >= self._progress_interval
+            )
+            if notify:
+                self._last_report = now
+        if notify and self._on_progress is not None:
+            self._on_progress(self._progress)
+
+    def _start(self) -> None:
+        self._progress = IngestProgress()
+        self._report = IngestReport(progress=self._progress)
+        self._last_report = time.monotonic()
+        if self.manifest is not None:
+            self.manifest.begin_run()
+
+    def _stale_keys(self) -> Iterator[List[str]]:
+        if self.manifest is None:
+            raise ValueError("deleting missing documents requires a manifest")
+        self.manifest.commit()
+        return self.manifest.stale_keys()
+
+    def _deleted(self, keys: List[str], error: Optional[Exception]) -> None:
+        assert self.manifest is not None
+        if error is None:
+            self.manifest.remove(keys)
+            self._progress.deleted += len(keys)
+        else:
+            self._report.failures.extend(IngestFailure(k, error) for k in keys)
+
+    def _done(self) -> IngestReport:
+        if self.manifest is not None:
+            self.manifest.commit()
+        if self._on_progress is not None:
+            self._on_progress(self._progress)
+        return self._report
+
+    def ingest(self, documents: Iterable[DocumentLike]) -> IngestReport:
+        r"""Add every document using a pool of ``concurrency`` threads."""
+        self._start()
+        self._add_all(documents)
+        return self._done()
+
+    def _add_all(self, documents: Iterable[DocumentLike]) -> None:
+        def add(document: DocumentLike) -> None:
+            doc = self._prepare_or_fail(document)
+            if doc is None:
+                return
+            send, entry = self._begin(doc)
+            if not send:
+                return
+            error: Optional[Exception] = None
+            try:
+                self._client.knowledge.add(
+                    knowledge_base_id=self.knowledge_base_id,
+                    content=doc.content,
+                    key=doc.key,
+                    metadata=doc.metadata,
+                    configuration=doc.configuration,
+                    retries=self._retries,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = e
+            self._finish(doc, entry, error)
+
+        run_bounded(documents, add, self._concurrency)
+
+    def sync(self, documents: Iterable[DocumentLike]) -> IngestReport:
+        r"""Ingest new and changed documents, then delete documents missing from ``documents``.
+
+        ``documents`` must be the complete corpus; any key in the manifest that it
+        does not yield is deleted from the knowledge base.
+        """
+        self._start()
+        self._add_all(documents)
+        for keys in self._stale_keys():
+            error: Optional[Exception] = None
+            try:
+                self._client.knowledge.delete_documents(
+                    knowledge_base_id=self.knowledge_base_id,
+                    filters=key_filter(keys),
+                    retries=self._retries,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = e
+            self._deleted(keys, error)
+        return self._done()
+
+    async def ingest_async(
+        self, documents: Union[Iterable[DocumentLike], AsyncIterable[DocumentLike]]
+    ) -> IngestReport:
+        r"""Add every document with at most ``concurrency`` requests in flight."""
+        self._start()
+        await self._add_all_async(documents)
+        return self._done()
+
+    async def _add_all_async(
+        self, documents: Union[Iterable[DocumentLike], AsyncIterable[DocumentLike]]
+    ) -> None:
+        async def add(document: DocumentLike) -> None:
+            doc = self._prepare_or_fail(document)
+            if doc is None:
+                return
+            send, entry = self._begin(doc)
+            if not send:
+                return
+            error: Optional[Exception] = None
+            try:
+                await self._client.knowledge.add_async(
+                    knowledge_base_id=self.knowledge_base_id,
+                    content=doc.content,
+                    key=doc.key,
+                    metadata=doc.metadata,
+                    configuration=doc.configuration,
+                    retries=self._retries,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = e
+            self._finish(doc, entry, error)
+
+        await run_bounded_async(documents, add, self._concurrency)
+
+    async def sync_async(
+        self, documents: Union[Iterable[DocumentLike], AsyncIterable[DocumentLike]]
+    ) -> IngestReport:
+        r"""Async counterpart of :meth:`sync`."""
+        self._start()
+        await self._add_all_async(documents)
+        for keys in self._stale_keys():
+            error: Optional[Exception] = None
+            try:
+                await self._client.knowledge.delete_documents_async(
+                    knowledge_base_id=self.knowledge_base_id,
+                    filters=key_filter(keys),
+                    retries=self._retries,
+                )
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = e
+            self._deleted(keys, error)
+        return self._done()
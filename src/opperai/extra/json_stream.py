@@ -0,0 +1,444 @@
+"""Incremental JSON parsing that yields selected values as their bytes arrive."""
+
+import json
+import re
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from pydantic_core import from_json
+
+Path = Tuple[Union[str, int], ...]
+r"""Location of a value: object keys and array indexes from the root."""
+
+Pattern = Tuple[Union[str, int], ...]
+r"""A :data:`Path` where ``"*"`` matches any key or index, e.g. ``("data", "*")``."""
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+_SCALAR = re.compile(rb"[^ \t\r\n,\]}]+")
+_STRUCTURE = (b"[", b"]", b"{", b"}", b'"')
+_HIGH_SURROGATE = re.compile(rb"\\u[dD][89abAB][0-9a-fA-F]{2}")
+
+_OBJECT, _ARRAY = 0, 1
+_KEY, _COLON, _VALUE, _AFTER = 0, 1, 2, 3
+
+
+def _matches(pattern: Pattern, path: Path) -> bool:
+    return len(pattern) == len(path) and all(
+        p == "*" or p == k for p, k in zip(pattern, path)
+    )
+
+
+def _prefix_of(path: Path, pattern: Pattern) -> bool:
+    return len(pattern) > len(path) and all(
+        p == "*" or p == k for p, k in zip(pattern, path)
+    )
+
+
+class StringSink(ABC):
+    r"""Receives the contents of a large string value instead of the parser buffering it."""
+
+    @abstractmethod
+    def write(self, data: bytes) -> None:
+        r"""Append UTF-8 bytes of the string, with JSON escapes already decoded."""
+
+    @abstractmethod
+    def close(self) -> Any:
+        r"""Finish the string; the returned value replaces it in the parsed item."""
+
+
+class _Frame:
+    __slots__ = ("kind", "path", "key", "state")
+
+    def __init__(self, kind: int, path: Path) -> None:
+        self.kind = kind
+        self.path = path
+        self.key: Union[str, int] = 0
+        self.state = _KEY if kind == _OBJECT else _VALUE
+
+
+class JSONItemScanner:
+    r"""Push parser that emits the values at the given paths as soon as each is complete.
+
+    Bytes are fed in arbitrary chunks. Only the value currently being
+    emitted is buffered; everything else is dropped, or kept as the
+    *remainder*: the document without the emitted values, which is usually
+    small (e.g. the pagination metadata around ``data[*]``). Arrays whose
+    items are emitted are left empty in the remainder.
+
+    String values at ``spill`` paths are passed to a :class:`StringSink` in
+    pieces as they arrive, and replaced by what the sink's ``close`` returns.
+
+    :param items: Patterns of the values to emit, e.g. ``[("data", "*")]``
+    :param spill: Sink factory per pattern of string values to stream out
+    :param keep_remainder: Keep the remainder, see :attr:`remainder`
+    """
+
+    def __init__(
+        self,
+        items: Sequence[Pattern],
+        *,
+        spill: Optional[Mapping[Pattern, Callable[[Path], StringSink]]] = None,
+        keep_remainder: bool = True,
+    ) -> None:
+        self._items = [tuple(p) for p in items]
+        self._spill = {tuple(p): f for p, f in (spill or {}).items()}
+        self._keep_remainder = keep_remainder
+        self._buf = bytearray()
+        self._pos = 0
+        self._out_start = 0
+        self._skeleton = bytearray()
+        self._capture: Optional[bytearray] = None
+        self._capture_depth = 0
+        self._capture_path: Path = ()
+        self._stack: List[_Frame] = []
+        self._done = False
+        # Resumable state for a string whose closing quote has not arrived yet.
+        self._string_start = -1
+        self._string_scan = 0
+        # Resumable state of skipping over a value with nothing to emit or spill inside.
+        self._skip_depth = 0
+        self._sink: Optional[StringSink] = None
+        self._emitted: List[Tuple[Path, Any]] = []
+        self.remainder: Any = None
+        r"""The parsed document without the emitted items, set by :meth:`close`."""
+
+    # Output bookkeeping
+
+    def _flush(self, upto: int) -> None:
+        if upto > self._out_start:
+            if self._capture is not None:
+                self._capture += self._buf[self._out_start : upto]
+            elif self._keep_remainder:
+                self._skeleton += self._buf[self._out_start : upto]
+        self._out_start = upto
+
+    def _write(self, data: bytes) -> None:
+        if self._capture is not None:
+            self._capture += data
+        elif self._keep_remainder:
+            self._skeleton += data
+
+    def _compact(self) -> None:
+        # Everything before _pos is consumed; an unfinished token starts at _pos.
+        keep = self._pos
+        self._flush(keep)
+        if keep:
+            del self._buf[:keep]
+            self._pos = 0
+            self._out_start -= keep
+            if self._string_start >= 0:
+                self._string_start -= keep
+                self._string_scan -= keep
+
+    # Tokens
+
+    def _string_end(self, start: int) -> int:
+        r"""Index of the closing quote of the string opened at ``start``, or -1."""
+        buf = self._buf
+        i = self._string_scan if self._string_start == start else start + 1
+        while True:
+            j = buf.find(b'"', i)
+            if j < 0:
+                self._string_start, self._string_scan = start, len(buf)
+                return -1
+            k = j - 1
+            while buf[k] == 0x5C:
+                k -= 1
+            if (j - 1 - k) % 2 == 0:
+                self._string_start = -1
+                return j
+            i = j + 1
+
+    def _skip_value(self) -> bool:
+        r"""Scan towards the end of the container being skipped; whether it was reached."""
+        buf = self._buf
+        depth = self._skip_depth
+        i = self._pos
+        # Next offset of each structural byte; bytes.find is much faster than a
+        # character class search, and each is only looked up again once passed.
+        ahead = {c: buf.find(c, i) for c in _STRUCTURE}
+        while True:
+            for c, at in ahead.items():
+                if 0 <= at < i:
+                    ahead[c] = buf.find(c, i)
+            found = [at for at in ahead.values() if at >= 0]
+            if not found:
+                self._pos, self._skip_depth = len(buf), depth
+                return False
+            i = min(found)
+            ch = buf[i]
+            if ch == 0x22:
+                end = self._string_end(i)
+                if end < 0:
+                    self._pos, self._skip_depth = i, depth
+                    return False
+                i = end + 1
+            elif ch in (0x5B, 0x7B):
+                depth += 1
+                i += 1
+            else:
+                depth -= 1
+                i += 1
+                if depth == 0:
+                    self._pos, self._skip_depth = i, 0
+                    return True
+
+    def _decoded(self, raw: bytes) -> bytes:
+        if b"\\" not in raw:
+            return raw
+        return from_json(b'"' + raw + b'"').encode("utf-8")
+
+    def _spill_string(self) -> bool:
+        r"""Stream the spilled string at ``_pos``; whether its closing quote was reached."""
+        assert self._sink is not None
+        buf = self._buf
+        start = self._pos
+        end = -1
+        i = start
+        while True:
+            j = buf.find(b'"', i)
+            if j < 0:
+                break
+            k = j - 1
+            while k >= start and buf[k] == 0x5C:
+                k -= 1
+            if (j - 1 - k) % 2 == 0:
+                end = j
+                break
+            i = j + 1
+        if end >= 0:
+            self._sink.write(self._decoded(bytes(buf[start:end])))
+            self._write(json.dumps(self._sink.close()).encode("utf-8"))
+            self._sink = None
+            self._pos = self._out_start = end + 1
+            return True
+        # Hold back a possibly split escape sequence or UTF-8 character.
+        cut = len(buf)
+        backslash = buf.rfind(b"\\", max(start, cut - 6))
+        if backslash >= 0:
+            run = backslash
+            while run > start and buf[run - 1] == 0x5C:
+                run -= 1
+            if (backslash - run) % 2 == 0:
+                cut = backslash
+        # A high surrogate escape only decodes together with the low one after it.
+        if cut - 6 >= start and _HIGH_SURROGATE.fullmatch(buf, cut - 6, cut):
+            run = cut - 6
+            while run > start and buf[run - 1] == 0x5C:
+                run -= 1
+            if (cut - 6 - run) % 2 == 0:
+                cut -= 6
+        while cut > start and buf[cut - 1] >= 0x80 and len(buf) - cut < 4:
+            cut -= 1
+        if cut > start:
+            self._sink.write(self._decoded(bytes(buf[start:cut])))
+        self._pos = self._out_start = cut
+        return False
+
+    # Structure
+
+    def _value_path(self) -> Path:
+        if not self._stack:
+            return ()
+        frame = self._stack[-1]
+        return frame.path + (frame.key,)
+
+    def _begin_value(self, path: Path) -> None:
+        if self._capture is None and any(_matches(p, path) for p in self._items):
+            self._flush(self._pos)
+            self._capture = bytearray()
+            self._capture_depth = len(self._stack)
+            self._capture_path = path
+
+    def _end_value(self) -> None:
+        if self._capture is not None and len(self._stack) == self._capture_depth:
+            self._flush(self._pos)
+            self._emitted.append((self._capture_path, from_json(self._capture)))
+            self._capture = None
+        if self._stack:
+            self._stack[-1].state = _AFTER
+        else:
+            self._done = True
+
+    def _needs_structure(self, path: Path) -> bool:
+        return any(_prefix_of(path, p) for p in self._spill) or (
+            self._capture is None and any(_prefix_of(path, p) for p in self._items)
+        )
+
+    def _run(self, final: bool) -> None:
+        buf = self._buf
+        while True:
+            if self._sink is not None:
+                if not self._spill_string():
+                    return
+                self._end_value()
+                continue
+            if self._skip_depth:
+                if not self._skip_value():
+                    return
+                self._end_value()
+                continue
+
+            self._pos = _WHITESPACE.match(buf, self._pos).end()  # type: ignore[union-attr]
+            if self._pos >= len(buf):
+                return
+            if self._done:
+                raise ValueError("unexpected data after the end of the JSON document")
+            c = buf[self._pos]
+            frame = self._stack[-1] if self._stack else None
+
+            if frame is not None and frame.state == _AFTER:
+                if c == 0x2C:  # ,
+                    if frame.kind == _ARRAY:
+                        emitted = self._capture is None and any(
+                            _matches(p, frame.path + (frame.key,)) for p in self._items
+                        )
+                        if emitted:
+                            # Emitted items leave an empty array in the remainder.
+                            self._flush(self._pos)
+                            self._out_start = self._pos + 1
+                        frame.key = int(frame.key) + 1
+                        frame.state = _VALUE
+                    else:
+                        frame.state = _KEY
+                    self._pos += 1
+                    continue
+                if c in (0x5D, 0x7D):
+                    self._close(c)
+                    continue
+                raise ValueError(f"unexpected byte {chr(c)!r} in JSON document")
+
+            if frame is not None and frame.kind == _OBJECT and frame.state == _KEY:
+                if c == 0x7D:
+                    self._close(c)
+                    continue
+                if c != 0x22:
+                    raise ValueError(f"expected an object key, got {chr(c)!r}")
+                end = self._string_end(self._pos)
+                if end < 0:
+                    return
+                frame.key = from_json(bytes(buf[self._pos : end + 1]))
+                frame.state = _COLON
+                self._pos = end + 1
+                continue
+
+            if frame is not None and frame.state == _COLON:
+                if c != 0x3A:
+                    raise ValueError(f"expected ':', got {chr(c)!r}")
+                frame.state = _VALUE
+                self._pos += 1
+                continue
+
+            # A value, or the end of an empty array.
+            if c == 0x5D and frame is not None and frame.kind == _ARRAY:
+                self._close(c)
+                continue
+            path = self._value_path()
+            if c in (0x7B, 0x5B):
+                self._begin_value(path)
+                if not self._needs_structure(path):
+                    self._skip_depth = 1
+                    self._pos += 1
+                    continue
+                self._stack.append(_Frame(_OBJECT if c == 0x7B else _ARRAY, path))
+                self._pos += 1
+            elif c == 0x22:
+                factory = next(
+                    (f for p, f in self._spill.items() if _matches(p, path)), None
+                )
+                if factory is not None:
+                    self._begin_value(path)
+                    self._flush(self._pos)
+                    self._sink = factory(path)
+                    self._pos = self._out_start = self._pos + 1
+                    continue
+                end = self._string_end(self._pos)
+                if end < 0:
+                    return
+                self._begin_value(path)
+                self._pos = end + 1
+                self._end_value()
+            else:
+                m = _SCALAR.match(buf, self._pos)
+                if m is None:
+                    raise ValueError(f"unexpected byte {chr(c)!r} in JSON document")
+                if m.end() == len(buf) and not final:
+                    return
+                self._begin_value(path)
+                self._pos = m.end()
+                self._end_value()
+
+    def _close(self, c: int) -> None:
+        frame = self._stack.pop()
+        if (c == 0x7D) != (frame.kind == _OBJECT):
+            raise ValueError(f"mismatched {chr(c)!r} in JSON document")
+        self._pos += 1
+        self._end_value()
+
+    def feed(self, data: bytes) -> List[Tuple[Path, Any]]:
+        r"""Parse another chunk and return the ``(path, value)`` items it completed."""
+        self._buf += data
+        self._run(final=False)
+        self._compact()
+        emitted, self._emitted = self._emitted, []
+        return emitted
+
+    def close(self) -> List[Tuple[Path, Any]]:
+        r"""Finish the document, returning any last items and setting :attr:`remainder`."""
+        self._run(final=True)
+        self._flush(self._pos)
+        emitted, self._emitted = self._emitted, []
+        if not self._done:
+            raise ValueError("incomplete JSON document")
+        if self._keep_remainder and self._skeleton.strip():
+            self.remainder = from_json(bytes(self._skeleton))
+        return emitted
+
+
+def iter_json_items(
+    chunks: Iterable[bytes],
+    items: Sequence[Pattern],
+    *,
+    spill: Optional[Mapping[Pattern, Callable[[Path], StringSink]]] = None,
+    scanner: Optional[JSONItemScanner] = None,
+) -> Iterator[Tuple[Path, Any]]:
+    r"""Yield ``(path, value)`` for each value at ``items`` as the chunks arrive.
+
+    Pass your own ``scanner`` to read its :attr:`~JSONItemScanner.remainder`
+    once the iterator is exhausted.
+    """
+    if scanner is None:
+        scanner = JSONItemScanner(items, spill=spill)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+async def aiter_json_items(
+    chunks: AsyncIterable[bytes],
+    items: Sequence[Pattern],
+    *,
+    spill: Optional[Mapping[Pattern, Callable[[Path], StringSink]]] = None,
+    scanner: Optional[JSONItemScanner] = None,
+) -> AsyncIterator[Tuple[Path, Any]]:
+    r"""Async counterpart of :func:`iter_json_items`."""
+    if scanner is None:
+        scanner = JSONItemScanner(items, spill=spill)
+    async for chunk in chunks:
+        for item in scanner.feed(chunk):
+            yield item
+    for item in scanner.close():
+        yield item
@@ -0,0 +1,287 @@
+"""Local manifest of documents already ingested into a knowledge base."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from opperai import models
+
+
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ManifestEntry(NamedTuple):
+    key: str
+    content_hash: str
+    metadata_hash: str
+    configuration: str
+    r"""Canonical JSON of the ``TextProcessingConfiguration`` the document was sent with."""
+
+
+def fingerprint(document: models.AddRequest) -> ManifestEntry:
+    r"""Hash a document's content, metadata and processing configuration.
+
+    The document must already have a ``key``.
+    """
+    if not document.key:
+        raise ValueError("document has no key")
+    configuration = document.configuration
+    config_json = (
+        _canonical_json(configuration.model_dump(by_alias=True))
+        if isinstance(configuration, models.TextProcessingConfiguration)
+        else ""
+    )
+    return ManifestEntry(
+        key=document.key,
+        content_hash=_digest(document.content),
+        metadata_hash=_digest(_canonical_json(document.metadata or {})),
+        configuration=config_json,
+    )
+
+
+class IngestManifest:
+    r"""SQLite-backed map of document ``key`` to the fingerprint last ingested.
+
+    Each ingest is a run: every key seen during the run is stamped with the run
+    id, so keys that disappeared from the source can be found afterwards without
+    holding the whole key set in memory. Writes are committed in batches and
+    on :meth:`close`.
+
+    :param path: Path of the SQLite database, created if it does not exist
+    :param knowledge_base_id: Knowledge base the entries belong to; one file can hold several
+    :param commit_every: Number of writes between commits
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "os.PathLike[str]"],
+        knowledge_base_id: str,
+        *,
+        commit_every: int = 500,
+    ) -> None:
+        self.knowledge_base_id = knowledge_base_id
+        self._commit_every = commit_every
+        self._pending_writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.fspath(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                knowledge_base_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                metadata_hash TEXT NOT NULL,
+                configuration TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                seen_run INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (knowledge_base_id, key)
+            )
+            """
+        )
+        self._conn.commit()
+        self.run_id = 0
+
+    def begin_run(self) -> int:
+        r"""Start a new run and return its id."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(seen_run), 0) FROM documents WHERE knowledge_base_id = ?",
+                (self.knowledge_base_id,),
+            ).fetchone()
+            self.run_id = int(row[0]) + 1
+            return self.run_id
+
+    def get(self, key: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, content_hash, metadata_hash, configuration FROM documents "
+                "WHERE knowledge_base_id = ? AND key = ?",
+                (self.knowledge_base_id, key),
+            ).fetchone()
+        return ManifestEntry(*row) if row is not None else None
+
+    def check(self, entry: ManifestEntry) -> bool:
+        r"""Mark ``entry.key`` as seen in this run and report whether it is unchanged."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, metadata_hash, configuration FROM documents "
+                "WHERE knowledge_base_id = ? AND key = ?",
+                (self.knowledge_base_id, entry.key),
+            ).fetchone()
+            if row is None:
+                return False
+            self._write(
+                "UPDATE documents SET seen_run = ? WHERE knowledge_base_id = ? AND key = ?",
+                (self.run_id, self.knowledge_base_id, entry.key),
+            )
+        return tuple(row) == entry[1:]
+
+    def record(self, entry: ManifestEntry) -> None:
+        r"""Store ``entry`` as successfully ingested in this run."""
+        with self._lock:
+            self._write(
+                "INSERT INTO documents (knowledge_base_id, key, content_hash, metadata_hash, "
+                "configuration, updated_at, seen_run) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (knowledge_base_id, key) DO UPDATE SET "
+                "content_hash = excluded.content_hash, metadata_hash = excluded.metadata_hash, "
+                "configuration = excluded.configuration, updated_at = excluded.updated_at, "
+                "seen_run = excluded.seen_run",
+                (self.knowledge_base_id, *entry, time.time(), self.run_id),
+            )
+
+    def stale_keys(self, batch_size: int = 500) -> Iterator[List[str]]:
+        r"""Yield, in batches, the keys that were not seen in the current run."""
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key FROM documents WHERE knowledge_base_id = ? "
+                    "AND seen_run < ? AND key > ? ORDER BY key LIMIT ?",
+                    (self.knowledge_base_id, self.run_id, last, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            keys = [r[0] for r in rows]
+            last = keys[-1]
+            yield keys
+
+    def remove(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM documents WHERE knowledge_base_id = ? AND key = ?",
+                [(self.knowledge_base_id, k) for k in keys],
+            )
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM documents WHERE knowledge_base_id = ?",
+                (self.knowledge_base_id,),
+            ).fetchone()
+        return int(row[0])
+
+    def _write(self, sql: str, params: Any) -> None:
+        self._conn.execute(sql, params)
+        self._pending_writes += 1
+        if self._pending_writes >= self._commit_every:
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._pending_writes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self) -> "IngestManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def key_filter(keys: List[str]) -> List[models.Filter]:
+    r"""Filters selecting the documents with the given keys."""
+    return [models.Filter(field="key", operation=models.Op.IN, value=list(keys))]
+
+
+
+class FileManifestEntry(NamedTuple):
+    name: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    file_id: str
+
+
+class FileSyncManifest:
+    r"""SQLite-backed record of local files already uploaded to a knowledge base.
+
+    Entries are written as soon as each upload completes, so an interrupted
+    directory sync resumes where it stopped instead of starting over.
+
+    :param path: Path of the SQLite database, created if it does not exist
+    :param knowledge_base_id: Knowledge base the entries belong to; one file can hold several
+    """
+
+    def __init__(
+        self, path: Union[str, "os.PathLike[str]"], knowledge_base_id: str
+    ) -> None:
+        self.knowledge_base_id = knowledge_base_id
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.fspath(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                knowledge_base_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                PRIMARY KEY (knowledge_base_id, name)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, name: str) -> Optional[FileManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT name, size, mtime_ns, sha256, file_id FROM files "
+                "WHERE knowledge_base_id = ? AND name = ?",
+                (self.knowledge_base_id, name),
+            ).fetchone()
+        return FileManifestEntry(*row) if row is not None else None
+
+    def record(self, entry: FileManifestEntry) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (knowledge_base_id, name, size, mtime_ns, "
+                "sha256, file_id) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.knowledge_base_id, *entry),
+            )
+            self._conn.commit()
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM files WHERE knowledge_base_id = ? AND name = ?",
+                (self.knowledge_base_id, name),
+            )
+            self._conn.commit()
+
+    def names(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM files WHERE knowledge_base_id = ?",
+                (self.knowledge_base_id,),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "FileSyncManifest":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -0,0 +1,271 @@
+"""Batched, de-duplicating writers for span metrics."""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from opperai import models
+from opperai.types import OptionalNullable, UNSET
+from opperai.utils import BackoffStrategy, RetryConfig
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+DEFAULT_METRIC_RETRY_CONFIG = RetryConfig(
+    "backoff", BackoffStrategy(250, 5000, 2.0, 30000), True
+)
+"""Retry policy used for metric writes when none is supplied."""
+
+
+@dataclass
+class MetricWriteError:
+    span_id: str
+    request: models.CreateSpanMetricRequest
+    error: Exception
+
+
+@dataclass
+class MetricsFlushResult:
+    written: List[models.CreateSpanMetricResponse] = field(default_factory=list)
+    failed: List[MetricWriteError] = field(default_factory=list)
+    deduplicated: int = 0
+
+
+class _MetricQueue:
+    """Pending metric writes keyed by (span_id, dimension), last write wins."""
+
+    def __init__(self) -> None:
+        self._pending: Dict[Tuple[str, str], models.CreateSpanMetricRequest] = {}
+        self._deduplicated = 0
+        self._lock = threading.Lock()
+
+    def put(self, span_id: str, request: models.CreateSpanMetricRequest) -> int:
+        key = (span_id, request.dimension)
+        with self._lock:
+            if key in self._pending:
+                # Re-insert so the entry keeps the position of its latest write.
+                del self._pending[key]
+                self._deduplicated += 1
+            self._pending[key] = request
+            return len(self._pending)
+
+    def drain(
+        self,
+    ) -> Tuple[List[Tuple[str, models.CreateSpanMetricRequest]], int]:
+        with self._lock:
+            items = [(span_id, req) for (span_id, _), req in self._pending.items()]
+            deduplicated = self._deduplicated
+            self._pending = {}
+            self._deduplicated = 0
+        return items, deduplicated
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+
+def _build_request(
+    dimension: str, value: float, comment: OptionalNullable[str]
+) -> models.CreateSpanMetricRequest:
+    return models.CreateSpanMetricRequest(
+        dimension=dimension, value=value, comment=comment
+    )
+
+
+class SpanMetricsWriter:
+    r"""Queue span metrics and write them concurrently with the sync client.
+
+    Metrics are buffered until :meth:`flush` is called, ``max_pending`` distinct
+    (span, dimension) pairs are queued, or the writer is used as a context
+    manager and exits. Repeated writes to the same (span, dimension) pair are
+    collapsed so only the last value is sent.
+
+    :param client: The Opper client used to send the metrics
+    :param max_in_flight: Maximum number of concurrent ``create_metric`` requests
+    :param max_pending: Number of queued metrics that triggers an automatic flush
+    :param retries: Retry configuration applied to each write
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        *,
+        max_in_flight: int = 16,
+        max_pending: int = 1000,
+        retries: Optional[RetryConfig] = None,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self._client = client
+        self._max_in_flight = max_in_flight
+        self._max_pending = max_pending
+        self._retries = retries or DEFAULT_METRIC_RETRY_CONFIG
+        self._queue = _MetricQueue()
+        self._flush_lock = threading.Lock()
+        self.failed: List[MetricWriteError] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def add(
+        self,
+        *,
+        span_id: str,
+        dimension: str,
+        value: float,
+        comment: OptionalNullable[str] = UNSET,
+    ) -> None:
+        r"""Queue a metric for ``span_id``, replacing any pending value for ``dimension``."""
+        self.add_request(span_id, _build_request(dimension, value, comment))
+
+    def add_request(
+        self, span_id: str, request: models.CreateSpanMetricRequest
+    ) -> None:
+        if self._queue.put(span_id, request) >= self._max_pending:
+            self.flush()
+
+    def flush(self) -> MetricsFlushResult:
+        r"""Send every queued metric and wait for the writes to complete.
+
+        Writes that still fail after retrying are returned in ``failed`` and also
+        accumulated on :attr:`failed`.
+        """
+        with self._flush_lock:
+            items, deduplicated = self._queue.drain()
+            result = MetricsFlushResult(deduplicated=deduplicated)
+            if not items:
+                return result
+
+            workers = min(self._max_in_flight, len(items))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    (span_id, req, pool.submit(self._write, span_id, req))
+                    for span_id, req in items
+                ]
+                for span_id, req, future in futures:
+                    try:
+                        result.written.append(future.result())
+                    except Exception as e:  # pylint: disable=broad-exception-caught
+                        result.failed.append(MetricWriteError(span_id, req, e))
+
+            self.failed.extend(result.failed)
+            return result
+
+    def _write(
+        self, span_id: str, request: models.CreateSpanMetricRequest
+    ) -> models.CreateSpanMetricResponse:
+        return self._client.span_metrics.create_metric(
+            span_id=span_id,
+            dimension=request.dimension,
+            value=request.value,
+            comment=request.comment,
+            retries=self._retries,
+        )
+
+    def __enter__(self) -> "SpanMetricsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.flush()
+
+
+class SpanMetricsWriterAsync:
+    r"""Queue span metrics and write them concurrently with the async client.
+
+    The async counterpart of :class:`SpanMetricsWriter`. At most
+    ``max_in_flight`` requests are outstanding at any time.
+
+    :param client: The Opper client used to send the metrics
+    :param max_in_flight: Maximum number of concurrent ``create_metric_async`` requests
+    :param max_pending: Number of queued metrics that triggers an automatic flush
+    :param retries: Retry configuration applied to each write
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        *,
+        max_in_flight: int = 16,
+        max_pending: int = 1000,
+        retries: Optional[RetryConfig] = None,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self._client = client
+        self._max_in_flight = max_in_flight
+        self._max_pending = max_pending
+        self._retries = retries or DEFAULT_METRIC_RETRY_CONFIG
+        self._queue = _MetricQueue()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.failed: List[MetricWriteError] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    async def add(
+        self,
+        *,
+        span_id: str,
+        dimension: str,
+        value: float,
+        comment: OptionalNullable[str] = UNSET,
+    ) -> None:
+        r"""Queue a metric for ``span_id``, replacing any pending value for ``dimension``."""
+        await self.add_request(span_id, _build_request(dimension, value, comment))
+
+    async def add_request(
+        self, span_id: str, request: models.CreateSpanMetricRequest
+    ) -> None:
+        if self._queue.put(span_id, request) >= self._max_pending:
+            await self.flush()
+
+    async def flush(self) -> MetricsFlushResult:
+        r"""Send every queued metric and wait for the writes to complete.
+
+        Writes that still fail after retrying are returned in ``failed`` and also
+        accumulated on :attr:`failed`.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            items, deduplicated = self._queue.drain()
+            result = MetricsFlushResult(deduplicated=deduplicated)
+            if not items:
+                return result
+
+            semaphore = asyncio.Semaphore(self._max_in_flight)
+
+            async def write(span_id: str, req: models.CreateSpanMetricRequest):
+                async with semaphore:
+                    return await self._client.span_metrics.create_metric_async(
+                        span_id=span_id,
+                        dimension=req.dimension,
+                        value=req.value,
+                        comment=req.comment,
+                        retries=self._retries,
+                    )
+
+            outcomes = await asyncio.gather(
+                *(write(span_id, req) for span_id, req in items),
+                return_exceptions=True,
+            )
+            for (span_id, req), outcome in zip(items, outcomes):
+                if isinstance(outcome, BaseException):
+                    if not isinstance(outcome, Exception):
+                        raise outcome
+                    result.failed.append(MetricWriteError(span_id, req, outcome))
+                else:
+                    result.written.append(outcome)
+
+            self.failed.extend(result.failed)
+            return result
+
+    async def __aenter__(self) -> "SpanMetricsWriterAsync":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.flush()
@@ -0,0 +1,127 @@
+"""Middleware run around the SDK's HTTP requests."""
+
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, List
+
+import httpx
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+CallNext = Callable[..., httpx.Response]
+r"""Sends the request, or the replacement request passed to it, through the rest of the chain."""
+CallNextAsync = Callable[..., Awaitable[httpx.Response]]
+
+
+class RequestMiddleware:
+    r"""Wraps every request an :class:`~opperai.Opper` client sends.
+
+    ``handle`` and ``handle_async`` receive the operation's hook context, the
+    built ``httpx.Request`` and whether the response will be streamed, and
+    return the response, normally by calling ``call_next``, optionally with a
+    replacement request. The response returned has already passed the SDK's
+    hooks, error handling and retries. The default implementations pass the
+    request through unchanged.
+    """
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        return call_next()
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        return await call_next()
+
+
+class MiddlewareChain:
+    r"""Ordered middleware; the first one added is the outermost."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._middleware: List[RequestMiddleware] = []
+
+    def add(self, middleware: RequestMiddleware, outermost: bool = False) -> None:
+        with self._lock:
+            if outermost:
+                self._middleware = [middleware, *self._middleware]
+            else:
+                self._middleware = [*self._middleware, middleware]
+
+    def remove(self, middleware: RequestMiddleware) -> None:
+        with self._lock:
+            self._middleware = [m for m in self._middleware if m is not middleware]
+
+    def __bool__(self) -> bool:
+        return bool(self._middleware)
+
+    def __iter__(self):
+        return iter(self._middleware)
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        middleware = self._middleware
+
+        def dispatch(i: int, req: httpx.Request) -> httpx.Response:
+            if i == len(middleware):
+                return call_next(req)
+            return middleware[i].handle(
+                hook_ctx,
+                req,
+                stream,
+                lambda replacement=None: dispatch(
+                    i + 1, req if replacement is None else replacement
+                ),
+            )
+
+        return dispatch(0, request)
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        middleware = self._middleware
+
+        async def dispatch(i: int, req: httpx.Request) -> httpx.Response:
+            if i == len(middleware):
+                return await call_next(req)
+            return await middleware[i].handle_async(
+                hook_ctx,
+                req,
+                stream,
+                lambda replacement=None: dispatch(
+                    i + 1, req if replacement is None else replacement
+                ),
+            )
+
+        return await dispatch(0, request)
+
+
+def add_middleware(client: "Opper", middleware: RequestMiddleware) -> None:
+    r"""Run ``middleware`` around every request sent by ``client``.
+
+    :param client: The Opper client
+    :param middleware: The middleware to add, innermost of those already added
+    """
+    config = client.sdk_configuration.__dict__
+    chain = config.get("_middleware")
+    if chain is None:
+        chain = config.setdefault("_middleware", MiddlewareChain())
+    chain.add(middleware)
+
+
+def remove_middleware(client: "Opper", middleware: RequestMiddleware) -> None:
+    r"""Stop running ``middleware`` for ``client``'s requests."""
+    chain = client.sdk_configuration.__dict__.get("_middleware")
+    if chain is not None:
+        chain.remove(middleware)
@@ -0,0 +1,437 @@
+"""Cached catalog of the language models a client can call."""
+
+import difflib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+import httpx
+
+from opperai import models
+from opperai.types import UNSET
+
+from .middleware import CallNext, CallNextAsync, RequestMiddleware, add_middleware
+from .pagination import paginate, paginate_async
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+BUILTIN = "builtin"
+CUSTOM = "custom"
+ALIAS = "alias"
+
+MODEL_OPERATIONS = frozenset(
+    {"function_call_call_post", "function_stream_call_stream_post"}
+)
+"""Operations whose request ``model`` is checked by :class:`ModelValidationMiddleware`."""
+
+_PAGE_SIZE = 100
+_CATALOG_VERSION = 1
+
+
+@dataclass
+class ModelInfo:
+    name: str
+    kind: str
+    r"""``builtin``, ``custom`` or ``alias``"""
+    hosting_provider: Optional[str] = None
+    location: Optional[str] = None
+    input_cost_per_token: Optional[float] = None
+    output_cost_per_token: Optional[float] = None
+    identifier: Optional[str] = None
+    r"""Provider identifier of a custom model"""
+    fallback_models: List[str] = field(default_factory=list)
+    r"""Models an alias resolves to, in order"""
+    capabilities: Dict[str, Any] = field(default_factory=dict)
+    r"""The ``extra`` settings of a custom model"""
+
+
+class UnknownModelError(ValueError):
+    r"""A ``model`` value names a model that is not in the catalog."""
+
+    def __init__(self, name: str, suggestions: List[str]) -> None:
+        message = f"unknown model {name!r}"
+        if suggestions:
+            message += "; did you mean " + ", ".join(repr(s) for s in suggestions) + "?"
+        super().__init__(message)
+        self.name = name
+        self.suggestions = suggestions
+
+
+def model_names(model: Any) -> List[str]:
+    r"""The model names in a ``TModel`` value: a name, a ``Model``, a dict with ``name``, or a fallback list."""
+    if model is None or model is UNSET:
+        return []
+    if isinstance(model, str):
+        return [model]
+    if isinstance(model, models.Model):
+        return [model.name]
+    if isinstance(model, Mapping):
+        name = model.get("name")
+        return [name] if isinstance(name, str) else []
+    if isinstance(model, list):
+        return [name for item in model for name in model_names(item)]
+    return []
+
+
+def _cost(value: Any) -> Optional[float]:
+    return value if isinstance(value, (int, float)) else None
+
+
+class ModelCatalog:
+    r"""Built-in models, custom models and aliases, cached on disk with a TTL.
+
+    The catalog is read from ``path`` if that is younger than ``ttl``.
+    Otherwise it is fetched with ``language_models.list``, ``list_custom`` and
+    ``list_aliases``, and then written back. Once a
+    catalog has been loaded, an expired one is still used while a background
+    thread refreshes it, so lookups never wait on the network after the first.
+
+    A name missing from the catalog may have been added since it was
+    fetched, so validation refreshes the catalog once before rejecting it,
+    unless it was fetched less than ``miss_refresh_interval`` seconds ago.
+
+    :param client: The Opper client
+    :param path: JSON file the catalog is kept in; memory only if not given
+    :param ttl: Seconds after which the catalog is refreshed
+    :param background_refresh: Refresh an expired catalog in a background thread instead of on the next lookup
+    :param miss_refresh_interval: Minimum seconds between refreshes forced by unknown names
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        path: Optional[Union[str, "os.PathLike[str]"]] = None,
+        *,
+        ttl: float = 24 * 3600,
+        background_refresh: bool = True,
+        miss_refresh_interval: float = 60.0,
+    ) -> None:
+        self._client = client
+        self.path = os.fspath(path) if path is not None else None
+        self.ttl = ttl
+        self.background_refresh = background_refresh
+        self.miss_refresh_interval = miss_refresh_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+        self._models: Optional[Dict[str, ModelInfo]] = None
+        self._fetched_at = 0.0
+        self._miss_refreshed_at = -math.inf
+        self._load()
+
+    @property
+    def fetched_at(self) -> float:
+        r"""Epoch seconds at which the catalog was fetched, 0 if it never was."""
+        return self._fetched_at
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self._fetched_at >= self.ttl
+
+    def _load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != _CATALOG_VERSION:
+                return
+            catalog = {m["name"]: ModelInfo(**m) for m in data["models"]}
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        with self._lock:
+            self._models = catalog
+            self._fetched_at = float(data.get("fetched_at", 0))
+
+    def _save(self, catalog: Dict[str, ModelInfo], fetched_at: float) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".models-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": _CATALOG_VERSION,
+                        "fetched_at": fetched_at,
+                        "models": [asdict(m) for m in catalog.values()],
+                    },
+                    f,
+                )
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _install(self, catalog: Dict[str, ModelInfo]) -> None:
+        fetched_at = time.time()
+        with self._lock:
+            self._models = catalog
+            self._fetched_at = fetched_at
+        self._save(catalog, fetched_at)
+
+    @staticmethod
+    def _collect(
+        builtin: List[models.ListLanguageModelsResponse],
+        custom: List[models.ListCustomModelsResponseItem],
+        aliases: List[models.ListModelAliasesResponseItem],
+    ) -> Dict[str, ModelInfo]:
+        catalog: Dict[str, ModelInfo] = {}
+        for m in builtin:
+            catalog[m.name] = ModelInfo(
+                name=m.name,
+                kind=BUILTIN,
+                hosting_provider=m.hosting_provider,
+                location=m.location,
+                input_cost_per_token=_cost(m.input_cost_per_token),
+                output_cost_per_token=_cost(m.output_cost_per_token),
+            )
+        for c in custom:
+            catalog[c.name] = ModelInfo(
+                name=c.name,
+                kind=CUSTOM,
+                identifier=c.identifier,
+                capabilities=dict(c.extra or {}),
+            )
+        for a in aliases:
+            catalog[a.name] = ModelInfo(
+                name=a.name, kind=ALIAS, fallback_models=list(a.fallback_models)
+            )
+        return catalog
+
+    def refresh(self) -> None:
+        r"""Fetch the catalog now and write it to ``path``."""
+        lm = self._client.language_models
+        self._install(
+            self._collect(
+                list(paginate(lm.list, page_size=_PAGE_SIZE)),
+                list(paginate(lm.list_custom, page_size=_PAGE_SIZE)),
+                list(paginate(lm.list_aliases, page_size=_PAGE_SIZE)),
+            )
+        )
+
+    async def refresh_async(self) -> None:
+        r"""Async counterpart of :meth:`refresh`."""
+        lm = self._client.language_models
+        self._install(
+            self._collect(
+                [m async for m in paginate_async(lm.list_async, page_size=_PAGE_SIZE)],
+                [
+                    m
+                    async for m in paginate_async(
+                        lm.list_custom_async, page_size=_PAGE_SIZE
+                    )
+                ],
+                [
+                    m
+                    async for m in paginate_async(
+                        lm.list_aliases_async, page_size=_PAGE_SIZE
+                    )
+                ],
+            )
+        )
+
+    def _refresh_in_background(self) -> None:
+        with self._refresh_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run() -> None:
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # The stale catalog stays in use; the next lookup tries again.
+                pass
+            finally:
+                with self._refresh_lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="opperai-model-catalog", daemon=True).start()
+
+    def catalog(self) -> Dict[str, ModelInfo]:
+        r"""All known models by name, fetching them first if no catalog has been loaded."""
+        current = self._models
+        if current is None:
+            with self._refresh_lock:
+                if self._models is None:
+                    self.refresh()
+            current = self._models
+        elif self.expired:
+            if self.background_refresh:
+                self._refresh_in_background()
+            else:
+                self.refresh()
+                current = self._models
+        assert current is not None
+        return current
+
+    async def catalog_async(self) -> Dict[str, ModelInfo]:
+        r"""Async counterpart of :meth:`catalog`; only the first load is awaited."""
+        if self._models is None or (self.expired and not self.background_refresh):
+            await self.refresh_async()
+        elif self.expired:
+            self._refresh_in_background()
+        assert self._models is not None
+        return self._models
+
+    def get(self, name: str) -> Optional[ModelInfo]:
+        return self.catalog().get(name)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.catalog()
+
+    def suggest(self, name: str, n: int = 3) -> List[str]:
+        r"""Up to ``n`` known model names closest to ``name``."""
+        catalog = self.catalog()
+        suggestions = difflib.get_close_matches(name, catalog, n=n, cutoff=0.6)
+        if len(suggestions) < n and "/" not in name:
+            # A bare model name often lacks its provider prefix.
+            bare = {k.rsplit("/", 1)[-1]: k for k in catalog}
+            for match in difflib.get_close_matches(name, bare, n=n, cutoff=0.6):
+                if bare[match] not in suggestions:
+                    suggestions.append(bare[match])
+        return suggestions[:n]
+
+    def _refresh_for_miss(self, catalog: Dict[str, ModelInfo], model: Any) -> bool:
+        r"""Whether a name in ``model`` is unknown and a refresh for it is due now."""
+        if all(name in catalog for name in model_names(model)):
+            return False
+        now = time.monotonic()
+        with self._refresh_lock:
+            if (
+                now - self._miss_refreshed_at < self.miss_refresh_interval
+                or time.time() - self._fetched_at < self.miss_refresh_interval
+            ):
+                return False
+            self._miss_refreshed_at = now
+        return True
+
+    def _check(self, catalog: Dict[str, ModelInfo], model: Any) -> List[ModelInfo]:
+        infos = []
+        for name in model_names(model):
+            info = catalog.get(name)
+            if info is None:
+                raise UnknownModelError(name, self.suggest(name))
+            infos.append(info)
+        return infos
+
+    def validate(self, model: Any) -> List[ModelInfo]:
+        r"""Check every name in a ``TModel`` value against the catalog.
+
+        An unknown name forces a refresh first, at most once per
+        ``miss_refresh_interval``.
+
+        :param model: A model name, ``Model``, dict with ``name``, or fallback list
+        :raises UnknownModelError: For the first name not in the catalog, with suggestions
+        :return: The catalog entries of the names, in order
+        """
+        catalog = self.catalog()
+        if self._refresh_for_miss(catalog, model):
+            try:
+                self.refresh()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Judge the name against the catalog already loaded.
+                pass
+            catalog = self.catalog()
+        return self._check(catalog, model)
+
+    async def validate_async(self, model: Any) -> List[ModelInfo]:
+        r"""Async counterpart of :meth:`validate`."""
+        catalog = await self.catalog_async()
+        if self._refresh_for_miss(catalog, model):
+            try:
+                await self.refresh_async()
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Judge the name against the catalog already loaded.
+                pass
+            catalog = await self.catalog_async()
+        return self._check(catalog, model)
+
+    def find(
+        self,
+        *,
+        kind: Optional[str] = None,
+        hosting_provider: Optional[str] = None,
+        location: Optional[str] = None,
+        where: Optional[Callable[[ModelInfo], bool]] = None,
+    ) -> List[ModelInfo]:
+        r"""Catalog entries matching every given criterion, for routing without a request."""
+        return [
+            info
+            for info in self.catalog().values()
+            if (kind is None or info.kind == kind)
+            and (hosting_provider is None or info.hosting_provider == hosting_provider)
+            and (location is None or info.location == location)
+            and (where is None or where(info))
+        ]
+
+
+def _request_model(request: httpx.Request) -> Any:
+    try:
+        body = json.loads(request.content)
+    except ValueError:
+        return None
+    return body.get("model") if isinstance(body, dict) else None
+
+
+class ModelValidationMiddleware(RequestMiddleware):
+    r"""Rejects calls whose ``model`` is not in the catalog before they are sent.
+
+    :param catalog: The catalog to validate against
+    """
+
+    def __init__(self, catalog: ModelCatalog) -> None:
+        self.catalog = catalog
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        if getattr(hook_ctx, "operation_id", "") in MODEL_OPERATIONS:
+            self.catalog.validate(_request_model(request))
+        return call_next()
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        if getattr(hook_ctx, "operation_id", "") in MODEL_OPERATIONS:
+            await self.catalog.validate_async(_request_model(request))
+        return await call_next()
+
+
+def validate_models(
+    client: "Opper", catalog: ModelCatalog
+) -> ModelValidationMiddleware:
+    r"""Check the ``model`` of every ``call`` and ``stream`` against ``catalog`` before sending.
+
+    A call naming an unknown model raises :class:`UnknownModelError` without
+    the call being sent.
+
+    :param client: The Opper client
+    :param catalog: The catalog to validate against
+    :return: The installed middleware, for :func:`remove_middleware`
+    """
+    middleware = ModelValidationMiddleware(catalog)
+    add_middleware(client, middleware)
+    return middleware
@@ -0,0 +1,260 @@
+"""Concurrent fan-out of knowledge base queries with result fusion."""
+
+import asyncio
+import dataclasses
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from opperai import models, utils
+from opperai.types import OptionalNullable, UNSET
+
+from .query_cache import normalize_query
+from .singleflight import AsyncSingleFlight, SingleFlight
+
+if TYPE_CHECKING:
+    from opperai.knowledge import Knowledge
+
+
+DEFAULT_RRF_K = 60
+"""Rank offset of reciprocal-rank fusion; larger values flatten the weight of top ranks."""
+
+
+@dataclass
+class KnowledgeQuery:
+    query: str
+    knowledge_base_id: Optional[str] = None
+    r"""Knowledge base to query, defaults to the one passed to ``query_many``."""
+    top_k: int = 3
+    prefilter_limit: int = 10
+    filters: Optional[List[models.Filter]] = None
+    rerank: bool = True
+
+
+KnowledgeQueryLike = Union[KnowledgeQuery, Mapping[str, Any], str]
+
+
+@dataclass
+class FusedDocument:
+    document: models.QueryKnowledgeBaseResponse
+    knowledge_base_id: str
+    score: float
+    r"""Reciprocal-rank fusion score summed over the queries that returned the document."""
+    queries: List[int] = field(default_factory=list)
+    r"""Indexes of the queries that returned the document."""
+
+
+@dataclass
+class QueryOutcome:
+    query: KnowledgeQuery
+    results: List[models.QueryKnowledgeBaseResponse]
+    latency: float
+    r"""Seconds from when the query started until its results were available."""
+    shared: bool = False
+    r"""Whether the results came from an identical query already in flight."""
+    error: Optional[Exception] = None
+
+
+@dataclass
+class MultiQueryResult:
+    outcomes: List[QueryOutcome]
+    fused: List[FusedDocument]
+
+    @property
+    def latencies(self) -> List[float]:
+        return [o.latency for o in self.outcomes]
+
+    @property
+    def requests_sent(self) -> int:
+        return sum(1 for o in self.outcomes if not o.shared)
+
+    @property
+    def errors(self) -> List[Tuple[int, Exception]]:
+        return [(i, o.error) for i, o in enumerate(self.outcomes) if o.error is not None]
+
+
+def _coerce(query: KnowledgeQueryLike, knowledge_base_id: Optional[str]) -> KnowledgeQuery:
+    if isinstance(query, str):
+        query = KnowledgeQuery(query=query)
+    elif isinstance(query, KnowledgeQuery):
+        query = dataclasses.replace(query)
+    else:
+        query = KnowledgeQuery(**query)
+    if query.filters:
+        query.filters = [utils.get_pydantic_model(f, models.Filter) for f in query.filters]
+    if query.knowledge_base_id is None:
+        if knowledge_base_id is None:
+            raise ValueError(f"no knowledge_base_id for query {query.query!r}")
+        query.knowledge_base_id = knowledge_base_id
+    return query
+
+
+def _flight_key(query: KnowledgeQuery) -> Tuple[Any, ...]:
+    filters = sorted(
+        json.dumps(f.model_dump(by_alias=True), sort_keys=True, default=str)
+        for f in query.filters or ()
+    )
+    return (
+        query.knowledge_base_id,
+        normalize_query(query.query),
+        tuple(filters),
+        query.top_k,
+        query.prefilter_limit,
+        query.rerank,
+    )
+
+
+def fuse(
+    outcomes: Sequence[QueryOutcome],
+    *,
+    rrf_k: int = DEFAULT_RRF_K,
+    dedupe_by: Literal["id", "key"] = "id",
+) -> List[FusedDocument]:
+    r"""Merge query results with reciprocal-rank fusion.
+
+    Each document scores ``1 / (rrf_k + rank)`` for every query that returned
+    it, with ``rank`` starting at 1; repeated identical queries count once.
+    Documents are deduplicated per knowledge base by ``id``, or by ``key`` to
+    collapse chunks of the same document, and returned best first.
+    """
+    fused: Dict[Tuple[str, str], FusedDocument] = {}
+    seen_queries = set()
+    for index, outcome in enumerate(outcomes):
+        kb_id = str(outcome.query.knowledge_base_id)
+        repeated = _flight_key(outcome.query) in seen_queries
+        seen_queries.add(_flight_key(outcome.query))
+        for rank, doc in enumerate(outcome.results, start=1):
+            ident = (kb_id, doc.key if dedupe_by == "key" else doc.id)
+            entry = fused.get(ident)
+            if entry is None:
+                entry = fused[ident] = FusedDocument(doc, kb_id, 0.0)
+            if not repeated:
+                entry.score += 1.0 / (rrf_k + rank)
+            if index not in entry.queries:
+                entry.queries.append(index)
+    return sorted(fused.values(), key=lambda d: d.score, reverse=True)
+
+
+def _flights(knowledge: "Knowledge", name: str, factory):
+    config = knowledge.sdk_configuration.__dict__
+    flights = config.get(name)
+    if flights is None:
+        flights = config.setdefault(name, factory())
+    return flights
+
+
+def query_many(
+    knowledge: "Knowledge",
+    queries: Sequence[KnowledgeQueryLike],
+    *,
+    knowledge_base_id: Optional[str] = None,
+    concurrency: int = 8,
+    rrf_k: int = DEFAULT_RRF_K,
+    dedupe_by: Literal["id", "key"] = "id",
+    return_exceptions: bool = False,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    timeout_ms: Optional[int] = None,
+) -> MultiQueryResult:
+    r"""Run several knowledge base queries concurrently and fuse their results.
+
+    Identical queries, in this call or in any other ``query_many`` running on
+    the same client, share a single request while it is in flight.
+
+    :param knowledge: The client's knowledge SDK, ``client.knowledge``
+    :param queries: Query strings, :class:`KnowledgeQuery` objects or mappings of their fields
+    :param knowledge_base_id: Knowledge base for queries that do not name one
+    :param concurrency: Maximum number of requests in flight
+    :param rrf_k: Rank offset used by reciprocal-rank fusion
+    :param dedupe_by: Document field that identifies duplicates when fusing
+    :param return_exceptions: Record failed queries in the result instead of raising
+    :param retries: Override the default retry configuration for each query
+    :param timeout_ms: Request timeout in milliseconds
+    """
+    specs = [_coerce(q, knowledge_base_id) for q in queries]
+    flights: SingleFlight = _flights(knowledge, "_query_many_flights", SingleFlight)
+
+    def run(query: KnowledgeQuery) -> QueryOutcome:
+        start = time.monotonic()
+        try:
+            results, shared = flights.do(
+                _flight_key(query),
+                lambda: knowledge.query(
+                    knowledge_base_id=str(query.knowledge_base_id),
+                    query=query.query,
+                    top_k=query.top_k,
+                    prefilter_limit=query.prefilter_limit,
+                    filters=query.filters if query.filters else UNSET,
+                    rerank=query.rerank,
+                    retries=retries,
+                    timeout_ms=timeout_ms,
+                ),
+            )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if not return_exceptions:
+                raise
+            return QueryOutcome(query, [], time.monotonic() - start, error=e)
+        return QueryOutcome(query, results, time.monotonic() - start, shared)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(specs)))) as pool:
+        outcomes = list(pool.map(run, specs))
+    return MultiQueryResult(outcomes, fuse(outcomes, rrf_k=rrf_k, dedupe_by=dedupe_by))
+
+
+async def query_many_async(
+    knowledge: "Knowledge",
+    queries: Sequence[KnowledgeQueryLike],
+    *,
+    knowledge_base_id: Optional[str] = None,
+    concurrency: int = 8,
+    rrf_k: int = DEFAULT_RRF_K,
+    dedupe_by: Literal["id", "key"] = "id",
+    return_exceptions: bool = False,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    timeout_ms: Optional[int] = None,
+) -> MultiQueryResult:
+    r"""Async counterpart of :func:`query_many`."""
+    specs = [_coerce(q, knowledge_base_id) for q in queries]
+    flights: AsyncSingleFlight = _flights(
+        knowledge, "_query_many_flights_async", AsyncSingleFlight
+    )
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(query: KnowledgeQuery) -> QueryOutcome:
+        start = time.monotonic()
+        try:
+
+            async def send() -> List[models.QueryKnowledgeBaseResponse]:
+                async with semaphore:
+                    return await knowledge.query_async(
+                        knowledge_base_id=str(query.knowledge_base_id),
+                        query=query.query,
+                        top_k=query.top_k,
+                        prefilter_limit=query.prefilter_limit,
+                        filters=query.filters if query.filters else UNSET,
+                        rerank=query.rerank,
+                        retries=retries,
+                        timeout_ms=timeout_ms,
+                    )
+
+            results, shared = await flights.do(_flight_key(query), send)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if not return_exceptions:
+                raise
+            return QueryOutcome(query, [], time.monotonic() - start, error=e)
+        return QueryOutcome(query, results, time.monotonic() - start, shared)
+
+    outcomes = list(await asyncio.gather(*(run(q) for q in specs)))
+    return MultiQueryResult(outcomes, fuse(outcomes, rrf_k=rrf_k, dedupe_by=dedupe_by))
@@ -0,0 +1,226 @@
+"""Run CPU-bound work in a process pool without blocking the event loop."""
+
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_CPU_BOUND_ATTR = "__opper_cpu_bound__"
+
+# ProcessPoolExecutor refuses more than 61 workers on Windows.
+_WINDOWS_MAX_WORKERS = 61
+
+
+def cpu_bound(fn: Callable[..., R]) -> Callable[..., R]:
+    r"""Mark ``fn`` as CPU bound so helpers run it in a process pool.
+
+    The function is returned unchanged, so it stays picklable by reference and
+    can still be called directly.
+    """
+    setattr(fn, _CPU_BOUND_ATTR, True)
+    return fn
+
+
+def is_cpu_bound(fn: Callable[..., Any]) -> bool:
+    return bool(getattr(fn, _CPU_BOUND_ATTR, False))
+
+
+def default_pool_size(reserve: int = 1) -> int:
+    r"""Number of worker processes to use on this machine.
+
+    Uses the CPUs available to this process (respecting affinity masks where the
+    platform exposes them) and keeps ``reserve`` cores free for the event loop
+    and the HTTP client.
+    """
+    count: Optional[int] = None
+    process_cpu_count = getattr(os, "process_cpu_count", None)
+    if process_cpu_count is not None:
+        count = process_cpu_count()
+    elif hasattr(os, "sched_getaffinity"):
+        count = len(os.sched_getaffinity(0))
+    if not count:
+        count = os.cpu_count() or 1
+
+    size = max(1, count - reserve)
+    if sys.platform == "win32":
+        size = min(size, _WINDOWS_MAX_WORKERS)
+    return size
+
+
+def to_payload(value: Any) -> Any:
+    r"""Convert SDK models into plain, picklable data.
+
+    Models are dumped by alias with unset optional fields dropped, which also
+    avoids shipping the ``UNSET`` sentinel, whose identity does not survive
+    pickling. Mappings and sequences are converted recursively.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    if isinstance(value, Mapping):
+        return {k: to_payload(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_payload(v) for v in value]
+    return value
+
+
+def _run_chunk(fn: Callable[..., R], chunk: Sequence[Tuple[Any, ...]]) -> List[R]:
+    return [fn(*args) for args in chunk]
+
+
+def chunk_size_for(items: int, workers: int) -> int:
+    r"""Chunk size that gives each worker about four chunks."""
+    if items <= 0:
+        return 1
+    chunks, extra = divmod(items, workers * 4)
+    return chunks + 1 if extra else max(chunks, 1)
+
+
+class CPUExecutor:
+    r"""A lazily started, shared ``ProcessPoolExecutor`` for CPU-bound callables.
+
+    Results are routed back to the awaiting coroutine through
+    ``asyncio.wrap_future`` so the event loop keeps serving in-flight requests
+    while the work runs. Arguments and results must be picklable; use
+    :func:`to_payload` to derive plain data from SDK responses.
+
+    :param max_workers: Number of worker processes, defaults to :func:`default_pool_size`
+    :param mp_context: Optional multiprocessing context, e.g. ``get_context("spawn")``
+    """
+
+    def __init__(
+        self, max_workers: Optional[int] = None, mp_context: Optional[Any] = None
+    ) -> None:
+        self.max_workers = max_workers or default_pool_size()
+        self._mp_context = mp_context
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=self._mp_context
+                )
+            return self._pool
+
+    def submit(self, fn: Callable[..., R], *args: Any) -> "Future[R]":
+        return self.pool.submit(fn, *args)
+
+    async def run(self, fn: Callable[..., R], *args: Any) -> R:
+        r"""Run ``fn(*args)`` in the pool and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    async def map(
+        self,
+        fn: Callable[..., R],
+        *iterables: Iterable[Any],
+        chunksize: Optional[int] = None,
+    ) -> List[R]:
+        r"""Apply ``fn`` across ``iterables`` in chunks and return results in order.
+
+        Submitting chunks instead of single items amortizes the pickling and IPC
+        cost for cheap callables.
+
+        :param fn: A picklable callable
+        :param iterables: Argument iterables, zipped like the builtin ``map``
+        :param chunksize: Items per submitted task, defaults to :func:`chunk_size_for`
+        """
+        args = list(zip(*iterables))
+        if not args:
+            return []
+        if chunksize is None:
+            chunksize = chunk_size_for(len(args), self.max_workers)
+
+        futures = [
+            asyncio.wrap_future(
+                self.submit(_run_chunk, fn, args[i : i + chunksize])
+            )
+            for i in range(0, len(args), chunksize)
+        ]
+        results: List[R] = []
+        for chunk in await asyncio.gather(*futures):
+            results.extend(chunk)
+        return results
+
+    def map_sync(
+        self,
+        fn: Callable[..., R],
+        *iterables: Iterable[Any],
+        chunksize: Optional[int] = None,
+    ) -> List[R]:
+        r"""Blocking counterpart of :meth:`map` for synchronous callers."""
+        args = list(zip(*iterables))
+        if not args:
+            return []
+        if chunksize is None:
+            chunksize = chunk_size_for(len(args), self.max_workers)
+        futures = [
+            self.submit(_run_chunk, fn, args[i : i + chunksize])
+            for i in range(0, len(args), chunksize)
+        ]
+        results: List[R] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def __enter__(self) -> "CPUExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown()
+
+    async def __aenter__(self) -> "CPUExecutor":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+
+
+_default_executor: Optional[CPUExecutor] = None
+_default_lock = threading.Lock()
+
+
+def get_cpu_executor() -> CPUExecutor:
+    r"""Return the process-wide :class:`CPUExecutor`, creating it on first use."""
+    global _default_executor  # pylint: disable=global-statement
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = CPUExecutor()
+        return _default_executor
+
+
+async def offload(fn: Callable[..., R], *args: Any) -> R:
+    r"""Await ``fn(*args)`` without blocking the event loop.
+
+    Callables marked with :func:`cpu_bound` run in the shared process pool with
+    their arguments converted by :func:`to_payload`; anything else runs in the
+    loop's default thread pool.
+    """
+    if is_cpu_bound(fn):
+        payload = [to_payload(a) for a in args]
+        return await get_cpu_executor().run(fn, *payload)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
@@ -0,0 +1,162 @@
+"""Lazy, concurrent iteration over the items of paginated list endpoints."""
+
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+_FETCH = "fetch"
+_WAIT = "wait"
+_EMIT = "emit"
+
+_Action = Tuple[str, Any]
+
+
+def _plan(
+    page_size: int, window: int, max_items: Optional[int]
+) -> Generator[_Action, Any, None]:
+    r"""The paging logic shared by :func:`paginate` and :func:`paginate_async`.
+
+    Yields ``(fetch, (offset, limit))`` to start a request, ``(wait, offset)``
+    to be sent back that request's page, and ``(emit, item)`` for each item
+    in order. The drivers only carry out the requests.
+    """
+    yield _FETCH, (0, page_size)
+    page = yield _WAIT, 0
+    data = list(page.data)
+    total = page.meta.total_count
+    if max_items is not None:
+        total = min(total, max_items)
+    # A server that caps ``limit`` returns shorter pages; step by what it returned.
+    step = len(data)
+    offsets = list(range(step, total, step)) if step else []
+    # The next pages are requested before the first page's items are consumed.
+    started = min(window, len(offsets))
+    for offset in offsets[:started]:
+        yield _FETCH, (offset, step)
+    for item in data[:total]:
+        yield _EMIT, item
+    for position, offset in enumerate(offsets):
+        page = yield _WAIT, offset
+        if started < len(offsets) and started < position + 1 + window:
+            yield _FETCH, (offsets[started], step)
+            started += 1
+        for item in list(page.data)[: total - offset]:
+            yield _EMIT, item
+
+
+def _check(page_size: int, concurrency: int) -> None:
+    if page_size < 1:
+        raise ValueError("page_size must be at least 1")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+
+def paginate(
+    list_page: Callable[..., Any],
+    *,
+    page_size: int = 100,
+    concurrency: int = 4,
+    max_items: Optional[int] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    **kwargs: Any,
+) -> Iterator[Any]:
+    r"""Yield every item of a paginated list endpoint, in order.
+
+    The first page is fetched on its own. Its ``meta.total_count`` then fixes
+    the remaining offsets, which are fetched on a pool of ``concurrency``
+    threads, at most ``concurrency`` pages ahead of the one being consumed.
+    Items are yielded as soon as their page and every earlier page have
+    arrived. Offsets are planned from the first page's count, so items added
+    while iterating may be missed and removed ones may shift others.
+
+    Works with any method taking ``offset`` and ``limit`` and returning a
+    ``PaginatedResponse*``, e.g. ``client.functions.list`` or
+    ``client.knowledge.list_files``.
+
+    :param list_page: The list method to call
+    :param page_size: ``limit`` of each request
+    :param concurrency: Maximum number of pages requested ahead
+    :param max_items: Stop after this many items
+    :param executor: Thread pool to fetch on; one is created for the iteration by default
+    :param kwargs: Other arguments for every call, e.g. ``knowledge_base_id``
+    """
+    _check(page_size, concurrency)
+
+    def fetch(offset: int, limit: int) -> Any:
+        return list_page(offset=offset, limit=limit, **kwargs)
+
+    pool = executor or ThreadPoolExecutor(max_workers=concurrency)
+    pending: Dict[int, "Future[Any]"] = {}
+    plan = _plan(page_size, concurrency, max_items)
+    try:
+        reply = None
+        while True:
+            try:
+                action, arg = plan.send(reply)
+            except StopIteration:
+                return
+            reply = None
+            if action == _FETCH:
+                pending[arg[0]] = pool.submit(fetch, *arg)
+            elif action == _WAIT:
+                reply = pending.pop(arg).result()
+            else:
+                yield arg
+    finally:
+        for future in pending.values():
+            future.cancel()
+        if executor is None:
+            pool.shutdown(wait=False)
+
+
+async def paginate_async(
+    list_page: Callable[..., Awaitable[Any]],
+    *,
+    page_size: int = 100,
+    concurrency: int = 4,
+    max_items: Optional[int] = None,
+    **kwargs: Any,
+) -> AsyncIterator[Any]:
+    r"""Async counterpart of :func:`paginate`, for ``*_async`` list methods.
+
+    Pages ahead of the one being consumed are fetched as tasks on the running
+    event loop.
+    """
+    _check(page_size, concurrency)
+    pending: Dict[int, "asyncio.Task[Any]"] = {}
+    plan = _plan(page_size, concurrency, max_items)
+    try:
+        reply = None
+        while True:
+            try:
+                action, arg = plan.send(reply)
+            except StopIteration:
+                return
+            reply = None
+            if action == _FETCH:
+                offset, limit = arg
+                pending[offset] = asyncio.ensure_future(
+                    list_page(offset=offset, limit=limit, **kwargs)
+                )
+            elif action == _WAIT:
+                reply = await pending.pop(arg)
+            else:
+                yield arg
+    finally:
+        for task in pending.values():
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending.values(), return_exceptions=True)
@@ -0,0 +1,118 @@
+"""Bounded-concurrency pipelines over sync and async iterables."""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+async def aiter_items(source: Union[Iterable[T], AsyncIterable[T]]) -> AsyncIterator[T]:
+    r"""Iterate a sync or async iterable from a coroutine."""
+    if hasattr(source, "__aiter__"):
+        async for item in source:  # type: ignore[union-attr]
+            yield item
+    else:
+        for item in source:  # type: ignore[union-attr]
+            yield item
+
+
+async def run_bounded_async(
+    source: Union[Iterable[T], AsyncIterable[T]],
+    worker: Callable[[T], Awaitable[Any]],
+    concurrency: int,
+    queue_size: Optional[int] = None,
+) -> None:
+    r"""Feed ``source`` through ``worker`` with at most ``concurrency`` calls in flight.
+
+    Items are pulled from ``source`` only as fast as workers take them, through a
+    queue of ``queue_size`` items (default ``2 * concurrency``), so memory stays
+    bounded however large the source is. The first exception raised by a worker
+    or by the source cancels the pipeline and is re-raised.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    queue: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=queue_size or concurrency * 2)
+
+    async def produce() -> None:
+        async for item in aiter_items(source):
+            await queue.put(item)
+        # Only on exhaustion: after a failure every task is cancelled instead,
+        # and waiting for room in a full queue would never end.
+        for _ in range(concurrency):
+            await queue.put(_DONE)
+
+    async def consume() -> None:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            await worker(item)
+
+    tasks = [asyncio.ensure_future(produce())]
+    tasks.extend(asyncio.ensure_future(consume()) for _ in range(concurrency))
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_bounded(
+    source: Iterable[T],
+    worker: Callable[[T], Any],
+    concurrency: int,
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> None:
+    r"""Thread-pool counterpart of :func:`run_bounded_async`.
+
+    At most ``concurrency`` items are submitted at a time; the source is not
+    advanced until a slot frees up. The first worker exception stops
+    submission and is re-raised once in-flight work has finished.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    slots = threading.BoundedSemaphore(concurrency)
+    errors: List[BaseException] = []
+
+    def done(future: "Future[Any]") -> None:
+        error = future.exception()
+        if error is not None:
+            errors.append(error)
+        slots.release()
+
+    pool = executor or ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        for item in source:
+            slots.acquire()
+            if errors:
+                slots.release()
+                break
+            pool.submit(worker, item).add_done_callback(done)
+        # Wait for every in-flight item by taking all of the slots back.
+        for _ in range(concurrency):
+            slots.acquire()
+        for _ in range(concurrency):
+            slots.release()
+    finally:
+        if executor is None:
+            pool.shutdown(wait=True)
+
+    if errors:
+        raise errors[0]
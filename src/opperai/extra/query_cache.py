@@ -0,0 +1,338 @@
+"""Client-side cache for knowledge base query results."""
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import httpx
+
+from .middleware import CallNext, CallNextAsync, RequestMiddleware, add_middleware
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+QUERY_OPERATION = "query_knowledge_base_knowledge__knowledge_base_id__query_post"
+
+INVALIDATING_OPERATIONS = frozenset(
+    {
+        "add_knowledge__knowledge_base_id__add_post",
+        "upload_file_knowledge__knowledge_base_id__upload_post",
+        "register_file_upload_knowledge__knowledge_base_id__register_file_post",
+        "delete_documents_knowledge__knowledge_base_id__query_delete",
+        "delete_file_from_knowledge_base_knowledge__knowledge_base_id__files__file_id__delete",
+        "delete_knowledge_base_knowledge__knowledge_base_id__delete",
+    }
+)
+"""Operations that change a knowledge base's contents and drop its cached queries."""
+
+_KNOWLEDGE_BASE_PATH = re.compile(r"/knowledge/([^/]+)(?:/|$)")
+
+_WHITESPACE = re.compile(r"\s+")
+
+_QUERY_DEFAULTS = {"prefilter_limit": 10, "top_k": 3, "rerank": True}
+
+
+def normalize_query(query: str, *, casefold: bool = False) -> str:
+    r"""Normalize a query string for use in a cache key.
+
+    Unicode is NFC-normalized and runs of whitespace are collapsed to a single
+    space; with ``casefold`` the query is also case-folded.
+    """
+    query = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", query)).strip()
+    return query.casefold() if casefold else query
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _knowledge_base_id(request: httpx.Request) -> Optional[str]:
+    match = _KNOWLEDGE_BASE_PATH.search(request.url.path)
+    if match is None or match.group(1) == "by-name":
+        return None
+    return match.group(1)
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class _Entry(NamedTuple):
+    knowledge_base_id: str
+    status_code: int
+    headers: List[Tuple[str, str]]
+    content: bytes
+    expires_at: float
+    size: int
+
+
+class KnowledgeQueryCache(RequestMiddleware):
+    r"""Caches ``knowledge.query`` responses on the client.
+
+    Entries are keyed by knowledge base id, normalized query text, filters,
+    ``top_k``, ``prefilter_limit`` and ``rerank``, expire after ``ttl`` seconds,
+    and are evicted least recently used first once their total size exceeds
+    ``max_bytes``. Any ``add``, ``upload_file``, ``register_file_upload``,
+    ``delete_documents``, ``delete_file`` or ``delete_knowledge_base`` sent
+    through the same client drops the cached queries of that knowledge base,
+    and query responses that were in flight while it ran are not stored.
+
+    Install it with :func:`enable_query_cache`.
+
+    :param ttl: Seconds a cached response stays valid
+    :param max_bytes: Upper bound on the total size of cached responses
+    :param casefold: Treat queries that differ only in case as the same query
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = 300.0,
+        max_bytes: int = 32 * 1024 * 1024,
+        casefold: bool = False,
+    ) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.casefold = casefold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys_by_kb: Dict[str, Set[str]] = {}
+        self._generations: Dict[str, int] = {}
+        self._stats = QueryCacheStats()
+
+    def cache_key(self, request: httpx.Request) -> Optional[Tuple[str, str]]:
+        r"""The knowledge base id and cache key of a query request, if cacheable."""
+        kb_id = _knowledge_base_id(request)
+        if kb_id is None:
+            return None
+        try:
+            body = json.loads(request.content or b"{}")
+        except ValueError:
+            return None
+        if not isinstance(body, dict) or not isinstance(body.get("query"), str):
+            return None
+        filters = body.get("filters") or []
+        key = {
+            "knowledge_base_id": kb_id,
+            "query": normalize_query(body["query"], casefold=self.casefold),
+            # Filters are combined with AND, so their order does not matter.
+            "filters": sorted(_canonical_json(f) for f in filters),
+        }
+        for name, default in _QUERY_DEFAULTS.items():
+            value = body.get(name)
+            key[name] = default if value is None else value
+        return kb_id, _canonical_json(key)
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                self._stats.expirations += 1
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+            return entry
+
+    def put(
+        self, kb_id: str, key: str, response: httpx.Response, generation: int
+    ) -> None:
+        content = response.content
+        headers = list(response.headers.multi_items())
+        size = len(content) + len(key) + sum(len(k) + len(v) for k, v in headers)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(kb_id, 0) != generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(
+                kb_id,
+                response.status_code,
+                headers,
+                content,
+                time.monotonic() + self.ttl,
+                size,
+            )
+            self._keys_by_kb.setdefault(kb_id, set()).add(key)
+            self._stats.size_bytes += size
+            self._stats.stores += 1
+            while self._stats.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._stats.size_bytes -= entry.size
+        keys = self._keys_by_kb.get(entry.knowledge_base_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_kb[entry.knowledge_base_id]
+
+    def generation(self, kb_id: str) -> int:
+        with self._lock:
+            return self._generations.get(kb_id, 0)
+
+    def _begin_write(self, kb_id: str) -> None:
+        # Queries already in flight may finish before or after the write lands,
+        # so their responses must not be stored.
+        with self._lock:
+            self._generations[kb_id] = self._generations.get(kb_id, 0) + 1
+
+    def invalidate(self, knowledge_base_id: Optional[str] = None) -> None:
+        r"""Drop the cached queries of one knowledge base, or of all of them."""
+        with self._lock:
+            if knowledge_base_id is None:
+                kb_ids = set(self._keys_by_kb) | set(self._generations)
+            else:
+                kb_ids = {knowledge_base_id}
+            for kb_id in kb_ids:
+                self._generations[kb_id] = self._generations.get(kb_id, 0) + 1
+                for key in list(self._keys_by_kb.get(kb_id, ())):
+                    self._drop(key)
+            self._stats.invalidations += 1
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> QueryCacheStats:
+        r"""A snapshot of the cache's counters."""
+        with self._lock:
+            return QueryCacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                stores=self._stats.stores,
+                evictions=self._stats.evictions,
+                expirations=self._stats.expirations,
+                invalidations=self._stats.invalidations,
+                entries=len(self._entries),
+                size_bytes=self._stats.size_bytes,
+            )
+
+    def _replay(self, entry: _Entry, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            entry.status_code,
+            headers=entry.headers,
+            content=entry.content,
+            request=request,
+        )
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        operation_id = hook_ctx.operation_id
+        if operation_id in INVALIDATING_OPERATIONS:
+            kb_id = _knowledge_base_id(request)
+            if kb_id is None:
+                return call_next()
+            self._begin_write(kb_id)
+            try:
+                return call_next()
+            finally:
+                self.invalidate(kb_id)
+
+        cache_key = (
+            self.cache_key(request)
+            if operation_id == QUERY_OPERATION and not stream
+            else None
+        )
+        if cache_key is None:
+            return call_next()
+        kb_id, key = cache_key
+        entry = self.get(key)
+        if entry is not None:
+            return self._replay(entry, request)
+        generation = self.generation(kb_id)
+        response = call_next()
+        if 200 <= response.status_code < 300:
+            self.put(kb_id, key, response, generation)
+        return response
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        operation_id = hook_ctx.operation_id
+        if operation_id in INVALIDATING_OPERATIONS:
+            kb_id = _knowledge_base_id(request)
+            if kb_id is None:
+                return await call_next()
+            self._begin_write(kb_id)
+            try:
+                return await call_next()
+            finally:
+                self.invalidate(kb_id)
+
+        cache_key = (
+            self.cache_key(request)
+            if operation_id == QUERY_OPERATION and not stream
+            else None
+        )
+        if cache_key is None:
+            return await call_next()
+        kb_id, key = cache_key
+        entry = self.get(key)
+        if entry is not None:
+            return self._replay(entry, request)
+        generation = self.generation(kb_id)
+        response = await call_next()
+        if 200 <= response.status_code < 300:
+            self.put(kb_id, key, response, generation)
+        return response
+
+
+def enable_query_cache(
+    client: "Opper",
+    *,
+    ttl: float = 300.0,
+    max_bytes: int = 32 * 1024 * 1024,
+    casefold: bool = False,
+) -> KnowledgeQueryCache:
+    r"""Cache ``knowledge.query`` results for ``client`` and return the cache.
+
+    :param client: The Opper client
+    :param ttl: Seconds a cached response stays valid
+    :param max_bytes: Upper bound on the total size of cached responses
+    :param casefold: Treat queries that differ only in case as the same query
+    """
+    cache = KnowledgeQueryCache(ttl=ttl, max_bytes=max_bytes, casefold=casefold)
+    add_middleware(client, cache)
+    return cache
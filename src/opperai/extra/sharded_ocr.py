@@ -0,0 +1,386 @@
+"""OCR of large documents split into page ranges processed concurrently."""
+
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+)
+
+from opperai import models, utils
+from opperai.types import OptionalNullable, UNSET
+
+if TYPE_CHECKING:
+    from opperai.ocr import Ocr
+
+
+DEFAULT_PAGES_PER_SHARD = 10
+
+
+@dataclass
+class ShardedOCRResponse:
+    r"""OCR results merged across page shards, with ``pages`` in ``index`` order."""
+
+    pages: List[models.OCRPageResult]
+    model: str
+    usage_info: models.OCRUsageInfo
+    cost: Optional[models.OCRCost]
+    responses: List[models.OCRResponseModel] = field(repr=False)
+    r"""One response per shard, in shard order."""
+    attempts: int = 0
+    r"""Requests sent, including retries of failed shards."""
+
+
+def page_shards(pages: Sequence[int], pages_per_shard: int) -> List[List[int]]:
+    r"""Split page indexes into consecutive shards of at most ``pages_per_shard`` pages."""
+    if pages_per_shard < 1:
+        raise ValueError("pages_per_shard must be at least 1")
+    ordered = sorted(set(pages))
+    return [
+        ordered[i : i + pages_per_shard]
+        for i in range(0, len(ordered), pages_per_shard)
+    ]
+
+
+def merge_ocr_responses(
+    responses: Sequence[models.OCRResponseModel], attempts: int = 0
+) -> ShardedOCRResponse:
+    r"""Merge shard responses: pages sorted by index, usage and cost summed."""
+    pages = sorted(
+        (page for response in responses for page in response.pages),
+        key=lambda p: p.index,
+    )
+    sizes = [
+        r.usage_info.doc_size_bytes
+        for r in responses
+        if isinstance(r.usage_info.doc_size_bytes, int)
+    ]
+    usage_info = models.OCRUsageInfo(
+        pages_processed=sum(r.usage_info.pages_processed for r in responses),
+        # Every shard reports the size of the same source document.
+        doc_size_bytes=max(sizes) if sizes else UNSET,
+    )
+    costs = [r.cost for r in responses if isinstance(r.cost, models.OCRCost)]
+    cost = None
+    if costs:
+        cost = models.OCRCost(
+            generation=sum(c.generation for c in costs),
+            platform=sum(c.platform for c in costs),
+            total=sum(c.total for c in costs),
+        )
+    return ShardedOCRResponse(
+        pages=pages,
+        model=responses[0].model if responses else "",
+        usage_info=usage_info,
+        cost=cost,
+        responses=list(responses),
+        attempts=attempts,
+    )
+
+
+class _Progress:
+    r"""Bookkeeping shared by the sync and async shard runners."""
+
+    def __init__(self, shards: List[List[int]], ordered: bool, max_attempts: int):
+        self.shards = shards
+        self.ordered = ordered
+        self.max_attempts = max(1, max_attempts)
+        self.responses: List[Optional[models.OCRResponseModel]] = [None] * len(shards)
+        self.failures = [0] * len(shards)
+        self.attempts = 0
+        self._next = 0
+
+    def failed(self, shard: int, error: BaseException) -> None:
+        self.failures[shard] += 1
+        if self.failures[shard] >= self.max_attempts:
+            raise error
+
+    def completed(
+        self, shard: int, response: models.OCRResponseModel
+    ) -> List[models.OCRPageResult]:
+        r"""Record a shard's response and return the pages now ready to yield."""
+        self.responses[shard] = response
+        if not self.ordered:
+            return sorted(response.pages, key=lambda p: p.index)
+        ready: List[models.OCRPageResult] = []
+        while self._next < len(self.shards) and self.responses[self._next] is not None:
+            done = self.responses[self._next]
+            assert done is not None
+            ready.extend(sorted(done.pages, key=lambda p: p.index))
+            self._next += 1
+        return ready
+
+    def result(self) -> ShardedOCRResponse:
+        return merge_ocr_responses(
+            [r for r in self.responses if r is not None], self.attempts
+        )
+
+
+def _request_kwargs(
+    model: str,
+    document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+    include_image_base64: Optional[bool],
+    image_limit: OptionalNullable[int],
+    image_min_size: OptionalNullable[int],
+    mistral_extra: Any,
+    retries: OptionalNullable[utils.RetryConfig],
+    timeout_ms: Optional[int],
+) -> Dict[str, Any]:
+    return {
+        "model": model,
+        "document": document,
+        "include_image_base64": include_image_base64,
+        "image_limit": image_limit,
+        "image_min_size": image_min_size,
+        "mistral_extra": mistral_extra,
+        "retries": retries,
+        "timeout_ms": timeout_ms,
+    }
+
+
+def _shards_for(
+    pages: Optional[Sequence[int]], page_count: Optional[int], pages_per_shard: int
+) -> List[List[int]]:
+    if pages is None:
+        if page_count is None:
+            raise ValueError("pass the pages to process or the document's page_count")
+        pages = range(page_count)
+    return page_shards(pages, pages_per_shard)
+
+
+class OCRPageStream:
+    r"""Pages of a sharded OCR run, yielded as their shards complete.
+
+    Iterate to receive :class:`~opperai.models.OCRPageResult` objects; once
+    exhausted, :attr:`result` holds the merged :class:`ShardedOCRResponse`.
+    With ``ordered`` pages come in ``index`` order, each as soon as every
+    earlier shard is done; otherwise in the order shards complete.
+    """
+
+    def __init__(
+        self,
+        ocr: "Ocr",
+        shards: List[List[int]],
+        request: Dict[str, Any],
+        *,
+        concurrency: int,
+        max_attempts: int,
+        ordered: bool,
+    ) -> None:
+        self._ocr = ocr
+        self._request = request
+        self._concurrency = max(1, concurrency)
+        self._progress = _Progress(shards, ordered, max_attempts)
+        self.result: Optional[ShardedOCRResponse] = None
+
+    def _send(self, shard: int) -> models.OCRResponseModel:
+        return self._ocr.process_ocr_ocr_post(
+            pages=self._progress.shards[shard], **self._request
+        )
+
+    def __iter__(self) -> Iterator[models.OCRPageResult]:
+        progress = self._progress
+        pending = list(range(len(progress.shards)))
+        pending.reverse()
+        running: Dict[Future, int] = {}
+        with ThreadPoolExecutor(max_workers=self._concurrency) as pool:
+            try:
+                while pending or running:
+                    while pending and len(running) < self._concurrency:
+                        shard = pending.pop()
+                        progress.attempts += 1
+                        running[pool.submit(self._send, shard)] = shard
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        shard = running.pop(future)
+                        error = future.exception()
+                        if error is not None:
+                            progress.failed(shard, error)
+                            pending.append(shard)
+                            continue
+                        yield from progress.completed(shard, future.result())
+            finally:
+                for future in running:
+                    future.cancel()
+        self.result = progress.result()
+
+    def collect(self) -> ShardedOCRResponse:
+        r"""Run to completion and return the merged response."""
+        for _ in self:
+            pass
+        assert self.result is not None
+        return self.result
+
+
+class AsyncOCRPageStream:
+    r"""Async counterpart of :class:`OCRPageStream`, iterated with ``async for``."""
+
+    def __init__(
+        self,
+        ocr: "Ocr",
+        shards: List[List[int]],
+        request: Dict[str, Any],
+        *,
+        concurrency: int,
+        max_attempts: int,
+        ordered: bool,
+    ) -> None:
+        self._ocr = ocr
+        self._request = request
+        self._concurrency = max(1, concurrency)
+        self._progress = _Progress(shards, ordered, max_attempts)
+        self.result: Optional[ShardedOCRResponse] = None
+
+    async def _send(self, shard: int) -> models.OCRResponseModel:
+        return await self._ocr.process_ocr_ocr_post_async(
+            pages=self._progress.shards[shard], **self._request
+        )
+
+    async def __aiter__(self) -> AsyncIterator[models.OCRPageResult]:
+        progress = self._progress
+        pending = list(range(len(progress.shards)))
+        pending.reverse()
+        running: Dict[asyncio.Task, int] = {}
+        try:
+            while pending or running:
+                while pending and len(running) < self._concurrency:
+                    shard = pending.pop()
+                    progress.attempts += 1
+                    running[asyncio.ensure_future(self._send(shard))] = shard
+                done: Set[asyncio.Task]
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    shard = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        progress.failed(shard, error)
+                        pending.append(shard)
+                        continue
+                    for page in progress.completed(shard, task.result()):
+                        yield page
+        finally:
+            for task in running:
+                task.cancel()
+        self.result = progress.result()
+
+    async def collect(self) -> ShardedOCRResponse:
+        r"""Run to completion and return the merged response."""
+        async for _ in self:
+            pass
+        assert self.result is not None
+        return self.result
+
+
+def iter_ocr_pages(
+    ocr: "Ocr",
+    *,
+    model: str,
+    document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+    pages: Optional[Sequence[int]] = None,
+    page_count: Optional[int] = None,
+    pages_per_shard: int = DEFAULT_PAGES_PER_SHARD,
+    concurrency: int = 4,
+    max_attempts: int = 3,
+    ordered: bool = True,
+    include_image_base64: Optional[bool] = False,
+    image_limit: OptionalNullable[int] = UNSET,
+    image_min_size: OptionalNullable[int] = UNSET,
+    mistral_extra: OptionalNullable[
+        Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+    ] = UNSET,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    timeout_ms: Optional[int] = None,
+) -> OCRPageStream:
+    r"""OCR a document as concurrent requests over page shards, yielding pages as they complete.
+
+    Each shard is one ``ocr.process_ocr_ocr_post`` call with its ``pages``;
+    a shard that fails is sent again on its own, up to ``max_attempts`` times,
+    without repeating the shards that succeeded.
+
+    :param ocr: The client's OCR SDK, ``client.ocr``
+    :param model: The OCR model to use
+    :param document: Document specification for OCR processing
+    :param pages: Page indices to process (0-based)
+    :param page_count: Number of pages in the document, used when ``pages`` is not given
+    :param pages_per_shard: Pages per request
+    :param concurrency: Maximum number of requests in flight
+    :param max_attempts: Attempts per shard before the whole run fails
+    :param ordered: Yield pages in index order rather than as shards complete
+    :param include_image_base64: Whether to include base64-encoded images in the response
+    :param image_limit: Maximum number of images to extract per page
+    :param image_min_size: Minimum size (width or height in pixels) for images to be included
+    :param mistral_extra: Mistral-specific OCR parameters
+    :param retries: Override the default retry configuration for each request
+    :param timeout_ms: Request timeout in milliseconds
+    """
+    return OCRPageStream(
+        ocr,
+        _shards_for(pages, page_count, pages_per_shard),
+        _request_kwargs(
+            model,
+            document,
+            include_image_base64,
+            image_limit,
+            image_min_size,
+            mistral_extra,
+            retries,
+            timeout_ms,
+        ),
+        concurrency=concurrency,
+        max_attempts=max_attempts,
+        ordered=ordered,
+    )
+
+
+async def iter_ocr_pages_async(
+    ocr: "Ocr",
+    *,
+    model: str,
+    document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+    pages: Optional[Sequence[int]] = None,
+    page_count: Optional[int] = None,
+    pages_per_shard: int = DEFAULT_PAGES_PER_SHARD,
+    concurrency: int = 4,
+    max_attempts: int = 3,
+    ordered: bool = True,
+    include_image_base64: Optional[bool] = False,
+    image_limit: OptionalNullable[int] = UNSET,
+    image_min_size: OptionalNullable[int] = UNSET,
+    mistral_extra: OptionalNullable[
+        Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+    ] = UNSET,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    timeout_ms: Optional[int] = None,
+) -> AsyncOCRPageStream:
+    r"""Async counterpart of :func:`iter_ocr_pages`, sending shards with ``process_ocr_ocr_post_async``.
+
+    Await it for the stream, then iterate that with ``async for``.
+    """
+    return AsyncOCRPageStream(
+        ocr,
+        _shards_for(pages, page_count, pages_per_shard),
+        _request_kwargs(
+            model,
+            document,
+            include_image_base64,
+            image_limit,
+            image_min_size,
+            mistral_extra,
+            retries,
+            timeout_ms,
+        ),
+        concurrency=concurrency,
+        max_attempts=max_attempts,
+        ordered=ordered,
+    )
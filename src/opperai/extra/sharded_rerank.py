@@ -0,0 +1,318 @@
+"""Reranking of large candidate sets split across concurrent requests."""
+
+import asyncio
+import json
+import math
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from opperai import models, utils
+from opperai.types import OptionalNullable, UNSET
+
+if TYPE_CHECKING:
+    from opperai.rerank import Rerank
+
+
+DEFAULT_MAX_SHARD_DOCUMENTS = 100
+
+DEFAULT_MAX_SHARD_BYTES = 256 * 1024
+"""Approximate serialized size of the documents sent in one request."""
+
+Prefilter = Callable[[str, Sequence[str]], Sequence[float]]
+r"""Scores document texts against a query; higher is more relevant."""
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def bm25_scores(
+    query: str, texts: Sequence[str], k1: float = 1.2, b: float = 0.75
+) -> List[float]:
+    r"""Okapi BM25 score of each text for ``query``, computed locally.
+
+    Used as the default pre-filter: cheap, and good enough to discard
+    candidates that share no terms with the query.
+    """
+    docs = [Counter(_TOKEN.findall(t.casefold())) for t in texts]
+    terms = set(_TOKEN.findall(query.casefold()))
+    if not docs or not terms:
+        return [0.0] * len(docs)
+    lengths = [sum(d.values()) for d in docs]
+    avg = sum(lengths) / len(docs) or 1.0
+    idf = {}
+    for term in terms:
+        df = sum(1 for d in docs if term in d)
+        idf[term] = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in terms:
+            tf = doc.get(term, 0)
+            if tf:
+                score += (
+                    idf[term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg))
+                )
+        scores.append(score)
+    return scores
+
+
+@dataclass
+class ShardedRerankResponse:
+    r"""Rerank results merged across shards.
+
+    ``results`` hold the global top documents by relevance score, with
+    ``index`` pointing into the documents originally passed in.
+    """
+
+    results: List[models.RerankResult]
+    model: str
+    usage: Dict[str, Any]
+    cost: Optional[models.RerankCost]
+    responses: List[models.RerankResponseModel] = field(repr=False)
+    r"""One response per shard, in shard order, with shard-local indexes."""
+    candidates: int = 0
+    r"""Number of documents sent to the reranker after pre-filtering."""
+
+
+def _document_size(document: models.RerankDocument) -> int:
+    size = len(document.text.encode("utf-8")) + 32
+    if document.metadata:
+        size += len(json.dumps(document.metadata, default=str))
+    return size
+
+
+def shard_documents(
+    indexes: Sequence[int],
+    documents: Sequence[models.RerankDocument],
+    max_documents: int = DEFAULT_MAX_SHARD_DOCUMENTS,
+    max_bytes: int = DEFAULT_MAX_SHARD_BYTES,
+) -> List[List[int]]:
+    r"""Split ``indexes`` into shards of at most ``max_documents`` documents and about ``max_bytes``.
+
+    A document larger than ``max_bytes`` on its own gets a shard of its own.
+    """
+    shards: List[List[int]] = []
+    current: List[int] = []
+    size = 0
+    for i in indexes:
+        doc_size = _document_size(documents[i])
+        if current and (len(current) >= max_documents or size + doc_size > max_bytes):
+            shards.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += doc_size
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _prepare(
+    query: str,
+    documents: Sequence[Union[models.RerankDocument, models.RerankDocumentTypedDict]],
+    top_k: Optional[int],
+    prefilter: Union[bool, Prefilter],
+    prefilter_top_n: Optional[int],
+    max_shard_documents: Optional[int],
+    max_shard_bytes: Optional[int],
+) -> Tuple[List[models.RerankDocument], List[List[int]], int]:
+    if max_shard_documents is None:
+        max_shard_documents = DEFAULT_MAX_SHARD_DOCUMENTS
+    if max_shard_bytes is None:
+        max_shard_bytes = DEFAULT_MAX_SHARD_BYTES
+    docs = [utils.get_pydantic_model(d, models.RerankDocument) for d in documents]
+    candidates = list(range(len(docs)))
+    if prefilter:
+        limit = prefilter_top_n
+        if limit is None:
+            limit = max(4 * (top_k or 0), max_shard_documents)
+        if limit < len(docs):
+            scorer = bm25_scores if prefilter is True else prefilter
+            scores = scorer(query, [d.text for d in docs])
+            candidates = sorted(candidates, key=lambda i: -scores[i])[:limit]
+            candidates.sort()
+    shards = shard_documents(candidates, docs, max_shard_documents, max_shard_bytes)
+    return docs, shards, len(candidates)
+
+
+def _merge_usage(responses: Sequence[models.RerankResponseModel]) -> Dict[str, Any]:
+    usage: Dict[str, Any] = {}
+    for response in responses:
+        for key, value in (response.usage or {}).items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                usage[key] = usage.get(key, 0) + value
+            else:
+                usage.setdefault(key, value)
+    return usage
+
+
+def _merge(
+    responses: Sequence[models.RerankResponseModel],
+    shards: Sequence[Sequence[int]],
+    docs: Sequence[models.RerankDocument],
+    top_k: Optional[int],
+    return_documents: Optional[bool],
+    candidates: int,
+) -> ShardedRerankResponse:
+    results: List[models.RerankResult] = []
+    for response, shard in zip(responses, shards):
+        for result in response.results:
+            original = shard[result.index]
+            update: Dict[str, Any] = {"index": original}
+            if return_documents and not isinstance(
+                result.document, models.RerankDocument
+            ):
+                update["document"] = docs[original]
+            results.append(result.model_copy(update=update))
+    # Reranker scores are absolute per query and document, so shards compare directly.
+    results.sort(key=lambda r: (-r.relevance_score, r.index))
+    if top_k is not None:
+        results = results[:top_k]
+
+    costs = [r.cost for r in responses if isinstance(r.cost, models.RerankCost)]
+    cost = None
+    if costs:
+        cost = models.RerankCost(
+            generation=sum(c.generation for c in costs),
+            platform=sum(c.platform for c in costs),
+            total=sum(c.total for c in costs),
+        )
+    return ShardedRerankResponse(
+        results=results,
+        model=responses[0].model if responses else "",
+        usage=_merge_usage(responses),
+        cost=cost,
+        responses=list(responses),
+        candidates=candidates,
+    )
+
+
+def rerank_sharded(
+    rerank: "Rerank",
+    *,
+    query: str,
+    documents: Sequence[Union[models.RerankDocument, models.RerankDocumentTypedDict]],
+    model: str,
+    top_k: Optional[int] = None,
+    return_documents: Optional[bool] = True,
+    max_chunks_per_doc: OptionalNullable[int] = UNSET,
+    max_shard_documents: Optional[int] = None,
+    max_shard_bytes: Optional[int] = None,
+    concurrency: int = 4,
+    prefilter: Union[bool, Prefilter] = False,
+    prefilter_top_n: Optional[int] = None,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    timeout_ms: Optional[int] = None,
+) -> ShardedRerankResponse:
+    r"""Rerank any number of documents as several concurrent ``rerank.documents`` requests.
+
+    Documents are split into shards bounded by count and size, each shard
+    is reranked for its own ``top_k``, and the results are merged by score
+    into the global ``top_k`` with indexes into ``documents``.
+
+    :param rerank: The client's rerank SDK, ``client.rerank``
+    :param query: The search query to rank documents against
+    :param documents: Documents to rerank
+    :param model: The reranking model to use
+    :param top_k: Number of top documents to return. Defaults to all documents.
+    :param return_documents: Whether to return document content in the results
+    :param max_chunks_per_doc: Maximum number of chunks per document
+    :param max_shard_documents: Maximum number of documents per request,
+        :data:`DEFAULT_MAX_SHARD_DOCUMENTS` by default
+    :param max_shard_bytes: Approximate maximum size of the documents in one request,
+        :data:`DEFAULT_MAX_SHARD_BYTES` by default
+    :param concurrency: Maximum number of requests in flight
+    :param prefilter: Score documents locally first and only rerank the best ones;
+        ``True`` uses :func:`bm25_scores`, or pass a scoring function
+    :param prefilter_top_n: Documents kept by the pre-filter, by default
+        ``max(4 * top_k, max_shard_documents)``
+    :param retries: Override the default retry configuration for each request
+    :param timeout_ms: Request timeout in milliseconds
+    """
+    docs, shards, candidates = _prepare(
+        query,
+        documents,
+        top_k,
+        prefilter,
+        prefilter_top_n,
+        max_shard_documents,
+        max_shard_bytes,
+    )
+
+    def run(shard: List[int]) -> models.RerankResponseModel:
+        return rerank.documents(
+            query=query,
+            documents=[docs[i] for i in shard],
+            model=model,
+            top_k=min(top_k, len(shard)) if top_k is not None else UNSET,
+            return_documents=return_documents,
+            max_chunks_per_doc=max_chunks_per_doc,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    if len(shards) <= 1:
+        responses = [run(shard) for shard in shards]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(concurrency, len(shards)))
+        ) as pool:
+            responses = list(pool.map(run, shards))
+    return _merge(responses, shards, docs, top_k, return_documents, candidates)
+
+
+async def rerank_sharded_async(
+    rerank: "Rerank",
+    *,
+    query: str,
+    documents: Sequence[Union[models.RerankDocument, models.RerankDocumentTypedDict]],
+    model: str,
+    top_k: Optional[int] = None,
+    return_documents: Optional[bool] = True,
+    max_chunks_per_doc: OptionalNullable[int] = UNSET,
+    max_shard_documents: Optional[int] = None,
+    max_shard_bytes: Optional[int] = None,
+    concurrency: int = 4,
+    prefilter: Union[bool, Prefilter] = False,
+    prefilter_top_n: Optional[int] = None,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    timeout_ms: Optional[int] = None,
+) -> ShardedRerankResponse:
+    r"""Async counterpart of :func:`rerank_sharded`, sending shards with ``rerank.documents_async``."""
+    docs, shards, candidates = _prepare(
+        query,
+        documents,
+        top_k,
+        prefilter,
+        prefilter_top_n,
+        max_shard_documents,
+        max_shard_bytes,
+    )
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(shard: List[int]) -> models.RerankResponseModel:
+        async with semaphore:
+            return await rerank.documents_async(
+                query=query,
+                documents=[docs[i] for i in shard],
+                model=model,
+                top_k=min(top_k, len(shard)) if top_k is not None else UNSET,
+                return_documents=return_documents,
+                max_chunks_per_doc=max_chunks_per_doc,
+                retries=retries,
+                timeout_ms=timeout_ms,
+            )
+
+    responses = list(await asyncio.gather(*(run(shard) for shard in shards)))
+    return _merge(responses, shards, docs, top_k, return_documents, candidates)
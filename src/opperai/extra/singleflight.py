@@ -0,0 +1,82 @@
+"""Coalescing of identical concurrent calls."""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    r"""Run at most one call per key at a time across threads.
+
+    A thread calling :meth:`do` while another call with the same key is running
+    waits for it and receives its result, or its exception, instead of making
+    the call again. Nothing is cached once the call returns.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, "Future[Any]"] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> Tuple[T, bool]:
+        r"""Return ``fn()``'s result and whether it was shared with an earlier caller."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if future is None:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn())
+        except BaseException as e:  # pylint: disable=broad-exception-caught
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result(), False
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    r"""Run at most one call per key at a time across tasks on an event loop.
+
+    The call runs in its own task, so cancelling one waiter does not cancel
+    the call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Tuple[int, Hashable], "asyncio.Task[Any]"] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[T]]
+    ) -> Tuple[T, bool]:
+        r"""Return ``await fn()``'s result and whether it was shared with an earlier caller."""
+        # Tasks belong to one event loop, so calls on different loops never share.
+        flight_key = (id(asyncio.get_running_loop()), key)
+        task = self._calls.get(flight_key)
+        shared = task is not None
+        if task is None:
+
+            async def call() -> T:
+                return await fn()
+
+            task = asyncio.ensure_future(call())
+            self._calls[flight_key] = task
+
+            def done(t: "asyncio.Task[Any]") -> None:
+                self._calls.pop(flight_key, None)
+                if not t.cancelled():
+                    # Mark the exception retrieved in case every waiter was cancelled.
+                    t.exception()
+
+            task.add_done_callback(done)
+        return await asyncio.shield(task), shared
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,416 @@
+"""OCR responses parsed incrementally, with page images spilled out of memory."""
+
+import base64
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    BinaryIO,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+import httpx
+
+from opperai import models, utils
+from opperai.types import OptionalNullable, UNSET
+
+from ._streaming import prepare, raise_for_response
+from .json_stream import (
+    JSONItemScanner,
+    Path,
+    StringSink,
+    aiter_json_items,
+    iter_json_items,
+)
+
+if TYPE_CHECKING:
+    from opperai.ocr import Ocr
+
+
+_PAGES = ("pages", "*")
+_IMAGE_BASE64 = ("pages", "*", "images", "*", "image_base64")
+_DATA_URI_PREFIX_LIMIT = 128
+
+
+class ImageSink(ABC):
+    r"""Storage for page images spilled while an OCR response is parsed.
+
+    Images are identified by their position in the response: the page's
+    position in ``pages`` and the image's position in that page's ``images``.
+    """
+
+    @abstractmethod
+    def open(self, page: int, image: int) -> BinaryIO:
+        r"""A writable binary file for the decoded image; it is closed once written."""
+
+    @abstractmethod
+    def read(self, page: int, image: int) -> bytes:
+        r"""The decoded image, for lazy access from :class:`LazyOCRPageImage`."""
+
+    def close(self) -> None:
+        r"""Release the stored images."""
+
+
+class TemporaryImageSink(ImageSink):
+    r"""Stores each image in its own file in a temporary directory, removed on :meth:`close`.
+
+    :param directory: Parent of the temporary directory, defaults to the system temp dir
+    """
+
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = tempfile.mkdtemp(prefix="opperai-ocr-", dir=directory)
+
+    def path(self, page: int, image: int) -> str:
+        return os.path.join(self.directory, f"{page}-{image}.bin")
+
+    def open(self, page: int, image: int) -> BinaryIO:
+        return open(self.path(page, image), "wb")
+
+    def read(self, page: int, image: int) -> bytes:
+        with open(self.path(page, image), "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> "TemporaryImageSink":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class _Base64Spill(StringSink):
+    r"""Decodes a base64 image string piece by piece into an :class:`ImageSink` file."""
+
+    def __init__(self, sink: ImageSink, path: Path) -> None:
+        self._page = int(path[1])
+        self._image = int(path[3])
+        self._file = sink.open(self._page, self._image)
+        self._pending = b""
+        self._media_type: Optional[str] = None
+        self._prefix_checked = False
+        self._size = 0
+
+    def write(self, data: bytes) -> None:
+        data = self._pending + data
+        if not self._prefix_checked:
+            # Images may be sent as data URIs: "data:image/png;base64,...".
+            if len(data) < 5 and b"data:".startswith(data):
+                self._pending = data
+                return
+            if data.startswith(b"data:"):
+                comma = data.find(b",", 0, _DATA_URI_PREFIX_LIMIT)
+                if comma < 0:
+                    if len(data) < _DATA_URI_PREFIX_LIMIT:
+                        self._pending = data
+                        return
+                else:
+                    self._media_type = data[5:comma].split(b";")[0].decode("ascii")
+                    data = data[comma + 1 :]
+            self._prefix_checked = True
+        usable = len(data) - len(data) % 4
+        if usable:
+            decoded = base64.b64decode(data[:usable])
+            self._file.write(decoded)
+            self._size += len(decoded)
+        self._pending = data[usable:]
+
+    def close(self) -> Any:
+        if self._pending:
+            padded = self._pending + b"=" * (-len(self._pending) % 4)
+            decoded = base64.b64decode(padded)
+            self._file.write(decoded)
+            self._size += len(decoded)
+        self._file.close()
+        return {
+            "page": self._page,
+            "image": self._image,
+            "size": self._size,
+            "media_type": self._media_type,
+        }
+
+
+@dataclass
+class LazyOCRPageImage:
+    r"""An image extracted from a page, kept in an :class:`ImageSink` until accessed."""
+
+    id: str
+    top_left_x: Optional[int]
+    top_left_y: Optional[int]
+    bottom_right_x: Optional[int]
+    bottom_right_y: Optional[int]
+    size: int
+    r"""Decoded size in bytes."""
+    media_type: Optional[str]
+    r"""Media type when the image was sent as a data URI."""
+    _sink: ImageSink = field(repr=False)
+    _page: int = field(repr=False)
+    _image: int = field(repr=False)
+
+    def read(self) -> bytes:
+        r"""The decoded image bytes, read from the sink on each call."""
+        return self._sink.read(self._page, self._image)
+
+    @property
+    def image_base64(self) -> str:
+        r"""The image re-encoded as the API sent it, for code written against ``OCRPageImage``."""
+        encoded = base64.b64encode(self.read()).decode("ascii")
+        if self.media_type is not None:
+            return f"data:{self.media_type};base64,{encoded}"
+        return encoded
+
+
+@dataclass
+class StreamedOCRPage:
+    r"""A processed page whose images are loaded lazily."""
+
+    index: int
+    markdown: str
+    dimensions: Optional[models.OCRPageDimensions]
+    images: List[LazyOCRPageImage]
+
+
+def _page(data: Dict[str, Any], sink: ImageSink) -> StreamedOCRPage:
+    images = []
+    for image in data.get("images") or []:
+        spilled = image.get("image_base64")
+        if not isinstance(spilled, dict):
+            # No payload was sent for this image; there is nothing to read back.
+            continue
+        images.append(
+            LazyOCRPageImage(
+                id=image.get("id", ""),
+                top_left_x=image.get("top_left_x"),
+                top_left_y=image.get("top_left_y"),
+                bottom_right_x=image.get("bottom_right_x"),
+                bottom_right_y=image.get("bottom_right_y"),
+                size=spilled["size"],
+                media_type=spilled["media_type"],
+                _sink=sink,
+                _page=spilled["page"],
+                _image=spilled["image"],
+            )
+        )
+    dimensions = data.get("dimensions")
+    return StreamedOCRPage(
+        index=data["index"],
+        markdown=data.get("markdown", ""),
+        dimensions=(
+            models.OCRPageDimensions.model_validate(dimensions)
+            if dimensions is not None
+            else None
+        ),
+        images=images,
+    )
+
+
+class _StreamedOCRBase:
+    def __init__(self, http_res: httpx.Response, sink: Optional[ImageSink]) -> None:
+        self.http_res = http_res
+        self._owns_sink = sink is None
+        self.sink: ImageSink = sink if sink is not None else TemporaryImageSink()
+        self._scanner = JSONItemScanner(
+            [_PAGES], spill={_IMAGE_BASE64: lambda path: _Base64Spill(self.sink, path)}
+        )
+        self.id: Optional[str] = None
+        self.model: Optional[str] = None
+        self.usage_info: Optional[models.OCRUsageInfo] = None
+        self.cost: Optional[models.OCRCost] = None
+
+    def _finish(self) -> None:
+        rest = self._scanner.remainder or {}
+        self.id = rest.get("id")
+        self.model = rest.get("model")
+        if rest.get("usage_info") is not None:
+            self.usage_info = models.OCRUsageInfo.model_validate(rest["usage_info"])
+        if rest.get("cost") is not None:
+            self.cost = models.OCRCost.model_validate(rest["cost"])
+
+
+class StreamedOCRResponse(_StreamedOCRBase):
+    r"""An OCR response read page by page from the network.
+
+    Iterate to receive :class:`StreamedOCRPage` objects as they are parsed;
+    image payloads go to the sink as they arrive, so memory holds about one
+    page at a time. ``id``, ``model``, ``usage_info`` and ``cost`` are set
+    once iteration finishes. Images stay readable until :meth:`close`, which
+    removes them if the sink is the default temporary one.
+    """
+
+    def __iter__(self) -> Iterator[StreamedOCRPage]:
+        try:
+            for _, data in iter_json_items(
+                self.http_res.iter_bytes(), [_PAGES], scanner=self._scanner
+            ):
+                yield _page(data, self.sink)
+        finally:
+            self.http_res.close()
+        self._finish()
+
+    def close(self) -> None:
+        self.http_res.close()
+        if self._owns_sink:
+            self.sink.close()
+
+    def __enter__(self) -> "StreamedOCRResponse":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class AsyncStreamedOCRResponse(_StreamedOCRBase):
+    r"""Async counterpart of :class:`StreamedOCRResponse`, iterated with ``async for``."""
+
+    async def __aiter__(self) -> AsyncIterator[StreamedOCRPage]:
+        try:
+            async for _, data in aiter_json_items(
+                self.http_res.aiter_bytes(), [_PAGES], scanner=self._scanner
+            ):
+                yield _page(data, self.sink)
+        finally:
+            await self.http_res.aclose()
+        self._finish()
+
+    async def close(self) -> None:
+        await self.http_res.aclose()
+        if self._owns_sink:
+            self.sink.close()
+
+    async def __aenter__(self) -> "AsyncStreamedOCRResponse":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+
+def _request(
+    model: str,
+    document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+    pages: OptionalNullable[List[int]],
+    image_limit: OptionalNullable[int],
+    image_min_size: OptionalNullable[int],
+    mistral_extra: OptionalNullable[
+        Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+    ],
+) -> models.OCRRequestModel:
+    return models.OCRRequestModel(
+        model=model,
+        document=utils.get_pydantic_model(document, models.OCRDocument),
+        pages=pages,
+        include_image_base64=True,
+        image_limit=image_limit,
+        image_min_size=image_min_size,
+        mistral_extra=utils.get_pydantic_model(
+            mistral_extra, OptionalNullable[models.MistralOCRExtra]
+        ),
+    )
+
+
+def process_streamed(
+    ocr: "Ocr",
+    *,
+    model: str,
+    document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+    pages: OptionalNullable[List[int]] = UNSET,
+    image_limit: OptionalNullable[int] = UNSET,
+    image_min_size: OptionalNullable[int] = UNSET,
+    mistral_extra: OptionalNullable[
+        Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+    ] = UNSET,
+    sink: Optional[ImageSink] = None,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> StreamedOCRResponse:
+    r"""Run OCR with page images and read the response incrementally.
+
+    Sends the same request as ``ocr.process_ocr_ocr_post`` with
+    ``include_image_base64=True``, but never holds the whole response:
+    pages are parsed as they arrive and images are decoded into ``sink``.
+
+    :param ocr: The client's OCR SDK, ``client.ocr``
+    :param model: The OCR model to use
+    :param document: Document specification for OCR processing
+    :param pages: Specific page indices to process (0-based)
+    :param image_limit: Maximum number of images to extract per page
+    :param image_min_size: Minimum size (width or height in pixels) for images to be included
+    :param mistral_extra: Mistral-specific OCR parameters
+    :param sink: Where to store images, a :class:`TemporaryImageSink` by default
+    :param retries: Override the default retry configuration for this method
+    :param server_url: Override the default server URL for this method
+    :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+    :param http_headers: Additional headers to set or replace on requests.
+    """
+    kwargs = prepare(
+        ocr,
+        method="POST",
+        path="/ocr",
+        request=_request(
+            model, document, pages, image_limit, image_min_size, mistral_extra
+        ),
+        operation_id="process_ocr_ocr_post",
+        accept="application/json",
+        retries=retries,
+        server_url=server_url,
+        timeout_ms=timeout_ms,
+        http_headers=http_headers,
+        is_async=False,
+        body_type=models.OCRRequestModel,
+    )
+    http_res = ocr.do_request(**kwargs)
+    if utils.match_response(http_res, "200", "application/json"):
+        return StreamedOCRResponse(http_res, sink)
+    raise_for_response(http_res, utils.stream_to_text(http_res))
+
+
+async def process_streamed_async(
+    ocr: "Ocr",
+    *,
+    model: str,
+    document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+    pages: OptionalNullable[List[int]] = UNSET,
+    image_limit: OptionalNullable[int] = UNSET,
+    image_min_size: OptionalNullable[int] = UNSET,
+    mistral_extra: OptionalNullable[
+        Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+    ] = UNSET,
+    sink: Optional[ImageSink] = None,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> AsyncStreamedOCRResponse:
+    r"""Async counterpart of :func:`process_streamed`."""
+    kwargs = prepare(
+        ocr,
+        method="POST",
+        path="/ocr",
+        request=_request(
+            model, document, pages, image_limit, image_min_size, mistral_extra
+        ),
+        operation_id="process_ocr_ocr_post",
+        accept="application/json",
+        retries=retries,
+        server_url=server_url,
+        timeout_ms=timeout_ms,
+        http_headers=http_headers,
+        is_async=True,
+        body_type=models.OCRRequestModel,
+    )
+    http_res = await ocr.do_request_async(**kwargs)
+    if utils.match_response(http_res, "200", "application/json"):
+        return AsyncStreamedOCRResponse(http_res, sink)
+    raise_for_response(http_res, await utils.stream_to_text_async(http_res))
@@ -0,0 +1,305 @@
+"""Opt-in incremental decoding of large JSON responses, one list element at a time."""
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Generic,
+    Iterator,
+    Mapping,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
+
+import httpx
+from pydantic import TypeAdapter
+
+from opperai import models, utils
+from opperai.basesdk import BaseSDK
+from opperai.types import BaseModel, OptionalNullable, UNSET
+
+from ._streaming import prepare, raise_for_response
+from .json_stream import JSONItemScanner, Pattern, aiter_json_items, iter_json_items
+
+if TYPE_CHECKING:
+    from opperai.datasets import Datasets
+    from opperai.knowledge import Knowledge
+    from opperai.traces import Traces
+
+
+T = TypeVar("T")
+E = TypeVar("E", bound=BaseModel)
+
+
+class _StreamedItemsBase(Generic[T, E]):
+    def __init__(
+        self,
+        http_res: httpx.Response,
+        items: Pattern,
+        item_type: Type[T],
+        envelope_type: Optional[Type[E]],
+    ) -> None:
+        self.http_res = http_res
+        self._items = items
+        self._item_type = item_type
+        self._envelope_type = envelope_type
+        self._adapter: TypeAdapter[T] = TypeAdapter(item_type)
+        self._scanner = JSONItemScanner([items])
+        self.envelope: Optional[E] = None
+        r"""The rest of the response, with the streamed list empty, once iteration finishes."""
+
+    def _item(self, data: Any) -> T:
+        return self._adapter.validate_python(data)
+
+    def _finish(self) -> None:
+        if self._envelope_type is not None and self._scanner.remainder is not None:
+            self.envelope = self._envelope_type.model_validate(self._scanner.remainder)
+
+
+class StreamedItems(_StreamedItemsBase[T, E]):
+    r"""The elements of one list in a JSON response, validated as each one arrives.
+
+    Only the element being parsed is held in memory, not the response body
+    or the full list. Iterate once; afterwards :attr:`envelope` holds the
+    response model without the list (e.g. the pagination ``meta``).
+    """
+
+    def __iter__(self) -> Iterator[T]:
+        try:
+            for _, data in iter_json_items(
+                self.http_res.iter_bytes(), [self._items], scanner=self._scanner
+            ):
+                yield self._item(data)
+        finally:
+            self.http_res.close()
+        self._finish()
+
+    def close(self) -> None:
+        self.http_res.close()
+
+    def __enter__(self) -> "StreamedItems[T, E]":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class AsyncStreamedItems(_StreamedItemsBase[T, E]):
+    r"""Async counterpart of :class:`StreamedItems`, iterated with ``async for``."""
+
+    async def __aiter__(self) -> AsyncIterator[T]:
+        try:
+            async for _, data in aiter_json_items(
+                self.http_res.aiter_bytes(), [self._items], scanner=self._scanner
+            ):
+                yield self._item(data)
+        finally:
+            await self.http_res.aclose()
+        self._finish()
+
+    async def close(self) -> None:
+        await self.http_res.aclose()
+
+    async def __aenter__(self) -> "AsyncStreamedItems[T, E]":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+
+def stream_items(
+    sdk: BaseSDK,
+    *,
+    path: str,
+    request: Any,
+    operation_id: str,
+    items: Sequence[Any],
+    item_type: Type[T],
+    envelope_type: Optional[Type[E]] = None,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> StreamedItems[T, E]:
+    r"""Send a GET operation and decode the list at ``items`` from the response as it streams.
+
+    Builds the request exactly as the generated method does, so hooks,
+    retries and middleware apply, but reads the body with ``iter_bytes``.
+
+    :param sdk: The sub-SDK that owns the operation, e.g. ``client.traces``
+    :param path: The operation's path template, e.g. ``"/traces/{trace_id}"``
+    :param request: The operation's request model holding path and query parameters
+    :param operation_id: The operation id passed to hooks
+    :param items: Path of the list elements in the response, e.g. ``("data", "*")``
+    :param item_type: Model each element is validated as
+    :param envelope_type: Model of the response, validated from the rest of it
+    :param retries: Override the default retry configuration for this method
+    :param server_url: Override the default server URL for this method
+    :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+    :param http_headers: Additional headers to set or replace on requests.
+    """
+    kwargs = prepare(
+        sdk,
+        method="GET",
+        path=path,
+        request=request,
+        operation_id=operation_id,
+        accept="application/json",
+        retries=retries,
+        server_url=server_url,
+        timeout_ms=timeout_ms,
+        http_headers=http_headers,
+        is_async=False,
+        has_path_params=True,
+    )
+    http_res = sdk.do_request(**kwargs)
+    if utils.match_response(http_res, "200", "application/json"):
+        return StreamedItems(http_res, tuple(items), item_type, envelope_type)
+    raise_for_response(http_res, utils.stream_to_text(http_res))
+
+
+async def stream_items_async(
+    sdk: BaseSDK,
+    *,
+    path: str,
+    request: Any,
+    operation_id: str,
+    items: Sequence[Any],
+    item_type: Type[T],
+    envelope_type: Optional[Type[E]] = None,
+    retries: OptionalNullable[utils.RetryConfig] = UNSET,
+    server_url: Optional[str] = None,
+    timeout_ms: Optional[int] = None,
+    http_headers: Optional[Mapping[str, str]] = None,
+) -> AsyncStreamedItems[T, E]:
+    r"""Async counterpart of :func:`stream_items`, reading the body with ``aiter_bytes``."""
+    kwargs = prepare(
+        sdk,
+        method="GET",
+        path=path,
+        request=request,
+        operation_id=operation_id,
+        accept="application/json",
+        retries=retries,
+        server_url=server_url,
+        timeout_ms=timeout_ms,
+        http_headers=http_headers,
+        is_async=True,
+        has_path_params=True,
+    )
+    http_res = await sdk.do_request_async(**kwargs)
+    if utils.match_response(http_res, "200", "application/json"):
+        return AsyncStreamedItems(http_res, tuple(items), item_type, envelope_type)
+    raise_for_response(http_res, await utils.stream_to_text_async(http_res))
+
+
+def _trace_spans(trace_id: str) -> Dict[str, Any]:
+    return {
+        "path": "/traces/{trace_id}",
+        "request": models.GetTraceTracesTraceIDGetRequest(trace_id=trace_id),
+        "operation_id": "get_trace_traces__trace_id__get",
+        "items": ("spans", "*"),
+        "item_type": models.SpanSchema,
+        "envelope_type": models.GetTraceResponse,
+    }
+
+
+def _dataset_entries(dataset_id: str, offset: int, limit: int) -> Dict[str, Any]:
+    return {
+        "path": "/datasets/{dataset_id}/entries",
+        "request": models.ListDatasetEntriesDatasetsDatasetIDEntriesGetRequest(
+            dataset_id=dataset_id, offset=offset, limit=limit
+        ),
+        "operation_id": "list_dataset_entries_datasets__dataset_id__entries_get",
+        "items": ("data", "*"),
+        "item_type": models.GetDatasetEntriesResponse,
+        "envelope_type": models.PaginatedResponseGetDatasetEntriesResponse,
+    }
+
+
+def _knowledge_files(knowledge_base_id: str, offset: int, limit: int) -> Dict[str, Any]:
+    return {
+        "path": "/knowledge/{knowledge_base_id}/files",
+        "request": models.ListFilesKnowledgeKnowledgeBaseIDFilesGetRequest(
+            knowledge_base_id=knowledge_base_id, offset=offset, limit=limit
+        ),
+        "operation_id": "list_files_knowledge__knowledge_base_id__files_get",
+        "items": ("data", "*"),
+        "item_type": models.ListFilesResponse,
+        "envelope_type": models.PaginatedResponseListFilesResponse,
+    }
+
+
+def stream_trace_spans(
+    traces: "Traces", *, trace_id: str, **options: Any
+) -> "StreamedItems[models.SpanSchema, models.GetTraceResponse]":
+    r"""``traces.get`` decoded incrementally, yielding its spans one at a time."""
+    return stream_items(traces, **_trace_spans(trace_id), **options)
+
+
+async def stream_trace_spans_async(
+    traces: "Traces", *, trace_id: str, **options: Any
+) -> "AsyncStreamedItems[models.SpanSchema, models.GetTraceResponse]":
+    r"""Async counterpart of :func:`stream_trace_spans`."""
+    return await stream_items_async(traces, **_trace_spans(trace_id), **options)
+
+
+def stream_dataset_entries(
+    datasets: "Datasets",
+    *,
+    dataset_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    **options: Any,
+) -> "StreamedItems[models.GetDatasetEntriesResponse, models.PaginatedResponseGetDatasetEntriesResponse]":
+    r"""``datasets.list_entries`` decoded incrementally, yielding entries one at a time."""
+    return stream_items(
+        datasets, **_dataset_entries(dataset_id, offset, limit), **options
+    )
+
+
+async def stream_dataset_entries_async(
+    datasets: "Datasets",
+    *,
+    dataset_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    **options: Any,
+) -> "AsyncStreamedItems[models.GetDatasetEntriesResponse, models.PaginatedResponseGetDatasetEntriesResponse]":
+    r"""Async counterpart of :func:`stream_dataset_entries`."""
+    return await stream_items_async(
+        datasets, **_dataset_entries(dataset_id, offset, limit), **options
+    )
+
+
+def stream_knowledge_files(
+    knowledge: "Knowledge",
+    *,
+    knowledge_base_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    **options: Any,
+) -> (
+    "StreamedItems[models.ListFilesResponse, models.PaginatedResponseListFilesResponse]"
+):
+    r"""``knowledge.list_files`` decoded incrementally, yielding files one at a time."""
+    return stream_items(
+        knowledge, **_knowledge_files(knowledge_base_id, offset, limit), **options
+    )
+
+
+async def stream_knowledge_files_async(
+    knowledge: "Knowledge",
+    *,
+    knowledge_base_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    **options: Any,
+) -> "AsyncStreamedItems[models.ListFilesResponse, models.PaginatedResponseListFilesResponse]":
+    r"""Async counterpart of :func:`stream_knowledge_files`."""
+    return await stream_items_async(
+        knowledge, **_knowledge_files(knowledge_base_id, offset, limit), **options
+    )
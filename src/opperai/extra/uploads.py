@@ -0,0 +1,329 @@
+"""Size-aware file uploads to knowledge bases."""
+
+import asyncio
+import io
+import json
+import mimetypes
+import os
+import uuid
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+import httpx
+
+from opperai import errors, models
+from opperai.types import OptionalNullable, UNSET
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+DEFAULT_PRESIGNED_THRESHOLD = 8 * 1024 * 1024
+"""Files larger than this many bytes are sent through a presigned upload URL."""
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+"""Number of bytes read from disk per chunk when streaming an upload."""
+
+FileSource = Union[str, "os.PathLike[str]", bytes, IO[bytes]]
+
+UploadResult = Union[models.UploadFileResponse, models.RegisterFileUploadResponse]
+
+
+class _OpenedFile:
+    """A file source normalized to a seekable binary stream with a known size."""
+
+    def __init__(self, source: FileSource, filename: Optional[str]) -> None:
+        self._owned = False
+        if isinstance(source, (str, os.PathLike)):
+            self.stream: IO[bytes] = open(source, "rb")  # pylint: disable=consider-using-with
+            self._owned = True
+            filename = filename or os.path.basename(os.fspath(source))
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.stream = io.BytesIO(source)
+        else:
+            self.stream = source
+            filename = filename or os.path.basename(str(getattr(source, "name", "")))
+
+        if not filename:
+            raise ValueError("filename is required when uploading from a stream")
+        self.filename = filename
+        self.start = self.stream.tell()
+        self.size = self.stream.seek(0, io.SEEK_END) - self.start
+        self.stream.seek(self.start)
+
+    def rewind(self) -> None:
+        self.stream.seek(self.start)
+
+    def close(self) -> None:
+        if self._owned:
+            self.stream.close()
+
+
+def _content_type(filename: str, content_type: Optional[str]) -> str:
+    if content_type:
+        return content_type
+    guessed, _ = mimetypes.guess_type(filename)
+    return guessed or "application/octet-stream"
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class StreamingMultipartBody:
+    r"""A ``multipart/form-data`` body whose file part is read from disk in chunks.
+
+    The total length is computed up front so the request is sent with a
+    ``Content-Length`` header, which presigned POST targets require, while only
+    ``chunk_size`` bytes of the file are held in memory at a time. Iterating the
+    body again rewinds the file, so retried requests resend it.
+    """
+
+    def __init__(
+        self,
+        fields: Mapping[str, Any],
+        file: _OpenedFile,
+        content_type: str,
+        *,
+        field_name: str = "file",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        self.boundary = uuid.uuid4().hex
+        self._file = file
+        self._chunk_size = chunk_size
+
+        parts: List[bytes] = []
+        for name, value in fields.items():
+            parts.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f"{value}\r\n".encode("utf-8")
+            )
+        parts.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(field_name)}"; '
+            f'filename="{_quote(file.filename)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8")
+        )
+        self._head = b"".join(parts)
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self._file.size + len(self._tail)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Content-Type": self.content_type, "Content-Length": str(len(self))}
+
+    def __iter__(self) -> Iterator[bytes]:
+        self._file.rewind()
+        yield self._head
+        remaining = self._file.size
+        while remaining > 0:
+            chunk = self._file.stream.read(min(self._chunk_size, remaining))
+            if not chunk:
+                raise IOError("file ended before its reported size")
+            remaining -= len(chunk)
+            yield chunk
+        yield self._tail
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        self._file.rewind()
+        yield self._head
+        remaining = self._file.size
+        while remaining > 0:
+            # Disk reads go through the default executor so they do not stall the loop.
+            chunk = await loop.run_in_executor(
+                None, self._file.stream.read, min(self._chunk_size, remaining)
+            )
+            if not chunk:
+                raise IOError("file ended before its reported size")
+            remaining -= len(chunk)
+            yield chunk
+        yield self._tail
+
+
+def _metadata_json(metadata: OptionalNullable[Dict[str, Any]]) -> OptionalNullable[str]:
+    if metadata == UNSET or metadata is None or isinstance(metadata, str):
+        return metadata
+    return json.dumps(metadata)
+
+
+def _check_upload(res: httpx.Response) -> None:
+    if res.status_code >= 300:
+        raise errors.APIError("Presigned upload failed", res, res.text)
+
+
+def upload_file(
+    client: "Opper",
+    knowledge_base_id: str,
+    file: FileSource,
+    *,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+    configuration: Optional[
+        Union[
+            models.TextProcessingConfiguration,
+            models.TextProcessingConfigurationTypedDict,
+        ]
+    ] = None,
+    metadata: OptionalNullable[Dict[str, Any]] = UNSET,
+    presigned_threshold: int = DEFAULT_PRESIGNED_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    timeout_ms: Optional[int] = None,
+) -> UploadResult:
+    r"""Upload a file to a knowledge base, choosing the transfer path by size.
+
+    Files up to ``presigned_threshold`` bytes are read and sent through
+    ``knowledge.upload_file``. Larger files use ``get_upload_url``, are streamed
+    from disk to the returned URL in ``chunk_size`` pieces, and are then
+    registered with ``register_file_upload``, so memory use stays flat
+    regardless of file size.
+
+    :param client: The Opper client
+    :param knowledge_base_id: The id of the knowledge base to upload the file to
+    :param file: A path, an open binary file, or bytes
+    :param filename: Name to store the file under, defaults to the path's basename
+    :param content_type: MIME type, guessed from the filename when omitted
+    :param configuration: Text processing configuration for the file
+    :param metadata: Metadata to attach to the file
+    :param presigned_threshold: Size in bytes above which the presigned flow is used
+    :param chunk_size: Bytes read from disk per chunk in the presigned flow
+    :param timeout_ms: Request timeout in milliseconds
+    """
+    opened = _OpenedFile(file, filename)
+    try:
+        mime = _content_type(opened.filename, content_type)
+        config = models.TextProcessingConfiguration.model_validate(configuration or {})
+        if opened.size <= presigned_threshold:
+            return client.knowledge.upload_file(
+                knowledge_base_id=knowledge_base_id,
+                file=models.BodyUploadFileKnowledgeKnowledgeBaseIDUploadPostFile(
+                    file_name=opened.filename,
+                    content=opened.stream.read(),
+                    content_type=mime,
+                ),
+                text_processing_chunk_size=config.text_processing_chunk_size,
+                text_processing_chunk_overlap=config.text_processing_chunk_overlap,
+                metadata=_metadata_json(metadata),
+                timeout_ms=timeout_ms,
+            )
+
+        target = client.knowledge.get_upload_url(
+            knowledge_base_id=knowledge_base_id,
+            filename=opened.filename,
+            timeout_ms=timeout_ms,
+        )
+        body = StreamingMultipartBody(
+            target.fields, opened, mime, chunk_size=chunk_size
+        )
+        http_client = client.sdk_configuration.client
+        if http_client is None:
+            raise ValueError("client is required")
+        req = http_client.build_request(
+            "POST",
+            target.url,
+            content=iter(body),
+            headers=body.headers,
+            timeout=timeout_ms / 1000 if timeout_ms is not None else None,
+        )
+        res = http_client.send(req)
+        _check_upload(res)
+
+        return client.knowledge.register_file_upload(
+            knowledge_base_id=knowledge_base_id,
+            filename=opened.filename,
+            file_id=target.id,
+            content_type=mime,
+            configuration=config,
+            metadata=metadata,
+            timeout_ms=timeout_ms,
+        )
+    finally:
+        opened.close()
+
+
+async def upload_file_async(
+    client: "Opper",
+    knowledge_base_id: str,
+    file: FileSource,
+    *,
+    filename: Optional[str] = None,
+    content_type: Optional[str] = None,
+    configuration: Optional[
+        Union[
+            models.TextProcessingConfiguration,
+            models.TextProcessingConfigurationTypedDict,
+        ]
+    ] = None,
+    metadata: OptionalNullable[Dict[str, Any]] = UNSET,
+    presigned_threshold: int = DEFAULT_PRESIGNED_THRESHOLD,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    timeout_ms: Optional[int] = None,
+) -> UploadResult:
+    r"""Async counterpart of :func:`upload_file`."""
+    opened = _OpenedFile(file, filename)
+    try:
+        mime = _content_type(opened.filename, content_type)
+        config = models.TextProcessingConfiguration.model_validate(configuration or {})
+        if opened.size <= presigned_threshold:
+            return await client.knowledge.upload_file_async(
+                knowledge_base_id=knowledge_base_id,
+                file=models.BodyUploadFileKnowledgeKnowledgeBaseIDUploadPostFile(
+                    file_name=opened.filename,
+                    content=opened.stream.read(),
+                    content_type=mime,
+                ),
+                text_processing_chunk_size=config.text_processing_chunk_size,
+                text_processing_chunk_overlap=config.text_processing_chunk_overlap,
+                metadata=_metadata_json(metadata),
+                timeout_ms=timeout_ms,
+            )
+
+        target = await client.knowledge.get_upload_url_async(
+            knowledge_base_id=knowledge_base_id,
+            filename=opened.filename,
+            timeout_ms=timeout_ms,
+        )
+        body = StreamingMultipartBody(
+            target.fields, opened, mime, chunk_size=chunk_size
+        )
+        http_client = client.sdk_configuration.async_client
+        if http_client is None:
+            raise ValueError("client is required")
+        req = http_client.build_request(
+            "POST",
+            target.url,
+            content=body.__aiter__(),
+            headers=body.headers,
+            timeout=timeout_ms / 1000 if timeout_ms is not None else None,
+        )
+        res = await http_client.send(req)
+        _check_upload(res)
+
+        return await client.knowledge.register_file_upload_async(
+            knowledge_base_id=knowledge_base_id,
+            filename=opened.filename,
+            file_id=target.id,
+            content_type=mime,
+            configuration=config,
+            metadata=metadata,
+            timeout_ms=timeout_ms,
+        )
+    finally:
+        opened.close()
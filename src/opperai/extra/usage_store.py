@@ -0,0 +1,359 @@
+"""Local cache of ``analytics.get_usage`` time buckets, refreshed incrementally."""
+
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from opperai import models
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+def _utc(when: datetime) -> datetime:
+    if when.tzinfo is None:
+        return when.replace(tzinfo=timezone.utc)
+    return when.astimezone(timezone.utc)
+
+
+def bucket_start(when: datetime, granularity: models.Granularity) -> datetime:
+    r"""Start of the UTC bucket of ``granularity`` containing ``when``; naive datetimes are taken as UTC."""
+    when = _utc(when).replace(second=0, microsecond=0)
+    if granularity == models.Granularity.MINUTE:
+        return when
+    when = when.replace(minute=0)
+    if granularity == models.Granularity.HOUR:
+        return when
+    when = when.replace(hour=0)
+    if granularity == models.Granularity.DAY:
+        return when
+    when = when.replace(day=1)
+    if granularity == models.Granularity.MONTH:
+        return when
+    return when.replace(month=1)
+
+
+def bucket_end(start: datetime, granularity: models.Granularity) -> datetime:
+    r"""Start of the bucket following the one that starts at ``start``."""
+    if granularity == models.Granularity.MINUTE:
+        return start + timedelta(minutes=1)
+    if granularity == models.Granularity.HOUR:
+        return start + timedelta(hours=1)
+    if granularity == models.Granularity.DAY:
+        return start + timedelta(days=1)
+    if granularity == models.Granularity.MONTH:
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start.replace(year=start.year + 1)
+
+
+def _stamp(when: datetime) -> str:
+    return when.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse(stamp: str) -> datetime:
+    return datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+
+def series_key(
+    granularity: models.Granularity,
+    fields: Optional[Sequence[str]],
+    group_by: Optional[Sequence[str]],
+) -> str:
+    r"""Identifier of the bucket series that one set of query parameters returns."""
+    return json.dumps(
+        [granularity.value, sorted(fields or []), sorted(group_by or [])],
+        separators=(",", ":"),
+    )
+
+
+def _merge(
+    ranges: List[Tuple[datetime, datetime]], low: datetime, high: datetime
+) -> List[Tuple[datetime, datetime]]:
+    r"""``ranges`` with ``[low, high)`` added, merging ranges that overlap or touch."""
+    merged = []
+    for start, end in ranges:
+        if end < low or high < start:
+            merged.append((start, end))
+        else:
+            low, high = min(low, start), max(high, end)
+    merged.append((low, high))
+    merged.sort()
+    return merged
+
+
+@dataclass
+class UsageStoreStats:
+    queries: int = 0
+    requests: int = 0
+    r"""``analytics.get_usage`` requests sent"""
+    buckets_fetched: int = 0
+    buckets_served: int = 0
+
+
+class UsageStore:
+    r"""``analytics.get_usage`` with a local SQLite cache of its time buckets.
+
+    Results are stored per series, that is per ``granularity``, ``fields`` and
+    ``group_by``, and per bucket. For each series the store remembers the
+    ranges of buckets that had already ended (by more than ``settle``) when
+    they were fetched; those are never requested again. A query only fetches
+    the gaps between those ranges, which for a dashboard that polls up to the
+    present is the last complete bucket onwards, and then answers from the
+    cache.
+
+    Ranges are widened to whole buckets, in UTC.
+
+    :param client: The Opper client
+    :param path: Path of the SQLite database, created if it does not exist
+    :param settle: How long after a bucket ends its usage is taken as final
+    """
+
+    def __init__(
+        self,
+        client: "Opper",
+        path: Union[str, "os.PathLike[str]"],
+        *,
+        settle: timedelta = timedelta(minutes=10),
+    ) -> None:
+        self._client = client
+        self.settle = settle
+        self._stats = UsageStoreStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.fspath(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_buckets (
+                series TEXT NOT NULL,
+                time_bucket TEXT NOT NULL,
+                items TEXT NOT NULL,
+                PRIMARY KEY (series, time_bucket)
+            )
+            """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage_complete (
+                series TEXT NOT NULL,
+                complete_from TEXT NOT NULL,
+                complete_to TEXT NOT NULL,
+                PRIMARY KEY (series, complete_from)
+            )
+            """)
+        self._conn.commit()
+
+    def stats(self) -> UsageStoreStats:
+        with self._lock:
+            return UsageStoreStats(**self._stats.__dict__)
+
+    def _coverage(self, series: str) -> List[Tuple[datetime, datetime]]:
+        r"""The disjoint ranges of final buckets of ``series``, in order; call with the lock held."""
+        rows = self._conn.execute(
+            "SELECT complete_from, complete_to FROM usage_complete "
+            "WHERE series = ? ORDER BY complete_from",
+            (series,),
+        ).fetchall()
+        return [(_parse(low), _parse(high)) for low, high in rows]
+
+    def _plan(
+        self,
+        series: str,
+        granularity: models.Granularity,
+        from_date: datetime,
+        to_date: datetime,
+    ) -> Tuple[datetime, datetime, List[Tuple[datetime, datetime]]]:
+        start = bucket_start(from_date, granularity)
+        end = bucket_start(to_date, granularity)
+        if end < _utc(to_date):
+            end = bucket_end(end, granularity)
+        if end <= start:
+            return start, end, []
+        with self._lock:
+            coverage = self._coverage(series)
+        fetches = []
+        cursor = start
+        for low, high in coverage:
+            if high <= cursor:
+                continue
+            if end <= low:
+                break
+            if cursor < low:
+                fetches.append((cursor, low))
+            cursor = high
+        if cursor < end:
+            fetches.append((cursor, end))
+        return start, end, fetches
+
+    def _store(
+        self,
+        series: str,
+        granularity: models.Granularity,
+        fetched: List[Tuple[datetime, datetime, List[models.GetUsageResultItem]]],
+        now: datetime,
+    ) -> None:
+        horizon = bucket_start(now - self.settle, granularity)
+        with self._lock:
+            coverage = self._coverage(series)
+            for start, end, items in fetched:
+                self._conn.execute(
+                    "DELETE FROM usage_buckets WHERE series = ? "
+                    "AND time_bucket >= ? AND time_bucket < ?",
+                    (series, _stamp(start), _stamp(end)),
+                )
+                buckets: Dict[str, List[Any]] = {}
+                for item in items:
+                    stamp = _stamp(bucket_start(item.time_bucket, granularity))
+                    buckets.setdefault(stamp, []).append(
+                        item.model_dump(mode="json", by_alias=True)
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO usage_buckets (series, time_bucket, items) VALUES (?, ?, ?)",
+                    [
+                        (series, stamp, json.dumps(values, separators=(",", ":")))
+                        for stamp, values in buckets.items()
+                    ],
+                )
+                self._stats.buckets_fetched += len(buckets)
+                complete_end = min(end, horizon)
+                if complete_end > start:
+                    coverage = _merge(coverage, start, complete_end)
+            self._conn.execute("DELETE FROM usage_complete WHERE series = ?", (series,))
+            self._conn.executemany(
+                "INSERT INTO usage_complete (series, complete_from, complete_to) "
+                "VALUES (?, ?, ?)",
+                [(series, _stamp(low), _stamp(high)) for low, high in coverage],
+            )
+            self._conn.commit()
+
+    def _read(
+        self, series: str, start: datetime, end: datetime
+    ) -> List[models.GetUsageResultItem]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT items FROM usage_buckets WHERE series = ? "
+                "AND time_bucket >= ? AND time_bucket < ? ORDER BY time_bucket",
+                (series, _stamp(start), _stamp(end)),
+            ).fetchall()
+            self._stats.buckets_served += len(rows)
+        return [
+            models.GetUsageResultItem.model_validate(item)
+            for (items,) in rows
+            for item in json.loads(items)
+        ]
+
+    def _begin(
+        self,
+        from_date: datetime,
+        to_date: Optional[datetime],
+        granularity: models.Granularity,
+        fields: Optional[Sequence[str]],
+        group_by: Optional[Sequence[str]],
+    ) -> Tuple[str, datetime, datetime, datetime, List[Tuple[datetime, datetime]]]:
+        now = datetime.now(timezone.utc)
+        series = series_key(granularity, fields, group_by)
+        start, end, fetches = self._plan(series, granularity, from_date, to_date or now)
+        with self._lock:
+            self._stats.queries += 1
+            self._stats.requests += len(fetches)
+        return series, start, end, now, fetches
+
+    def get_usage(
+        self,
+        *,
+        from_date: datetime,
+        to_date: Optional[datetime] = None,
+        granularity: models.Granularity = models.Granularity.DAY,
+        fields: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+    ) -> List[models.GetUsageResultItem]:
+        r"""Usage over ``[from_date, to_date)``, fetching only buckets not yet final in the cache.
+
+        :param from_date: Start of the range (inclusive), widened to the start of its bucket
+        :param to_date: End of the range (exclusive), widened to the end of its bucket; now by default
+        :param granularity: Time granularity for grouping
+        :param fields: Fields from event_metadata to include and sum
+        :param group_by: Fields from tags to group by
+        """
+        series, start, end, now, fetches = self._begin(
+            from_date, to_date, granularity, fields, group_by
+        )
+        fetched = [
+            (
+                low,
+                high,
+                self._client.analytics.get_usage(
+                    from_date=low,
+                    to_date=high,
+                    granularity=granularity,
+                    fields=fields,
+                    group_by=group_by,
+                ),
+            )
+            for low, high in fetches
+        ]
+        self._store(series, granularity, fetched, now)
+        return self._read(series, start, end)
+
+    async def get_usage_async(
+        self,
+        *,
+        from_date: datetime,
+        to_date: Optional[datetime] = None,
+        granularity: models.Granularity = models.Granularity.DAY,
+        fields: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+    ) -> List[models.GetUsageResultItem]:
+        r"""Async counterpart of :meth:`get_usage`."""
+        series, start, end, now, fetches = self._begin(
+            from_date, to_date, granularity, fields, group_by
+        )
+        fetched = [
+            (
+                low,
+                high,
+                await self._client.analytics.get_usage_async(
+                    from_date=low,
+                    to_date=high,
+                    granularity=granularity,
+                    fields=fields,
+                    group_by=group_by,
+                ),
+            )
+            for low, high in fetches
+        ]
+        self._store(series, granularity, fetched, now)
+        return self._read(series, start, end)
+
+    def invalidate(
+        self,
+        granularity: Optional[models.Granularity] = None,
+        fields: Optional[Sequence[str]] = None,
+        group_by: Optional[Sequence[str]] = None,
+    ) -> None:
+        r"""Drop one series, or every series when ``granularity`` is not given."""
+        with self._lock:
+            if granularity is None:
+                self._conn.execute("DELETE FROM usage_buckets")
+                self._conn.execute("DELETE FROM usage_complete")
+            else:
+                series = series_key(granularity, fields, group_by)
+                self._conn.execute(
+                    "DELETE FROM usage_buckets WHERE series = ?", (series,)
+                )
+                self._conn.execute(
+                    "DELETE FROM usage_complete WHERE series = ?", (series,)
+                )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "UsageStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
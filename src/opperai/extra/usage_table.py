@@ -0,0 +1,399 @@
+"""Columnar tables of ``analytics.get_usage`` results."""
+
+import heapq
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from opperai import models
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore[assignment]
+
+
+TIME_BUCKET = "time_bucket"
+COST = "cost"
+
+NULL_TIME = -(2**63)
+"""``time_bucket`` of rows that total over time, e.g. from :meth:`UsageTable.group_by` without it; NumPy reads it as ``NaT``."""
+
+UsageItemLike = Union[models.GetUsageResultItem, Mapping[str, Any]]
+
+
+@dataclass
+class DictionaryColumn:
+    r"""A column stored as ``int32`` codes into a list of distinct values."""
+
+    codes: array = field(repr=False)
+    values: List[Any]
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Any:
+        return self.values[self.codes[index]]
+
+    def decode(self) -> List[Any]:
+        values = self.values
+        return [values[c] for c in self.codes]
+
+
+class _Encoder:
+    def __init__(self) -> None:
+        self.codes = array("i")
+        self.values: List[Any] = []
+        self._index: Dict[Any, int] = {}
+
+    def add(self, value: Any) -> None:
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def column(self) -> DictionaryColumn:
+        return DictionaryColumn(self.codes, self.values)
+
+
+def _number(value: Any) -> float:
+    if value is None or value == "":
+        return 0.0
+    return float(value)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class UsageTable:
+    r"""Usage rows held as one contiguous array per column.
+
+    ``time_bucket`` is an ``array('q')`` of UTC epoch seconds, or
+    :data:`NULL_TIME` where a row has none, ``cost`` and every
+    summed ``fields`` value an ``array('d')``, and every ``group_by`` tag a
+    :class:`DictionaryColumn`. Aggregations work on the arrays and codes, and
+    use NumPy when it is installed.
+
+    Build one with :meth:`from_usage`.
+
+    :param time_buckets: UTC epoch seconds of each row's bucket
+    :param metrics: Summable columns, including ``cost``
+    :param dimensions: Dictionary-encoded group-by columns
+    :param use_numpy: Force or disable NumPy; by default it is used when installed
+    """
+
+    def __init__(
+        self,
+        time_buckets: array,
+        metrics: Dict[str, array],
+        dimensions: Dict[str, DictionaryColumn],
+        *,
+        use_numpy: Optional[bool] = None,
+    ) -> None:
+        if use_numpy and np is None:
+            raise ImportError(
+                "use_numpy requires numpy; install it with `pip install numpy`"
+            )
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self.time_buckets = time_buckets
+        self.metrics = metrics
+        self.dimensions = dimensions
+
+    @classmethod
+    def from_usage(
+        cls,
+        items: Iterable[UsageItemLike],
+        *,
+        group_by: Optional[Sequence[str]] = None,
+        fields: Optional[Sequence[str]] = None,
+        use_numpy: Optional[bool] = None,
+    ) -> "UsageTable":
+        r"""Convert ``analytics.get_usage`` results into columns in one pass.
+
+        :param items: ``GetUsageResultItem`` values, or the same rows as dicts
+        :param group_by: The tags the usage was grouped by; by default, every non-numeric extra value of the first row
+        :param fields: The summed fields; by default, every numeric extra value of the first row
+        :param use_numpy: Force or disable NumPy; by default it is used when installed
+        """
+        times = array("q")
+        costs = array("d")
+        metric_arrays: Optional[Dict[str, array]] = None
+        encoders: Dict[str, _Encoder] = {}
+        for item in items:
+            if isinstance(item, models.GetUsageResultItem):
+                when: Any = item.time_bucket
+                cost: Any = item.cost
+                extra: Mapping[str, Any] = item.additional_properties or {}
+            else:
+                when, cost, extra = item[TIME_BUCKET], item[COST], item
+            if metric_arrays is None:
+                names = [k for k in extra if k not in (TIME_BUCKET, COST)]
+                if group_by is None:
+                    group_by = [k for k in names if not _is_number(extra[k])]
+                if fields is None:
+                    fields = [
+                        k for k in names if _is_number(extra[k]) and k not in group_by
+                    ]
+                metric_arrays = {name: array("d") for name in fields}
+                encoders = {name: _Encoder() for name in group_by}
+            if isinstance(when, str):
+                when = datetime.fromisoformat(when.replace("Z", "+00:00"))
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            times.append(int(when.timestamp()))
+            costs.append(_number(cost))
+            for name, values in metric_arrays.items():
+                values.append(_number(extra.get(name)))
+            for name, encoder in encoders.items():
+                encoder.add(extra.get(name))
+        metrics = {COST: costs}
+        if metric_arrays is None:
+            metric_arrays = {name: array("d") for name in fields or []}
+            encoders = {name: _Encoder() for name in group_by or []}
+        metrics.update(metric_arrays)
+        return cls(
+            times,
+            metrics,
+            {name: e.column() for name, e in encoders.items()},
+            use_numpy=use_numpy,
+        )
+
+    def __len__(self) -> int:
+        return len(self.time_buckets)
+
+    @property
+    def columns(self) -> List[str]:
+        return [TIME_BUCKET, *self.dimensions, *self.metrics]
+
+    def column(self, name: str) -> Union[array, List[Any]]:
+        r"""The named column: the array of a metric or of ``time_bucket``, or the decoded values of a dimension."""
+        if name == TIME_BUCKET:
+            return self.time_buckets
+        if name in self.metrics:
+            return self.metrics[name]
+        return self.dimensions[name].decode()
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        r"""Each row as a dict, with ``time_bucket`` as an aware UTC datetime or None."""
+        dims = list(self.dimensions.items())
+        metrics = list(self.metrics.items())
+        for i, ts in enumerate(self.time_buckets):
+            row: Dict[str, Any] = {
+                TIME_BUCKET: (
+                    None
+                    if ts == NULL_TIME
+                    else datetime.fromtimestamp(ts, timezone.utc)
+                )
+            }
+            for name, col in dims:
+                row[name] = col[i]
+            for name, values in metrics:
+                row[name] = values[i]
+            yield row
+
+    def total(self, metric: str = COST) -> float:
+        if self.use_numpy and len(self):
+            return float(np.frombuffer(self.metrics[metric], dtype=np.float64).sum())
+        return sum(self.metrics[metric])
+
+    def _keys(self, by: Sequence[str]) -> List[Tuple[str, Any]]:
+        keys: List[Tuple[str, Any]] = []
+        for name in by:
+            if name == TIME_BUCKET:
+                keys.append((name, self.time_buckets))
+            elif name in self.dimensions:
+                keys.append((name, self.dimensions[name]))
+            else:
+                raise KeyError(f"no dimension named {name!r}")
+        return keys
+
+    def _group_index(self, by: Sequence[str]) -> Tuple[array, List[Tuple[Any, ...]]]:
+        r"""Group number of every row, and the key values of each group in order of first row."""
+        keys = self._keys(by)
+        if self.use_numpy and keys and len(self):
+            return self._group_index_numpy(keys)
+        columns = [col if isinstance(col, array) else col.codes for _, col in keys]
+        groups: Dict[Tuple[int, ...], int] = {}
+        index = array("i", bytes(4 * len(self)))
+        for i, key in enumerate(zip(*columns) if columns else ((),) * len(self)):
+            g = groups.get(key)
+            if g is None:
+                g = groups[key] = len(groups)
+            index[i] = g
+        decoded = [
+            tuple(
+                k if isinstance(col, array) else col.values[k]
+                for k, (_, col) in zip(key, keys)
+            )
+            for key in groups
+        ]
+        return index, decoded
+
+    def _group_index_numpy(
+        self, keys: List[Tuple[str, Any]]
+    ) -> Tuple[array, List[Tuple[Any, ...]]]:
+        combined = np.zeros(len(self), dtype=np.int64)
+        for _, col in keys:
+            if isinstance(col, array):
+                distinct, codes = np.unique(
+                    np.frombuffer(col, dtype=np.int64), return_inverse=True
+                )
+                size = len(distinct)
+            else:
+                codes, size = np.frombuffer(col.codes, dtype=np.int32), len(col.values)
+            combined = combined * max(size, 1) + codes
+        _, first, inverse = np.unique(combined, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind="stable")
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        index = array("i", rank[inverse.reshape(-1)].astype(np.int32).tobytes())
+        decoded = [tuple(col[row] for _, col in keys) for row in first[order].tolist()]
+        return index, decoded
+
+    def _sums(self, index: array, groups: int) -> Dict[str, array]:
+        if self.use_numpy and len(self):
+            idx = np.frombuffer(index, dtype=np.int32)
+            return {
+                name: array(
+                    "d",
+                    np.bincount(
+                        idx,
+                        weights=np.frombuffer(values, dtype=np.float64),
+                        minlength=groups,
+                    ).tobytes(),
+                )
+                for name, values in self.metrics.items()
+            }
+        sums: Dict[str, array] = {}
+        for name, values in self.metrics.items():
+            out = [0.0] * groups
+            for g, v in zip(index, values):
+                out[g] += v
+            sums[name] = array("d", out)
+        return sums
+
+    def _table(
+        self,
+        by: Sequence[str],
+        keys: List[Tuple[Any, ...]],
+        sums: Dict[str, array],
+    ) -> "UsageTable":
+        # Without time_bucket in by, every group totals over time.
+        times = array("q", [NULL_TIME]) * len(keys)
+        dims: Dict[str, DictionaryColumn] = {}
+        for position, name in enumerate(by):
+            if name == TIME_BUCKET:
+                times = array(
+                    "q",
+                    (
+                        NULL_TIME if key[position] is None else key[position]
+                        for key in keys
+                    ),
+                )
+                continue
+            encoder = _Encoder()
+            for key in keys:
+                encoder.add(key[position])
+            dims[name] = encoder.column()
+        return UsageTable(times, sums, dims, use_numpy=self.use_numpy)
+
+    def group_by(self, *by: str) -> "UsageTable":
+        r"""Sum every metric per distinct combination of the ``by`` columns.
+
+        ``by`` names dimensions and may include ``time_bucket``; without it the
+        result's ``time_bucket`` column is :data:`NULL_TIME`, and None in
+        :meth:`rows`. Groups are in order of their first row.
+        """
+        index, keys = self._group_index(by)
+        return self._table(by, keys, self._sums(index, len(keys)))
+
+    def rollup(self, *by: str) -> "UsageTable":
+        r"""Subtotals for each prefix of ``by``, from the full grouping down to the grand total.
+
+        Columns not part of a subtotal's prefix are None in its rows, as in
+        SQL's ``GROUP BY ROLLUP``; in the ``time_bucket`` array they hold
+        :data:`NULL_TIME`.
+        """
+        index, keys = self._group_index(by)
+        level = self._sums(index, len(keys))
+        all_keys = list(keys)
+        all_sums = {name: array("d", values) for name, values in level.items()}
+        for width in range(len(by) - 1, -1, -1):
+            # Each coarser level is summed from the groups of the finest one.
+            parents: Dict[Tuple[Any, ...], int] = {}
+            parent_index = array("i")
+            for key in keys:
+                prefix = key[:width]
+                parent_index.append(parents.setdefault(prefix, len(parents)))
+            for name, values in level.items():
+                out = [0.0] * len(parents)
+                for g, v in zip(parent_index, values):
+                    out[g] += v
+                all_sums[name].extend(out)
+            all_keys.extend(prefix + (None,) * (len(by) - width) for prefix in parents)
+        return self._table(by, all_keys, all_sums)
+
+    def top(self, n: int, *by: str, metric: str = COST) -> "UsageTable":
+        r"""The ``n`` groups of ``by`` with the largest ``metric``, largest first."""
+        grouped = self.group_by(*by)
+        values = grouped.metrics[metric]
+        if grouped.use_numpy and len(grouped) > n:
+            arr = np.frombuffer(values, dtype=np.float64)
+            part = np.argpartition(-arr, n - 1)[:n] if n > 0 else np.array([], int)
+            order = [int(i) for i in part[np.argsort(-arr[part], kind="stable")]]
+        else:
+            order = heapq.nlargest(n, range(len(values)), key=values.__getitem__)
+        return grouped.take(order)
+
+    def take(self, rows: Sequence[int]) -> "UsageTable":
+        r"""A new table with the given rows, in the given order."""
+        return UsageTable(
+            array("q", (self.time_buckets[i] for i in rows)),
+            {
+                name: array("d", (values[i] for i in rows))
+                for name, values in self.metrics.items()
+            },
+            {
+                name: DictionaryColumn(
+                    array("i", (col.codes[i] for i in rows)), col.values
+                )
+                for name, col in self.dimensions.items()
+            },
+            use_numpy=self.use_numpy,
+        )
+
+    def to_numpy(self) -> Dict[str, Any]:
+        r"""Zero-copy NumPy arrays of every column.
+
+        ``time_bucket`` is ``datetime64[s]``, metrics are float64 and dimensions
+        their int32 codes; decode them with :attr:`dimensions`' ``values``.
+        Requires NumPy, which is not a dependency of this package.
+        """
+        if np is None:
+            raise ImportError(
+                "UsageTable.to_numpy requires numpy; install it with `pip install numpy`"
+            )
+        out: Dict[str, Any] = {
+            TIME_BUCKET: np.frombuffer(self.time_buckets, dtype=np.int64).view(
+                "datetime64[s]"
+            )
+        }
+        for name, col in self.dimensions.items():
+            out[name] = np.frombuffer(col.codes, dtype=np.int32)
+        for name, values in self.metrics.items():
+            out[name] = np.frombuffer(values, dtype=np.float64)
+        return out
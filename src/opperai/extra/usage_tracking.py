@@ -0,0 +1,389 @@
+"""In-process totals of the usage and cost reported by function calls."""
+
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import httpx
+
+from .middleware import CallNext, CallNextAsync, RequestMiddleware, add_middleware
+
+if TYPE_CHECKING:
+    from opperai.sdk import Opper
+
+
+CALL_OPERATIONS = frozenset(
+    {
+        "function_call_call_post",
+        "call_function_functions__function_id__call_post",
+        "call_function_revision_functions__function_id__call__revision_id__post",
+    }
+)
+"""Operations whose JSON response carries ``usage``, ``cost`` and ``cached``."""
+
+STREAM_OPERATIONS = frozenset(
+    {
+        "function_stream_call_stream_post",
+        "stream_function_functions__function_id__call_stream_post",
+        "stream_function_revision_functions__function_id__call_stream__revision_id__post",
+    }
+)
+"""Operations whose event stream reports ``usage`` and ``cost`` on its final chunks."""
+
+
+class UsageKey(NamedTuple):
+    function: str
+    r"""Function name, or the function id for calls made by id"""
+    model: str
+    tags: Tuple[Tuple[str, str], ...]
+    r"""The call's tags as sorted ``(name, value)`` pairs"""
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    cached: int = 0
+    r"""Calls answered from the cache"""
+    usage: Dict[str, float] = field(default_factory=dict)
+    r"""Sum of each numeric ``usage`` field; nested fields are joined with dots"""
+    cost: Dict[str, float] = field(default_factory=dict)
+    r"""Sum of each numeric ``cost`` field; nested fields are joined with dots"""
+
+    def merge(self, other: "UsageTotals") -> None:
+        self.calls += other.calls
+        self.cached += other.cached
+        _add_into(self.usage, other.usage)
+        _add_into(self.cost, other.cost)
+
+    def copy(self) -> "UsageTotals":
+        return UsageTotals(self.calls, self.cached, dict(self.usage), dict(self.cost))
+
+
+def _add_into(target: Dict[str, float], values: Dict[str, float]) -> None:
+    for name, value in values.items():
+        target[name] = target.get(name, 0) + value
+
+
+def _flatten(
+    values: Dict[str, Any], prefix: str, out: Dict[str, float]
+) -> Dict[str, float]:
+    for name, value in values.items():
+        path = f"{prefix}{name}"
+        if isinstance(value, dict):
+            _flatten(value, path + ".", out)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = out.get(path, 0) + value
+    return out
+
+
+class UsageSnapshot(Dict[UsageKey, UsageTotals]):
+    r"""Totals per :class:`UsageKey` at the time of the snapshot."""
+
+    def total(self) -> UsageTotals:
+        result = UsageTotals()
+        for totals in self.values():
+            result.merge(totals)
+        return result
+
+    def group_by(self, key: Callable[[UsageKey], Any]) -> Dict[Any, UsageTotals]:
+        r"""Merge the totals of keys that map to the same ``key(usage_key)``."""
+        groups: Dict[Any, UsageTotals] = {}
+        for usage_key, totals in self.items():
+            groups.setdefault(key(usage_key), UsageTotals()).merge(totals)
+        return groups
+
+    def by_function(self) -> Dict[str, UsageTotals]:
+        return self.group_by(lambda k: k.function)
+
+    def by_model(self) -> Dict[str, UsageTotals]:
+        return self.group_by(lambda k: k.model)
+
+    def by_tag(self, tag: str) -> Dict[Optional[str], UsageTotals]:
+        r"""Totals per value of ``tag``, with calls that lack it under None."""
+        return self.group_by(lambda k: dict(k.tags).get(tag))
+
+
+class _Shard:
+    __slots__ = ("lock", "totals")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.totals: Dict[UsageKey, UsageTotals] = {}
+
+
+class UsageAggregator:
+    r"""Running totals of calls, cache hits, tokens and cost per function, model and tags.
+
+    Each thread records into its own shard, whose lock is only ever contended
+    by :meth:`snapshot` and :meth:`reset`, so recording from many threads does
+    not serialize on a shared lock.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(
+        self,
+        key: UsageKey,
+        *,
+        usage: Optional[Dict[str, Any]] = None,
+        cost: Optional[Dict[str, Any]] = None,
+        cached: bool = False,
+    ) -> None:
+        r"""Add one call with the ``usage`` and ``cost`` it reported."""
+        usage_values = _flatten(usage, "", {}) if usage else {}
+        cost_values = _flatten(cost, "", {}) if cost else {}
+        shard = self._shard()
+        with shard.lock:
+            totals = shard.totals.get(key)
+            if totals is None:
+                totals = shard.totals[key] = UsageTotals()
+            totals.calls += 1
+            totals.cached += bool(cached)
+            _add_into(totals.usage, usage_values)
+            _add_into(totals.cost, cost_values)
+
+    def snapshot(self, reset: bool = False) -> UsageSnapshot:
+        r"""Totals across all threads; with ``reset``, also start every total from zero."""
+        result = UsageSnapshot()
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            with shard.lock:
+                totals = shard.totals
+                if reset:
+                    shard.totals = {}
+                else:
+                    totals = {k: t.copy() for k, t in totals.items()}
+            for key, value in totals.items():
+                if key in result:
+                    result[key].merge(value)
+                else:
+                    result[key] = value
+        return result
+
+    def reset(self) -> None:
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            with shard.lock:
+                shard.totals = {}
+
+
+def _model_name(model: Any) -> str:
+    if isinstance(model, str):
+        return model
+    if isinstance(model, dict):
+        return str(model.get("name", ""))
+    if isinstance(model, list):
+        return ",".join(_model_name(m) for m in model)
+    return ""
+
+
+def usage_key(request: httpx.Request) -> UsageKey:
+    r"""The key a call request's usage is recorded under, read from its body and path."""
+    body: Dict[str, Any] = {}
+    if request.content:
+        try:
+            parsed = json.loads(request.content)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            body = parsed
+    function = body.get("name")
+    if not function:
+        parts = request.url.path.split("/")
+        function = parts[parts.index("functions") + 1] if "functions" in parts else ""
+    tags = body.get("tags") or {}
+    return UsageKey(
+        function=str(function),
+        model=_model_name(body.get("model")),
+        tags=tuple(sorted((str(k), str(v)) for k, v in tags.items())),
+    )
+
+
+class _StreamUsage:
+    r"""Picks ``usage``, ``cost`` and ``cached`` out of the events of a streamed call."""
+
+    def __init__(self, aggregator: UsageAggregator, key: UsageKey) -> None:
+        self._aggregator = aggregator
+        self._key = key
+        self._buffer = b""
+        self._usage: Dict[str, Any] = {}
+        self._cost: Dict[str, Any] = {}
+        self._cached = False
+        self._seen = False
+        self._done = False
+
+    def feed(self, data: bytes) -> None:
+        lines = (self._buffer + data).split(b"\n")
+        self._buffer = lines.pop()
+        for line in lines:
+            self._line(line)
+
+    def _line(self, line: bytes) -> None:
+        # Only the few chunks that report usage are parsed.
+        if not line.startswith(b"data:") or not (
+            b'"usage"' in line or b'"cost"' in line or b'"cached"' in line
+        ):
+            return
+        try:
+            event = json.loads(line[5:])
+        except ValueError:
+            return
+        if not isinstance(event, dict):
+            return
+        if isinstance(event.get("usage"), dict):
+            self._usage = event["usage"]
+            self._seen = True
+        if isinstance(event.get("cost"), dict):
+            self._cost = event["cost"]
+            self._seen = True
+        if event.get("cached"):
+            self._cached = True
+
+    def finish(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        if self._buffer:
+            self._line(self._buffer.rstrip(b"\r"))
+        if self._seen or self._cached:
+            self._aggregator.record(
+                self._key, usage=self._usage, cost=self._cost, cached=self._cached
+            )
+
+
+class _TeeStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, usage: _StreamUsage) -> None:
+        self._stream = stream
+        self._usage = usage
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._usage.feed(chunk)
+            yield chunk
+        self._usage.finish()
+
+    def close(self) -> None:
+        self._usage.finish()
+        self._stream.close()
+
+
+class _AsyncTeeStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, usage: _StreamUsage) -> None:
+        self._stream = stream
+        self._usage = usage
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._usage.feed(chunk)
+            yield chunk
+        self._usage.finish()
+
+    async def aclose(self) -> None:
+        self._usage.finish()
+        await self._stream.aclose()
+
+
+class UsageTrackingMiddleware(RequestMiddleware):
+    r"""Records the usage of successful function calls, streamed or not, into an aggregator.
+
+    :param aggregator: Where usage is recorded; a new one by default
+    """
+
+    def __init__(self, aggregator: Optional[UsageAggregator] = None) -> None:
+        self.aggregator = aggregator or UsageAggregator()
+
+    def _observe(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        response: httpx.Response,
+        is_async: bool,
+    ) -> None:
+        operation_id = getattr(hook_ctx, "operation_id", "")
+        if response.status_code != 200:
+            return
+        if operation_id in CALL_OPERATIONS:
+            try:
+                body = json.loads(response.content)
+            except ValueError:
+                return
+            if isinstance(body, dict):
+                self.aggregator.record(
+                    usage_key(request),
+                    usage=body.get("usage"),
+                    cost=body.get("cost"),
+                    cached=bool(body.get("cached")),
+                )
+        elif operation_id in STREAM_OPERATIONS:
+            usage = _StreamUsage(self.aggregator, usage_key(request))
+            try:
+                content = response.content
+            except httpx.ResponseNotRead:
+                if is_async:
+                    response.stream = _AsyncTeeStream(response.stream, usage)  # type: ignore[arg-type]
+                else:
+                    response.stream = _TeeStream(response.stream, usage)  # type: ignore[arg-type]
+                return
+            usage.feed(content)
+            usage.finish()
+
+    def handle(
+        self, hook_ctx: Any, request: httpx.Request, stream: bool, call_next: CallNext
+    ) -> httpx.Response:
+        response = call_next()
+        self._observe(hook_ctx, request, response, False)
+        return response
+
+    async def handle_async(
+        self,
+        hook_ctx: Any,
+        request: httpx.Request,
+        stream: bool,
+        call_next: CallNextAsync,
+    ) -> httpx.Response:
+        response = await call_next()
+        self._observe(hook_ctx, request, response, True)
+        return response
+
+
+def track_usage(
+    client: "Opper", aggregator: Optional[UsageAggregator] = None
+) -> UsageAggregator:
+    r"""Record the usage and cost of every function call ``client`` makes.
+
+    Covers ``call``, ``functions.call`` and ``functions.call_revision`` and their
+    streaming counterparts, whose usage is taken from the final chunks once the
+    stream has been read or closed.
+
+    :param client: The Opper client
+    :param aggregator: Aggregator to record into, shared between clients if given
+    :return: The aggregator usage is recorded into
+    """
+    middleware = UsageTrackingMiddleware(aggregator)
+    add_middleware(client, middleware)
+    return middleware.aggregator
@@ -0,0 +1,371 @@
+"""Exact top-k similarity search over locally held embedding vectors."""
+
+import heapq
+import math
+import operator
+from array import array
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from opperai import models, utils
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from .embedding_cache import EmbeddingCache
+
+
+Metric = Literal["cosine", "dot"]
+
+FilterLike = Union[models.Filter, models.FilterTypedDict]
+
+
+def _compare(op: models.Op, actual: Any, expected: Any) -> bool:
+    try:
+        if op == models.Op.EQUAL_:
+            return actual == expected
+        if op == models.Op.NOT_EQUAL_:
+            return actual != expected
+        if op == models.Op.GREATER_THAN_:
+            return actual > expected
+        if op == models.Op.LESS_THAN_:
+            return actual < expected
+        if op == models.Op.IN:
+            return actual in expected
+    except TypeError:
+        return False
+    raise ValueError(f"unsupported filter operation: {op}")
+
+
+def matches_filters(
+    metadata: Optional[Mapping[str, Any]], filters: Sequence[models.Filter]
+) -> bool:
+    r"""Whether ``metadata`` satisfies every filter, as ``knowledge.query`` applies them.
+
+    A missing field only satisfies ``!=``.
+    """
+    metadata = metadata or {}
+    for f in filters:
+        if f.field not in metadata:
+            if f.operation != models.Op.NOT_EQUAL_:
+                return False
+            continue
+        if not _compare(f.operation, metadata[f.field], f.value):
+            return False
+    return True
+
+
+@dataclass
+class SearchHit:
+    key: str
+    score: float
+    metadata: Optional[Dict[str, Any]]
+    position: int
+    r"""Row of the vector in the index."""
+
+
+def _norm(vector: Sequence[float]) -> float:
+    return math.sqrt(sum(x * x for x in vector))
+
+
+class VectorIndex:
+    r"""Brute-force exact nearest-neighbour search over float32 vectors.
+
+    Vectors live in one contiguous float32 buffer: an ``array('f')`` for
+    vectors added in memory, or a read-only view of an :class:`EmbeddingCache`
+    data file for :meth:`from_embedding_cache`, which loads without copying.
+    Scores are computed block by block; with NumPy installed each block is a
+    single matrix multiply against all queries, otherwise a pure-Python loop
+    is used, which is only practical for small indexes.
+
+    :param dimensions: Length of every vector
+    :param metric: ``"cosine"`` or ``"dot"`` similarity
+    :param block_size: Number of vectors scored per block
+    :param use_numpy: Force or disable NumPy; by default it is used when installed
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        *,
+        metric: Metric = "cosine",
+        block_size: int = 4096,
+        use_numpy: Optional[bool] = None,
+    ) -> None:
+        if metric not in ("cosine", "dot"):
+            raise ValueError(f"unsupported metric: {metric}")
+        if use_numpy and np is None:
+            raise ImportError(
+                "use_numpy requires numpy; install it with `pip install numpy`"
+            )
+        self.dimensions = dimensions
+        self.metric = metric
+        self.block_size = block_size
+        self.use_numpy = np is not None if use_numpy is None else use_numpy
+        self._buffer: Union[array, memoryview] = array("f")
+        self._starts = array("q")
+        self._norms = array("f")
+        self._keys: List[str] = []
+        self._metadata: List[Optional[Dict[str, Any]]] = []
+        self._contiguous = True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _writable(self) -> array:
+        if isinstance(self._buffer, memoryview):
+            # Adding to an index loaded from a cache file copies its vectors once.
+            buffer = array("f")
+            for start in self._starts:
+                buffer.extend(self._buffer[start : start + self.dimensions])
+            self._buffer = buffer
+            self._starts = array("q", range(0, len(buffer), self.dimensions))
+            self._contiguous = True
+        return self._buffer
+
+    def add(
+        self,
+        key: str,
+        vector: Sequence[float],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        r"""Add one vector with an optional metadata dict used by filters."""
+        self.add_many([(key, vector, metadata)])
+
+    def add_many(
+        self,
+        items: Iterable[Tuple[str, Sequence[float], Optional[Dict[str, Any]]]],
+    ) -> None:
+        r"""Add ``(key, vector, metadata)`` triples."""
+        buffer = self._writable()
+        for key, vector, metadata in items:
+            if len(vector) != self.dimensions:
+                raise ValueError(
+                    f"vector for {key!r} has {len(vector)} dimensions, expected {self.dimensions}"
+                )
+            self._starts.append(len(buffer))
+            buffer.extend(vector)
+            self._norms.append(_norm(vector))
+            self._keys.append(key)
+            self._metadata.append(metadata)
+
+    @classmethod
+    def from_embedding_cache(
+        cls,
+        cache: "EmbeddingCache",
+        model: str = "",
+        texts: Optional[Sequence[str]] = None,
+        *,
+        keys: Optional[Sequence[str]] = None,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+        metric: Metric = "cosine",
+        block_size: int = 4096,
+        use_numpy: Optional[bool] = None,
+    ) -> "VectorIndex":
+        r"""Index vectors straight from an embedding cache's memory-mapped file.
+
+        :param cache: The embedding cache
+        :param model: Cache key of the embedding model, see :func:`model_key`
+        :param texts: Texts to index, in order; by default every vector of ``model``.
+            Texts missing from the cache are skipped.
+        :param keys: Keys reported in hits, defaults to the texts or, without texts,
+            the hex SHA-256 of each text
+        :param metadata: Metadata for each text, used by filters
+        :param metric: ``"cosine"`` or ``"dot"`` similarity
+        :param block_size: Number of vectors scored per block
+        :param use_numpy: Force or disable NumPy; by default it is used when installed
+        """
+        view, locations = cache.locate(model, texts)
+        if keys is None and texts is not None:
+            keys = texts
+        entries = [(i, loc) for i, loc in enumerate(locations) if loc is not None]
+        dims = {loc[2] for _, loc in entries}
+        if len(dims) > 1:
+            raise ValueError(
+                f"vectors of {model!r} have mixed dimensions: {sorted(dims)}"
+            )
+        index = cls(
+            dims.pop() if dims else 0,
+            metric=metric,
+            block_size=block_size,
+            use_numpy=use_numpy,
+        )
+        index._buffer = view
+        for i, (h, start, _) in entries:
+            index._starts.append(start)
+            index._keys.append(keys[i] if keys is not None else h.hex())
+            index._metadata.append(metadata[i] if metadata is not None else None)
+        index._contiguous = all(
+            start == row * index.dimensions for row, start in enumerate(index._starts)
+        )
+        index._compute_norms()
+        return index
+
+    def _compute_norms(self) -> None:
+        if self.use_numpy and len(self) and self._contiguous:
+            matrix = self._matrix()
+            norms = np.empty(len(self), dtype=np.float32)
+            for b0 in range(0, len(self), self.block_size):
+                norms[b0 : b0 + self.block_size] = np.linalg.norm(
+                    matrix[b0 : b0 + self.block_size], axis=1
+                )
+            self._norms = array("f", norms.tobytes())
+            return
+        view = memoryview(self._buffer)
+        self._norms = array(
+            "f", (_norm(view[s : s + self.dimensions]) for s in self._starts)
+        )
+
+    def _matrix(self) -> Any:
+        flat = np.frombuffer(self._buffer, dtype=np.float32)
+        return flat[: len(self) * self.dimensions].reshape(len(self), self.dimensions)
+
+    def _candidates(
+        self, filters: Optional[Sequence[FilterLike]]
+    ) -> Optional[List[int]]:
+        if not filters:
+            return None
+        parsed = [utils.get_pydantic_model(f, models.Filter) for f in filters]
+        return [
+            i for i, meta in enumerate(self._metadata) if matches_filters(meta, parsed)
+        ]
+
+    def search(
+        self,
+        query: Sequence[float],
+        top_k: int = 10,
+        filters: Optional[Sequence[FilterLike]] = None,
+    ) -> List[SearchHit]:
+        r"""The ``top_k`` vectors most similar to ``query``, best first.
+
+        :param query: The query vector
+        :param top_k: Number of hits to return
+        :param filters: Metadata filters, combined with AND, applied before scoring
+        """
+        return self.search_many([query], top_k, filters)[0]
+
+    def search_many(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int = 10,
+        filters: Optional[Sequence[FilterLike]] = None,
+    ) -> List[List[SearchHit]]:
+        r"""Batched :meth:`search`; every query is scored in the same pass over the vectors."""
+        for q in queries:
+            if len(q) != self.dimensions:
+                raise ValueError(
+                    f"query has {len(q)} dimensions, expected {self.dimensions}"
+                )
+        candidates = self._candidates(filters)
+        if not queries or top_k <= 0 or len(self) == 0 or candidates == []:
+            return [[] for _ in queries]
+        if self.use_numpy:
+            ranked = self._search_numpy(queries, top_k, candidates)
+        else:
+            ranked = self._search_python(queries, top_k, candidates)
+        return [
+            [SearchHit(self._keys[i], score, self._metadata[i], i) for score, i in hits]
+            for hits in ranked
+        ]
+
+    def _search_numpy(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int,
+        candidates: Optional[List[int]],
+    ) -> List[List[Tuple[float, int]]]:
+        q = np.asarray(queries, dtype=np.float32)
+        norms = np.frombuffer(self._norms, dtype=np.float32)
+        if self.metric == "cosine":
+            q_norms = np.linalg.norm(q, axis=1, keepdims=True)
+            q = np.divide(q, q_norms, out=np.zeros_like(q), where=q_norms > 0)
+        rows = (
+            np.arange(len(self))
+            if candidates is None
+            else np.asarray(candidates, dtype=np.int64)
+        )
+        flat = np.frombuffer(self._buffer, dtype=np.float32)
+        starts = np.frombuffer(self._starts, dtype=np.int64)
+        matrix = self._matrix() if self._contiguous else None
+
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        best_rows = np.empty((len(q), 0), dtype=np.int64)
+        for b0 in range(0, len(rows), self.block_size):
+            block_rows = rows[b0 : b0 + self.block_size]
+            if matrix is not None and candidates is None:
+                block = matrix[block_rows[0] : block_rows[-1] + 1]
+            elif matrix is not None:
+                block = matrix[block_rows]
+            else:
+                block = np.stack(
+                    [flat[s : s + self.dimensions] for s in starts[block_rows]]
+                )
+            scores = q @ block.T
+            if self.metric == "cosine":
+                block_norms = norms[block_rows]
+                scores = np.divide(
+                    scores,
+                    block_norms,
+                    out=np.zeros_like(scores),
+                    where=block_norms > 0,
+                )
+            scores = np.concatenate([best_scores, scores], axis=1)
+            ids = np.concatenate(
+                [best_rows, np.broadcast_to(block_rows, (len(q), len(block_rows)))],
+                axis=1,
+            )
+            k = min(top_k, scores.shape[1])
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, keep, axis=1)
+            best_rows = np.take_along_axis(ids, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            list(zip(s.tolist(), r.tolist())) for s, r in zip(best_scores, best_rows)
+        ]
+
+    def _search_python(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int,
+        candidates: Optional[List[int]],
+    ) -> List[List[Tuple[float, int]]]:
+        view = memoryview(self._buffer)
+        q_norms = [_norm(q) for q in queries]
+        heaps: List[List[Tuple[float, int]]] = [[] for _ in queries]
+        rows: Iterable[int] = range(len(self)) if candidates is None else candidates
+        dims = self.dimensions
+        for i in rows:
+            start = self._starts[i]
+            vector = view[start : start + dims]
+            for qi, q in enumerate(queries):
+                score = sum(map(operator.mul, vector, q))
+                if self.metric == "cosine":
+                    denom = self._norms[i] * q_norms[qi]
+                    score = score / denom if denom > 0 else 0.0
+                heap = heaps[qi]
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (score, -i))
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, (score, -i))
+        return [
+            [(score, -neg) for score, neg in sorted(heap, reverse=True)]
+            for heap in heaps
+        ]
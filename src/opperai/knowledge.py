@@ -8,6 +8,14 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, Dict, List, Mapping, Optional, Union
 
+# region imports
+from typing import TYPE_CHECKING, Literal, Sequence
+
+if TYPE_CHECKING:
+    from opperai.extra.multiquery import KnowledgeQueryLike, MultiQueryResult
+    from opperai.extra.streamed_responses import AsyncStreamedItems, StreamedItems
+# endregion imports
+
 
 class Knowledge(BaseSDK):
     def create(
@@ -3463,3 +3471,162 @@ class Knowledge(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def query_many(
+        self,
+        queries: Sequence["KnowledgeQueryLike"],
+        *,
+        knowledge_base_id: Optional[str] = None,
+        concurrency: int = 8,
+        rrf_k: int = 60,
+        dedupe_by: Literal["id", "key"] = "id",
+        return_exceptions: bool = False,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        timeout_ms: Optional[int] = None,
+    ) -> "MultiQueryResult":
+        r"""Query Knowledge Bases Concurrently
+
+        Run several queries concurrently, sharing one request between identical
+        queries in flight, and fuse their results with reciprocal-rank fusion.
+
+        :param queries: Query strings, KnowledgeQuery objects or mappings of their fields
+        :param knowledge_base_id: Knowledge base for queries that do not name one
+        :param concurrency: Maximum number of requests in flight
+        :param rrf_k: Rank offset used by reciprocal-rank fusion
+        :param dedupe_by: Document field that identifies duplicates when fusing
+        :param return_exceptions: Record failed queries in the result instead of raising
+        :param retries: Override the default retry configuration for each query
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        """
+        from opperai.extra.multiquery import query_many
+
+        return query_many(
+            self,
+            queries,
+            knowledge_base_id=knowledge_base_id,
+            concurrency=concurrency,
+            rrf_k=rrf_k,
+            dedupe_by=dedupe_by,
+            return_exceptions=return_exceptions,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    async def query_many_async(
+        self,
+        queries: Sequence["KnowledgeQueryLike"],
+        *,
+        knowledge_base_id: Optional[str] = None,
+        concurrency: int = 8,
+        rrf_k: int = 60,
+        dedupe_by: Literal["id", "key"] = "id",
+        return_exceptions: bool = False,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        timeout_ms: Optional[int] = None,
+    ) -> "MultiQueryResult":
+        r"""Query Knowledge Bases Concurrently
+
+        Run several queries concurrently, sharing one request between identical
+        queries in flight, and fuse their results with reciprocal-rank fusion.
+
+        :param queries: Query strings, KnowledgeQuery objects or mappings of their fields
+        :param knowledge_base_id: Knowledge base for queries that do not name one
+        :param concurrency: Maximum number of requests in flight
+        :param rrf_k: Rank offset used by reciprocal-rank fusion
+        :param dedupe_by: Document field that identifies duplicates when fusing
+        :param return_exceptions: Record failed queries in the result instead of raising
+        :param retries: Override the default retry configuration for each query
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        """
+        from opperai.extra.multiquery import query_many_async
+
+        return await query_many_async(
+            self,
+            queries,
+            knowledge_base_id=knowledge_base_id,
+            concurrency=concurrency,
+            rrf_k=rrf_k,
+            dedupe_by=dedupe_by,
+            return_exceptions=return_exceptions,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    def list_files_streamed(
+        self,
+        *,
+        knowledge_base_id: str,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "StreamedItems[models.ListFilesResponse, models.PaginatedResponseListFilesResponse]":
+        r"""List Files Streamed
+
+        List files like `list_files`, decoding the response as it arrives.
+        Iterate the result to receive files one at a time; its `envelope`
+        then holds the pagination metadata.
+
+        :param knowledge_base_id: The id of the knowledge base to list files from
+        :param offset: The offset to start the list from
+        :param limit: The number of files to return
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_responses import stream_knowledge_files
+
+        return stream_knowledge_files(
+            self,
+            knowledge_base_id=knowledge_base_id,
+            offset=offset,
+            limit=limit,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    async def list_files_streamed_async(
+        self,
+        *,
+        knowledge_base_id: str,
+        offset: Optional[int] = 0,
+        limit: Optional[int] = 100,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "AsyncStreamedItems[models.ListFilesResponse, models.PaginatedResponseListFilesResponse]":
+        r"""List Files Streamed
+
+        List files like `list_files`, decoding the response as it arrives.
+        Iterate the result with `async for` to receive files one at a time; its `envelope`
+        then holds the pagination metadata.
+
+        :param knowledge_base_id: The id of the knowledge base to list files from
+        :param offset: The offset to start the list from
+        :param limit: The number of files to return
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_responses import stream_knowledge_files_async
+
+        return await stream_knowledge_files_async(
+            self,
+            knowledge_base_id=knowledge_base_id,
+            offset=offset,
+            limit=limit,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    # endregion sdk-class-body
@@ -8,6 +8,18 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, List, Mapping, Optional, Union
 
+# region imports
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    from opperai.extra.sharded_ocr import AsyncOCRPageStream, OCRPageStream
+    from opperai.extra.streamed_ocr import (
+        AsyncStreamedOCRResponse,
+        ImageSink,
+        StreamedOCRResponse,
+    )
+# endregion imports
+
 
 class Ocr(BaseSDK):
     def process_ocr_ocr_post(
@@ -481,3 +493,236 @@ class Ocr(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def process_sharded(
+        self,
+        *,
+        model: str,
+        document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+        pages: Optional[Sequence[int]] = None,
+        page_count: Optional[int] = None,
+        pages_per_shard: int = 10,
+        concurrency: int = 4,
+        max_attempts: int = 3,
+        ordered: bool = True,
+        include_image_base64: Optional[bool] = False,
+        image_limit: OptionalNullable[int] = UNSET,
+        image_min_size: OptionalNullable[int] = UNSET,
+        mistral_extra: OptionalNullable[
+            Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+        ] = UNSET,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        timeout_ms: Optional[int] = None,
+    ) -> "OCRPageStream":
+        r"""Process Ocr in Page Shards
+
+        Process a large document as concurrent requests over ranges of its pages.
+        A shard that fails is retried on its own. Iterate the returned stream to
+        receive pages as their shards complete, or call `collect()` for the
+        merged response.
+
+        :param model: The OCR model to use
+        :param document: Document specification for OCR processing.
+        :param pages: Specific page indices to process (0-based)
+        :param page_count: Number of pages in the document, used when pages is not given
+        :param pages_per_shard: Number of pages per request
+        :param concurrency: Maximum number of requests in flight
+        :param max_attempts: Attempts per shard before the whole run fails
+        :param ordered: Yield pages in index order rather than as shards complete
+        :param include_image_base64: Whether to include base64-encoded images in the response
+        :param image_limit: Maximum number of images to extract per page
+        :param image_min_size: Minimum size (width or height in pixels) for images to be included
+        :param mistral_extra: Mistral-specific OCR parameters
+        :param retries: Override the default retry configuration for each request
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        """
+        from opperai.extra.sharded_ocr import iter_ocr_pages
+
+        return iter_ocr_pages(
+            self,
+            model=model,
+            document=document,
+            pages=pages,
+            page_count=page_count,
+            pages_per_shard=pages_per_shard,
+            concurrency=concurrency,
+            max_attempts=max_attempts,
+            ordered=ordered,
+            include_image_base64=include_image_base64,
+            image_limit=image_limit,
+            image_min_size=image_min_size,
+            mistral_extra=mistral_extra,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    async def process_sharded_async(
+        self,
+        *,
+        model: str,
+        document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+        pages: Optional[Sequence[int]] = None,
+        page_count: Optional[int] = None,
+        pages_per_shard: int = 10,
+        concurrency: int = 4,
+        max_attempts: int = 3,
+        ordered: bool = True,
+        include_image_base64: Optional[bool] = False,
+        image_limit: OptionalNullable[int] = UNSET,
+        image_min_size: OptionalNullable[int] = UNSET,
+        mistral_extra: OptionalNullable[
+            Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+        ] = UNSET,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        timeout_ms: Optional[int] = None,
+    ) -> "AsyncOCRPageStream":
+        r"""Process Ocr in Page Shards
+
+        Process a large document as concurrent requests over ranges of its pages.
+        A shard that fails is retried on its own. Await this method, then
+        iterate the returned stream with `async for` to receive pages as their
+        shards complete, or await `collect()` for the merged response.
+
+        :param model: The OCR model to use
+        :param document: Document specification for OCR processing.
+        :param pages: Specific page indices to process (0-based)
+        :param page_count: Number of pages in the document, used when pages is not given
+        :param pages_per_shard: Number of pages per request
+        :param concurrency: Maximum number of requests in flight
+        :param max_attempts: Attempts per shard before the whole run fails
+        :param ordered: Yield pages in index order rather than as shards complete
+        :param include_image_base64: Whether to include base64-encoded images in the response
+        :param image_limit: Maximum number of images to extract per page
+        :param image_min_size: Minimum size (width or height in pixels) for images to be included
+        :param mistral_extra: Mistral-specific OCR parameters
+        :param retries: Override the default retry configuration for each request
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        """
+        from opperai.extra.sharded_ocr import iter_ocr_pages_async
+
+        return await iter_ocr_pages_async(
+            self,
+            model=model,
+            document=document,
+            pages=pages,
+            page_count=page_count,
+            pages_per_shard=pages_per_shard,
+            concurrency=concurrency,
+            max_attempts=max_attempts,
+            ordered=ordered,
+            include_image_base64=include_image_base64,
+            image_limit=image_limit,
+            image_min_size=image_min_size,
+            mistral_extra=mistral_extra,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    def process_streamed(
+        self,
+        *,
+        model: str,
+        document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+        pages: OptionalNullable[List[int]] = UNSET,
+        image_limit: OptionalNullable[int] = UNSET,
+        image_min_size: OptionalNullable[int] = UNSET,
+        mistral_extra: OptionalNullable[
+            Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+        ] = UNSET,
+        sink: Optional["ImageSink"] = None,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "StreamedOCRResponse":
+        r"""Process Ocr with Streamed Images
+
+        Process a document with base64 page images like `process_ocr_ocr_post`,
+        parsing the response as it arrives. Iterate the result to receive
+        pages one at a time; their images are decoded into `sink`, temporary
+        files by default, and read back only when accessed.
+
+        :param model: The OCR model to use
+        :param document: Document specification for OCR processing.
+        :param pages: Specific page indices to process (0-based). If not specified, all pages are processed.
+        :param image_limit: Maximum number of images to extract per page
+        :param image_min_size: Minimum size (width or height in pixels) for images to be included
+        :param mistral_extra: Mistral-specific OCR parameters
+        :param sink: Where to store page images
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_ocr import process_streamed
+
+        return process_streamed(
+            self,
+            model=model,
+            document=document,
+            pages=pages,
+            image_limit=image_limit,
+            image_min_size=image_min_size,
+            mistral_extra=mistral_extra,
+            sink=sink,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    async def process_streamed_async(
+        self,
+        *,
+        model: str,
+        document: Union[models.OCRDocument, models.OCRDocumentTypedDict],
+        pages: OptionalNullable[List[int]] = UNSET,
+        image_limit: OptionalNullable[int] = UNSET,
+        image_min_size: OptionalNullable[int] = UNSET,
+        mistral_extra: OptionalNullable[
+            Union[models.MistralOCRExtra, models.MistralOCRExtraTypedDict]
+        ] = UNSET,
+        sink: Optional["ImageSink"] = None,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "AsyncStreamedOCRResponse":
+        r"""Process Ocr with Streamed Images
+
+        Process a document with base64 page images like `process_ocr_ocr_post`,
+        parsing the response as it arrives. Iterate the result with `async for` to receive
+        pages one at a time; their images are decoded into `sink`, temporary
+        files by default, and read back only when accessed.
+
+        :param model: The OCR model to use
+        :param document: Document specification for OCR processing.
+        :param pages: Specific page indices to process (0-based). If not specified, all pages are processed.
+        :param image_limit: Maximum number of images to extract per page
+        :param image_min_size: Minimum size (width or height in pixels) for images to be included
+        :param mistral_extra: Mistral-specific OCR parameters
+        :param sink: Where to store page images
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_ocr import process_streamed_async
+
+        return await process_streamed_async(
+            self,
+            model=model,
+            document=document,
+            pages=pages,
+            image_limit=image_limit,
+            image_min_size=image_min_size,
+            mistral_extra=mistral_extra,
+            sink=sink,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    # endregion sdk-class-body
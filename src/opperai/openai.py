@@ -8,6 +8,16 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, Mapping, Optional, Union, cast
 
+# region imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from opperai.extra.chat_stream import (
+        AsyncChatCompletionStream,
+        ChatCompletionStream,
+    )
+# endregion imports
+
 
 class Openai(BaseSDK):
     def create_chat_completion(
@@ -217,3 +227,72 @@ class Openai(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def create_chat_completion_stream(
+        self,
+        *,
+        request: Union[models.Payload, models.PayloadTypedDict],
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "ChatCompletionStream":
+        r"""Chat Completions Stream
+
+        Send the request with `stream` set and iterate the returned stream for
+        chunk deltas as they arrive. The stream accumulates the final message
+        and tool calls, records the time to the first token, and exposes the
+        usage sent on the final chunk.
+
+        :param request: The request object to send. `stream` is set to true, and `stream_options.include_usage` defaults to true.
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.chat_stream import create_chat_completion_stream
+
+        return create_chat_completion_stream(
+            self,
+            request=request,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    async def create_chat_completion_stream_async(
+        self,
+        *,
+        request: Union[models.Payload, models.PayloadTypedDict],
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "AsyncChatCompletionStream":
+        r"""Chat Completions Stream
+
+        Send the request with `stream` set and iterate the returned stream for
+        chunk deltas as they arrive. The stream accumulates the final message
+        and tool calls, records the time to the first token, and exposes the
+        usage sent on the final chunk.
+
+        :param request: The request object to send. `stream` is set to true, and `stream_options.include_usage` defaults to true.
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.chat_stream import create_chat_completion_stream_async
+
+        return await create_chat_completion_stream_async(
+            self,
+            request=request,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    # endregion sdk-class-body
@@ -8,6 +8,13 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, List, Mapping, Optional, Union
 
+# region imports
+from typing import TYPE_CHECKING, Callable, Sequence
+
+if TYPE_CHECKING:
+    from opperai.extra.sharded_rerank import ShardedRerankResponse
+# endregion imports
+
 
 class Rerank(BaseSDK):
     def documents(
@@ -471,3 +478,122 @@ class Rerank(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def documents_sharded(
+        self,
+        *,
+        query: str,
+        documents: Union[
+            Sequence[models.RerankDocument], Sequence[models.RerankDocumentTypedDict]
+        ],
+        model: str,
+        top_k: Optional[int] = None,
+        return_documents: Optional[bool] = True,
+        max_chunks_per_doc: OptionalNullable[int] = UNSET,
+        max_shard_documents: Optional[int] = None,
+        max_shard_bytes: Optional[int] = None,
+        concurrency: int = 4,
+        prefilter: Union[bool, Callable[[str, Sequence[str]], Sequence[float]]] = False,
+        prefilter_top_n: Optional[int] = None,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        timeout_ms: Optional[int] = None,
+    ) -> "ShardedRerankResponse":
+        r"""Rerank Many Documents
+
+        Rerank any number of documents by splitting them into size-bounded
+        requests sent concurrently, merging the results by relevance score into
+        a global top_k whose indexes refer to the documents passed in.
+
+        :param query: The search query to rank documents against
+        :param documents: List of documents to rerank
+        :param model: The reranking model to use
+        :param top_k: Number of top documents to return. Defaults to all documents.
+        :param return_documents: Whether to return document content in the results
+        :param max_chunks_per_doc: Maximum number of chunks per document
+        :param max_shard_documents: Maximum number of documents per request, by default `DEFAULT_MAX_SHARD_DOCUMENTS` from `opperai.extra.sharded_rerank`
+        :param max_shard_bytes: Approximate maximum size of the documents in one request, by default `DEFAULT_MAX_SHARD_BYTES`
+        :param concurrency: Maximum number of requests in flight
+        :param prefilter: Score documents locally first and only rerank the best ones; True uses BM25, or pass a scoring function
+        :param prefilter_top_n: Documents kept by the pre-filter, by default max(4 * top_k, max_shard_documents)
+        :param retries: Override the default retry configuration for each request
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        """
+        from opperai.extra.sharded_rerank import rerank_sharded
+
+        return rerank_sharded(
+            self,
+            query=query,
+            documents=documents,
+            model=model,
+            top_k=top_k,
+            return_documents=return_documents,
+            max_chunks_per_doc=max_chunks_per_doc,
+            max_shard_documents=max_shard_documents,
+            max_shard_bytes=max_shard_bytes,
+            concurrency=concurrency,
+            prefilter=prefilter,
+            prefilter_top_n=prefilter_top_n,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    async def documents_sharded_async(
+        self,
+        *,
+        query: str,
+        documents: Union[
+            Sequence[models.RerankDocument], Sequence[models.RerankDocumentTypedDict]
+        ],
+        model: str,
+        top_k: Optional[int] = None,
+        return_documents: Optional[bool] = True,
+        max_chunks_per_doc: OptionalNullable[int] = UNSET,
+        max_shard_documents: Optional[int] = None,
+        max_shard_bytes: Optional[int] = None,
+        concurrency: int = 4,
+        prefilter: Union[bool, Callable[[str, Sequence[str]], Sequence[float]]] = False,
+        prefilter_top_n: Optional[int] = None,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        timeout_ms: Optional[int] = None,
+    ) -> "ShardedRerankResponse":
+        r"""Rerank Many Documents
+
+        Rerank any number of documents by splitting them into size-bounded
+        requests sent concurrently, merging the results by relevance score into
+        a global top_k whose indexes refer to the documents passed in.
+
+        :param query: The search query to rank documents against
+        :param documents: List of documents to rerank
+        :param model: The reranking model to use
+        :param top_k: Number of top documents to return. Defaults to all documents.
+        :param return_documents: Whether to return document content in the results
+        :param max_chunks_per_doc: Maximum number of chunks per document
+        :param max_shard_documents: Maximum number of documents per request, by default `DEFAULT_MAX_SHARD_DOCUMENTS` from `opperai.extra.sharded_rerank`
+        :param max_shard_bytes: Approximate maximum size of the documents in one request, by default `DEFAULT_MAX_SHARD_BYTES`
+        :param concurrency: Maximum number of requests in flight
+        :param prefilter: Score documents locally first and only rerank the best ones; True uses BM25, or pass a scoring function
+        :param prefilter_top_n: Documents kept by the pre-filter, by default max(4 * top_k, max_shard_documents)
+        :param retries: Override the default retry configuration for each request
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        """
+        from opperai.extra.sharded_rerank import rerank_sharded_async
+
+        return await rerank_sharded_async(
+            self,
+            query=query,
+            documents=documents,
+            model=model,
+            top_k=top_k,
+            return_documents=return_documents,
+            max_chunks_per_doc=max_chunks_per_doc,
+            max_shard_documents=max_shard_documents,
+            max_shard_bytes=max_shard_bytes,
+            concurrency=concurrency,
+            prefilter=prefilter,
+            prefilter_top_n=prefilter_top_n,
+            retries=retries,
+            timeout_ms=timeout_ms,
+        )
+
+    # endregion sdk-class-body
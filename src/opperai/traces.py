@@ -8,6 +8,13 @@ from opperai.utils import get_security_from_env
 from opperai.utils.unmarshal_json_response import unmarshal_json_response
 from typing import Any, Mapping, Optional
 
+# region imports
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from opperai.extra.streamed_responses import AsyncStreamedItems, StreamedItems
+# endregion imports
+
 
 class Traces(BaseSDK):
     def list(
@@ -437,3 +444,70 @@ class Traces(BaseSDK):
             raise errors.APIError("API error occurred", http_res, http_res_text)
 
         raise errors.APIError("Unexpected response received", http_res)
+
+    # region sdk-class-body
+    def get_streamed(
+        self,
+        *,
+        trace_id: str,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "StreamedItems[models.SpanSchema, models.GetTraceResponse]":
+        r"""Get Trace Streamed
+
+        Get a trace like `get`, decoding the response as it arrives. Iterate the
+        result to receive spans one at a time; its `envelope` then holds
+        the trace without its spans.
+
+        :param trace_id: The id of the trace to get
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_responses import stream_trace_spans
+
+        return stream_trace_spans(
+            self,
+            trace_id=trace_id,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    async def get_streamed_async(
+        self,
+        *,
+        trace_id: str,
+        retries: OptionalNullable[utils.RetryConfig] = UNSET,
+        server_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        http_headers: Optional[Mapping[str, str]] = None,
+    ) -> "AsyncStreamedItems[models.SpanSchema, models.GetTraceResponse]":
+        r"""Get Trace Streamed
+
+        Get a trace like `get`, decoding the response as it arrives. Iterate the
+        result with `async for` to receive spans one at a time; its `envelope` then holds
+        the trace without its spans.
+
+        :param trace_id: The id of the trace to get
+        :param retries: Override the default retry configuration for this method
+        :param server_url: Override the default server URL for this method
+        :param timeout_ms: Override the default request timeout configuration for this method in milliseconds
+        :param http_headers: Additional headers to set or replace on requests.
+        """
+        from opperai.extra.streamed_responses import stream_trace_spans_async
+
+        return await stream_trace_spans_async(
+            self,
+            trace_id=trace_id,
+            retries=retries,
+            server_url=server_url,
+            timeout_ms=timeout_ms,
+            http_headers=http_headers,
+        )
+
+    # endregion sdk-class-body
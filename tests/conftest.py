@@ -0,0 +1,22 @@
+from typing import Callable
+
+import httpx
+import pytest
+
+from opperai import Opper
+
+Handler = Callable[[httpx.Request], httpx.Response]
+
+
+@pytest.fixture
+def make_client() -> Callable[[Handler], Opper]:
+    r"""An Opper client whose sync and async requests are answered by ``handler``."""
+
+    def make(handler: Handler) -> Opper:
+        return Opper(
+            http_bearer="test",
+            client=httpx.Client(transport=httpx.MockTransport(handler)),
+            async_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+
+    return make
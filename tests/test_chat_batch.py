@@ -0,0 +1,95 @@
+import asyncio
+import io
+import json
+
+import httpx
+
+from opperai.extra.chat_batch import BatchCheckpoint, ChatBatchRunner
+
+
+def _completion(content: str) -> dict:
+    return {
+        "id": "c",
+        "object": "chat.completion",
+        "created": 1,
+        "model": "m",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3},
+    }
+
+
+def _request(text: str) -> dict:
+    return {"model": "m", "messages": [{"role": "user", "content": text}]}
+
+
+def _handler(attempts):
+    def handler(request: httpx.Request) -> httpx.Response:
+        text = json.loads(request.content)["messages"][0]["content"]
+        attempts[text] = attempts.get(text, 0) + 1
+        if text == "bad":
+            return httpx.Response(400, json={"detail": "rejected"})
+        if text == "busy" and attempts[text] == 1:
+            return httpx.Response(429, headers={"retry-after": "0"}, text="slow down")
+        return httpx.Response(200, json=_completion(text.upper()))
+
+    return handler
+
+
+def _lines(out: io.StringIO):
+    return {r["custom_id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+
+
+def test_results_failures_and_retries(make_client):
+    attempts = {}
+    out = io.StringIO()
+    runner = ChatBatchRunner(make_client(_handler(attempts)), concurrency=4)
+    report = runner.run([_request("hi"), _request("busy"), _request("bad")], out)
+    lines = _lines(out)
+    assert lines["1"]["response"]["choices"][0]["message"]["content"] == "HI"
+    assert lines["2"]["error"] is None and attempts["busy"] == 2
+    assert lines["3"]["error"]["status_code"] == 400 and attempts["bad"] == 1
+    assert report.failed_ids == ["3"]
+    assert report.progress.throttled == 1
+    assert report.usage["m"].total_tokens == 6
+    assert runner._limit._in_flight == 0
+
+
+def test_checkpoint_skips_completed_requests(make_client, tmp_path):
+    attempts = {}
+    requests = [_request("a"), _request("b"), _request("bad")]
+    with BatchCheckpoint(tmp_path / "batch.db") as checkpoint:
+        runner = ChatBatchRunner(make_client(_handler(attempts)), checkpoint=checkpoint)
+        runner.run(requests, io.StringIO())
+        report = asyncio.run(runner.run_async(requests, io.StringIO()))
+    assert attempts == {"a": 1, "b": 1, "bad": 2}
+    assert report.progress.skipped == 2
+    assert report.usage["m"].requests == 2
+
+
+def test_cancelled_request_releases_its_slot(make_client):
+    started = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        started.set()
+        await asyncio.sleep(60)
+        raise AssertionError("not cancelled")
+
+    runner = ChatBatchRunner(make_client(handler), concurrency=1)
+
+    async def main():
+        task = asyncio.ensure_future(runner.run_async([_request("x")], io.StringIO()))
+        await asyncio.wait_for(started.wait(), 5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return runner._limit._in_flight
+
+    assert asyncio.run(main()) == 0
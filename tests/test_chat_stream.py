@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+
+_CHUNKS = [
+    {"content": "Hel", "role": "assistant"},
+    {"content": "lo"},
+    {
+        "tool_calls": [
+            {"index": 0, "id": "c", "function": {"name": "f", "arguments": '{"a"'}}
+        ]
+    },
+    {"tool_calls": [{"index": 0, "function": {"arguments": ": 1}"}}]},
+]
+
+
+def _sse(usage=True) -> bytes:
+    events = []
+    for delta in _CHUNKS:
+        chunk = {
+            "id": "x",
+            "object": "chat.completion.chunk",
+            "created": 1,
+            "model": "m",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+        events.append(chunk)
+    events[-1]["choices"][0]["finish_reason"] = "tool_calls"
+    if usage:
+        events.append(
+            {
+                "id": "x",
+                "object": "chat.completion.chunk",
+                "created": 1,
+                "model": "m",
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": 1,
+                    "completion_tokens": 2,
+                    "total_tokens": 3,
+                },
+            }
+        )
+    lines = [f"data: {json.dumps(e)}\n\n" for e in events] + ["data: [DONE]\n\n"]
+    return "".join(lines).encode()
+
+
+def _chat_handler(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if body["model"] == "bad":
+            return httpx.Response(400, json={"detail": "unknown model"})
+        return httpx.Response(
+            200, content=_sse(), headers={"content-type": "text/event-stream"}
+        )
+
+    return handler
+
+
+_REQUEST = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def test_stream_accumulates_the_completion(make_client):
+    requests = []
+    client = make_client(_chat_handler(requests))
+    with client.openai.create_chat_completion_stream(request=_REQUEST) as stream:
+        completion = stream.final_completion()
+    message = completion.choices[0].message
+    assert message.content == "Hello"
+    assert message.tool_calls[0].function.arguments == '{"a": 1}'
+    assert completion.choices[0].finish_reason == "tool_calls"
+    assert stream.usage.total_tokens == 3
+    assert stream.time_to_first_token is not None
+    assert requests[0]["stream"] is True
+    assert requests[0]["stream_options"] == {"include_usage": True}
+
+
+def test_stream_async(make_client):
+    client = make_client(_chat_handler([]))
+
+    async def main():
+        stream = await client.openai.create_chat_completion_stream_async(
+            request=_REQUEST
+        )
+        deltas = [c.choices[0].delta.content async for c in stream if c.choices]
+        return deltas, stream.accumulator.completion()
+
+    deltas, completion = asyncio.run(main())
+    assert deltas[:2] == ["Hel", "lo"]
+    assert completion.choices[0].message.content == "Hello"
+
+
+def test_errors_are_mapped(make_client):
+    client = make_client(_chat_handler([]))
+    with pytest.raises(errors.BadRequestError):
+        client.openai.create_chat_completion_stream(
+            request={**_REQUEST, "model": "bad"}
+        )
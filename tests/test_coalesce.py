@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.coalesce import enable_request_coalescing
+from opperai.extra.singleflight import AsyncSingleFlight, SingleFlight
+
+_KB = {
+    "id": "kb",
+    "name": "docs",
+    "created_at": "2025-01-01T00:00:00Z",
+    "embedding_model": "m",
+    "count": 1,
+}
+
+
+def test_single_flight_shares_results_and_errors_between_threads():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flights.do, "k", slow)
+        started.wait(5)
+        follower = pool.submit(flights.do, "k", slow)
+        # Release the call only once the follower is blocked on its result.
+        condition = flights._calls["k"]._condition  # pylint: disable=protected-access
+        while not condition._waiters:  # pylint: disable=protected-access
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+    assert calls == [1]
+    assert len(flights) == 0
+    assert flights.do("k", lambda: 2) == (2, False)
+
+
+def test_async_single_flight_survives_a_cancelled_waiter():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("k", slow))
+        second = asyncio.ensure_future(flights.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == ("done", True)
+        assert len(flights) == 0
+
+    asyncio.run(main())
+    assert calls == [1]
+
+
+def test_identical_async_gets_share_one_request(make_client):
+    sent = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.method)
+        await asyncio.sleep(0.01)
+        if request.url.path.endswith("/missing"):
+            return httpx.Response(404, json={"type": "NotFoundError", "detail": "no"})
+        return httpx.Response(200, json=_KB)
+
+    client = make_client(handler)
+    coalescer = enable_request_coalescing(client)
+
+    async def main():
+        kbs = await asyncio.gather(
+            *(client.knowledge.get_async(knowledge_base_id="kb") for _ in range(3))
+        )
+        assert {kb.name for kb in kbs} == {"docs"}
+        assert len({id(kb) for kb in kbs}) == 3
+
+        failures = await asyncio.gather(
+            *(
+                client.knowledge.get_async(knowledge_base_id="missing")
+                for _ in range(2)
+            ),
+            return_exceptions=True,
+        )
+        assert all(isinstance(f, errors.NotFoundError) for f in failures)
+
+        await asyncio.gather(
+            *(
+                client.knowledge.query_async(knowledge_base_id="kb", query="q")
+                for _ in range(2)
+            ),
+            return_exceptions=True,
+        )
+
+    asyncio.run(main())
+    assert sent == ["GET", "GET", "POST", "POST"]
+    stats = coalescer.stats()
+    assert (stats.requests, stats.coalesced) == (5, 3)
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.compact_embeddings import _CHUNK, decode_embeddings
+
+
+def _body(data, **extra) -> bytes:
+    return json.dumps({"model": "m", "data": data, "usage": {}, **extra}).encode()
+
+
+def test_empty_result():
+    result = decode_embeddings(_body([]))
+    assert (result.count, result.dimensions) == (0, 0)
+    assert result.tolist() == []
+    assert len(result.matrix()) == 0
+
+
+def test_embedding_key_in_strings_and_nested_objects():
+    data = [
+        {
+            "object": 'has "embedding": [9, 9] inside',
+            "meta": {"embedding": [7.0, 7.0, 7.0]},
+            "index": 0,
+            "embedding": [1.0, 2.0],
+        },
+    ]
+    result = decode_embeddings(_body(data, note='"embedding": [5]'))
+    assert result.tolist() == [[1.0, 2.0]]
+    assert result.model == "m"
+
+
+def test_out_of_order_indexes():
+    data = [
+        {"index": 2, "embedding": [3.0]},
+        {"index": 0, "embedding": [1.0]},
+        {"index": 1, "embedding": [2.0]},
+    ]
+    assert decode_embeddings(_body(data)).tolist() == [[1.0], [2.0], [3.0]]
+
+
+def test_vectors_spanning_many_chunks():
+    data = [{"index": i, "embedding": [i + 0.5] * 4096} for i in range(8)]
+    body = _body(data)
+    assert len(body) > 2 * _CHUNK
+    result = decode_embeddings(body)
+    assert result.count == 8
+    assert result.row(-1).tolist() == [7.5] * 4096
+
+
+def test_mismatched_dimensions():
+    data = [{"embedding": [1.0, 2.0]}, {"embedding": [1.0]}]
+    with pytest.raises(ValueError, match="embedding 1 has 1 dimensions"):
+        decode_embeddings(_body(data))
+
+
+def test_create_compact(make_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["input"]
+        data = [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(texts)]
+        return httpx.Response(200, json={"model": "m", "data": data, "usage": {}})
+
+    client = make_client(handler)
+    assert client.embeddings.create_compact(input=["a", "bb"]).tolist() == [
+        [1.0],
+        [2.0],
+    ]
+    result = asyncio.run(client.embeddings.create_compact_async(input=["ccc"]))
+    assert result.tolist() == [[3.0]]
+    # An ordinary create on the same client still returns the full model.
+    assert client.embeddings.create(input=["a"]).data[0]["embedding"] == [1.0]
+
+
+def test_create_compact_maps_errors(make_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, json={"detail": "no"})
+
+    client = make_client(handler)
+    with pytest.raises(errors.BadRequestError):
+        client.embeddings.create_compact(input="a")
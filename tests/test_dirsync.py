@@ -0,0 +1,124 @@
+import asyncio
+import re
+import threading
+
+import httpx
+
+from opperai.extra.dirsync import DirectorySync
+
+
+class _KnowledgeBase:
+    r"""In-memory ``list_files``, ``upload`` and ``delete_file`` endpoints."""
+
+    def __init__(self):
+        self.files = {}
+        self.deleted = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, content=b""):
+        self._next += 1
+        file_id = f"f{self._next}"
+        self.files[file_id] = (name, len(content))
+        return file_id
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        with self._lock:
+            if request.method == "GET" and path.endswith("/files"):
+                data = [
+                    {
+                        "id": file_id,
+                        "original_filename": name,
+                        "size": size,
+                        "status": "completed",
+                        "document_id": 1,
+                    }
+                    for file_id, (name, size) in self.files.items()
+                ]
+                return httpx.Response(
+                    200, json={"meta": {"total_count": len(data)}, "data": data}
+                )
+            if request.method == "DELETE":
+                file_id = path.rsplit("/", 1)[-1]
+                self.files.pop(file_id)
+                self.deleted.append(file_id)
+                return httpx.Response(204)
+            if path.endswith("/upload"):
+                body = request.read()
+                name = re.search(rb'filename="([^"]+)"', body).group(1).decode()
+                content = body.split(b"\r\n\r\n")[-1].rsplit(b"\r\n--", 1)[0]
+                file_id = self.add(name, content)
+                return httpx.Response(
+                    201,
+                    json={
+                        "id": file_id,
+                        "key": "k",
+                        "original_filename": name,
+                        "document_id": 1,
+                    },
+                )
+        return httpx.Response(500)
+
+
+def test_sync_uploads_skips_unchanged_and_deletes_removed(make_client, tmp_path):
+    kb = _KnowledgeBase()
+    (tmp_path / "sub").mkdir()
+    for i in range(3):
+        (tmp_path / f"a{i}.txt").write_text("x" * (i + 1))
+    (tmp_path / "sub" / "b.txt").write_text("hello")
+
+    with DirectorySync(make_client(kb), "kb", tmp_path) as sync:
+        report = sync.run()
+        assert sorted(report.uploaded) == ["a0.txt", "a1.txt", "a2.txt", "sub/b.txt"]
+
+        (tmp_path / "a0.txt").unlink()
+        (tmp_path / "a1.txt").write_text("changed")
+        report = asyncio.run(sync.run_async())
+        assert report.replaced == ["a1.txt"]
+        assert report.deleted == ["a0.txt"]
+        assert report.unchanged == 2
+
+        report = sync.run()
+        assert (report.uploaded, report.replaced, report.deleted) == ([], [], [])
+    assert sorted(name for name, _ in kb.files.values()) == [
+        "a1.txt",
+        "a2.txt",
+        "sub/b.txt",
+    ]
+
+
+def test_sync_only_deletes_its_own_files_matching_patterns(make_client, tmp_path):
+    kb = _KnowledgeBase()
+    foreign_pdf = kb.add("other.pdf")
+    foreign_txt = kb.add("notes.txt")
+    (tmp_path / "keep.pdf").write_bytes(b"%PDF")
+    (tmp_path / "gone.pdf").write_bytes(b"%PDF-2")
+    (tmp_path / "local.txt").write_text("not synced")
+
+    with DirectorySync(make_client(kb), "kb", tmp_path, patterns=["*.pdf"]) as sync:
+        assert sorted(sync.run().uploaded) == ["gone.pdf", "keep.pdf"]
+        (tmp_path / "gone.pdf").unlink()
+        report = sync.run()
+
+    assert report.deleted == ["gone.pdf"]
+    assert foreign_pdf in kb.files
+    assert foreign_txt in kb.files
+
+
+def test_sync_async_records_upload_failures(make_client, tmp_path):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"meta": {"total_count": 0}, "data": []})
+        return httpx.Response(400, text="rejected")
+
+    for i in range(20):
+        (tmp_path / f"f{i}.txt").write_text(str(i))
+
+    async def main():
+        with DirectorySync(make_client(handler), "kb", tmp_path, concurrency=2) as sync:
+            return await asyncio.wait_for(sync.run_async(), timeout=10)
+
+    report = asyncio.run(main())
+    assert len(report.failures) == 20
+    assert {f.operation for f in report.failures} == {"upload"}
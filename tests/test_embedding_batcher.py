@@ -0,0 +1,70 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from opperai.extra.embedding_batcher import MicroBatchEmbedder
+
+
+def _embeddings_handler(requests, gate=None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["input"]
+        requests.append(texts)
+        if gate is not None:
+            gate.wait(5)
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float(len(t)), 1.0]}
+            for i, t in enumerate(texts)
+        ]
+        return httpx.Response(200, json={"model": "m", "data": data, "usage": {}})
+
+    return handler
+
+
+def test_texts_are_batched_and_deduplicated(make_client):
+    requests = []
+    with MicroBatchEmbedder(
+        make_client(_embeddings_handler(requests)), max_batch_size=8, max_delay=0.05
+    ) as embedder:
+        futures = [embedder.submit(t) for t in ["a", "bb", "a", "ccc"]]
+        vectors = [f.result(5) for f in futures]
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+    assert requests == [["a", "bb", "ccc"]]
+
+
+def test_failed_batch_fails_every_caller(make_client):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, text="rejected")
+
+    with MicroBatchEmbedder(make_client(handler), max_delay=0.01) as embedder:
+        futures = [embedder.submit(t) for t in ["a", "b"]]
+        for future in futures:
+            with pytest.raises(Exception):
+                future.result(5)
+    assert embedder.stats().failed_batches == 1
+
+
+def test_cancelled_caller_does_not_fail_the_batch(make_client):
+    requests = []
+    gate = threading.Event()
+    embedder = MicroBatchEmbedder(
+        make_client(_embeddings_handler(requests, gate)), max_delay=0.05
+    )
+
+    async def main():
+        cancelled = asyncio.ensure_future(embedder.embed_async("cancel me"))
+        kept = asyncio.ensure_future(embedder.embed_async("keep"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.2)
+        gate.set()
+        return await asyncio.wait_for(kept, 5)
+
+    try:
+        assert asyncio.run(main()) == [4.0, 1.0]
+    finally:
+        gate.set()
+        embedder.close()
+    assert embedder.stats().failed_batches == 0
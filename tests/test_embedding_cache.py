@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.embedding_cache import EmbeddingCache, enable_embedding_cache
+
+
+class _Embeddings:
+    def __init__(self) -> None:
+        self.sent = []
+        self.status = 200
+        self.drop_one = False
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["input"]
+        self.sent.append(texts)
+        if self.status != 200:
+            return httpx.Response(
+                self.status, json={"type": "BadRequestError", "detail": "no"}
+            )
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float(len(t)), 0.5]}
+            for i, t in enumerate(texts)
+        ]
+        if self.drop_one:
+            data.pop()
+        return httpx.Response(
+            200,
+            json={
+                "model": "served",
+                "data": data,
+                "usage": {"total_tokens": len(texts)},
+            },
+        )
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+
+def _vectors(response):
+    return [item["embedding"] for item in response.data]
+
+
+def test_only_misses_are_sent_and_order_is_kept(make_client, tmp_path):
+    server = _Embeddings()
+    client = make_client(server.handler)
+    cache = enable_embedding_cache(client, tmp_path)
+
+    client.embeddings.create(input=["a", "bb"])
+    response = client.embeddings.create(input=["ccc", "a", "ccc", "bb"])
+
+    assert server.sent == [["a", "bb"], ["ccc"]]
+    assert _vectors(response) == [[3.0, 0.5], [1.0, 0.5], [3.0, 0.5], [2.0, 0.5]]
+    assert response.model == "served"
+    stats = cache.stats()
+    assert (stats.hits, stats.misses) == (2, 4)
+
+    cached = client.embeddings.create(input="bb")
+    assert len(server.sent) == 2
+    assert _vectors(cached) == [[2.0, 0.5]]
+    assert cached.model == "served"
+
+
+def test_vectors_are_keyed_by_model_and_persist(make_client, tmp_path):
+    server = _Embeddings()
+    client = make_client(server.handler)
+    enable_embedding_cache(client, tmp_path)
+    client.embeddings.create(input=["a"], model="one")
+    client.embeddings.create(input=["a"], model="two")
+    assert len(server.sent) == 2
+
+    with EmbeddingCache(tmp_path) as reopened:
+        assert reopened.get("one", "a").tolist() == [1.0, 0.5]
+        assert reopened.get("three", "a") is None
+
+
+def test_errors_and_malformed_responses_are_not_cached(make_client, tmp_path):
+    server = _Embeddings()
+    client = make_client(server.handler)
+    cache = enable_embedding_cache(client, tmp_path)
+
+    server.status = 400
+    with pytest.raises(errors.BadRequestError):
+        client.embeddings.create(input=["a"])
+
+    server.status = 200
+    server.drop_one = True
+    with pytest.raises(ValueError, match="expected 2 embeddings, got 1"):
+        client.embeddings.create(input=["a", "b"])
+
+    assert cache.stats().entries == 0
+
+
+def test_compaction_keeps_the_most_recently_used(tmp_path):
+    with EmbeddingCache(tmp_path, max_bytes=24, compact_ratio=0.75) as cache:
+        cache.put_many("m", [("a", [1.0, 1.0]), ("b", [2.0, 2.0])])
+        cache.put("m", "c", [3.0, 3.0])
+        old = cache.get("m", "a")
+        cache.put("m", "d", [4.0, 4.0])
+
+        stats = cache.stats()
+        assert (stats.compactions, stats.evictions, stats.entries) == (1, 2, 2)
+        assert stats.size_bytes == 16
+        assert cache.get("m", "b") is None and cache.get("m", "c") is None
+        assert cache.get("m", "a").tolist() == [1.0, 1.0]
+        assert cache.get("m", "d").tolist() == [4.0, 4.0]
+        # Views taken before a compaction stay readable.
+        assert old.tolist() == [1.0, 1.0]
+
+
+def test_async_create_uses_the_cache(make_client, tmp_path):
+    server = _Embeddings()
+    client = make_client(server.async_handler)
+    enable_embedding_cache(client, tmp_path)
+
+    async def main():
+        await client.embeddings.create_async(input=["a"])
+        return await client.embeddings.create_async(input=["a", "bb"])
+
+    response = asyncio.run(main())
+    assert server.sent == [["a"], ["bb"]]
+    assert _vectors(response) == [[1.0, 0.5], [2.0, 0.5]]
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import pickle
+
+import httpx
+
+from opperai.extra.evaluation import Evaluator, EvaluationRunner, evaluator
+
+
+@evaluator(mode="process", name="length")
+def score_length(entry, output):
+    # Runs in a worker process, so it only sees plain data.
+    assert isinstance(entry, dict)
+    return [{"dimension": "length", "value": len(output["text"])}]
+
+
+@evaluator
+def malformed(entry, output):
+    return [{"dimension": "broken", "value": "high"}]
+
+
+@evaluator
+def score_one(entry, output):
+    return [{"dimension": "one", "value": 1.0}]
+
+
+def _dataset_handler(entries, metric_status=200, metric_requests=None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/metrics"):
+            body = json.loads(request.content)
+            if metric_requests is not None:
+                metric_requests.append((request.url.path, body))
+            return httpx.Response(
+                metric_status,
+                json={
+                    **body,
+                    "id": "m",
+                    "span_id": request.url.path.split("/")[2],
+                    "created_at": "2024-01-01T00:00:00Z",
+                },
+            )
+        offset = int(request.url.params["offset"])
+        limit = int(request.url.params["limit"])
+        page = [
+            {"id": f"e{i}", "input": f"in{i}", "output": "out"}
+            for i in range(offset, min(offset + limit, entries))
+        ]
+        return httpx.Response(
+            200, json={"meta": {"total_count": entries}, "data": page}
+        )
+
+    return handler
+
+
+async def _target(entry):
+    return {"text": entry.input, "span_id": f"span-{entry.id}"}
+
+
+def test_evaluator_returns_the_function_unchanged():
+    assert callable(score_length) and not isinstance(score_length, Evaluator)
+    assert pickle.loads(pickle.dumps(score_length)) is score_length
+    ev = Evaluator(score_length)
+    assert (ev.mode, ev.name) == ("process", "length")
+
+
+def test_process_evaluator_scores_every_entry(make_client):
+    requests = []
+    runner = EvaluationRunner(
+        make_client(_dataset_handler(5, metric_requests=requests)),
+        concurrency=2,
+        page_size=2,
+        process_workers=1,
+    )
+    report = asyncio.run(runner.run("d", _target, [score_length]))
+    assert report.errors == []
+    assert report.stages["target"].count == 5
+    assert report.dimensions["length"].count == 5
+    assert report.dimensions["length"].mean == 3.0
+    assert sorted(path.split("/")[-2] for path, _ in requests) == [
+        f"span-e{i}" for i in range(5)
+    ]
+    assert {body["value"] for _, body in requests} == {3.0}
+
+
+def test_malformed_metric_is_an_evaluator_error(make_client):
+    runner = EvaluationRunner(make_client(_dataset_handler(2)), write_metrics=False)
+    report = asyncio.run(runner.run("d", _target, [malformed, score_one]))
+    assert sorted(e.entry_id for e in report.errors) == ["e0", "e1"]
+    assert {e.stage for e in report.errors} == {"eval:malformed"}
+    assert all(isinstance(e.error, ValueError) for e in report.errors)
+    assert report.dimensions["one"].count == 2
+    assert "broken" not in report.dimensions
+
+
+def test_failed_metric_write_reports_the_entry(make_client):
+    runner = EvaluationRunner(make_client(_dataset_handler(1, metric_status=400)))
+    report = asyncio.run(runner.run("d", _target, [score_one]))
+    [error] = report.errors
+    assert (error.entry_id, error.stage, error.span_id) == ("e0", "metrics", "span-e0")
+
+
+def test_target_failure_is_recorded(make_client):
+    async def target(entry):
+        if entry.id == "e1":
+            raise RuntimeError("boom")
+        return await _target(entry)
+
+    runner = EvaluationRunner(make_client(_dataset_handler(3)), write_metrics=False)
+    report = asyncio.run(runner.run("d", target, [score_one]))
+    assert [(e.entry_id, e.stage) for e in report.errors] == [("e1", "target")]
+    assert report.dimensions["one"].count == 2
+
+
+class _Crash(BaseException):
+    pass
+
+
+def test_consumer_crash_cancels_the_run(make_client):
+    async def target(entry):
+        if entry.id == "e3":
+            raise _Crash()
+
+    runner = EvaluationRunner(
+        make_client(_dataset_handler(50)), concurrency=2, page_size=5
+    )
+
+    async def main():
+        try:
+            await asyncio.wait_for(runner.run("d", target, [score_one]), 5)
+        except _Crash:
+            return asyncio.all_tasks() == {asyncio.current_task()}
+        return False
+
+    # The producer and the other consumers are cancelled, not left blocked.
+    assert asyncio.run(main())
@@ -0,0 +1,28 @@
+import ast
+import importlib
+from pathlib import Path
+
+import opperai.extra
+
+INIT = Path(opperai.extra.__file__)
+
+
+def test_type_checking_imports_resolve():
+    # The TYPE_CHECKING imports are only read by type checkers, so a stale
+    # module name in them would go unnoticed at runtime.
+    tree = ast.parse(INIT.read_text())
+    imports = [
+        node
+        for node in ast.walk(tree)
+        if isinstance(node, ast.ImportFrom) and node.level == 1
+    ]
+    assert imports
+    for node in imports:
+        module = importlib.import_module(f"opperai.extra.{node.module}")
+        for alias in node.names:
+            assert hasattr(module, alias.name), (node.module, alias.name)
+
+
+def test_lazy_exports_resolve():
+    for name in opperai.extra.__all__:
+        assert getattr(opperai.extra, name) is not None
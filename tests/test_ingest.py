@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import httpx
+
+from opperai.extra.ingest import KnowledgeIngestor
+from opperai.extra.manifest import IngestManifest
+
+
+def _handler(added):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "DELETE":
+            return httpx.Response(200, json={"id": "kb", "deleted_count": 1})
+        body = json.loads(request.content)
+        if body["key"] == "fails":
+            return httpx.Response(400, text="rejected")
+        added.append(body["key"])
+        return httpx.Response(201, json={})
+
+    return handler
+
+
+def test_ingest_records_invalid_and_failed_documents(make_client):
+    added = []
+    ingestor = KnowledgeIngestor(make_client(_handler(added)), "kb")
+    docs = [{"content": f"doc {i}", "key": f"k{i}"} for i in range(5)]
+    docs += [{"key": "no-content"}, {"content": "x", "key": "fails"}]
+
+    report = ingestor.ingest(docs)
+
+    assert sorted(added) == [f"k{i}" for i in range(5)]
+    assert report.progress.succeeded == 5
+    assert report.progress.failed == 2
+    assert sorted(f.key for f in report.failures) == ["fails", "no-content"]
+
+
+def test_ingest_async_survives_invalid_documents(make_client):
+    added = []
+    ingestor = KnowledgeIngestor(make_client(_handler(added)), "kb", concurrency=2)
+    docs = [{"key": "bad"}] + [{"content": f"doc {i}"} for i in range(20)]
+
+    async def main():
+        return await asyncio.wait_for(ingestor.ingest_async(docs), timeout=5)
+
+    report = asyncio.run(main())
+    assert len(added) == 20
+    assert [f.key for f in report.failures] == ["bad"]
+
+
+def test_sync_reports_final_progress_once_and_deletes_stale_keys(make_client, tmp_path):
+    added = []
+    finals = []
+    manifest = IngestManifest(str(tmp_path / "manifest.db"), "kb")
+    ingestor = KnowledgeIngestor(
+        make_client(_handler(added)),
+        "kb",
+        manifest=manifest,
+        on_progress=lambda p: finals.append(p.deleted),
+        progress_interval=1e9,
+    )
+    ingestor.sync([{"content": "a", "key": "a"}, {"content": "b", "key": "b"}])
+    assert finals == [0]
+
+    finals.clear()
+    report = ingestor.sync([{"content": "a", "key": "a"}])
+    assert finals == [1]
+    assert report.progress.skipped == 1
+    assert report.progress.deleted == 1
@@ -0,0 +1,39 @@
+import json
+
+from opperai.extra.json_stream import JSONItemScanner, StringSink
+
+
+class _Collect(StringSink):
+    def __init__(self, path):
+        self.data = bytearray()
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    def close(self):
+        return self.data.decode("utf-8")
+
+
+def _scan(doc: bytes, cuts):
+    scanner = JSONItemScanner([("data", "*")], spill={("data", "*", "t"): _Collect})
+    items = []
+    start = 0
+    for cut in list(cuts) + [len(doc)]:
+        items += scanner.feed(doc[start:cut])
+        start = cut
+    items += scanner.close()
+    return [value for _, value in items]
+
+
+def test_spill_surrogate_pair_split_across_chunks():
+    doc = b'{"data": [{"t": "x\\ud83d\\ude00y"}]}'
+    high = doc.index(b"\\ud83d")
+    for offset in range(1, 13):
+        assert _scan(doc, [high + offset]) == [{"t": "x\U0001f600y"}]
+
+
+def test_spill_decodes_every_split():
+    text = 'a\U0001f600b\\"é\U0001d11e\n'
+    doc = json.dumps({"data": [{"t": text, "n": 1}]}).encode()
+    for cut in range(1, len(doc)):
+        assert _scan(doc, [cut]) == [{"t": text, "n": 1}]
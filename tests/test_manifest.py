@@ -0,0 +1,122 @@
+import json
+
+import httpx
+import pytest
+
+from opperai import models
+from opperai.extra.ingest import KnowledgeIngestor
+from opperai.extra.manifest import IngestManifest, fingerprint
+
+
+class _Knowledge:
+    def __init__(self) -> None:
+        self.added = []
+        self.deleted = []
+        self.reject = set()
+        self.delete_status = 200
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.method == "DELETE":
+            if self.delete_status != 200:
+                return httpx.Response(
+                    self.delete_status, json={"type": "BadRequestError", "detail": "no"}
+                )
+            self.deleted.extend(body["filters"][0]["value"])
+            return httpx.Response(200, json={"id": "kb", "deleted_count": 1})
+        if body["key"] in self.reject:
+            return httpx.Response(400, json={"type": "BadRequestError", "detail": "no"})
+        self.added.append(body["key"])
+        return httpx.Response(201, json={})
+
+
+def _docs(**changes):
+    docs = {
+        "a": {"content": "alpha", "key": "a", "metadata": {"x": 1, "y": 2}},
+        "b": {"content": "beta", "key": "b"},
+        "c": {"content": "gamma", "key": "c"},
+    }
+    for key, change in changes.items():
+        docs[key] = {**docs[key], **change}
+    return list(docs.values())
+
+
+def _ingestor(make_client, knowledge, path):
+    return KnowledgeIngestor(
+        make_client(knowledge.handler), "kb", manifest=IngestManifest(path, "kb")
+    )
+
+
+def test_unchanged_documents_are_skipped(make_client, tmp_path):
+    knowledge = _Knowledge()
+    ingestor = _ingestor(make_client, knowledge, tmp_path / "m.db")
+    ingestor.ingest(_docs())
+    knowledge.added.clear()
+
+    report = ingestor.ingest(
+        _docs(
+            a={"metadata": {"y": 2, "x": 1}},
+            b={"content": "beta 2"},
+            c={"configuration": {"text_processing_chunk_size": 10}},
+        )
+    )
+
+    assert sorted(knowledge.added) == ["b", "c"]
+    assert report.progress.skipped == 1
+
+
+def test_failed_documents_are_sent_again(make_client, tmp_path):
+    knowledge = _Knowledge()
+    knowledge.reject = {"b"}
+    path = tmp_path / "m.db"
+    ingestor = _ingestor(make_client, knowledge, path)
+    assert ingestor.ingest(_docs()).progress.failed == 1
+    ingestor.manifest.close()
+
+    knowledge.reject = set()
+    knowledge.added.clear()
+    report = _ingestor(make_client, knowledge, path).ingest(_docs())
+    assert knowledge.added == ["b"]
+    assert report.progress.skipped == 2
+
+
+def test_sync_keeps_keys_whose_delete_failed(make_client, tmp_path):
+    knowledge = _Knowledge()
+    ingestor = _ingestor(make_client, knowledge, tmp_path / "m.db")
+    ingestor.sync(_docs())
+
+    knowledge.delete_status = 400
+    report = ingestor.sync(_docs()[:1])
+    assert sorted(f.key for f in report.failures) == ["b", "c"]
+    assert len(ingestor.manifest) == 3
+
+    knowledge.delete_status = 200
+    report = ingestor.sync(_docs()[:1])
+    assert sorted(knowledge.deleted) == ["b", "c"]
+    assert report.progress.deleted == 2
+    assert len(ingestor.manifest) == 1
+
+
+def test_manifests_are_scoped_to_their_knowledge_base(make_client, tmp_path):
+    path = tmp_path / "m.db"
+    with IngestManifest(path, "kb") as manifest:
+        manifest.begin_run()
+        manifest.record(fingerprint(models.AddRequest(content="x", key="k")))
+    with IngestManifest(path, "other") as other:
+        assert len(other) == 0
+        with pytest.raises(ValueError, match="different knowledge base"):
+            KnowledgeIngestor(make_client(_Knowledge().handler), "kb", manifest=other)
+
+    with pytest.raises(ValueError, match="no key"):
+        fingerprint(models.AddRequest(content="x"))
+
+
+def test_stale_keys_are_yielded_in_batches(tmp_path):
+    with IngestManifest(tmp_path / "m.db", "kb", commit_every=2) as manifest:
+        manifest.begin_run()
+        for i in range(5):
+            manifest.record(fingerprint(models.AddRequest(content="x", key=f"k{i}")))
+        manifest.begin_run()
+        assert manifest.check(fingerprint(models.AddRequest(content="x", key="k2")))
+        assert not manifest.check(fingerprint(models.AddRequest(content="y", key="k3")))
+        assert list(manifest.stale_keys(batch_size=2)) == [["k0", "k1"], ["k4"]]
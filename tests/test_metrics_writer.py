@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+
+import httpx
+
+from opperai.extra.metrics_writer import SpanMetricsWriter, SpanMetricsWriterAsync
+
+
+class _Metrics:
+    def __init__(self, delay=0.0):
+        self.writes = []
+        self.in_flight = 0
+        self.peak = 0
+        self._delay = delay
+        self._lock = threading.Lock()
+
+    def _response(self, request: httpx.Request) -> httpx.Response:
+        span_id = request.url.path.split("/")[-2]
+        body = json.loads(request.content)
+        self.writes.append((span_id, body["dimension"], body["value"]))
+        if span_id == "bad":
+            return httpx.Response(400, json={"detail": "no such span"})
+        return httpx.Response(
+            200,
+            json={
+                **body,
+                "id": "m",
+                "span_id": span_id,
+                "created_at": "2024-01-01T00:00:00Z",
+            },
+        )
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._response(request)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self._delay)
+        self.in_flight -= 1
+        return self._response(request)
+
+
+def test_last_write_per_dimension_wins(make_client):
+    server = _Metrics()
+    with SpanMetricsWriter(make_client(server.handler)) as writer:
+        writer.add(span_id="s1", dimension="score", value=0.1)
+        writer.add(span_id="s1", dimension="score", value=0.9)
+        writer.add(span_id="s1", dimension="length", value=3)
+        writer.add(span_id="s2", dimension="score", value=0.5)
+        assert len(writer) == 3
+    assert sorted(server.writes) == [
+        ("s1", "length", 3),
+        ("s1", "score", 0.9),
+        ("s2", "score", 0.5),
+    ]
+
+
+def test_flush_reports_failures(make_client):
+    writer = SpanMetricsWriter(make_client(_Metrics().handler))
+    writer.add(span_id="s", dimension="score", value=1)
+    writer.add(span_id="bad", dimension="score", value=1)
+    writer.add(span_id="s", dimension="score", value=2)
+    result = writer.flush()
+    assert result.deduplicated == 1
+    assert [w.span_id for w in result.written] == ["s"]
+    assert [(f.span_id, f.request.dimension) for f in result.failed] == [
+        ("bad", "score")
+    ]
+    assert writer.failed == result.failed
+    assert writer.flush().written == []
+
+
+def test_max_pending_triggers_a_flush(make_client):
+    server = _Metrics()
+    writer = SpanMetricsWriter(make_client(server.handler), max_pending=2)
+    writer.add(span_id="a", dimension="d", value=1)
+    assert server.writes == []
+    writer.add(span_id="b", dimension="d", value=1)
+    assert len(server.writes) == 2 and len(writer) == 0
+
+
+def test_async_writes_are_bounded(make_client):
+    server = _Metrics(delay=0.01)
+    client = make_client(server.async_handler)
+
+    async def main():
+        async with SpanMetricsWriterAsync(client, max_in_flight=3) as writer:
+            for i in range(12):
+                await writer.add(span_id=f"s{i}", dimension="d", value=i)
+            await writer.add(span_id="bad", dimension="d", value=0)
+        return writer
+
+    writer = asyncio.run(main())
+    assert len(server.writes) == 13
+    assert server.peak <= 3
+    assert [f.span_id for f in writer.failed] == ["bad"]
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai.extra.model_catalog import (
+    ALIAS,
+    BUILTIN,
+    CUSTOM,
+    ModelCatalog,
+    UnknownModelError,
+    validate_models,
+)
+
+
+class _Models:
+    def __init__(self):
+        self.builtin = ["openai/gpt-4o", "anthropic/claude-sonnet"]
+        self.fetches = 0
+        self.calls = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/models"):
+            self.fetches += 1
+            data = [
+                {"hosting_provider": "p", "name": n, "location": "eu"}
+                for n in self.builtin
+            ]
+        elif path.endswith("/models/custom"):
+            data = [{"id": "c", "name": "mine", "identifier": "x", "extra": {}}]
+        elif path.endswith("/models/aliases"):
+            data = [{"id": "a", "name": "fast", "fallback_models": ["openai/gpt-4o"]}]
+        else:
+            self.calls += 1
+            return httpx.Response(
+                200, json={"span_id": "s", "message": "ok", "cached": False}
+            )
+        return httpx.Response(
+            200, json={"meta": {"total_count": len(data)}, "data": data}
+        )
+
+
+def test_catalog_is_fetched_and_persisted(make_client, tmp_path):
+    server = _Models()
+    path = tmp_path / "models.json"
+    catalog = ModelCatalog(make_client(server.handler), path)
+    assert catalog.get("openai/gpt-4o").kind == BUILTIN
+    assert catalog.get("mine").kind == CUSTOM
+    assert catalog.get("fast").fallback_models == ["openai/gpt-4o"]
+    assert [m.name for m in catalog.find(kind=ALIAS)] == ["fast"]
+
+    reloaded = ModelCatalog(make_client(server.handler), path)
+    assert "anthropic/claude-sonnet" in reloaded
+    assert server.fetches == 1
+
+
+def test_unknown_model_gets_suggestions(make_client):
+    catalog = ModelCatalog(make_client(_Models().handler))
+    with pytest.raises(UnknownModelError) as info:
+        catalog.validate(["fast", "gpt-4o"])
+    assert info.value.name == "gpt-4o"
+    assert info.value.suggestions == ["openai/gpt-4o"]
+
+
+def test_miss_forces_one_rate_limited_refresh(make_client):
+    server = _Models()
+    catalog = ModelCatalog(make_client(server.handler), miss_refresh_interval=0)
+    catalog.validate("openai/gpt-4o")
+    server.builtin.append("openai/new")
+    # The model was added after the catalog was fetched.
+    assert [m.name for m in catalog.validate("openai/new")] == ["openai/new"]
+    assert server.fetches == 2
+
+    catalog.miss_refresh_interval = 3600
+    with pytest.raises(UnknownModelError):
+        catalog.validate("openai/newer")
+    with pytest.raises(UnknownModelError):
+        asyncio.run(catalog.validate_async("openai/newer"))
+    assert server.fetches == 2
+
+
+def test_miss_refresh_async(make_client):
+    server = _Models()
+    catalog = ModelCatalog(make_client(server.handler), miss_refresh_interval=0)
+    catalog.refresh()
+    server.builtin.append("openai/new")
+    infos = asyncio.run(catalog.validate_async({"name": "openai/new"}))
+    assert infos[0].kind == BUILTIN
+
+
+def test_middleware_rejects_unknown_models_before_sending(make_client):
+    server = _Models()
+    client = make_client(server.handler)
+    validate_models(client, ModelCatalog(client))
+    client.call(name="f", input="x", model="fast")
+    with pytest.raises(UnknownModelError):
+        client.call(name="f", input="x", model="nope")
+    assert server.calls == 1
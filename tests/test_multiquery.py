@@ -0,0 +1,123 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.multiquery import KnowledgeQuery, QueryOutcome, fuse
+
+
+def _doc(ident, key=None):
+    return {
+        "id": ident,
+        "key": key or ident,
+        "content": ident,
+        "metadata": {},
+        "score": 0.0,
+    }
+
+
+_RESULTS = {
+    "alpha": [_doc("a"), _doc("b")],
+    "beta": [_doc("b"), _doc("c", key="a")],
+}
+
+
+class _Knowledge:
+    def __init__(self) -> None:
+        self.sent = []
+        self.in_flight = 0
+        self.peak = 0
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.sent.append((request.url.path, body["query"]))
+        if body["query"] not in _RESULTS:
+            return httpx.Response(400, json={"type": "BadRequestError", "detail": "no"})
+        return httpx.Response(200, json=_RESULTS[body["query"]])
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self._respond(request)
+
+
+def test_results_are_fused_by_reciprocal_rank(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+
+    result = client.knowledge.query_many(
+        ["alpha", "beta"], knowledge_base_id="kb", rrf_k=0
+    )
+
+    assert [d.document.id for d in result.fused] == ["b", "a", "c"]
+    assert result.fused[0].score == pytest.approx(1 / 2 + 1)
+    assert result.fused[0].queries == [0, 1]
+    assert result.requests_sent == 2
+
+    by_key = fuse(result.outcomes, rrf_k=0, dedupe_by="key")
+    assert [d.document.id for d in by_key] == ["a", "b"]
+
+
+def test_queries_name_their_knowledge_base(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+    client.knowledge.query_many(
+        [KnowledgeQuery("alpha"), {"query": "alpha", "knowledge_base_id": "other"}],
+        knowledge_base_id="kb",
+    )
+    assert sorted(knowledge.sent) == [
+        ("/v2/knowledge/kb/query", "alpha"),
+        ("/v2/knowledge/other/query", "alpha"),
+    ]
+
+    with pytest.raises(ValueError, match="no knowledge_base_id"):
+        client.knowledge.query_many(["alpha"])
+
+
+def test_failed_queries_raise_or_are_recorded(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+
+    with pytest.raises(errors.BadRequestError):
+        client.knowledge.query_many(["alpha", "missing"], knowledge_base_id="kb")
+
+    result = client.knowledge.query_many(
+        ["alpha", "missing"], knowledge_base_id="kb", return_exceptions=True
+    )
+    assert [i for i, _ in result.errors] == [1]
+    assert isinstance(result.errors[0][1], errors.BadRequestError)
+    assert [d.document.id for d in result.fused] == ["a", "b"]
+
+
+def test_async_identical_queries_share_a_request_within_the_limit(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.async_handler)
+
+    result = asyncio.run(
+        client.knowledge.query_many_async(
+            ["alpha", " alpha ", "beta", "alpha"], knowledge_base_id="kb", concurrency=1
+        )
+    )
+
+    assert sorted(knowledge.sent) == [
+        ("/v2/knowledge/kb/query", "alpha"),
+        ("/v2/knowledge/kb/query", "beta"),
+    ]
+    assert [o.shared for o in result.outcomes] == [False, True, False, True]
+    assert result.requests_sent == 2
+    assert knowledge.peak == 1
+    # Repeats of the same query do not add to a document's score.
+    assert result.fused[0].document.id == "b"
+
+
+def test_fuse_skips_failed_outcomes():
+    query = KnowledgeQuery("alpha", knowledge_base_id="kb")
+    outcome = QueryOutcome(query, [], 0.0, error=ValueError("boom"))
+    assert fuse([outcome]) == []
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from opperai import models
+from opperai.extra.offload import (
+    CPUExecutor,
+    chunk_size_for,
+    cpu_bound,
+    default_pool_size,
+    is_cpu_bound,
+    offload,
+    to_payload,
+)
+
+
+@cpu_bound
+def _pid_square(x):
+    return os.getpid(), x * x
+
+
+def _fail(x):
+    if x == 5:
+        raise ValueError("bad input")
+    return x
+
+
+def test_cpu_bound_marks_without_wrapping():
+    assert is_cpu_bound(_pid_square)
+    assert not is_cpu_bound(_fail)
+    assert _pid_square(3) == (os.getpid(), 9)
+
+
+def test_default_pool_size_keeps_a_core_free():
+    assert default_pool_size(reserve=0) >= default_pool_size() >= 1
+    assert default_pool_size(reserve=10_000) == 1
+
+
+def test_chunk_size_for():
+    assert chunk_size_for(0, 4) == 1
+    assert chunk_size_for(3, 4) == 1
+    assert chunk_size_for(160, 4) == 10
+    assert chunk_size_for(161, 4) == 11
+
+
+def test_to_payload_dumps_models_by_alias_and_drops_unset():
+    entry = models.CreateDatasetEntryRequest(input="q", output="a")
+    payload = to_payload({"m": [entry], "t": (1, 2)})
+    assert payload == {"m": [{"input": "q", "output": "a"}], "t": [1, 2]}
+
+
+def test_map_preserves_order_across_chunks():
+    async def main():
+        with CPUExecutor(max_workers=2) as executor:
+            return await executor.map(_fail, range(5), chunksize=2)
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+
+
+def test_map_sync_preserves_order():
+    with CPUExecutor(max_workers=2) as executor:
+        assert executor.map_sync(_fail, range(5), chunksize=3) == [0, 1, 2, 3, 4]
+        assert executor.map_sync(_fail, []) == []
+
+
+def test_worker_failure_is_raised_to_the_awaiting_caller():
+    async def main():
+        with CPUExecutor(max_workers=2) as executor:
+            with pytest.raises(ValueError, match="bad input"):
+                await executor.run(_fail, 5)
+            with pytest.raises(ValueError, match="bad input"):
+                await executor.map(_fail, range(10), chunksize=3)
+            # The pool stays usable after a task raised.
+            assert await executor.run(_fail, 1) == 1
+
+    asyncio.run(main())
+
+
+def test_offload_runs_cpu_bound_in_a_process_and_others_in_a_thread():
+    def in_thread():
+        return threading.get_ident()
+
+    async def main():
+        pid, square = await offload(_pid_square, 4)
+        ident = await offload(in_thread)
+        return pid, square, ident
+
+    pid, square, ident = asyncio.run(main())
+    assert square == 16
+    assert pid != os.getpid()
+    assert ident != threading.get_ident()
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from opperai.extra.pagination import paginate, paginate_async
+
+
+def _pages(total, cap=None, fail_at=None):
+    calls = []
+    lock = threading.Lock()
+
+    def page(offset, limit, **kwargs):
+        with lock:
+            calls.append((offset, limit, kwargs))
+        if offset == fail_at:
+            raise RuntimeError("page failed")
+        limit = min(limit, cap or limit)
+        data = list(range(offset, min(offset + limit, total)))
+        return SimpleNamespace(data=data, meta=SimpleNamespace(total_count=total))
+
+    return page, calls
+
+
+def test_items_in_order():
+    page, calls = _pages(23)
+    assert list(paginate(page, page_size=5, concurrency=3, tag="x")) == list(range(23))
+    assert sorted(offset for offset, _, _ in calls) == [0, 5, 10, 15, 20]
+    assert all(kwargs == {"tag": "x"} for _, _, kwargs in calls)
+
+
+def test_server_capped_limit_and_max_items():
+    page, calls = _pages(30, cap=4)
+    assert list(paginate(page, page_size=10, max_items=10)) == list(range(10))
+    assert sorted(offset for offset, _, _ in calls) == [0, 4, 8]
+
+
+def test_empty_endpoint():
+    page, calls = _pages(0)
+    assert list(paginate(page)) == []
+    assert len(calls) == 1
+
+
+def test_page_failure_is_raised():
+    page, _ = _pages(20, fail_at=10)
+    items = paginate(page, page_size=5)
+    with pytest.raises(RuntimeError, match="page failed"):
+        list(items)
+
+
+def test_invalid_arguments():
+    page, _ = _pages(1)
+    with pytest.raises(ValueError):
+        next(paginate(page, page_size=0))
+
+
+def test_async_items_in_order_and_early_exit_cancels():
+    page, _ = _pages(50)
+    started = []
+
+    async def list_page(offset, limit):
+        started.append(offset)
+        await asyncio.sleep(0)
+        return page(offset, limit)
+
+    async def main():
+        items = [i async for i in paginate_async(list_page, page_size=7)]
+        assert items == list(range(50))
+        gen = paginate_async(list_page, page_size=7, concurrency=2)
+        assert await gen.__anext__() == 0
+        await gen.aclose()
+        return asyncio.all_tasks() == {asyncio.current_task()}
+
+    assert asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+
+from opperai.extra.pipeline import run_bounded, run_bounded_async
+
+
+def test_run_bounded_async_processes_every_item_within_the_limit():
+    seen = []
+    in_flight = 0
+    peak = 0
+
+    async def worker(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0)
+        seen.append(item)
+        in_flight -= 1
+
+    asyncio.run(run_bounded_async(range(100), worker, 3))
+    assert sorted(seen) == list(range(100))
+    assert peak <= 3
+
+
+def test_run_bounded_async_worker_failure_is_raised_without_hanging():
+    async def worker(item):
+        if item == 3:
+            raise ValueError("bad item")
+        await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.wait_for(run_bounded_async(range(1000), worker, 2), timeout=5)
+
+    with pytest.raises(ValueError, match="bad item"):
+        asyncio.run(main())
+
+
+def test_run_bounded_async_source_failure_is_raised():
+    def source():
+        yield 1
+        raise KeyError("source")
+
+    async def worker(item):
+        await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.wait_for(run_bounded_async(source(), worker, 2), timeout=5)
+
+    with pytest.raises(KeyError):
+        asyncio.run(main())
+
+
+def test_run_bounded_stops_submitting_after_a_failure():
+    calls = []
+    lock = threading.Lock()
+
+    def worker(item):
+        with lock:
+            calls.append(item)
+        if item == 3:
+            raise ValueError("bad item")
+
+    with pytest.raises(ValueError, match="bad item"):
+        run_bounded(range(1000), worker, 2)
+    assert len(calls) < 1000
@@ -0,0 +1,142 @@
+import asyncio
+import httpx
+
+from opperai.extra.query_cache import enable_query_cache, normalize_query
+
+_RESULT = [{"id": "d1", "key": "k", "content": "c", "metadata": {}, "score": 0.5}]
+
+
+class _Knowledge:
+    def __init__(self) -> None:
+        self.queries = 0
+        self.query_status = 200
+        self.on_query = None
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/query"):
+            self.queries += 1
+            if self.on_query is not None:
+                self.on_query()
+            if self.query_status != 200:
+                return httpx.Response(
+                    self.query_status, json={"type": "BadRequestError", "detail": "no"}
+                )
+            return httpx.Response(200, json=_RESULT)
+        if request.url.path.endswith("/add"):
+            return httpx.Response(201, json={})
+        return httpx.Response(404, json={"type": "NotFoundError", "detail": "no"})
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+
+def test_normalize_query():
+    assert normalize_query("  a \n\t b ") == "a b"
+    assert normalize_query("Café", casefold=True) == "café"
+
+
+def test_equivalent_queries_share_an_entry(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+    cache = enable_query_cache(client)
+    filters = [
+        {"field": "a", "operation": "=", "value": 1},
+        {"field": "b", "operation": "=", "value": 2},
+    ]
+
+    first = client.knowledge.query(
+        knowledge_base_id="kb", query="what  is it", filters=filters
+    )
+    second = client.knowledge.query(
+        knowledge_base_id="kb", query="what is it", filters=filters[::-1]
+    )
+    client.knowledge.query(knowledge_base_id="kb", query="what is it", top_k=5)
+
+    assert first == second
+    assert knowledge.queries == 2
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 2, 2)
+
+
+def test_failed_and_unparseable_queries_are_not_cached(make_client):
+    knowledge = _Knowledge()
+    knowledge.query_status = 400
+    client = make_client(knowledge.handler)
+    cache = enable_query_cache(client)
+
+    for _ in range(2):
+        try:
+            client.knowledge.query(knowledge_base_id="kb", query="q")
+        except Exception:  # pylint: disable=broad-except
+            pass
+    assert knowledge.queries == 2
+    assert cache.stats().entries == 0
+
+    request = httpx.Request("POST", "https://x/v2/knowledge/kb/query", content=b"{oops")
+    assert cache.cache_key(request) is None
+
+
+def test_writes_invalidate_their_knowledge_base(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+    cache = enable_query_cache(client)
+
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    client.knowledge.query(knowledge_base_id="other", query="q")
+    client.knowledge.add(knowledge_base_id="kb", content="new")
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    client.knowledge.query(knowledge_base_id="other", query="q")
+
+    assert knowledge.queries == 3
+    assert cache.stats().invalidations == 1
+
+
+def test_query_in_flight_during_a_write_is_not_stored(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+    cache = enable_query_cache(client)
+
+    def write_once():
+        knowledge.on_query = None
+        client.knowledge.add(knowledge_base_id="kb", content="new")
+
+    knowledge.on_query = write_once
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    assert cache.stats().entries == 0
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    assert knowledge.queries == 2
+
+
+def test_expired_and_oversized_entries(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+    cache = enable_query_cache(client, ttl=0)
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    assert knowledge.queries == 2
+    assert cache.stats().expirations == 1
+
+    client = make_client(knowledge.handler)
+    small = enable_query_cache(client, max_bytes=10)
+    client.knowledge.query(knowledge_base_id="kb", query="q")
+    assert small.stats().stores == 0
+
+
+def test_async_queries_are_cached(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.async_handler)
+    cache = enable_query_cache(client)
+
+    async def main():
+        await client.knowledge.query_async(knowledge_base_id="kb", query="q")
+        await client.knowledge.query_async(knowledge_base_id="kb", query="q")
+        await client.knowledge.add_async(knowledge_base_id="kb", content="new")
+        await client.knowledge.query_async(knowledge_base_id="kb", query="q")
+
+    asyncio.run(main())
+    assert knowledge.queries == 2
+    assert cache.stats().hits == 1
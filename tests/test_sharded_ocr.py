@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.sharded_ocr import page_shards
+
+_DOCUMENT = {"type": "document_url", "document_url": "https://example.com/a.pdf"}
+
+
+class _OCR:
+    def __init__(self, failures=None) -> None:
+        # Number of times each shard, keyed by its first page, fails before succeeding.
+        self.failures = dict(failures or {})
+        self.sent = []
+        self.cancelled = 0
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        pages = json.loads(request.content)["pages"]
+        self.sent.append(pages)
+        if self.failures.get(pages[0], 0) > 0:
+            self.failures[pages[0]] -= 1
+            return httpx.Response(400, json={"type": "BadRequestError", "detail": "no"})
+        return httpx.Response(
+            200,
+            json={
+                "id": "r",
+                "model": "m",
+                "pages": [
+                    {"index": p, "markdown": f"page {p}"} for p in reversed(pages)
+                ],
+                "usage_info": {"pages_processed": len(pages), "doc_size_bytes": 100},
+                "cost": {"generation": 1.0, "platform": 0.5, "total": 1.5},
+            },
+        )
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        first = json.loads(request.content)["pages"][0]
+        try:
+            # Later shards finish first.
+            await asyncio.sleep(0.01 * (10 - first))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self._respond(request)
+
+
+def test_page_shards():
+    assert page_shards([4, 0, 2, 2, 1], 2) == [[0, 1], [2, 4]]
+    with pytest.raises(ValueError, match="at least 1"):
+        page_shards([0], 0)
+
+
+def test_pages_are_merged_in_order(make_client):
+    ocr = _OCR()
+    client = make_client(ocr.handler)
+
+    result = client.ocr.process_sharded(
+        model="m", document=_DOCUMENT, page_count=7, pages_per_shard=3
+    ).collect()
+
+    assert sorted(ocr.sent) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert [p.index for p in result.pages] == list(range(7))
+    assert result.usage_info.pages_processed == 7
+    assert result.usage_info.doc_size_bytes == 100
+    assert result.cost.total == 4.5
+    assert result.attempts == 3
+
+
+def test_failed_shards_are_retried_alone(make_client):
+    ocr = _OCR(failures={3: 2})
+    client = make_client(ocr.handler)
+
+    stream = client.ocr.process_sharded(
+        model="m", document=_DOCUMENT, pages=range(6), pages_per_shard=3
+    )
+    assert [p.index for p in stream] == list(range(6))
+    assert ocr.sent.count([0, 1, 2]) == 1
+    assert ocr.sent.count([3, 4, 5]) == 3
+    assert stream.result.attempts == 4
+
+
+def test_a_shard_failing_every_attempt_fails_the_run(make_client):
+    ocr = _OCR(failures={3: 5})
+    client = make_client(ocr.handler)
+    with pytest.raises(errors.BadRequestError):
+        client.ocr.process_sharded(
+            model="m",
+            document=_DOCUMENT,
+            page_count=6,
+            pages_per_shard=3,
+            max_attempts=2,
+        ).collect()
+    assert ocr.sent.count([3, 4, 5]) == 2
+
+
+def test_pages_or_page_count_is_required(make_client):
+    client = make_client(_OCR().handler)
+    with pytest.raises(ValueError, match="page_count"):
+        client.ocr.process_sharded(model="m", document=_DOCUMENT)
+
+
+def test_closing_the_stream_stops_sending_shards(make_client):
+    ocr = _OCR()
+    client = make_client(ocr.handler)
+    pages = iter(
+        client.ocr.process_sharded(
+            model="m",
+            document=_DOCUMENT,
+            page_count=5,
+            pages_per_shard=1,
+            concurrency=1,
+        )
+    )
+    assert next(pages).index == 0
+    pages.close()
+    assert ocr.sent == [[0]]
+
+
+def test_async_pages_in_completion_or_index_order(make_client):
+    ocr = _OCR()
+    client = make_client(ocr.async_handler)
+
+    async def main(ordered):
+        stream = await client.ocr.process_sharded_async(
+            model="m",
+            document=_DOCUMENT,
+            page_count=6,
+            pages_per_shard=2,
+            ordered=ordered,
+        )
+        indexes = [page.index async for page in stream]
+        return indexes, stream.result
+
+    indexes, result = asyncio.run(main(True))
+    assert indexes == list(range(6))
+    assert [p.index for p in result.pages] == list(range(6))
+
+    indexes, _ = asyncio.run(main(False))
+    assert indexes == [4, 5, 2, 3, 0, 1]
+
+
+def test_async_close_cancels_shards_in_flight(make_client):
+    ocr = _OCR()
+    client = make_client(ocr.async_handler)
+
+    async def main():
+        stream = await client.ocr.process_sharded_async(
+            model="m",
+            document=_DOCUMENT,
+            page_count=10,
+            pages_per_shard=1,
+            ordered=False,
+        )
+        pages = stream.__aiter__()
+        first = await pages.__anext__()
+        await pages.aclose()
+        return first
+
+    assert asyncio.run(main()).index == 3
+    assert ocr.cancelled == 3
+    assert len(ocr.sent) == 1
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from opperai import errors, models
+from opperai.extra.sharded_rerank import bm25_scores, shard_documents
+
+
+def _docs(n):
+    return [{"text": f"doc {i} about {'cats' if i % 2 else 'dogs'}"} for i in range(n)]
+
+
+class _Reranker:
+    def __init__(self, fail_on=None) -> None:
+        self.fail_on = fail_on
+        self.shards = []
+        self.in_flight = 0
+        self.peak = 0
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        texts = [d["text"] for d in body["documents"]]
+        self.shards.append(texts)
+        if self.fail_on is not None and self.fail_on in texts:
+            return httpx.Response(400, json={"type": "BadRequestError", "detail": "no"})
+        # Later documents are more relevant, so the global order is known.
+        results = sorted(
+            (
+                {"index": i, "relevance_score": int(t.split()[1]) / 100}
+                for i, t in enumerate(texts)
+            ),
+            key=lambda r: -r["relevance_score"],
+        )[: body.get("top_k")]
+        return httpx.Response(
+            200,
+            json={
+                "id": "r",
+                "results": results,
+                "model": "rr",
+                "usage": {"search_units": 1, "unit": "search"},
+                "cost": {"generation": 0.5, "platform": 0.25, "total": 0.75},
+            },
+        )
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return self._respond(request)
+
+
+def test_shards_are_merged_with_original_indexes(make_client):
+    reranker = _Reranker()
+    client = make_client(reranker.handler)
+    documents = _docs(10)
+
+    response = client.rerank.documents_sharded(
+        query="q", documents=documents, model="rr", top_k=4, max_shard_documents=3
+    )
+
+    assert sorted(len(s) for s in reranker.shards) == [1, 3, 3, 3]
+    assert [r.index for r in response.results] == [9, 8, 7, 6]
+    assert response.results[0].document.text == documents[9]["text"]
+    assert response.usage == {"search_units": 4, "unit": "search"}
+    assert response.cost == models.RerankCost(generation=2.0, platform=1.0, total=3.0)
+    assert response.candidates == 10
+    assert len(response.responses) == 4
+
+
+def test_shards_respect_the_byte_budget():
+    documents = [models.RerankDocument(text="x" * size) for size in (10, 10, 500, 10)]
+    assert shard_documents(range(4), documents, max_bytes=100) == [[0, 1], [2], [3]]
+
+
+def test_prefilter_drops_unrelated_documents(make_client):
+    reranker = _Reranker()
+    client = make_client(reranker.handler)
+
+    response = client.rerank.documents_sharded(
+        query="cats", documents=_docs(10), model="rr", prefilter=True, prefilter_top_n=5
+    )
+
+    assert response.candidates == 5
+    assert all("cats" in text for shard in reranker.shards for text in shard)
+    assert bm25_scores("", ["a"]) == [0.0]
+
+
+def test_a_failed_shard_fails_the_call(make_client):
+    reranker = _Reranker(fail_on="doc 4 about dogs")
+    client = make_client(reranker.handler)
+    with pytest.raises(errors.BadRequestError):
+        client.rerank.documents_sharded(
+            query="q", documents=_docs(10), model="rr", max_shard_documents=2
+        )
+
+
+def test_async_shards_run_within_the_limit(make_client):
+    reranker = _Reranker()
+    client = make_client(reranker.async_handler)
+
+    response = asyncio.run(
+        client.rerank.documents_sharded_async(
+            query="q",
+            documents=_docs(12),
+            model="rr",
+            max_shard_documents=2,
+            concurrency=2,
+            return_documents=False,
+        )
+    )
+
+    assert reranker.peak == 2
+    assert [r.index for r in response.results] == list(range(11, -1, -1))
+    assert not any(
+        isinstance(r.document, models.RerankDocument) for r in response.results
+    )
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+
+_PNG = bytes(range(256)) * 40
+
+
+def _ocr_handler(requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        if body["model"] == "bad":
+            return httpx.Response(422, json={"detail": [{"msg": "bad model"}]})
+        encoded = base64.b64encode(_PNG).decode()
+        pages = [
+            {
+                "index": 0,
+                "markdown": "# one",
+                "images": [
+                    {"id": "a", "image_base64": f"data:image/png;base64,{encoded}"},
+                    {"id": "b", "image_base64": encoded},
+                ],
+            },
+            {"index": 1, "markdown": "two", "images": []},
+        ]
+        return httpx.Response(
+            200, json={"id": "r", "model": body["model"], "pages": pages}
+        )
+
+    return handler
+
+
+_DOCUMENT = {"type": "document_url", "document_url": "https://example.com/a.pdf"}
+
+
+def test_pages_are_streamed_with_images_spilled(make_client):
+    requests = []
+    client = make_client(_ocr_handler(requests))
+    with client.ocr.process_streamed(model="m", document=_DOCUMENT) as response:
+        pages = list(response)
+        first, second = pages
+        assert [image.id for image in first.images] == ["a", "b"]
+        assert [image.read() for image in first.images] == [_PNG, _PNG]
+        assert first.images[0].media_type == "image/png"
+        assert first.images[0].size == len(_PNG)
+        assert second.markdown == "two" and second.images == []
+        assert (response.id, response.model) == ("r", "m")
+    assert requests[0]["include_image_base64"] is True
+
+
+def test_pages_are_streamed_async(make_client):
+    client = make_client(_ocr_handler([]))
+
+    async def main():
+        async with await client.ocr.process_streamed_async(
+            model="m", document=_DOCUMENT
+        ) as response:
+            return [page.index async for page in response]
+
+    assert asyncio.run(main()) == [0, 1]
+
+
+def test_errors_are_mapped(make_client):
+    client = make_client(_ocr_handler([]))
+    with pytest.raises(errors.RequestValidationError):
+        client.ocr.process_streamed(model="bad", document=_DOCUMENT)
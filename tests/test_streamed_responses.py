@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import pytest
+
+from opperai import errors
+
+
+def _entries_handler(total=3):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/missing/entries"):
+            return httpx.Response(404, json={"detail": "no such dataset"})
+        if request.url.path.endswith("/broken/entries"):
+            return httpx.Response(503, text="unavailable")
+        offset = int(request.url.params["offset"])
+        data = [
+            {"id": f"e{i}", "input": "in", "output": "out"}
+            for i in range(offset, total)
+        ]
+        return httpx.Response(200, json={"meta": {"total_count": total}, "data": data})
+
+    return handler
+
+
+def test_entries_are_streamed_with_envelope(make_client):
+    client = make_client(_entries_handler())
+    with client.datasets.list_entries_streamed(dataset_id="d", offset=1) as entries:
+        assert [e.id for e in entries] == ["e1", "e2"]
+    assert entries.envelope.meta.total_count == 3
+    assert entries.envelope.data == []
+
+
+def test_entries_are_streamed_async(make_client):
+    client = make_client(_entries_handler())
+
+    async def main():
+        entries = await client.datasets.list_entries_streamed_async(dataset_id="d")
+        return [e.id async for e in entries]
+
+    assert asyncio.run(main()) == ["e0", "e1", "e2"]
+
+
+def test_errors_are_mapped(make_client):
+    client = make_client(_entries_handler())
+    with pytest.raises(errors.NotFoundError) as info:
+        client.datasets.list_entries_streamed(dataset_id="missing")
+    assert info.value.data.detail == "no such dataset"
+    with pytest.raises(errors.APIError, match="API error occurred"):
+        asyncio.run(client.datasets.list_entries_streamed_async(dataset_id="broken"))
@@ -0,0 +1,132 @@
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.uploads import (
+    StreamingMultipartBody,
+    _OpenedFile,
+    upload_file,
+    upload_file_async,
+)
+
+_FILE = {"id": "f1", "key": "k", "original_filename": "notes.txt", "document_id": 1}
+
+
+class _Knowledge:
+    def __init__(self, upload_status: int = 204) -> None:
+        self.upload_status = upload_status
+        self.paths = []
+        self.uploaded = b""
+        self.registered = None
+
+    def _respond(self, request: httpx.Request, body: bytes) -> httpx.Response:
+        self.paths.append(request.url.path)
+        if request.url.host == "bucket.test":
+            assert request.headers["content-length"] == str(len(body))
+            self.uploaded = body
+            return httpx.Response(self.upload_status)
+        if request.url.path.endswith("/upload"):
+            assert b"hello" in body
+            return httpx.Response(201, json=_FILE)
+        if request.url.path.endswith("/upload_url"):
+            return httpx.Response(
+                200,
+                json={
+                    "url": "https://bucket.test/put",
+                    "fields": {"key": "k", "policy": "p"},
+                    "id": "f1",
+                },
+            )
+        if request.url.path.endswith("/register_file"):
+            self.registered = json.loads(body)
+            return httpx.Response(201, json=_FILE)
+        return httpx.Response(404, json={"type": "NotFoundError", "detail": "no"})
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request, request.read())
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        return self._respond(request, await request.aread())
+
+
+def test_small_file_uses_direct_upload(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+    result = upload_file(client, "kb", b"hello", filename="notes.txt")
+    assert result.id == "f1"
+    assert knowledge.paths == ["/v2/knowledge/kb/upload"]
+
+
+def test_large_file_is_streamed_to_the_presigned_url(make_client, tmp_path):
+    path = tmp_path / "notes.txt"
+    content = bytes(range(256)) * 100
+    path.write_bytes(content)
+    knowledge = _Knowledge()
+    client = make_client(knowledge.handler)
+
+    upload_file(
+        client, "kb", path, metadata={"a": 1}, presigned_threshold=10, chunk_size=7
+    )
+
+    assert knowledge.paths == [
+        "/v2/knowledge/kb/upload_url",
+        "/put",
+        "/v2/knowledge/kb/register_file",
+    ]
+    assert content in knowledge.uploaded
+    assert b'name="policy"\r\n\r\np\r\n' in knowledge.uploaded
+    assert knowledge.registered["file_id"] == "f1"
+    assert knowledge.registered["content_type"] == "text/plain"
+    assert knowledge.registered["metadata"] == {"a": 1}
+
+
+def test_large_file_async(make_client):
+    knowledge = _Knowledge()
+    client = make_client(knowledge.async_handler)
+    content = b"x" * 1000
+    asyncio.run(
+        upload_file_async(
+            client,
+            "kb",
+            io.BytesIO(content),
+            filename="notes.txt",
+            presigned_threshold=10,
+            chunk_size=64,
+        )
+    )
+    assert content in knowledge.uploaded
+    assert knowledge.registered["filename"] == "notes.txt"
+
+
+def test_failed_presigned_upload_is_not_registered(make_client):
+    knowledge = _Knowledge(upload_status=403)
+    client = make_client(knowledge.handler)
+    with pytest.raises(errors.APIError, match="Presigned upload failed"):
+        upload_file(client, "kb", b"x" * 100, filename="a.bin", presigned_threshold=10)
+    assert knowledge.registered is None
+    assert "/v2/knowledge/kb/register_file" not in knowledge.paths
+
+
+def test_stream_without_name_needs_a_filename():
+    with pytest.raises(ValueError, match="filename is required"):
+        _OpenedFile(io.BytesIO(b"data"), None)
+
+
+def test_multipart_body_rewinds_and_detects_truncated_files():
+    stream = io.BytesIO(b"0123456789")
+    stream.seek(2)
+    opened = _OpenedFile(stream, "digits.txt")
+    body = StreamingMultipartBody({}, opened, "text/plain", chunk_size=3)
+
+    first = b"".join(body)
+    assert len(first) == len(body)
+    assert b"23456789" in first and b"01" not in first.split(b"\r\n\r\n")[1]
+    assert b"".join(body) == first
+
+    stream.truncate(5)
+    with pytest.raises(IOError, match="file ended"):
+        b"".join(body)
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+from opperai import errors, models
+from opperai.extra.usage_store import UsageStore, bucket_end, bucket_start
+
+_DAY = timedelta(days=1)
+_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _when(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class _Analytics:
+    def __init__(self) -> None:
+        self.ranges = []
+        self.fail = False
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if self.fail:
+            return httpx.Response(400, json={"type": "BadRequestError", "detail": "no"})
+        low = _when(request.url.params["from_date"])
+        high = _when(request.url.params["to_date"])
+        self.ranges.append((low, high))
+        items = []
+        day = low
+        while day < high:
+            items.append(
+                {"time_bucket": day.isoformat(), "cost": "1.0", "count": day.day}
+            )
+            day += _DAY
+        return httpx.Response(200, json=items)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        return self.handler(request)
+
+
+def _days(items):
+    return [item.time_bucket.day for item in items]
+
+
+def test_buckets():
+    when = datetime(2024, 12, 31, 13, 45, 7)
+    assert bucket_start(when, models.Granularity.HOUR) == datetime(
+        2024, 12, 31, 13, tzinfo=timezone.utc
+    )
+    month = bucket_start(when, models.Granularity.MONTH)
+    assert bucket_end(month, models.Granularity.MONTH) == datetime(
+        2025, 1, 1, tzinfo=timezone.utc
+    )
+
+
+def test_final_buckets_are_fetched_once(make_client, tmp_path):
+    analytics = _Analytics()
+    with UsageStore(make_client(analytics.handler), tmp_path / "u.db") as store:
+        first = store.get_usage(from_date=_START, to_date=_START + 5 * _DAY)
+        again = store.get_usage(
+            from_date=_START + _DAY, to_date=_START + 3 * _DAY - timedelta(hours=1)
+        )
+        wider = store.get_usage(from_date=_START, to_date=_START + 7 * _DAY)
+
+        assert _days(first) == [1, 2, 3, 4, 5]
+        assert _days(again) == [2, 3]
+        assert _days(wider) == [1, 2, 3, 4, 5, 6, 7]
+        assert analytics.ranges == [
+            (_START, _START + 5 * _DAY),
+            (_START + 5 * _DAY, _START + 7 * _DAY),
+        ]
+        stats = store.stats()
+        assert (stats.queries, stats.requests, stats.buckets_fetched) == (3, 2, 7)
+
+
+def test_recent_buckets_are_fetched_again(make_client, tmp_path):
+    analytics = _Analytics()
+    today = bucket_start(datetime.now(timezone.utc), models.Granularity.DAY)
+    with UsageStore(make_client(analytics.handler), tmp_path / "u.db") as store:
+        store.get_usage(from_date=today - 3 * _DAY)
+        store.get_usage(from_date=today - 3 * _DAY)
+    assert analytics.ranges[0] == (today - 3 * _DAY, today + _DAY)
+    assert analytics.ranges[1][0] >= today - _DAY
+
+
+def test_failed_fetches_are_not_stored(make_client, tmp_path):
+    analytics = _Analytics()
+    with UsageStore(make_client(analytics.handler), tmp_path / "u.db") as store:
+        analytics.fail = True
+        with pytest.raises(errors.BadRequestError):
+            store.get_usage(from_date=_START, to_date=_START + 2 * _DAY)
+        analytics.fail = False
+        assert _days(store.get_usage(from_date=_START, to_date=_START + 2 * _DAY)) == [
+            1,
+            2,
+        ]
+        assert analytics.ranges == [(_START, _START + 2 * _DAY)]
+
+
+def test_series_are_cached_separately_and_invalidated(make_client, tmp_path):
+    analytics = _Analytics()
+    path = tmp_path / "u.db"
+    with UsageStore(make_client(analytics.handler), path) as store:
+        store.get_usage(from_date=_START, to_date=_START + _DAY)
+        store.get_usage(from_date=_START, to_date=_START + _DAY, group_by=["team"])
+        assert len(analytics.ranges) == 2
+
+    with UsageStore(make_client(analytics.handler), path) as store:
+        store.get_usage(from_date=_START, to_date=_START + _DAY)
+        assert len(analytics.ranges) == 2
+        store.invalidate(models.Granularity.DAY)
+        store.get_usage(from_date=_START, to_date=_START + _DAY)
+        store.get_usage(from_date=_START, to_date=_START + _DAY, group_by=["team"])
+        assert len(analytics.ranges) == 3
+
+
+def test_get_usage_async(make_client, tmp_path):
+    analytics = _Analytics()
+    with UsageStore(make_client(analytics.async_handler), tmp_path / "u.db") as store:
+
+        async def main():
+            await store.get_usage_async(from_date=_START, to_date=_START + 2 * _DAY)
+            return await store.get_usage_async(
+                from_date=_START, to_date=_START + 2 * _DAY
+            )
+
+        assert _days(asyncio.run(main())) == [1, 2]
+    assert len(analytics.ranges) == 1
@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from opperai.extra import usage_table
+from opperai.extra.usage_table import NULL_TIME, UsageTable
+
+_ROWS = [
+    {"time_bucket": "2024-01-01T00:00:00Z", "cost": 1.0, "model": "a", "count": 1},
+    {"time_bucket": "2024-01-01T00:00:00Z", "cost": 2.0, "model": "b", "count": 2},
+    {"time_bucket": "2024-01-02T00:00:00Z", "cost": 4.0, "model": "a", "count": 3},
+    {"time_bucket": "2024-01-02T00:00:00Z", "cost": 8.0, "model": "c", "count": 4},
+]
+_DAY1 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+_DAY2 = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=[False, True], ids=["python", "numpy"])
+def table(request):
+    if request.param and usage_table.np is None:
+        pytest.skip("numpy is not installed")
+    return UsageTable.from_usage(_ROWS, use_numpy=request.param)
+
+
+def test_from_usage_infers_columns(table):
+    assert table.columns == ["time_bucket", "model", "cost", "count"]
+    assert table.total() == 15.0
+    assert table.total("count") == 10.0
+    assert next(table.rows()) == {
+        "time_bucket": _DAY1,
+        "model": "a",
+        "cost": 1.0,
+        "count": 1.0,
+    }
+
+
+def test_group_by_without_time_has_no_time(table):
+    rows = list(table.group_by("model").rows())
+    assert [(r["time_bucket"], r["model"], r["cost"]) for r in rows] == [
+        (None, "a", 5.0),
+        (None, "b", 2.0),
+        (None, "c", 8.0),
+    ]
+    assert list(table.group_by("model").time_buckets) == [NULL_TIME] * 3
+
+
+def test_group_by_time(table):
+    rows = list(table.group_by("time_bucket").rows())
+    assert [(r["time_bucket"], r["cost"]) for r in rows] == [
+        (_DAY1, 3.0),
+        (_DAY2, 12.0),
+    ]
+
+
+def test_top(table):
+    rows = list(table.top(2, "model").rows())
+    assert [(r["time_bucket"], r["model"], r["cost"]) for r in rows] == [
+        (None, "c", 8.0),
+        (None, "a", 5.0),
+    ]
+
+
+def test_rollup(table):
+    rows = [
+        (r["time_bucket"], r["model"], r["cost"])
+        for r in table.rollup("time_bucket", "model").rows()
+    ]
+    assert rows == [
+        (_DAY1, "a", 1.0),
+        (_DAY1, "b", 2.0),
+        (_DAY2, "a", 4.0),
+        (_DAY2, "c", 8.0),
+        (_DAY1, None, 3.0),
+        (_DAY2, None, 12.0),
+        (None, None, 15.0),
+    ]
+
+
+def test_empty_usage():
+    table = UsageTable.from_usage([], group_by=["model"], fields=["count"])
+    assert len(table) == 0
+    assert len(table.group_by("model")) == 0
+    assert table.total() == 0
+
+
+def test_unknown_dimension(table):
+    with pytest.raises(KeyError):
+        table.group_by("project")
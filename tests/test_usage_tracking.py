@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from opperai import errors
+from opperai.extra.usage_tracking import UsageAggregator, UsageKey, track_usage
+
+
+def _call_response(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content or b"{}")
+    if body.get("input") == "bad":
+        return httpx.Response(400, json={"type": "BadRequestError", "detail": "no"})
+    if body.get("input") == "garbled":
+        return httpx.Response(200, content=b"not json")
+    return httpx.Response(
+        200,
+        json={
+            "span_id": "s",
+            "message": "ok",
+            "cached": body.get("input") == "again",
+            "usage": {"input_tokens": 3, "output_tokens": 2, "details": {"cached": 1}},
+            "cost": {"generation": 0.5, "platform": 0.25, "total": 0.75},
+        },
+    )
+
+
+class _Events(httpx.SyncByteStream, httpx.AsyncByteStream):
+    r"""An unread event stream whose usage chunk is split across reads."""
+
+    def __init__(self) -> None:
+        events = [
+            {"delta": "he", "chunk_type": "text"},
+            {"delta": "llo", "chunk_type": "text"},
+            {"usage": {"output_tokens": 4}, "cost": {"total": 1.5}},
+        ]
+        content = b"".join(b"data: " + json.dumps(e).encode() + b"\n\n" for e in events)
+        self.chunks = [content[i : i + 7] for i in range(0, len(content), 7)]
+
+    def __iter__(self):
+        yield from self.chunks
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _stream_response(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(
+        200, headers={"content-type": "text/event-stream"}, stream=_Events()
+    )
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/stream"):
+        return _stream_response(request)
+    return _call_response(request)
+
+
+async def _async_handler(request: httpx.Request) -> httpx.Response:
+    return _handler(request)
+
+
+def test_calls_are_totalled_per_function_model_and_tags(make_client):
+    client = make_client(_handler)
+    aggregator = track_usage(client)
+
+    client.call(name="summarize", input="x", model="m1", tags={"team": "a"})
+    client.call(name="summarize", input="again", model="m1", tags={"team": "a"})
+    client.call(name="translate", input="x", model="m2")
+    client.functions.call(function_id="fn-1", input="x")
+
+    snapshot = aggregator.snapshot()
+    totals = snapshot[UsageKey("summarize", "m1", (("team", "a"),))]
+    assert (totals.calls, totals.cached) == (2, 1)
+    assert totals.usage == {
+        "input_tokens": 6,
+        "output_tokens": 4,
+        "details.cached": 2,
+    }
+    assert totals.cost["total"] == 1.5
+    assert set(snapshot.by_function()) == {"summarize", "translate", "fn-1"}
+    assert snapshot.by_model()["m2"].calls == 1
+    assert snapshot.by_tag("team")[None].calls == 2
+    assert snapshot.total().cost["total"] == 3.0
+
+
+def test_failed_and_unparseable_calls_are_not_recorded(make_client):
+    client = make_client(_handler)
+    aggregator = track_usage(client)
+
+    with pytest.raises(errors.BadRequestError):
+        client.call(name="f", input="bad")
+    with pytest.raises(Exception):
+        client.call(name="f", input="garbled")
+    assert aggregator.snapshot() == {}
+
+
+def test_streamed_usage_is_recorded_once_read(make_client):
+    client = make_client(_handler)
+    aggregator = track_usage(client)
+
+    response = client.stream(name="f", input="x")
+    assert aggregator.snapshot() == {}
+    with response.result as events:
+        assert len(list(events)) == 3
+
+    totals = aggregator.snapshot()[UsageKey("f", "", ())]
+    assert totals.calls == 1
+    assert totals.usage == {"output_tokens": 4}
+    assert totals.cost == {"total": 1.5}
+
+
+def test_stream_closed_before_its_usage_is_not_recorded(make_client):
+    client = make_client(_handler)
+    aggregator = track_usage(client)
+
+    with client.stream(name="f", input="x").result as events:
+        next(iter(events))
+    assert aggregator.snapshot() == {}
+
+
+def test_async_stream_and_calls(make_client):
+    client = make_client(_async_handler)
+    aggregator = track_usage(client)
+
+    async def main():
+        await client.call_async(name="f", input="x")
+        response = await client.stream_async(name="f", input="x")
+        async with response.result as events:
+            async for _ in events:
+                pass
+
+    asyncio.run(main())
+    assert aggregator.snapshot()[UsageKey("f", "", ())].calls == 2
+
+
+def test_threads_record_without_losing_updates():
+    aggregator = UsageAggregator()
+    key = UsageKey("f", "m", ())
+
+    def work():
+        for _ in range(1000):
+            aggregator.record(key, usage={"tokens": 1})
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = aggregator.snapshot(reset=True)
+    assert snapshot[key].calls == 8000
+    assert snapshot[key].usage == {"tokens": 8000}
+    assert aggregator.snapshot() == {}
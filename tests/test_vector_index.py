@@ -0,0 +1,103 @@
+import pytest
+
+from opperai import models
+from opperai.extra import vector_index
+from opperai.extra.embedding_cache import EmbeddingCache
+from opperai.extra.vector_index import VectorIndex, matches_filters
+
+_ITEMS = [
+    ("x", [1.0, 0.0], {"lang": "en", "year": 2020}),
+    ("y", [0.0, 2.0], {"lang": "sv", "year": 2022}),
+    ("xy", [3.0, 3.0], {"lang": "en"}),
+    ("zero", [0.0, 0.0], None),
+]
+
+
+@pytest.fixture(params=[False, True], ids=["python", "numpy"])
+def use_numpy(request):
+    if request.param and vector_index.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+def _index(use_numpy, **kwargs):
+    index = VectorIndex(2, use_numpy=use_numpy, **kwargs)
+    index.add_many(_ITEMS)
+    return index
+
+
+def _keys(hits):
+    return [h.key for h in hits]
+
+
+def test_cosine_and_dot_rankings(use_numpy):
+    cosine = _index(use_numpy, block_size=3)
+    hits = cosine.search([1.0, 0.1], top_k=3)
+    assert _keys(hits) == ["x", "xy", "y"]
+    assert hits[0].score == pytest.approx(1 / (1.01**0.5), rel=1e-5)
+    assert hits[0].metadata == {"lang": "en", "year": 2020}
+
+    dot = _index(use_numpy, metric="dot", block_size=1)
+    assert _keys(dot.search([0.0, 1.0], top_k=2)) == ["xy", "y"]
+    assert [_keys(h) for h in dot.search_many([[1.0, 0.0], [0.0, 1.0]], 1)] == [
+        ["xy"],
+        ["xy"],
+    ]
+
+
+def test_filters_are_applied_before_scoring(use_numpy):
+    index = _index(use_numpy)
+    en = [{"field": "lang", "operation": "=", "value": "en"}]
+    assert _keys(index.search([0.0, 1.0], 10, en)) == ["xy", "x"]
+    recent = [{"field": "year", "operation": ">", "value": 2021}]
+    assert _keys(index.search([1.0, 0.0], 10, recent)) == ["y"]
+    none = [{"field": "lang", "operation": "in", "value": ["de"]}]
+    assert index.search([1.0, 0.0], 10, none) == []
+
+
+def test_matches_filters_treats_missing_fields_as_not_equal():
+    ne = models.Filter(field="lang", operation="!=", value="en")
+    gt = models.Filter(field="year", operation=">", value=2021)
+    assert matches_filters(None, [ne])
+    assert not matches_filters(None, [gt])
+    assert not matches_filters({"year": "soon"}, [gt])
+
+
+def test_malformed_vectors_and_queries_are_rejected(use_numpy):
+    index = _index(use_numpy)
+    with pytest.raises(ValueError, match="has 3 dimensions, expected 2"):
+        index.add("bad", [1.0, 2.0, 3.0])
+    with pytest.raises(ValueError, match="query has 1 dimensions"):
+        index.search([1.0])
+    with pytest.raises(ValueError, match="unsupported metric"):
+        VectorIndex(2, metric="l2")  # type: ignore[arg-type]
+    assert index.search([1.0, 0.0], top_k=0) == []
+    assert VectorIndex(2, use_numpy=use_numpy).search([1.0, 0.0]) == []
+
+
+def test_from_embedding_cache(use_numpy, tmp_path):
+    with EmbeddingCache(tmp_path) as cache:
+        cache.put_many("m", [("x", [1.0, 0.0]), ("y", [0.0, 1.0])])
+        cache.put("m", "wide", [1.0, 1.0])
+        cache.put("other", "z", [1.0, 0.0, 0.0])
+
+        index = VectorIndex.from_embedding_cache(
+            cache,
+            "m",
+            ["y", "missing", "x"],
+            metadata=[{"n": 1}, None, {"n": 2}],
+            use_numpy=use_numpy,
+        )
+        assert len(index) == 2
+        hits = index.search([1.0, 0.2], top_k=2)
+        assert [(h.key, h.metadata) for h in hits] == [("x", {"n": 2}), ("y", {"n": 1})]
+
+        everything = VectorIndex.from_embedding_cache(cache, "m", use_numpy=use_numpy)
+        assert len(everything) == 3
+        everything.add("new", [0.2, 0.9])
+        assert everything.search([0.2, 0.9], top_k=1)[0].key == "new"
+
+        cache.put("mixed", "a", [1.0])
+        cache.put("mixed", "b", [1.0, 2.0])
+        with pytest.raises(ValueError, match="mixed dimensions"):
+            VectorIndex.from_embedding_cache(cache, "mixed")